@@ -0,0 +1,307 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from pharmacy.db import supabase, invalidate_cache, get_medicine_names, get_medicines
+from pharmacy.auth import current_user_name
+from pharmacy.profiling import request_capture, captures, pstats_text
+from pharmacy.submit import call_rpc, flash, form_token, form_key, latency_summary
+from pharmacy.alerts import ALERT_DEFAULTS
+
+st.header("⚙️ จัดการระบบ (Admin Panel)")
+
+tab_manage, tab_add, tab_delete, tab_line, tab_quarantine, tab_cards, tab_profiler = st.tabs(["👥 จัดการข้อมูลผู้ใช้ / อนุมัติ", "➕ สร้างผู้ใช้ใหม่", "🗑️ ลบบัญชีผู้ใช้", "📱 ตั้งค่ารายงาน LINE", "🧪 คลังกักกัน (ยาหมดอายุ)", "📒 Stock Card ทุกรายการ", "⏱️ Profiler"])
+
+with tab_manage:
+    profiles = pd.DataFrame(supabase.table("profiles").select("*").execute().data)
+    if not profiles.empty:
+        profiles_view = profiles.copy()
+        profiles_view['status'] = profiles_view['is_approved'].map({True: 'อนุมัติแล้ว', False: 'รออนุมัติ'})
+        cols_to_show = ['email', 'full_name', 'role', 'status', 'created_at']
+        existing_cols = [c for c in cols_to_show if c in profiles_view.columns]
+        st.dataframe(profiles_view[existing_cols], use_container_width=True)
+        st.divider()
+        col_m1, col_m2 = st.columns(2)
+        with col_m1:
+            st.subheader("✅ จัดการคำขอใช้งาน")
+            pending_users = profiles[profiles['is_approved'] == False]
+            if not pending_users.empty:
+                user_to_approve = st.selectbox("เลือกผู้ใช้เพื่ออนุมัติ", pending_users['email'])
+                c1, c2 = st.columns(2)
+                if c1.button("อนุมัติให้เป็น Staff", use_container_width=True):
+                    supabase.table("profiles").update({"is_approved": True}).eq("email", user_to_approve).execute()
+                    invalidate_cache()
+                    flash("อนุมัติเรียบร้อย!"); st.rerun()
+                if c2.button("แต่งตั้งเป็น Admin", use_container_width=True):
+                    supabase.table("profiles").update({"is_approved": True, "role": "admin"}).eq("email", user_to_approve).execute()
+                    invalidate_cache()
+                    flash("แต่งตั้งเป็น Admin เรียบร้อย!"); st.rerun()
+            else: st.info("ไม่มีคำขอรออนุมัติ")
+        with col_m2:
+            st.subheader("✏️ แก้ไขสิทธิ์และชื่อผู้ใช้งาน")
+            user_to_edit_email = st.selectbox("เลือกผู้ใช้ที่ต้องการแก้ไข", profiles['email'].tolist())
+            if user_to_edit_email:
+                selected_user = profiles[profiles['email'] == user_to_edit_email].iloc[0]
+                with st.form("edit_user_profile_form"):
+                    current_name = selected_user['full_name'] if pd.notna(selected_user['full_name']) else ""
+                    new_name = st.text_input("ชื่อ - นามสกุล", value=current_name)
+                    current_role = selected_user['role']
+                    role_options = ["staff", "admin"]
+                    try: role_idx = role_options.index(current_role)
+                    except: role_idx = 0
+                    new_role = st.selectbox("สิทธิ์การใช้งาน (Role)", role_options, index=role_idx)
+                    if st.form_submit_button("💾 บันทึกการแก้ไข", use_container_width=True):
+                        try:
+                            supabase.table("profiles").update({"full_name": new_name, "role": new_role}).eq("id", selected_user['id']).execute()
+                            invalidate_cache()
+                            flash(f"อัปเดตข้อมูลของ {user_to_edit_email} เรียบร้อยแล้ว!"); st.rerun()
+                        except Exception as e: st.error(f"Error: {e}")
+    else: st.info("ไม่มีผู้ใช้งานในระบบ")
+
+with tab_add:
+    st.subheader("สร้างบัญชีผู้ใช้งานใหม่")
+    with st.form("admin_add_user"):
+        new_name = st.text_input("ชื่อ - นามสกุล")
+        new_email = st.text_input("อีเมลผู้ใช้งานใหม่")
+        new_password = st.text_input("รหัสผ่าน (ขั้นต่ำ 6 ตัวอักษร)", type="password")
+        new_role = st.selectbox("สิทธิ์การใช้งาน", ["staff", "admin"])
+        if st.form_submit_button("สร้างบัญชี", use_container_width=True):
+            if new_name and new_email and len(new_password) >= 6:
+                try:
+                    res = supabase.auth.sign_up({"email": new_email, "password": new_password})
+                    if res.user:
+                        supabase.table("profiles").update({"is_approved": True, "role": new_role, "full_name": new_name}).eq("id", res.user.id).execute()
+                        invalidate_cache()
+                        flash(f"สร้างบัญชี {new_email} สำเร็จ!")
+                        flash("ข้อควรระวัง: หลังจากนี้ให้กดปุ่ม 'ออกจากระบบ' แล้วล็อกอินบัญชี Admin กลับเข้ามาอีกครั้ง", icon="⚠️")
+                        st.rerun()
+                except Exception as e: st.error(f"ไม่สามารถสร้างบัญชีได้: {e}")
+            else: st.warning("กรุณากรอกข้อมูลให้ครบถ้วน (และรหัสผ่านขั้นต่ำ 6 ตัวอักษร)")
+
+with tab_delete:
+    st.subheader("เพิกถอนสิทธิ์ / ลบบัญชีผู้ใช้งาน")
+    all_profiles = pd.DataFrame(supabase.table("profiles").select("*").execute().data)
+    if not all_profiles.empty:
+        other_users = all_profiles[all_profiles['email'] != st.session_state.user_email]
+        if not other_users.empty:
+            user_to_delete = st.selectbox("เลือกอีเมลที่ต้องการลบสิทธิ์การเข้าถึง:", other_users['email'].tolist())
+            confirm_del_user = st.checkbox("ยืนยันว่าต้องการลบสิทธิ์ผู้ใช้นี้", key="confirm_del_user")
+            st.markdown('<div class="red-btn-hook"></div>', unsafe_allow_html=True)
+            if st.button("ลบผู้ใช้งาน", type="primary"):
+                if confirm_del_user:
+                    try:
+                        supabase.table("profiles").delete().eq("email", user_to_delete).execute()
+                        invalidate_cache()
+                        flash(f"ลบสิทธิ์ของ {user_to_delete} เรียบร้อยแล้ว!"); st.rerun()
+                    except Exception as e: st.error(f"เกิดข้อผิดพลาดในการลบ: {e}")
+                else: st.error("กรุณาติ๊กช่องยืนยันก่อนกดปุ่มลบ")
+        else: st.info("ไม่มีผู้ใช้งานอื่นในระบบ")
+
+with tab_line:
+    st.subheader("⚙️ ตั้งค่าการส่งรายงานและเชื่อมต่อ LINE")
+    st.info("กำหนดเวลาและใส่ Token (ระบบจะบันทึกและยึดค่าที่กรอกครั้งล่าสุดเสมอ)")
+    REPORT_JOB_DEFAULTS = {'weekly_report_enabled': False, 'weekly_report_weekday': 1, 'daily_report_enabled': False, 'daily_report_hour': 8}
+    WEEKDAYS_TH = ["จันทร์", "อังคาร", "พุธ", "พฤหัสบดี", "ศุกร์", "เสาร์", "อาทิตย์"]
+
+    # ดึงค่าเก่าจากฐานข้อมูลมาโชว์
+    try:
+        set_res = supabase.table("settings").select("*").eq("id", 1).execute()
+        if set_res.data:
+            current_day = int(set_res.data[0].get('report_day') if set_res.data[0].get('report_day') is not None else 1)
+            current_hour = int(set_res.data[0].get('report_hour') if set_res.data[0].get('report_hour') is not None else 10)
+            current_token = str(set_res.data[0].get('line_token') if set_res.data[0].get('line_token') is not None else '')
+            current_target = str(set_res.data[0].get('line_target_id') if set_res.data[0].get('line_target_id') is not None else '')
+            current_alert = {k: int(set_res.data[0].get(k) if set_res.data[0].get(k) is not None else v) for k, v in ALERT_DEFAULTS.items()}
+            current_jobs = {k: type(v)(set_res.data[0].get(k) if set_res.data[0].get(k) is not None else v) for k, v in REPORT_JOB_DEFAULTS.items()}
+        else:
+            current_day, current_hour, current_token, current_target, current_alert, current_jobs = 1, 10, "", "", dict(ALERT_DEFAULTS), dict(REPORT_JOB_DEFAULTS)
+    except:
+        current_day, current_hour, current_token, current_target, current_alert, current_jobs = 1, 10, "", "", dict(ALERT_DEFAULTS), dict(REPORT_JOB_DEFAULTS)
+
+    col_t1, col_t2 = st.columns(2)
+    with col_t1:
+        new_day = st.number_input("📅 วันที่ส่งรายงาน (รายเดือน):", min_value=1, max_value=31, value=min(max(current_day, 1), 31), help="เลือกได้ตั้งแต่วันที่ 1 ถึง 31 (เดือนที่มีไม่ถึงวันที่เลือก จะส่งในวันสุดท้ายของเดือน)")
+    with col_t2:
+        time_options = [f"{str(h).zfill(2)}:00 น." for h in range(0, 24)]
+        # ป้องกัน Error ถ้าค่า index เกิน 23
+        safe_hour_index = current_hour if 0 <= current_hour <= 23 else 10
+        selected_time_str = st.selectbox("⏰ เวลาที่ต้องการส่ง:", time_options, index=safe_hour_index)
+        new_hour = int(selected_time_str.split(":")[0])
+
+    # รายงานตามรอบเพิ่มเติม (auto_report.py ตรวจทุกชั่วโมง รอบที่พลาดจะถูกส่งย้อนให้)
+    col_j1, col_j2 = st.columns(2)
+    with col_j1:
+        new_weekly = st.toggle("⏰ รายงานยาใกล้หมดอายุ รายสัปดาห์", value=current_jobs['weekly_report_enabled'])
+        new_weekday = WEEKDAYS_TH.index(st.selectbox("ส่งทุกวัน (เวลาเดียวกับรายงานรายเดือน):", WEEKDAYS_TH, index=current_jobs['weekly_report_weekday'] - 1, disabled=not new_weekly)) + 1
+    with col_j2:
+        new_daily = st.toggle("📉 รายงานยาต่ำกว่าจุดสั่งซื้อ รายวัน", value=current_jobs['daily_report_enabled'])
+        new_daily_hour = int(st.selectbox("ส่งทุกวันเวลา:", time_options, index=current_jobs['daily_report_hour'] % 24, disabled=not new_daily).split(":")[0])
+
+    st.markdown("<br>##### 📱 ตั้งค่ารหัสผ่าน LINE Messaging API", unsafe_allow_html=True)
+    line_token_input = st.text_input("1. LINE Channel Access Token", value=current_token, type="password")
+    line_target_id = st.text_input("2. LINE User ID หรือ Group ID ปลายทาง", value=current_target, type="password")
+
+    # 🌟 แจ้งเตือนยาต่ำกว่าจุดสั่งซื้อ/ยาหมด/ใกล้หมดอายุ (ประเมินทันทีที่รับ-เบิก แล้วรวมส่งเข้า LINE ทุก 15 นาที ดู stock_alerts.py)
+    st.markdown("<br>##### 🔔 แจ้งเตือนคลังอัตโนมัติ", unsafe_allow_html=True)
+    col_a1, col_a2, col_a3 = st.columns(3)
+    new_band = col_a1.number_input("ช่วงกันแจ้งซ้ำเหนือจุดสั่งซื้อ (%)", min_value=0, max_value=200, value=current_alert['alert_band_pct'], help="ยาที่ต่ำกว่าจุดสั่งซื้อจะถือว่ากลับมาปกติเมื่อยอดเกินจุดสั่งซื้อไปอีกตามเปอร์เซ็นต์นี้")
+    new_debounce = col_a2.number_input("รอให้สถานะคงที่ก่อนแจ้ง (นาที)", min_value=0, max_value=720, value=current_alert['alert_debounce_minutes'])
+    new_expiry_days = col_a3.number_input("เตือนล็อตที่จะหมดอายุภายใน (วัน)", min_value=1, max_value=365, value=current_alert['alert_expiry_days'])
+
+    st.divider()
+
+    # จัดปุ่มเรียง ซ้าย - ขวา ให้สมดุล
+    col_btn_left, col_btn_right = st.columns(2)
+
+    with col_btn_left:
+        if st.button("💾 บันทึกการตั้งค่า", use_container_width=True):
+            clean_token = line_token_input.strip().split()[-1] if line_token_input.strip() else ""
+            clean_target = line_target_id.strip().split()[-1] if line_target_id.strip() else ""
+
+            try:
+                check = supabase.table("settings").select("id").eq("id", 1).execute()
+                if check.data:
+                    supabase.table("settings").update({
+                        "report_day": new_day,
+                        "report_hour": new_hour,
+                        "line_token": clean_token,
+                        "line_target_id": clean_target,
+                        "alert_band_pct": new_band, "alert_debounce_minutes": new_debounce, "alert_expiry_days": new_expiry_days,
+                        "weekly_report_enabled": new_weekly, "weekly_report_weekday": new_weekday, "daily_report_enabled": new_daily, "daily_report_hour": new_daily_hour
+                    }).eq("id", 1).execute()
+                else:
+                    supabase.table("settings").insert({
+                        "id": 1, 
+                        "report_day": new_day,
+                        "report_hour": new_hour,
+                        "line_token": clean_token,
+                        "line_target_id": clean_target,
+                        "alert_band_pct": new_band, "alert_debounce_minutes": new_debounce, "alert_expiry_days": new_expiry_days,
+                        "weekly_report_enabled": new_weekly, "weekly_report_weekday": new_weekday, "daily_report_enabled": new_daily, "daily_report_hour": new_daily_hour
+                    }).execute()
+                flash(f"บันทึกข้อมูลเรียบร้อย! ระบบจะส่งอัตโนมัติทุกวันที่ {new_day} เวลา {str(new_hour).zfill(2)}:00 น.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ บันทึกไม่ได้: โครงสร้างฐานข้อมูลยังไม่เป็นเวอร์ชันล่าสุด กรุณารัน python migrate.py (ดู migrate.py --status) ก่อนครับ ({e})")
+
+    with col_btn_right:
+        if st.button("🚀 ทดลองส่งรายงานสรุปของเดือนที่ผ่านมา เข้า LINE", type="primary", use_container_width=True):
+            test_token = line_token_input.strip().split()[-1] if line_token_input.strip() else ""
+            test_target = line_target_id.strip().split()[-1] if line_target_id.strip() else ""
+
+            if test_token and test_target:
+                # 🌟 สร้างรายงานในคิวงานเบื้องหลัง (ไม่ค้างหน้าเว็บ) แคชตามวันที่ + รายการล่าสุดในสมุดบัญชี + เวอร์ชัน Master Data/คลังยา
+                # กดซ้ำโดยข้อมูลไม่เปลี่ยนได้ข้อความเดิมทันที แล้วค่อยส่งเข้า LINE เมื่อรายงานพร้อม
+                from pharmacy.background import start_job
+                from pharmacy.exports import executive_report_txt, ledger_head, master_data_version
+                today = datetime.date.today()
+                start_job("executive_report", "executive_report", (today, ledger_head(supabase), master_data_version(supabase)), lambda client=supabase: executive_report_txt(client, today), label="รายงานผู้บริหาร")
+                st.session_state.report_send_to = (test_token, test_target)
+            else: 
+                st.warning("กรุณาใส่ Token และ Target ID ให้ครบถ้วนก่อนกดส่งครับ")
+        from pharmacy.background import job_result, download_artifact
+        report = job_result("executive_report", "กำลังรวบรวมข้อมูลและสร้างรายงาน... (จากฐานข้อมูลจริง)")
+        if report:
+            report_text = report[0].decode('utf-8')
+            send_to = st.session_state.pop('report_send_to', None)
+            if send_to:
+                from pharmacy.line import send_line_message
+                if send_line_message(send_to[0], send_to[1], report_text): st.success("✅ ส่งรายงานเข้า LINE สำเร็จ! ลองเช็กในแอป LINE ของคุณดูครับ")
+                else: st.error("❌ ส่งไม่สำเร็จ! กรุณาตรวจสอบว่า Token และ User ID ถูกต้องหรือไม่")
+            with st.expander("ดูตัวอย่างข้อความรายงาน"): st.text(report_text)
+            download_artifact(report, "📥 ดาวน์โหลดรายงาน (.txt)", use_container_width=True)
+
+with tab_quarantine:
+    st.subheader("🧪 คลังกักกันยาหมดอายุ")
+    st.info("ระบบจะตัดยาที่หมดอายุเข้าคลังกักกันอัตโนมัติทุกคืน (00:05 น.) ล็อตที่ถูกกักกันจะไม่ถูกนำไปเบิกจ่ายและไม่นับเป็นยอดคงเหลือ")
+    try:
+        job_res = supabase.table("job_state").select("last_run_at, last_result").eq("job", "expire_sweep").execute()
+        if job_res.data and job_res.data[0].get('last_result'):
+            last = job_res.data[0]['last_result']
+            last_run = pd.to_datetime(job_res.data[0]['last_run_at'], utc=True).tz_convert('Asia/Bangkok').strftime('%d/%m/%Y %H:%M')
+            st.caption(f"รอบล่าสุด: {last_run} | กักกัน {last.get('lots_quarantined', 0)} ล็อต | ตัดจำหน่าย {last.get('qty_written_off', 0)} หน่วย")
+        else: st.caption("ยังไม่เคยรันการตัดยาหมดอายุ")
+
+        q_res = supabase.table("inventory").select("medicine_id, lot_no, exp_date, quarantined_qty, quarantined_at").eq("status", "QUARANTINE").gt("quarantined_qty", 0).order("exp_date").execute()
+        df_q = pd.DataFrame(q_res.data)
+        if not df_q.empty:
+            df_q = pd.merge(df_q, get_medicine_names(), left_on='medicine_id', right_on='id', how='left')
+            df_q['quarantined_at'] = pd.to_datetime(df_q['quarantined_at'], utc=True).dt.tz_convert('Asia/Bangkok').dt.strftime('%d/%m/%Y')
+            st.dataframe(df_q[['generic_name', 'lot_no', 'exp_date', 'quarantined_qty', 'unit', 'quarantined_at']].rename(columns={'generic_name': 'รายการ', 'lot_no': 'เลข Lot', 'exp_date': 'วันหมดอายุ', 'quarantined_qty': 'จำนวนกักกัน', 'unit': 'หน่วย', 'quarantined_at': 'วันที่กักกัน'}), use_container_width=True, hide_index=True)
+        else: st.success("ไม่มียาในคลังกักกัน")
+    except Exception as e: st.error("❌ ยังไม่พบตาราง/คอลัมน์สำหรับคลังกักกัน กรุณารัน migrations/003_expiry_quarantine.sql ใน Supabase ก่อนครับ")
+
+    # ทุกรอบเก็บล็อตที่รับเข้ามาทั้งที่หมดอายุไปแล้วด้วย (migrations/022) จึงไม่ต้องเลือกสแกนทั้งหมดอีก
+    form_token("expire_sweep")
+    if st.button("🧹 ตัดยาหมดอายุตอนนี้", use_container_width=True, key=form_key("expire_sweep", "expire_sweep_submit")):
+        try:
+            result = call_rpc("expire_sweep", {"p_user_name": current_user_name()}, form="expire_sweep")
+            flash(f"กักกันเพิ่ม {result.get('lots_quarantined', 0)} ล็อต ตัดจำหน่ายรวม {result.get('qty_written_off', 0)} หน่วย"); st.rerun()
+        except Exception as e: st.error(f"เกิดข้อผิดพลาด: {e}")
+
+with tab_cards:
+    st.subheader("📒 บัญชีคุมเวชภัณฑ์คงคลัง ทุกรายการ (ตรวจสอบประจำปี)")
+    st.info("สร้าง Stock Card ของยาที่เปิดใช้งานทุกรายการในช่วงวันที่ในไฟล์เดียว (Excel ชีตละรายการ หรือ zip ของไฟล์ CSV) "
+            "งานใหญ่ที่รันประจำควรใช้ python stock_cards.py --fiscal-year <ปี พ.ศ.> บนเครื่องเซิร์ฟเวอร์แทน")
+    today = datetime.date.today()
+    fy_start = datetime.date(today.year if today.month >= 10 else today.year - 1, 10, 1)
+    c1, c2, c3 = st.columns(3)
+    cards_from = c1.date_input("ตั้งแต่วันที่", value=fy_start, max_value=today, key="cards_from")
+    cards_to = c2.date_input("ถึงวันที่", value=today, min_value=cards_from, max_value=today, key="cards_to")
+    cards_fmt = c3.radio("รูปแบบไฟล์", ["xlsx", "zip"], horizontal=True, format_func=lambda f: {"xlsx": "Excel ไฟล์เดียว", "zip": "zip (CSV รายการละไฟล์)"}[f])
+    if st.button("🖨️ สร้าง Stock Card ทุกรายการ", type="primary", use_container_width=True):
+        # 🌟 ส่งเข้าคิวงานเบื้องหลังพร้อมแถบความคืบหน้า แคชตามช่วงวันที่ + รายการล่าสุดในสมุดบัญชี + เวอร์ชันรายการยา/คลังยา
+        from pharmacy.background import start_job
+        from pharmacy.exports import stock_cards_file, ledger_head, master_data_version
+        from pharmacy.db import get_user_name_map
+        meds, user_names = get_medicines(), get_user_name_map()
+        start_job("stock_cards", "stock_cards", (cards_from, cards_to, cards_fmt, ledger_head(supabase), master_data_version(supabase), meds, user_names),
+                  lambda report, client=supabase: stock_cards_file(client, meds, cards_from, cards_to, cards_fmt, user_names, report), label="Stock Card ทุกรายการ", progress=True)
+    from pharmacy.background import job_result, download_artifact
+    cards = job_result("stock_cards", "กำลังสร้าง Stock Card ทุกรายการ...")
+    if cards:
+        if cards_fmt == "xlsx" and cards[1].endswith(".zip"): st.caption("เซิร์ฟเวอร์ไม่มีตัวเขียน Excel (openpyxl) จึงได้เป็น zip ของไฟล์ CSV")
+        download_artifact(cards, f"📥 ดาวน์โหลด {cards[1]}", use_container_width=True)
+
+with tab_profiler:
+    st.subheader("⏱️ จับโปรไฟล์ความเร็วของหน้า")
+    st.info("เลือกหน้าแล้วกดเปิด จากนั้นไปที่หน้านั้นและใช้งานตามปกติ ระบบจะจับโปรไฟล์ rerun ถัดไปของหน้านั้นหนึ่งครั้ง (เฉพาะ session ของคุณ)")
+    titles = [t for t in st.session_state.get('menu_titles', []) if t != "จัดการระบบ (Admin)"]
+    c1, c2 = st.columns([3, 1])
+    target = c1.selectbox("หน้าที่ต้องการจับโปรไฟล์", titles, label_visibility="collapsed")
+    if c2.button("▶️ จับ rerun ถัดไป", use_container_width=True, disabled=not titles):
+        request_capture(target)
+        st.success(f"พร้อมจับโปรไฟล์ครั้งถัดไปที่เปิดหน้า '{target}'")
+    if st.session_state.get('profile_next'): st.caption(f"⏳ รอจับโปรไฟล์หน้า: {st.session_state.profile_next}")
+
+    # 🌟 เวลาที่ปุ่มบันทึกแต่ละประเภทใช้จริง (เฉพาะคำสั่งฝั่งเซิร์ฟเวอร์ หลังเลิกใช้ time.sleep ก่อน rerun)
+    latency = latency_summary()
+    if not latency.empty:
+        st.markdown("**เวลาบันทึกต่อคำสั่ง (ทุกผู้ใช้บนเซิร์ฟเวอร์นี้ ล่าสุด 200 ครั้งต่อคำสั่ง)**")
+        st.dataframe(latency.rename(columns={'action': 'คำสั่ง', 'n': 'จำนวนครั้ง'}), hide_index=True, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(c, format="%.0f") for c in ['p50_ms', 'p95_ms', 'max_ms']})
+
+    results = captures()
+    if results:
+        st.divider()
+        labels = {i: f"{r['at']:%d/%m/%Y %H:%M:%S} | {r['page']} | {r['wall_ms']:,.0f} ms" for i, r in enumerate(results)}
+        cap = results[st.selectbox("ผลการจับโปรไฟล์ (ล่าสุดอยู่บน)", list(labels), format_func=lambda i: labels[i])]
+        m1, m2, m3 = st.columns(3)
+        m1.metric("เวลารวม (wall)", f"{cap['wall_ms']:,.0f} ms")
+        m2.metric("เวลา CPU", f"{cap['cpu_ms']:,.0f} ms")
+        m3.metric("แถวที่โหลด", f"{sum(cap['rows'].values()):,}")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("**แยกตามกลุ่ม (self time, ms)**")
+            st.dataframe(cap['breakdown'].rename(columns={'category': 'กลุ่ม', 'self_ms': 'ms'}), hide_index=True, use_container_width=True)
+        with c2:
+            st.markdown("**จำนวนแถวที่โหลดต่อแหล่งข้อมูล**")
+            if cap['rows']: st.dataframe(pd.DataFrame(list(cap['rows'].items()), columns=['แหล่งข้อมูล', 'แถว']), hide_index=True, use_container_width=True)
+            else: st.caption("ไม่มีการดึงข้อมูลใหม่ (ใช้แคชทั้งหมด)")
+        cols = {'function': 'ฟังก์ชัน', 'category': 'กลุ่ม', 'calls': 'จำนวนครั้ง', 'self_ms': 'self (ms)', 'cumulative_ms': 'สะสม (ms)'}
+        st.markdown("**ฟังก์ชันที่ใช้เวลามากที่สุด (self time)**")
+        st.dataframe(cap['top_self'].rename(columns=cols), hide_index=True, use_container_width=True)
+        with st.expander("ฟังก์ชันที่ใช้เวลาสะสมมากที่สุด (cumulative) / ข้อความ pstats"):
+            st.dataframe(cap['top_cumulative'].rename(columns=cols), hide_index=True, use_container_width=True)
+            st.code(pstats_text(cap), language=None)
+        st.download_button("📥 ดาวน์โหลดไฟล์โปรไฟล์ (.prof เปิดด้วย snakeviz หรือ python -m pstats)", data=cap['prof'],
+                           file_name=f"profile_{cap['page']}_{cap['at']:%Y%m%d_%H%M%S}.prof", mime="application/octet-stream")
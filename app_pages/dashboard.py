@@ -0,0 +1,65 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from pharmacy.db import fetch, get_categories
+from pharmacy.dimensions import kind_counts, DRUG, SUPPLY
+
+st.header("🖥️ ภาพรวมคลังเวชภัณฑ์ (Dashboard)")
+try:
+    meds = fetch("medicines", ["id", "generic_name", "unit", "min_stock"], [("eq", "is_active", True)])
+    # ยอดพร้อมใช้เฉพาะล็อต ACTIVE (ล็อตที่ถูกระงับเรียกคืนยังมี qty แต่เบิกไม่ได้ ตรงกับแจ้งเตือนสต๊อกและหน้าเบิกจ่าย)
+    inv = fetch("inventory", ["medicine_id", "lot_no", "exp_date", "qty"], [("eq", "status", "ACTIVE")])
+
+    if not meds.empty:
+        # 🌟 จำนวนรายการที่เปิดใช้งานต่อหมวด ฐานข้อมูลนับไว้ในตารางมิติแล้ว (migrations/018_medicine_dimensions.sql)
+        counts = kind_counts(get_categories())
+        count_drugs, count_supplies = counts[DRUG], counts[SUPPLY]
+
+        if not inv.empty:
+            inv_agg = inv.groupby('medicine_id', observed=True)['qty'].sum().reset_index()
+            df_dash = pd.merge(meds, inv_agg, left_on='id', right_on='medicine_id', how='left')
+            df_dash['qty'] = df_dash['qty'].fillna(0)
+        else:
+            df_dash = meds.copy()
+            df_dash['qty'] = 0
+
+        df_dash['qty'] = pd.to_numeric(df_dash['qty'], errors='coerce').fillna(0)
+        df_dash['min_stock'] = pd.to_numeric(df_dash['min_stock'], errors='coerce').fillna(0)
+        low_stock = df_dash[df_dash['qty'] <= df_dash['min_stock']]
+
+        near_exp = pd.DataFrame()
+        if not inv.empty:
+            inv_active = inv[inv['qty'] > 0].copy()
+            if not inv_active.empty:
+                inv_active['exp_date'] = pd.to_datetime(inv_active['exp_date'])
+                today = pd.to_datetime(datetime.date.today())
+                near_exp_raw = inv_active[inv_active['exp_date'] <= today + pd.Timedelta(days=90)]
+                if not near_exp_raw.empty:
+                    near_exp = pd.merge(near_exp_raw, meds, left_on='medicine_id', right_on='id', how='left')
+
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("รายการเวชภัณฑ์ยา", f"{count_drugs}", "รายการ")
+        c2.metric("รายการเวชภัณฑ์ที่มิใช่ยา", f"{count_supplies}", "รายการ")
+        c3.metric("ต่ำกว่าจุดสั่งซื้อ (Re-order)", f"{len(low_stock)}", "รายการ", delta_color="inverse")
+        c4.metric("ใกล้หมดอายุ (< 3 เดือน)", f"{len(near_exp)}", "ล็อต", delta_color="inverse")
+        st.divider()
+
+        col_l, col_r = st.columns(2)
+        with col_l:
+            st.markdown("#### แจ้งเตือน: ต่ำกว่าจุดสั่งซื้อ (Re-order Point)")
+            st.caption("รายการเวชภัณฑ์ที่ต้องดำเนินการจัดหาเพิ่ม (คงเหลือน้อยกว่าหรือเท่ากับ Min Stock)")
+            if not low_stock.empty:
+                for _, row in low_stock.iterrows():
+                    st.markdown(f'<div class="warn-box"><strong>{row["generic_name"]}</strong><br>คงเหลือ: <span style="color:#d35400; font-size:18px;"><b>{int(row["qty"])}</b></span> {row["unit"]} (จุดสั่งซื้อ: {row["min_stock"]})</div>', unsafe_allow_html=True)
+            else: st.success("ยอดคงคลังเพียงพอทุกรายการ")
+
+        with col_r:
+            st.markdown("#### แจ้งเตือน: เวชภัณฑ์ใกล้หมดอายุ (Near Expiry)")
+            st.caption("รายการที่จะหมดอายุภายใน 3 เดือนข้างหน้า (90 วัน) - เร่งกระจายตามหลัก FEFO")
+            if not near_exp.empty:
+                for _, row in near_exp.iterrows():
+                    exp_date = row['exp_date'].strftime('%d/%m/%Y')
+                    st.markdown(f'<div class="alert-box"><strong>{row["generic_name"]}</strong><br>Lot: {row["lot_no"]} | เหลือ: {int(row["qty"])} {row["unit"]}<br>📅 <b>หมดอายุ: {exp_date}</b></div>', unsafe_allow_html=True)
+            else: st.success("ไม่มีเวชภัณฑ์เสี่ยงหมดอายุใน 3 เดือน")
+    else: st.info("ยังไม่มีข้อมูล Master Data ในระบบ")
+except Exception as e: st.error(f"Error: {e}")
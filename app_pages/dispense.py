@@ -0,0 +1,86 @@
+import streamlit as st
+import pandas as pd
+from pharmacy.db import get_inventory_view
+from pharmacy.auth import current_user_name
+from pharmacy.stock import dispense_fefo, insufficient_stock, stock_error_message
+from pharmacy.scan import scan_box, scan_editor, clear_scans
+from pharmacy.submit import flash, form_token, form_key
+
+st.header("📤 การเบิกจ่ายเวชภัณฑ์ (Dispense)")
+df_inv = get_inventory_view()
+
+if not df_inv.empty:
+    df_grouped = df_inv.groupby(['medicine_id', 'generic_name', 'unit'], observed=True)['qty'].sum().reset_index()
+    med_dict = dict(zip(df_grouped['medicine_id'], df_grouped['generic_name'] + " (เหลือ " + df_grouped['qty'].astype(int).astype(str) + " " + df_grouped['unit'] + ")"))
+    med_options = df_grouped['medicine_id'].tolist()
+    st.info("💡 ระบบจะหักยอดคงเหลือจาก Lot ที่กำลังจะหมดอายุก่อนให้อัตโนมัติ (หลักการ FEFO)")
+
+    def show_dispense_error(e):
+        short = insufficient_stock(e)
+        if short:
+            med_name = df_grouped[df_grouped['medicine_id'] == short[0]]['generic_name'].values
+            st.error(f"❌ ยอดคงเหลือของ '{med_name[0] if len(med_name) else short[0]}' ไม่พอเบิก! (มียอดรวม {short[1]} แต่ต้องการเบิก {short[2]}) อาจมีผู้ใช้อื่นเบิกไปก่อนหน้านี้")
+        else: st.error(stock_error_message(e) or f"เกิดข้อผิดพลาดจากฐานข้อมูล: {e}")
+
+    # 🌟 โหมดสแกน: สแกนกล่อง/แผงยาที่จ่ายจริง รวมจำนวนต่อรายการ แล้วตัดสต๊อกแบบ FEFO ทั้งใบครั้งเดียว
+    if st.toggle("📷 โหมดสแกนบาร์โค้ด (GS1)", key="dispense_scan_mode"):
+        group_by = ('medicine_id',)
+        if scan_box("dispense_scan", group_by, med_dict):
+            edited = scan_editor("dispense_scan", group_by, med_dict, ['qty', 'scans'], {"qty": st.column_config.NumberColumn("จำนวนที่เบิก", min_value=1, step=1)})
+            note = st.text_input("หมายเหตุ (เช่น เบิกให้แผนก ER, รพ.สต.เครือข่าย)", value="จ่ายหน้างาน (สแกนบาร์โค้ด)")
+            recorder_name = current_user_name()
+            st.caption(f"ผู้บันทึกการเบิกจ่าย: {recorder_name}")
+            c1, c2 = st.columns([3, 1])
+            if c1.button(f"ยืนยันการเบิกจ่าย ({len(edited)} รายการ)", type="primary", use_container_width=True, key=form_key("dispense_scan", "dispense_scan_submit")):
+                avail = edited['medicine_id'].map(dict(zip(df_grouped['medicine_id'], df_grouped['qty']))).fillna(0)
+                if edited['qty'].isna().any() or (edited['qty'] < 1).any(): st.error("กรุณากรอกจำนวนที่เบิกให้ครบทุกรายการ")
+                elif (edited['qty'] > avail).any():
+                    for r, a in zip(edited[edited['qty'] > avail].to_dict('records'), avail[edited['qty'] > avail]):
+                        st.error(f"❌ ยอดคงเหลือของ '{med_dict.get(r['medicine_id'], r['medicine_id'])}' ไม่พอเบิก! (มียอดรวม {int(a)} แต่ต้องการเบิก {int(r['qty'])})")
+                else:
+                    try:
+                        # บันทึกสำเร็จแล้ว call_rpc ล้างรายการที่สแกนและเปลี่ยน key ของปุ่มให้เอง (pharmacy/submit.py)
+                        dispense_fefo([{"medicine_id": r['medicine_id'], "qty": r['qty']} for r in edited.to_dict('records')], recorder_name, note, form="dispense_scan")
+                        flash("บันทึกการเบิกจ่ายสำเร็จ! (ระบบตัดสต๊อกตาม Lot ที่หมดอายุก่อนให้อัตโนมัติเรียบร้อยแล้ว)"); st.rerun()
+                    except Exception as e: show_dispense_error(e)
+            if c2.button("ล้างรายการที่สแกน", use_container_width=True):
+                clear_scans("dispense_scan"); st.rerun()
+        st.stop()
+    num_items = st.number_input("จำนวนรายการเวชภัณฑ์ที่ต้องการเบิกจ่ายพร้อมกัน", min_value=1, max_value=20, value=1)
+    st.divider()
+
+    form_token("dispense_form")
+    with st.form(form_key("dispense_form", "bulk_dispense_form")):
+        dispense_requests = []
+        for i in range(int(num_items)):
+            st.markdown(f"**รายการที่ {i+1}**")
+            c1, c2 = st.columns([3, 1])
+            with c1: selected_id = st.selectbox("เลือกชื่อเวชภัณฑ์", options=med_options, format_func=lambda x: med_dict[x], key=f"disp_med_{i}")
+            with c2: amount = st.number_input("จำนวนที่เบิก", min_value=1, key=f"disp_qty_{i}")
+            st.markdown("---")
+            dispense_requests.append({'medicine_id': selected_id, 'dispense_qty': amount})
+
+        note = st.text_input("หมายเหตุ (เช่น เบิกให้แผนก ER, รพ.สต.เครือข่าย)", value="จ่ายหน้างาน")
+        recorder_name = current_user_name()
+        st.caption(f"ผู้บันทึกการเบิกจ่าย: {recorder_name}")
+
+        if st.form_submit_button("ยืนยันการเบิกจ่าย", use_container_width=True, key=form_key("dispense_form", "dispense_form_submit")):
+            req_df = pd.DataFrame(dispense_requests)
+            req_grouped = req_df.groupby('medicine_id')['dispense_qty'].sum().reset_index()
+            has_error = False
+            for _, row in req_grouped.iterrows():
+                med_id = row['medicine_id']
+                total_req = row['dispense_qty']
+                avail_qty = df_grouped[df_grouped['medicine_id'] == med_id]['qty'].values[0]
+                if total_req > avail_qty:
+                    med_name = df_grouped[df_grouped['medicine_id'] == med_id]['generic_name'].values[0]
+                    st.error(f"❌ ยอดคงเหลือของ '{med_name}' ไม่พอเบิก! (มียอดรวม {int(avail_qty)} แต่ต้องการเบิก {int(total_req)})")
+                    has_error = True
+
+            if not has_error:
+                try:
+                    # 🌟 ตรวจยอดซ้ำและตัดสต๊อกทั้งใบใน transaction เดียวฝั่งเซิร์ฟเวอร์ (ยอดด้านบนอาจเก่าไปแล้วถ้ามีคนเบิกพร้อมกัน)
+                    dispense_fefo([{"medicine_id": r['medicine_id'], "qty": r['dispense_qty']} for _, r in req_grouped.iterrows()], recorder_name, note, form="dispense_form")
+                    flash("บันทึกการเบิกจ่ายสำเร็จ! (ระบบตัดสต๊อกตาม Lot ที่หมดอายุก่อนให้อัตโนมัติเรียบร้อยแล้ว)"); st.rerun()
+                except Exception as e: show_dispense_error(e)
+else: st.info("ไม่มียอดยกมาในคลังสำหรับเบิกจ่าย")
@@ -0,0 +1,139 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from pharmacy.db import get_transactions_view, get_archived_months, get_archived_transactions_view, with_display_columns
+from pharmacy.auth import current_user_name
+from pharmacy.utils import format_thai_month
+from pharmacy.ledger import amend_transaction, void_transaction, ledger_error_message, net_qty_change
+from pharmacy.submit import flash, form_token, form_key
+
+st.header("🧾 ประวัติการรับและเบิกจ่ายเวชภัณฑ์")
+st.info("💡 **วิธีแก้ไขหรือยกเลิก:** ให้ใช้เมาส์ **'คลิกที่แถวของตาราง'** ที่ต้องการแก้ไขได้เลยครับ ฟอร์มจัดการจะโผล่ขึ้นมาด้านล่างทันที")
+show_audit = st.toggle("แสดงรายการปรับปรุงทั้งหมด (Audit Trail)", value=False, help="แสดงแถวต้นฉบับและรายการแก้ไข/ยกเลิกที่บันทึกต่อท้ายไว้ แทนยอดสุทธิ")
+
+def prepare_view(df):
+    df = with_display_columns(df)
+    df['qty_change_str'] = df['qty_change'].apply(lambda x: f"+{x}" if x > 0 else str(x))
+    return df
+
+df_trans = get_transactions_view(folded=not show_audit)
+archived_months = get_archived_months()
+if not df_trans.empty:
+    df_trans = prepare_view(df_trans)
+
+    c1, c2 = st.columns([1, 1])
+    with c1: filter_action = st.radio("ตัวกรองประเภท:", ["แสดงทั้งหมด", "เฉพาะรับเข้า", "เฉพาะเบิกจ่าย", "เฉพาะตัดหมดอายุ"], horizontal=True)
+    with c2:
+        # 🌟 เดือนที่เก็บถาวรแล้วมาจากชื่อโฟลเดอร์ และจะอ่านไฟล์เฉพาะเดือนที่ถูกเลือกเท่านั้น
+        all_months = sorted(set(df_trans['ym'].dropna()) | set(archived_months), reverse=True)
+        month_opts = {"ทั้งหมด": "ดูทุกเดือน (เฉพาะปีงบประมาณที่ยังไม่ปิด)" if archived_months else "ดูทุกเดือน (All Time)"}
+        for ym in all_months: month_opts[ym] = format_thai_month(ym) + (" 🗄️ เก็บถาวร" if ym in archived_months else "")
+        selected_ym = st.selectbox("เลือกเดือนที่ต้องการแสดงผล:", options=["ทั้งหมด"] + all_months, format_func=lambda x: month_opts[x])
+
+    df_display = df_trans.copy()
+    if selected_ym != "ทั้งหมด":
+        df_display = df_display[df_display['ym'] == selected_ym]
+        if selected_ym in archived_months:
+            df_archived = get_archived_transactions_view([selected_ym], folded=not show_audit)
+            if not df_archived.empty: df_display = pd.concat([df_display, prepare_view(df_archived)], ignore_index=True).sort_values('created_at_dt', ascending=False)
+    if filter_action == "เฉพาะรับเข้า": df_display = df_display[df_display['action_type'] == 'RECEIVE']
+    elif filter_action == "เฉพาะเบิกจ่าย": df_display = df_display[df_display['action_type'] == 'DISPENSE']
+    elif filter_action == "เฉพาะตัดหมดอายุ": df_display = df_display[df_display['action_type'] == 'EXPIRE']
+
+    df_view = df_display[['created_at_str', 'action_type_th', 'generic_name', 'lot_no', 'qty_change_str', 'unit', 'user_name', 'note']].copy()
+    df_view.columns = ['วัน-เวลา', 'ประเภท', 'รายการยา', 'เลข Lot', 'จำนวน (+/-)', 'หน่วย', 'ผู้บันทึก', 'หมายเหตุ']
+
+    event = st.dataframe(df_view, use_container_width=True, hide_index=True, selection_mode="single-row", on_select="rerun")
+
+    # 🌟 ไฟล์ประวัติทั้งหมด (Audit Trail + ประวัติที่เก็บถาวร) สร้างในคิวงานเบื้องหลัง แคชตามรายการล่าสุดในสมุดบัญชี เวอร์ชันรายการยา/คลังยา และเดือนที่เก็บถาวร
+    with st.expander("📦 ส่งออกประวัติทั้งหมด (CSV)"):
+        from pharmacy.background import start_job, job_result, download_artifact
+        if st.button("สร้างไฟล์ประวัติทั้งหมด", use_container_width=True):
+            from pharmacy.db import supabase, get_user_name_map, get_archive_uri
+            from pharmacy.exports import history_csv, ledger_head, master_data_version
+            archive_uri, user_names = get_archive_uri() if archived_months else None, get_user_name_map()
+            start_job("history_csv", "history_csv", (ledger_head(supabase), master_data_version(supabase), archived_months, user_names, datetime.date.today()),
+                      lambda: history_csv(supabase, archive_uri, user_names), label="ประวัติทั้งหมด")
+        history_file = job_result("history_csv", "กำลังรวบรวมประวัติทั้งหมด...")
+        if history_file: download_artifact(history_file, "📥 ดาวน์โหลดประวัติทั้งหมด (CSV)", use_container_width=True)
+
+    if len(event.selection.rows) > 0:
+        selected_idx = event.selection.rows[0]
+        selected_row = df_display.iloc[selected_idx]
+        st.divider()
+        st.subheader("⚙️ จัดการประวัติ (รายการที่เลือก)")
+        recorder_name = current_user_name()
+        can_edit = False
+        if st.session_state.role == 'admin':
+            can_edit = True
+            st.caption("👑 **สิทธิ์ Admin:** สามารถจัดการได้ทุกรายการ")
+        elif selected_row.get('user_name') == recorder_name or selected_row.get('user_name') == st.session_state.user_email:
+            can_edit = True
+            st.caption(f"👤 **สิทธิ์ Staff:** จัดการรายการของคุณ {recorder_name}")
+        else: st.error(f"❌ คุณไม่มีสิทธิ์แก้ไขรายการนี้ (ผู้บันทึกคือ: {selected_row['user_name']}) แอดมินหรือเจ้าของรายการเท่านั้นที่ทำได้")
+
+        if can_edit and selected_row.get('archived') == True:
+            st.info("🗄️ รายการนี้อยู่ในประวัติที่เก็บถาวร (ปีงบประมาณที่ปิดแล้ว) ดูได้อย่างเดียว")
+        elif can_edit and selected_row.get('carry_forward') == True:
+            st.info("ยอดยกมาจากการเก็บถาวรประวัติ ไม่สามารถแก้ไขหรือยกเลิกได้")
+        elif can_edit and pd.notna(selected_row.get('entry_kind')):
+            st.info("รายการนี้เป็นรายการปรับปรุง (แก้ไข/ยกเลิก) ไม่สามารถแก้ไขซ้ำได้ กรุณาปิด Audit Trail แล้วเลือกรายการต้นฉบับ")
+        elif can_edit:
+            trans_id = str(selected_row['id'])
+            lot_no = str(selected_row['lot_no'])
+            # 🌟 ยอดปัจจุบันของรายการ (รวมการแก้ไขก่อนหน้า) ไม่ใช่ยอดของแถวต้นฉบับที่แสดงในโหมด Audit Trail: ใช้เป็นค่าตั้งต้นและคำนวณยอดชั่วคราวตอนออฟไลน์
+            old_qty_change = net_qty_change(df_trans, selected_row)
+            action_type = selected_row['action_type']
+            ledger_form = f"ledger_form_{trans_id}"
+            # ผลต่อยอดของ Lot นี้ ใช้แสดงยอดชั่วคราวถ้าต้องเก็บคำสั่งไว้ในเครื่องตอนออฟไลน์
+            lot_effect = lambda qty: [{"medicine_id": str(selected_row['medicine_id']), "lot_no": lot_no, "qty": int(qty)}]
+            form_token(ledger_form)
+            with st.form(form_key(ledger_form, "edit_delete_trans_form")):
+                st.markdown(f"**รายการ:** {selected_row['generic_name']} (Lot: `{lot_no}`) | **ประเภท:** {selected_row['action_type_th']}")
+                c1, c2 = st.columns(2)
+                if action_type == 'RECEIVE':
+                    new_abs_qty = c1.number_input("จำนวนรับเข้า (ชิ้น)", min_value=1, value=abs(old_qty_change))
+                    new_qty_change = new_abs_qty
+                elif action_type == 'DISPENSE':
+                    new_abs_qty = c1.number_input("จำนวนเบิกจ่าย (ชิ้น)", min_value=1, value=abs(old_qty_change))
+                    new_qty_change = -new_abs_qty
+                elif action_type == 'EXPIRE':
+                    st.info("รายการตัดจำหน่ายยาหมดอายุ ไม่สามารถแก้ไขจำนวนได้ (ยกเลิกได้อย่างเดียว เฉพาะล็อตที่ยังไม่หมดอายุ ยอดจะย้ายออกจากคลังกักกันกลับมาใช้งาน)")
+                    new_qty_change = old_qty_change
+                elif action_type == 'ADJUST':
+                    st.info("รายการปรับยอดจากการตรวจนับ ไม่สามารถแก้ไขจำนวนได้ (ยกเลิกได้อย่างเดียว)")
+                    new_qty_change = old_qty_change
+                else:
+                    st.info("ยอดยกมาเริ่มต้น ไม่สามารถแก้ไขจำนวนได้ (ยกเลิกได้อย่างเดียว)")
+                    new_qty_change = old_qty_change
+
+                new_note = c2.text_input("หมายเหตุ", value=str(selected_row['note']) if pd.notna(selected_row['note']) else "")
+                st.warning("⚠️ การแก้ไขหรือยกเลิก จะบันทึกเป็นรายการปรับปรุงต่อท้ายประวัติ (ไม่ลบของเดิม) และปรับยอดในคลังให้อัตโนมัติ")
+                confirm_del = st.checkbox("กดยืนยันหากต้องการ **ยกเลิก** รายการนี้ (คืนยอดเข้าคลัง)")
+
+                col_btn1, col_btn2 = st.columns(2)
+                with col_btn1: submit_edit = st.form_submit_button("💾 บันทึกการแก้ไข", type="primary", use_container_width=True, key=form_key(ledger_form, "ledger_amend_submit"))
+                with col_btn2:
+                    st.markdown('<div class="red-btn-hook"></div>', unsafe_allow_html=True)
+                    submit_delete = st.form_submit_button("❌ ยกเลิกรายการนี้", type="primary", use_container_width=True, key=form_key(ledger_form, "ledger_void_submit"))
+
+                if submit_edit:
+                    if action_type in ('INITIAL', 'EXPIRE', 'ADJUST') and new_qty_change != old_qty_change: st.error("ไม่สามารถแก้ไขจำนวนของรายการนี้ได้")
+                    elif new_qty_change == old_qty_change and new_note == (str(selected_row['note']) if pd.notna(selected_row['note']) else ""): st.info("ไม่มีข้อมูลที่เปลี่ยนแปลง")
+                    else:
+                        try:
+                            # 🌟 บันทึกรายการ AMEND และปรับยอด Lot ใน transaction เดียวฝั่งเซิร์ฟเวอร์
+                            result = amend_transaction(trans_id, new_qty_change, new_note, recorder_name, form=ledger_form, effect=lot_effect(new_qty_change - old_qty_change))
+                            if result and not result.get('inventory_found', True) and new_qty_change != old_qty_change: flash("ไม่พบ Lot นี้ในคลัง ทำการบันทึกเฉพาะประวัติ", icon="⚠️")
+                            flash("บันทึกการแก้ไขและปรับยอดในคลังสำเร็จ!"); st.rerun()
+                        except Exception as e: st.error(ledger_error_message(e) or f"เกิดข้อผิดพลาดในการอัปเดต: {e}")
+
+                if submit_delete:
+                    if confirm_del:
+                        try:
+                            # ยกเลิก EXPIRE: ยอดย้ายออกจากคลังกักกันหรือไม่ ฐานข้อมูลเป็นผู้ตัดสิน (migrations/019) จึงไม่แสดงยอดชั่วคราว
+                            void_transaction(trans_id, new_note, recorder_name, form=ledger_form, effect=None if action_type == 'EXPIRE' else lot_effect(-old_qty_change))
+                            flash("ยกเลิกรายการและคืนยอดเข้าคลังสำเร็จ!"); st.rerun()
+                        except Exception as e: st.error(ledger_error_message(e) or f"เกิดข้อผิดพลาดในการยกเลิก: {e}")
+                    else: st.error("กรุณาติ๊กกล่องสี่เหลี่ยม 'กดยืนยัน' ก่อนทำการยกเลิกรายการ")
+else: st.info("ยังไม่มีประวัติการทำรายการในระบบ")
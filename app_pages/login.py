@@ -0,0 +1,38 @@
+import streamlit as st
+import os
+from pharmacy.db import supabase
+from pharmacy.auth import login_user
+
+st.markdown("<br><br>", unsafe_allow_html=True)
+col1, col2, col3 = st.columns([1, 2, 1])
+with col2:
+    if os.path.exists("moph_logo.png"): st.image("moph_logo.png", width=120)
+    else: st.image("https://cdn-icons-png.flaticon.com/512/3063/3063176.png", width=100)
+
+    st.title("ระบบคลังเวชภัณฑ์")
+    st.markdown("##### รพ.สต. โพนบก 🏥")
+
+    tab_login, tab_register = st.tabs(["🔐 เข้าสู่ระบบ", "📝 สมัครใช้งาน"])
+
+    with tab_login:
+        with st.form("login_form"):
+            email = st.text_input("อีเมลผู้ใช้งาน")
+            password = st.text_input("รหัสผ่าน", type="password")
+            if st.form_submit_button("เข้าสู่ระบบ", use_container_width=True): login_user(email, password)
+
+    with tab_register:
+        with st.form("register_form"):
+            st.info("💡 สมัครสมาชิกใหม่ แล้วรอผู้ดูแลระบบอนุมัติเพื่อเข้าใช้งาน")
+            reg_name = st.text_input("ชื่อ - นามสกุล")
+            reg_email = st.text_input("อีเมล")
+            reg_password = st.text_input("รหัสผ่าน (ขั้นต่ำ 6 ตัวอักษร)", type="password")
+            if st.form_submit_button("สมัครสมาชิก", use_container_width=True):
+                if reg_name and reg_email and len(reg_password) >= 6:
+                    try:
+                        res = supabase.auth.sign_up({"email": reg_email, "password": reg_password})
+                        if res.user:
+                            try: supabase.table("profiles").update({"full_name": reg_name}).eq("id", res.user.id).execute()
+                            except: pass
+                        st.success("สมัครสมาชิกสำเร็จ! โปรดแจ้งผู้ดูแลระบบเพื่ออนุมัติการใช้งาน")
+                    except Exception as e: st.error(f"สมัครไม่สำเร็จ (อีเมลอาจซ้ำ หรือรหัสผ่านสั้นไป): {e}")
+                else: st.warning("กรุณากรอกชื่อ-สกุล, อีเมล และรหัสผ่านให้ครบถ้วน")
@@ -0,0 +1,192 @@
+import streamlit as st
+import pandas as pd
+import time
+from pharmacy.db import supabase, get_medicines, get_all_medicines, get_categories, get_drug_groups, invalidate_cache
+from pharmacy.dimensions import category_kind, group_names, KIND_LABELS, SUPPLY
+from pharmacy.gs1 import parse_gs1
+from pharmacy.submit import flash, call_rpc
+
+st.header("📋 จัดการข้อมูลเวชภัณฑ์หลัก (Master Data)")
+# 🌟 รายชื่อกลุ่มยามาจากตารางมิติที่แคชไว้ (migrations/018_medicine_dimensions.sql) ไม่ต้องดาวน์โหลด drug_group ของยาทุกรายการทุกครั้งที่แสดงหน้า
+# กลุ่มที่พิมพ์เพิ่มใหม่ถูกเพิ่มเข้าตารางมิติโดย trigger ตอนบันทึกยา
+categories = get_categories()
+group_options = ["- (ไม่มีกลุ่มยา / ไม่ระบุ)"] + group_names(get_drug_groups()) + ["➕ พิมพ์เพิ่มกลุ่มยาใหม่เอง..."]
+# ความจำเป็นทางคลินิก (VEN) ใช้จัดกลุ่ม ABC-VEN ในหน้าสรุปยอด
+ven_options = [None, 'V', 'E', 'N']
+ven_label = lambda v: {'V': "V - จำเป็นยิ่ง (Vital)", 'E': "E - จำเป็น (Essential)", 'N': "N - ไม่จำเป็น (Non-essential)"}.get(v, "- ยังไม่กำหนด")
+
+tab1, tab2, tab3 = st.tabs(["📄 รายการที่มีอยู่", "📝 เพิ่มรายการใหม่", "⚙️ แก้ไข / ลบข้อมูล"])
+with tab1:
+    st.info("แสดงเฉพาะรายการเวชภัณฑ์ที่เปิดใช้งานอยู่ (Active) ในระบบ")
+    df_meds = get_medicines()
+    if not df_meds.empty:
+        df_meds['category'] = category_kind(df_meds, categories).map(KIND_LABELS).fillna(df_meds['category'])
+        df_meds['id'] = df_meds['id'].apply(lambda x: "-" if str(x).startswith("SYS-") else x)
+        df_meds.insert(0, 'ลำดับ', range(1, len(df_meds) + 1))
+        df_meds.rename(columns={'id': 'รหัสยามาตรฐาน', 'generic_name': 'ชื่อสามัญ', 'unit': 'หน่วยนับ', 'category': 'หมวดหมู่', 'drug_group': 'กลุ่มยา', 'min_stock': 'จุดสั่งซื้อ', 'is_active': 'สถานะ Active'}, inplace=True)
+        cols_to_show = ['ลำดับ', 'รหัสยามาตรฐาน', 'ชื่อสามัญ', 'หน่วยนับ', 'หมวดหมู่']
+        if 'กลุ่มยา' in df_meds.columns: cols_to_show.append('กลุ่มยา') 
+        if 'ven_class' in df_meds.columns: df_meds.rename(columns={'ven_class': 'VEN'}, inplace=True); cols_to_show.append('VEN')
+        cols_to_show.extend(['จุดสั่งซื้อ', 'สถานะ Active'])
+        st.dataframe(df_meds[cols_to_show], use_container_width=True, hide_index=True)
+    else: st.info("ยังไม่มีข้อมูลเวชภัณฑ์")
+
+with tab2:
+    with st.container(border=True):
+        st.markdown("#### เพิ่มรายการเวชภัณฑ์ใหม่")
+        c1, c2 = st.columns(2)
+        nid_input = c1.text_input("รหัสยามาตรฐาน (เว้นว่างได้ ระบบจะแสดงผลเป็น - ให้อัตโนมัติ)", key="add_id")
+        nname = c2.text_input("ชื่อสามัญ (Generic Name) *บังคับ", key="add_name")
+        nunit = c1.text_input("หน่วยนับ (เช่น เม็ด, ขวด) *บังคับ", key="add_unit")
+        ncat = c2.selectbox("หมวดหมู่", ["เวชภัณฑ์ยา", "เวชภัณฑ์ที่มิใช่ยา"], key="add_cat")
+
+        final_group = "-"
+        if ncat == "เวชภัณฑ์ยา":
+            ngroup_choice = st.selectbox("กลุ่มยา", group_options, key="add_group_choice")
+            if ngroup_choice == "➕ พิมพ์เพิ่มกลุ่มยาใหม่เอง...":
+                ngroup_custom = st.text_input("พิมพ์ชื่อกลุ่มยาใหม่", key="add_group_custom")
+                final_group = ngroup_custom.strip() if ngroup_custom.strip() else "-"
+            elif ngroup_choice != "- (ไม่มีกลุ่มยา / ไม่ระบุ)": final_group = ngroup_choice
+        else: final_group = "-"
+
+        c1, c2 = st.columns(2)
+        nmin = c1.number_input("จุดสั่งซื้อ (Min Stock)", min_value=0, value=100, key="add_min")
+        nven = c2.selectbox("ความจำเป็น (VEN)", ven_options, format_func=ven_label, key="add_ven")
+
+        if st.button("บันทึกรายการใหม่", use_container_width=True, type="primary", key="btn_add_med"):
+            if nname and nunit:
+                final_nid = nid_input.strip() if nid_input.strip() != "" else f"SYS-{int(time.time())}"
+                try:
+                    supabase.table("medicines").insert({"id": final_nid, "generic_name": nname, "unit": nunit, "category": ncat, "drug_group": final_group, "min_stock": nmin, "ven_class": nven, "is_active": True}).execute()
+                    invalidate_cache()
+                    flash("เพิ่มข้อมูลสำเร็จ!"); st.rerun()
+                except Exception as e: st.error(f"เกิดข้อผิดพลาดจากฐานข้อมูล: {e}")
+            else: st.warning("กรุณากรอกชื่อเวชภัณฑ์ และหน่วยนับ ให้ครบถ้วน")
+
+with tab3:
+    # 🌟 รายการยาทั้งหมดจากแคช (ล้างทุกครั้งที่บันทึก) ไม่ต้องดึงทั้งตาราง medicines ทุกครั้งที่แสดงหน้า
+    all_meds = get_all_medicines()
+    if not all_meds.empty:
+        med_dict = dict(zip(all_meds['id'], all_meds['generic_name'].fillna('-ไม่มีชื่อยา-') + " (" + all_meds['unit'].fillna('-') + ")"))
+        selected_id_real = st.selectbox("ค้นหาและเลือกรายการที่ต้องการแก้ไข หรือ ลบ:", options=all_meds['id'].tolist(), format_func=lambda x: med_dict[x], key="edit_med_select")
+
+        if selected_id_real:
+            med_info = all_meds[all_meds['id'] == selected_id_real].iloc[0]
+            st.divider()
+            k_suffix = str(selected_id_real)
+
+            with st.container(border=True):
+                st.markdown("#### แก้ไขข้อมูล")
+                c1, c2 = st.columns(2)
+                display_nid = "" if str(selected_id_real).startswith("SYS-") else selected_id_real
+                e_id = c1.text_input("รหัสยามาตรฐาน", value=display_nid, key=f"edit_id_{k_suffix}")
+                e_name = c2.text_input("ชื่อสามัญ (Generic Name)", value="" if pd.isna(med_info['generic_name']) else med_info['generic_name'], key=f"edit_name_{k_suffix}")
+                e_unit = c1.text_input("หน่วยนับ", value="" if pd.isna(med_info['unit']) else med_info['unit'], key=f"edit_unit_{k_suffix}")
+
+                cat_options = ["เวชภัณฑ์ยา", "เวชภัณฑ์ที่มิใช่ยา"]
+                cat_idx = 1 if category_kind(all_meds.loc[[med_info.name]], categories).iloc[0] == SUPPLY else 0
+                e_cat = c2.selectbox("หมวดหมู่", cat_options, index=cat_idx, key=f"edit_cat_{k_suffix}")
+
+                final_egroup = "-"
+                if e_cat == "เวชภัณฑ์ยา":
+                    current_group = str(med_info.get('drug_group', '-'))
+                    if current_group in ['None', 'nan', '']: current_group = '-'
+                    try: group_idx = group_options.index(current_group)
+                    except:
+                        if current_group != '-':
+                            group_options.insert(1, current_group)
+                            group_idx = 1
+                        else: group_idx = 0
+                    egroup_choice = st.selectbox("กลุ่มยา", group_options, index=group_idx, key=f"edit_group_choice_{k_suffix}")
+                    if egroup_choice == "➕ พิมพ์เพิ่มกลุ่มยาใหม่เอง...":
+                        egroup_custom = st.text_input("พิมพ์ชื่อกลุ่มยาใหม่", value="", key=f"edit_group_custom_{k_suffix}")
+                        final_egroup = egroup_custom.strip() if egroup_custom.strip() else "-"
+                    elif egroup_choice != "- (ไม่มีกลุ่มยา / ไม่ระบุ)": final_egroup = egroup_choice
+                else: final_egroup = "-"
+
+                min_stock_val = 0 if pd.isna(med_info.get('min_stock')) else int(med_info.get('min_stock', 0))
+                c1, c2 = st.columns(2)
+                e_min = c1.number_input("จุดสั่งซื้อ (Min Stock)", min_value=0, value=min_stock_val, key=f"edit_min_{k_suffix}")
+                current_ven = med_info.get('ven_class') if med_info.get('ven_class') in ven_options else None
+                e_ven = c2.selectbox("ความจำเป็น (VEN)", ven_options, index=ven_options.index(current_ven), format_func=ven_label, key=f"edit_ven_{k_suffix}")
+                e_active = st.checkbox("เปิดใช้งานรายการนี้ (นำไปรับ/เบิกได้ปกติ)", value=bool(med_info['is_active']), key=f"edit_active_{k_suffix}")
+
+                if st.button("บันทึกการแก้ไข", use_container_width=True, type="primary", key=f"btn_save_edit_{k_suffix}"):
+                    if e_name and e_unit:
+                        final_new_id = e_id.strip()
+                        if final_new_id == "": final_new_id = selected_id_real if str(selected_id_real).startswith("SYS-") else f"SYS-{int(time.time())}"
+                        try:
+                            changes = {"generic_name": e_name, "unit": e_unit, "category": e_cat, "drug_group": final_egroup, "min_stock": e_min, "ven_class": e_ven, "is_active": e_active}
+                            if final_new_id != selected_id_real:
+                                # 🌟 เปลี่ยนรหัสทุกตารางที่อ้างรหัสยา (คลัง, สมุดบัญชี, บาร์โค้ด, ยอดสิ้นเดือน ฯลฯ) ใน transaction เดียวฝั่งเซิร์ฟเวอร์ (migrations/020_medicine_rename.sql)
+                                call_rpc("medicine_rename", {"p_old_id": selected_id_real, "p_new_id": final_new_id, "p_changes": changes})
+                            else:
+                                supabase.table("medicines").update(changes).eq("id", selected_id_real).execute()
+                            invalidate_cache()
+                            flash(f"อัปเดตข้อมูลสำเร็จ!"); st.rerun()
+                        except Exception as e:
+                            if 'MEDICINE_ID_EXISTS' in str(e): st.error(f"❌ เปลี่ยนรหัสไม่ได้! รหัส '{final_new_id}' มีซ้ำอยู่ในระบบแล้ว")
+                            else: st.error(f"เกิดข้อผิดพลาดในการอัปเดต: {e}")
+                    else: st.warning("กรุณากรอกชื่อเวชภัณฑ์และหน่วยนับให้ครบถ้วน")
+
+            with st.container(border=True):
+                st.markdown("#### 🏷️ บาร์โค้ด (GTIN) สำหรับโหมดสแกน")
+                barcodes = pd.DataFrame(supabase.table("medicine_barcodes").select("gtin, pack_qty, note").eq("medicine_id", selected_id_real).execute().data)
+                if not barcodes.empty:
+                    st.dataframe(barcodes.rename(columns={'gtin': 'GTIN', 'pack_qty': 'จำนวนต่อการสแกน', 'note': 'หมายเหตุ'}), hide_index=True, use_container_width=True)
+                c1, c2, c3 = st.columns([3, 1, 2])
+                b_code = c1.text_input("สแกนกล่องยา หรือพิมพ์ GTIN/EAN", key=f"barcode_{k_suffix}")
+                b_pack = c2.number_input(f"{med_info['unit']} ต่อการสแกน", min_value=1, value=1, key=f"barcode_pack_{k_suffix}")
+                b_note = c3.text_input("หมายเหตุ (เช่น กล่อง 10 แผง)", key=f"barcode_note_{k_suffix}")
+                b1, b2 = st.columns(2)
+                if b1.button("เพิ่ม/อัปเดตบาร์โค้ด", use_container_width=True, key=f"btn_barcode_add_{k_suffix}"):
+                    try:
+                        gtin = parse_gs1(b_code)['gtin']
+                        supabase.table("medicine_barcodes").upsert({"gtin": gtin, "medicine_id": selected_id_real, "pack_qty": int(b_pack), "note": b_note or None}).execute()
+                        invalidate_cache()
+                        flash(f"บันทึก GTIN {gtin} แล้ว"); st.rerun()
+                    except ValueError as e: st.error(f"❌ {e}")
+                    except Exception as e: st.error(f"เกิดข้อผิดพลาดจากฐานข้อมูล: {e}")
+                if not barcodes.empty:
+                    b_del = b2.selectbox("ลบบาร์โค้ด", barcodes['gtin'].tolist(), key=f"barcode_del_{k_suffix}", label_visibility="collapsed")
+                    if b2.button("ลบบาร์โค้ดที่เลือก", use_container_width=True, key=f"btn_barcode_del_{k_suffix}"):
+                        supabase.table("medicine_barcodes").delete().eq("gtin", b_del).execute()
+                        invalidate_cache()
+                        flash("ลบบาร์โค้ดแล้ว"); st.rerun()
+
+            with st.container(border=True):
+                st.markdown("#### 💰 ราคาทุนรายล็อต")
+                st.caption("ใช้ตีมูลค่าคลังและต้นทุนการเบิกจ่ายในหน้าสรุปยอด (ล็อตที่ไม่มีราคาทุนจะใช้ราคาเฉลี่ยของล็อตอื่นของยานี้แทน) แก้ราคาแล้วมูลค่าย้อนหลังทุกเดือนเปลี่ยนตาม")
+                lots = pd.DataFrame(supabase.table("inventory").select("id, lot_no, exp_date, qty, status, unit_cost").eq("medicine_id", selected_id_real).order("exp_date").execute().data,
+                                    columns=['id', 'lot_no', 'exp_date', 'qty', 'status', 'unit_cost'])
+                if lots.empty: st.info("ยังไม่มีล็อตของรายการนี้ในคลัง")
+                else:
+                    lots['unit_cost'] = pd.to_numeric(lots['unit_cost']).astype('float64')
+                    edited_lots = st.data_editor(lots, hide_index=True, use_container_width=True, key=f"lot_cost_{k_suffix}", disabled=['lot_no', 'exp_date', 'qty', 'status'], column_order=['lot_no', 'exp_date', 'qty', 'status', 'unit_cost'],
+                                                 column_config={"lot_no": "รหัส Lot", "exp_date": "วันหมดอายุ", "qty": "คงเหลือ", "status": "สถานะ", "unit_cost": st.column_config.NumberColumn("ราคาทุน/หน่วย (บาท)", min_value=0.0, format="%.2f")})
+                    # 🌟 อัปเดตเฉพาะล็อตที่ราคาเปลี่ยนจริง
+                    changed = edited_lots[~((edited_lots['unit_cost'] == lots['unit_cost']) | (edited_lots['unit_cost'].isna() & lots['unit_cost'].isna()))]
+                    if st.button(f"บันทึกราคาทุน ({len(changed)} ล็อต)", use_container_width=True, disabled=changed.empty, key=f"btn_lot_cost_{k_suffix}"):
+                        try:
+                            for row in changed.to_dict('records'):
+                                supabase.table("inventory").update({"unit_cost": None if pd.isna(row['unit_cost']) else float(row['unit_cost'])}).eq("id", row['id']).execute()
+                            invalidate_cache()
+                            flash(f"บันทึกราคาทุน {len(changed)} ล็อตแล้ว"); st.rerun()
+                        except Exception as e: st.error(f"เกิดข้อผิดพลาดจากฐานข้อมูล: {e}")
+
+            st.divider()
+            st.markdown("#### ลบข้อมูลถาวร")
+            st.warning("แนะนำให้ใช้วิธี **'เอาเครื่องหมายถูกเปิดใช้งานออก'** แทนการลบ เพื่อเก็บประวัติไว้ตรวจสอบ (ระบบจะอนุญาตให้ลบถาวรได้ **เฉพาะรายการที่ไม่เคยมีประวัติรับ-จ่าย** เท่านั้น)")
+            del_col1, del_col2 = st.columns([1, 1])
+            with del_col1: confirm_del = st.checkbox("ยืนยันว่าต้องการลบรายการนี้ทิ้งถาวร", key=f"confirm_delete_box_{k_suffix}")
+            with del_col2:
+                st.markdown('<div class="red-btn-hook"></div>', unsafe_allow_html=True)
+                if st.button("ลบรายการเวชภัณฑ์ถาวร", type="primary", use_container_width=True, key=f"btn_del_med_{k_suffix}"):
+                    if confirm_del:
+                        try:
+                            supabase.table("medicines").delete().eq("id", selected_id_real).execute()
+                            invalidate_cache()
+                            flash(f"ลบรายการออกจากระบบเรียบร้อยแล้ว!"); st.rerun()
+                        except Exception as e: st.error("ไม่สามารถลบได้! เนื่องจากรายการนี้เคยถูกทำรับ/เบิกไปแล้ว (กรุณาใช้วิธีปิดใช้งานแทน)")
+                    else: st.error("กรุณาติ๊กเครื่องหมายถูกที่ช่อง 'ยืนยัน' ก่อนกดปุ่มลบ")
+    else: st.info("ยังไม่มีข้อมูลในระบบ")
@@ -0,0 +1,99 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from pharmacy.db import get_medicines, get_lot_trace, get_lot_stock, get_open_recalls, with_display_columns, invalidate_cache
+from pharmacy.auth import current_user_name
+from pharmacy.frames import TZ
+from pharmacy.recall import parse_lots, lot_summary, recall_lots, release_recall, recall_error_message, TRACE_COLUMNS, SUMMARY_COLUMNS
+from pharmacy.exports import lot_trace_file
+from pharmacy.submit import flash, form_token, form_key
+
+st.header("🔎 ตามรอย Lot / เรียกคืนยา")
+st.caption("ค้นทุกรายการรับเข้า/เบิกจ่ายของเลข Lot ที่บริษัทประกาศเรียกคืน: จ่ายให้ใคร เมื่อไร หน่วยงานไหน และยังเหลือในคลังเท่าไร")
+meds = get_medicines()
+med_dict = dict(zip(meds['id'], meds['generic_name'] + " (" + meds['unit'] + ")")) if not meds.empty else {}
+
+with st.form("recall_search"):
+    c1, c2 = st.columns([2, 2])
+    lots_text = c1.text_area("เลข Lot (หลาย Lot คั่นด้วยขึ้นบรรทัดใหม่หรือ ,)", value=st.session_state.get('recall_lots_text', ''), height=110)
+    medicine_id = c2.selectbox("รายการยา", options=[None] + list(med_dict), format_func=lambda x: "ทุกรายการยาที่มีเลข Lot นี้" if x is None else med_dict[x])
+    include_archive = c2.checkbox("รวมประวัติที่เก็บถาวร (ปีงบประมาณที่ปิดแล้ว)", value=False)
+    if st.form_submit_button("🔎 ตามรอย", use_container_width=True):
+        st.session_state.recall_lots_text = lots_text
+        st.session_state.recall_query = (tuple(parse_lots(lots_text)), medicine_id, include_archive)
+
+lots, medicine_id, include_archive = st.session_state.get('recall_query', ((), None, False))
+if lots:
+    trace = get_lot_trace(lots, medicine_id, include_archive)
+    stock = get_lot_stock(lots, medicine_id)
+    if trace.empty and stock.empty: st.warning(f"ไม่พบเลข Lot {', '.join(lots)} ในระบบ")
+    else:
+        names = meds[['id', 'generic_name', 'unit']].rename(columns={'id': 'medicine_id'})
+        summary = lot_summary(trace, stock).merge(names, on='medicine_id', how='left')
+        for col in ['first_dispense', 'last_dispense']:
+            summary[col] = pd.to_datetime(summary[col], utc=True).dt.tz_convert(TZ).dt.strftime('%d/%m/%Y %H:%M').fillna('-')
+        missing = [l for l in lots if l not in set(summary['lot_no'])]
+        if missing: st.warning(f"ไม่พบเลข Lot: {', '.join(missing)}")
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("ล็อตที่พบ", f"{len(summary):,}")
+        m2.metric("เบิกจ่ายไปแล้ว", f"{int(summary['dispensed_qty'].sum()):,}", help=f"{int(summary['dispense_count'].sum()):,} ครั้ง")
+        m3.metric("คงเหลือในคลัง", f"{int(summary['on_hand'].sum()):,}")
+        m4.metric("ถูกระงับจ่ายอยู่", f"{int(summary.loc[summary['status'].str.contains('RECALLED'), 'on_hand'].sum()):,}")
+
+        st.markdown("**สรุปรายล็อต**")
+        summary_view = summary[list(SUMMARY_COLUMNS)].rename(columns=SUMMARY_COLUMNS)
+        st.dataframe(summary_view, use_container_width=True, hide_index=True)
+
+        st.markdown("**รายการในสมุดบัญชีของล็อต**")
+        only_dispense = st.toggle("เฉพาะรายการเบิกจ่าย", value=True)
+        trace_view, shown = pd.DataFrame(columns=list(TRACE_COLUMNS.values())), pd.DataFrame(columns=list(TRACE_COLUMNS.values()))
+        if not trace.empty:
+            rows = with_display_columns(trace).sort_values('created_at_dt', ascending=False, kind='stable')
+            trace_view = rows[list(TRACE_COLUMNS)].rename(columns=TRACE_COLUMNS)
+            shown = trace_view[(rows['action_type'] == 'DISPENSE').to_numpy()] if only_dispense else trace_view
+        st.dataframe(shown, use_container_width=True, hide_index=True)
+        st.download_button("📥 ส่งออกผลการตามรอย (Excel)", *lot_trace_file(summary_view, trace_view, datetime.date.today()), use_container_width=True)
+
+        # 🌟 ระงับทันที: ล็อตที่ใช้งานอยู่ถูกเปลี่ยนเป็น RECALLED ในคำสั่งเดียว ใบเบิกถัดไปจะข้ามล็อตนี้ และรับเข้าล็อตเดิมซ้ำก็ถูกระงับอัตโนมัติ
+        with st.expander("🚫 บันทึกประกาศเรียกคืน / ระงับการจ่าย", expanded=False):
+            reason = st.text_input("เหตุผล / เลขที่หนังสือเรียกคืน", key="recall_reason")
+            block = st.checkbox("ระงับการจ่ายล็อตเหล่านี้ทันที (ไม่ถูกตัดจ่ายแบบ FEFO)", value=True, key="recall_block")
+            scope = med_dict.get(medicine_id, "ทุกรายการยาที่มีเลข Lot นี้")
+            form_token("lot_recall")
+            if st.button(f"บันทึกประกาศเรียกคืน {len(lots)} Lot ({scope})", type="primary", use_container_width=True, key=form_key("lot_recall", "lot_recall_submit")):
+                if not reason.strip(): st.error("กรุณาระบุเหตุผลหรือเลขที่หนังสือเรียกคืน")
+                else:
+                    try:
+                        result = recall_lots(lots, medicine_id, reason.strip(), block, current_user_name(), form="lot_recall")
+                        invalidate_cache()
+                        flash(f"บันทึกประกาศเรียกคืนแล้ว ระงับ {result.get('lots_blocked', 0)} ล็อต รวม {result.get('qty_blocked', 0):,} หน่วย" if block else "บันทึกประกาศเรียกคืนแล้ว (ไม่ระงับการจ่าย)")
+                        st.rerun()
+                    except Exception as e: st.error(recall_error_message(e) or f"เกิดข้อผิดพลาด: {e}")
+
+st.divider()
+st.subheader("📋 ประกาศเรียกคืนที่ยังมีผล")
+try:
+    recalls = get_open_recalls()
+    if recalls.empty: st.success("ไม่มีประกาศเรียกคืนที่ยังมีผล")
+    else:
+        recalls['created_at_str'] = recalls['created_at'].dt.tz_convert(TZ).dt.strftime('%d/%m/%Y %H:%M')
+        recalls['scope'] = recalls['medicine_id'].map(lambda m: med_dict.get(m, m) if pd.notna(m) else "ทุกรายการยา")
+        recalls['blocked_th'] = recalls['blocked'].map({True: '🚫 ระงับจ่าย', False: 'แจ้งเตือนอย่างเดียว'})
+        st.dataframe(recalls[['lot_no', 'scope', 'reason', 'blocked_th', 'created_by', 'created_at_str']].rename(columns={
+            'lot_no': 'เลข Lot', 'scope': 'รายการยา', 'reason': 'เหตุผล', 'blocked_th': 'การจ่าย', 'created_by': 'ผู้บันทึก', 'created_at_str': 'วันที่ประกาศ'}),
+            use_container_width=True, hide_index=True)
+        # ยกเลิกการระงับเฉพาะผู้ดูแลระบบ (ล็อตที่หมดอายุไประหว่างถูกระงับจะย้ายเข้าคลังกักกัน)
+        if st.session_state.get('role') == 'admin':
+            c1, c2 = st.columns([3, 1])
+            labels = {r.id: f"{r.lot_no} | {r.scope} | {r.reason or '-'}" for r in recalls.itertuples()}
+            recall_id = c1.selectbox("ยกเลิกประกาศ", options=list(labels), format_func=labels.get, label_visibility="collapsed")
+            form_token("lot_recall_release")
+            if c2.button("ยกเลิกการระงับ", use_container_width=True, key=form_key("lot_recall_release", "lot_recall_release_submit")):
+                try:
+                    result = release_recall(recall_id, current_user_name(), form="lot_recall_release")
+                    invalidate_cache()
+                    flash(f"ยกเลิกประกาศแล้ว คืนสถานะใช้งาน {result.get('lots_released', 0)} ล็อต ย้ายเข้าคลังกักกัน (หมดอายุ) {result.get('lots_quarantined', 0)} ล็อต")
+                    st.rerun()
+                except Exception as e: st.error(recall_error_message(e) or f"เกิดข้อผิดพลาด: {e}")
+except Exception as e: st.error("❌ ยังไม่พบตารางประกาศเรียกคืน กรุณารัน python migrate.py (migrations/017_lot_recall.sql) ก่อนครับ")
@@ -0,0 +1,111 @@
+import streamlit as st
+import pandas as pd
+from pharmacy.db import get_medicines, get_lot_expiries
+from pharmacy.auth import current_user_name
+from pharmacy.stock import receive_lots, stock_error_message
+from pharmacy.scan import scan_box, scan_editor, clear_scans
+from pharmacy.submit import flash, form_token, form_key
+from pharmacy.receive_grid import empty_grid, parse_invoice_file, resolve_medicines, validate_grid, receive_payload, GRID_COLUMNS, GRID_LABELS
+
+st.header("📥 การรับเวชภัณฑ์เข้าคลัง (Receive)")
+meds = get_medicines()
+med_dict = dict(zip(meds['id'], meds['generic_name'] + " (" + meds['unit'] + ")"))
+med_options = meds['id'].tolist()
+
+# 🌟 โหมดสแกน: สแกนกล่องยาทีละชิ้นตามใบส่งของ (ยา/Lot/วันหมดอายุอ่านจากบาร์โค้ด GS1) แล้วบันทึกทั้งใบครั้งเดียว
+if st.toggle("📷 โหมดสแกนบาร์โค้ด (GS1)", key="receive_scan_mode"):
+    group_by = ('medicine_id', 'lot_no', 'exp_date')
+    names = dict(zip(meds['id'], meds['generic_name'] + " (" + meds['unit'] + ")"))
+    if scan_box("receive_scan", group_by, names):
+        edited = scan_editor("receive_scan", group_by, names, ['lot_no', 'mfg_date', 'exp_date', 'qty', 'unit_cost', 'scans'], {
+            "lot_no": "รหัส Lot", "mfg_date": st.column_config.DateColumn("วันผลิต", format="DD/MM/YYYY"),
+            "exp_date": st.column_config.DateColumn("วันหมดอายุ", format="DD/MM/YYYY"), "qty": st.column_config.NumberColumn("จำนวนรับเข้า", min_value=1, step=1),
+            "unit_cost": st.column_config.NumberColumn("ราคาทุน/หน่วย (บาท)", min_value=0.0, format="%.2f")})
+        receive_note = st.text_input("หมายเหตุ (สามารถแก้ไขได้)", value="รับเข้า (สแกนบาร์โค้ด)")
+        recorder_name = current_user_name()
+        st.caption(f"ผู้บันทึกการรับเข้า: {recorder_name}")
+        c1, c2 = st.columns([3, 1])
+        if c1.button(f"บันทึกรับเข้าคลัง ({len(edited)} รายการ / {int(edited['qty'].fillna(0).sum()):,} หน่วย)", type="primary", use_container_width=True, key=form_key("receive_scan", "receive_scan_submit")):
+            if edited['exp_date'].isna().any() or edited['qty'].isna().any() or (edited['qty'] < 1).any(): st.error("กรุณากรอกวันหมดอายุและจำนวนรับเข้าให้ครบทุกรายการ (บาร์โค้ด EAN ธรรมดาไม่มีข้อมูล Lot/วันหมดอายุ)")
+            else:
+                receive_data = [{"medicine_id": r['medicine_id'], "lot_no": str(r['lot_no']).strip() if pd.notna(r['lot_no']) and str(r['lot_no']).strip() else "-",
+                                 "mfg_date": pd.Timestamp(r['mfg_date']).date().isoformat() if pd.notna(r['mfg_date']) else None,
+                                 "exp_date": pd.Timestamp(r['exp_date']).date().isoformat(), "qty": int(r['qty']),
+                                 "unit_cost": float(r['unit_cost']) if pd.notna(r['unit_cost']) else None} for r in edited.to_dict('records')]
+                try:
+                    # บันทึกสำเร็จแล้ว call_rpc ล้างรายการที่สแกนและเปลี่ยน key ของปุ่มให้เอง (pharmacy/submit.py)
+                    receive_lots(receive_data, recorder_name, receive_note, form="receive_scan")
+                    flash("บันทึกรับเข้าสำเร็จ!"); st.rerun()
+                except Exception as e: st.error(stock_error_message(e) or f"เกิดข้อผิดพลาดในการบันทึกข้อมูล: {e}")
+        if c2.button("ล้างรายการที่สแกน", use_container_width=True):
+            clear_scans("receive_scan"); st.rerun()
+    st.stop()
+
+# 🌟 โหมดตาราง: ใบส่งของหลายร้อยบรรทัด กรอกหรือวางจาก Excel ในตารางเดียว ตรวจทั้งใบพร้อมกันแล้วบันทึกครั้งเดียว
+if st.toggle("📋 โหมดตาราง (ใบส่งของจำนวนมาก / วางจาก Excel)", key="receive_grid_mode"):
+    form_token("receive_grid")
+    version = st.session_state.get("receive_grid_version", 0)
+    uploaded = st.file_uploader("นำเข้าไฟล์ใบส่งของ (CSV / Excel) หรือกรอกในตารางด้านล่าง", type=["csv", "xlsx"], key=f"receive_grid_file_{version}")
+    grid = empty_grid()
+    if uploaded is not None:
+        try: grid = parse_invoice_file(uploaded)
+        except Exception as e: st.error(f"อ่านไฟล์ไม่ได้: {e}")
+    st.caption("💡 คัดลอกหลายแถวจาก Excel (เรียงคอลัมน์ตามตาราง) แล้วคลิกช่องแรกของตารางกด Ctrl+V ได้เลย แถวจะเพิ่มให้อัตโนมัติ | ช่องยาใส่รหัสยา หรือชื่อยาตามที่แสดงในระบบ | วันที่ใส่ได้ทั้ง ว/ด/ป พ.ศ. และ ค.ศ.")
+    edited = st.data_editor(grid, num_rows="dynamic", hide_index=True, use_container_width=True, key=f"receive_grid_editor_{version}_{getattr(uploaded, 'file_id', '')}",
+                            column_config={c: st.column_config.TextColumn(GRID_LABELS[c]) for c in GRID_COLUMNS})
+    ids = tuple(sorted(resolve_medicines(edited['medicine'], meds)[0].dropna().unique()))
+    checked = validate_grid(edited, meds, get_lot_expiries(ids), pd.Timestamp.now(tz='Asia/Bangkok').date())
+    if checked.empty: st.info("ยังไม่มีรายการในตาราง")
+    else:
+        bad = checked[checked['problems'] != '']
+        c1, c2, c3 = st.columns(3)
+        c1.metric("จำนวนบรรทัด", f"{len(checked):,}")
+        c2.metric("จำนวนรับเข้ารวม", f"{int(checked['qty'].fillna(0).sum()):,}")
+        c3.metric("บรรทัดที่ต้องแก้ไข", f"{len(bad):,}")
+        if not bad.empty:
+            st.error(f"❌ พบ {len(bad):,} บรรทัดที่ต้องแก้ไขก่อนบันทึก")
+            st.dataframe(pd.DataFrame({"แถวที่": bad.index + 1, "ยา": edited.loc[bad.index, 'medicine'], "เลข Lot": bad['lot_no'], "ปัญหา": bad['problems']}), hide_index=True, use_container_width=True)
+        receive_note = st.text_input("หมายเหตุ (สามารถแก้ไขได้)", value="รับเข้า (ใบส่งของ)")
+        recorder_name = current_user_name()
+        st.caption(f"ผู้บันทึกการรับเข้า: {recorder_name}")
+        if st.button(f"บันทึกรับเข้าคลัง ({len(checked):,} รายการ)", type="primary", use_container_width=True, disabled=not bad.empty, key=form_key("receive_grid", "receive_grid_submit")):
+            try:
+                # ทั้งใบบันทึกใน transaction เดียวฝั่งเซิร์ฟเวอร์ (ผิดพลาดบรรทัดใดจะไม่มีรายการใดถูกบันทึก)
+                receive_lots(receive_payload(checked), recorder_name, receive_note, form="receive_grid")
+                flash(f"บันทึกรับเข้าสำเร็จ {len(checked):,} รายการ!"); st.rerun()
+            except Exception as e: st.error(stock_error_message(e) or f"เกิดข้อผิดพลาดในการบันทึกข้อมูล: {e}")
+    st.stop()
+
+num_items = st.number_input("จำนวนรายการเวชภัณฑ์ที่ต้องการรับเข้าพร้อมกัน", min_value=1, max_value=20, value=1)
+st.divider()
+
+# 🌟 token ของฟอร์มนี้ (ดับเบิลคลิกจะส่ง token เดิมซ้ำและถูกปฏิเสธที่เซิร์ฟเวอร์)
+form_token("receive_form")
+with st.form(form_key("receive_form", "bulk_receive_form")):
+    receive_data = []
+    for i in range(int(num_items)):
+        st.markdown(f"**รายการที่ {i+1}**")
+        selected_id = st.selectbox("เลือกเวชภัณฑ์", options=med_options, format_func=lambda x: med_dict[x], key=f"med_{i}")
+        c1, c2, c3, c4, c5 = st.columns(5)
+        with c1: lot = st.text_input("รหัส Lot", key=f"lot_{i}")
+        with c2: mfg = st.date_input("วันผลิต", key=f"mfg_{i}")
+        with c3: exp = st.date_input("วันหมดอายุ", key=f"exp_{i}")
+        with c4: qty = st.number_input("จำนวนรับเข้า", min_value=1, key=f"qty_{i}")
+        # 🌟 ราคาทุนต่อหน่วยของล็อตนี้ (ใช้ตีมูลค่าคลังและต้นทุนการเบิกจ่าย) ไม่ทราบราคาเว้นว่างไว้แล้วกรอกภายหลังได้ที่หน้า Master Data
+        with c5: unit_cost = st.number_input("ราคาทุน/หน่วย (บาท)", min_value=0.0, value=None, step=0.25, format="%.2f", key=f"cost_{i}")
+        st.markdown("---")
+        final_lot = lot if lot.strip() != "" else "-"
+        receive_data.append({"medicine_id": selected_id, "lot_no": final_lot, "mfg_date": str(mfg), "exp_date": str(exp), "qty": qty, "unit_cost": unit_cost})
+
+    receive_note = st.text_input("หมายเหตุ (สามารถแก้ไขได้)", value="รับเข้า (Receive)")
+    recorder_name = current_user_name()
+    st.caption(f"ผู้บันทึกการรับเข้า: {recorder_name}")
+
+    if st.form_submit_button("บันทึกรับเข้าคลัง", use_container_width=True, key=form_key("receive_form", "receive_form_submit")):
+        try:
+            # บันทึกล็อตและประวัติรับเข้าทั้งใบพร้อมกัน (ถ้าผิดพลาดจะไม่มีรายการใดถูกบันทึกครึ่งๆ กลางๆ)
+            receive_lots(receive_data, recorder_name, receive_note, form="receive_form")
+            flash("บันทึกรับเข้าสำเร็จ!"); st.rerun()
+        except Exception as e:
+            st.error(stock_error_message(e) or f"เกิดข้อผิดพลาดในการบันทึกข้อมูล: {e}")
+            st.info("คำแนะนำ: โปรดตรวจสอบว่ารหัส Lot มีการซ้ำซ้อนในระบบหรือไม่")
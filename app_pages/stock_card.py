@@ -0,0 +1,65 @@
+import streamlit as st
+import pandas as pd
+from pharmacy.db import get_medicines, map_user_names, get_archived_months, get_archived_transactions, with_display_columns, fetch
+from pharmacy.utils import format_thai_month
+from pharmacy.frames import TRANSACTION_COLUMNS
+from pharmacy.ledger import fold_ledger
+
+st.header("🗃️ บัญชีคุมเวชภัณฑ์คงคลัง (Stock Card)")
+meds = get_medicines()
+if not meds.empty:
+    med_dict = dict(zip(meds['id'], meds['generic_name'] + " (" + meds['unit'] + ")"))
+    selected_id = st.selectbox("ค้นหาและเลือกรายการเวชภัณฑ์ที่ต้องการดูประวัติ:", options=meds['id'].tolist(), format_func=lambda x: med_dict[x])
+
+    if selected_id:
+        selected_name = meds[meds['id'] == selected_id]['generic_name'].values[0]
+        selected_unit = meds[meds['id'] == selected_id]['unit'].values[0]
+        df_t = fold_ledger(fetch("transactions", TRANSACTION_COLUMNS, [("eq", "medicine_id", selected_id)], order="created_at"))
+        if get_archived_months() and st.toggle("🗄️ รวมประวัติที่เก็บถาวร (ปีงบประมาณที่ปิดแล้ว)", value=False):
+            df_a = fold_ledger(get_archived_transactions(medicine_id=selected_id))
+            if not df_a.empty:
+                # ได้ประวัติครบตั้งแต่ต้นแล้ว จึงตัดแถวยอดยกมาจากการเก็บถาวรออก ไม่ให้ยอดคงเหลือถูกนับซ้ำ
+                df_t = pd.concat([df_a, df_t], ignore_index=True)
+                df_t = df_t[~df_t['carry_forward'].eq(True)]
+        df_t = map_user_names(df_t)
+        df_i = fetch("inventory", ["lot_no", "exp_date", "qty"], [("eq", "medicine_id", selected_id)])
+
+        if not df_t.empty:
+            if not df_i.empty:
+                df_i_unique = df_i.drop_duplicates(subset=['lot_no'])[['lot_no', 'exp_date']]
+                df_t = pd.merge(df_t, df_i_unique, on='lot_no', how='left')
+            else: df_t['exp_date'] = '-'
+
+            df_t = df_t.sort_values(by='created_at', ascending=True)
+            df_t['running_balance'] = df_t['qty_change'].cumsum()
+            df_t = with_display_columns(df_t.sort_values(by='created_at', ascending=False), '%d/%m/%Y %H:%M')
+            df_t['qty_change_str'] = df_t['qty_change'].apply(lambda x: f"+{x}" if x > 0 else str(x))
+
+            all_months_sc = df_t['ym'].dropna().unique().tolist()
+            all_months_sc.sort(reverse=True)
+            month_opts_sc = {"ทั้งหมด": "ดูทุกรอบเดือน (All Time)"}
+            for ym in all_months_sc: month_opts_sc[ym] = format_thai_month(ym)
+
+            selected_ym_sc = st.selectbox("เลือกดูประวัติเฉพาะเดือน:", options=["ทั้งหมด"] + all_months_sc, format_func=lambda x: month_opts_sc[x])
+            df_show = df_t[df_t['ym'] == selected_ym_sc].copy() if selected_ym_sc != "ทั้งหมด" else df_t.copy()
+
+            cols = ['created_at_str', 'action_type_th', 'lot_no', 'exp_date', 'qty_change_str', 'running_balance', 'user_name', 'note']
+            df_show = df_show[cols]
+            df_show.columns = ['วัน-เวลา', 'ประเภท', 'เลข Lot', 'วันหมดอายุ', 'จำนวนรับ/จ่าย', f'ยอดคงเหลือ ({selected_unit})', 'ผู้บันทึก', 'หมายเหตุ']
+
+            st.markdown(f"**ประวัติความเคลื่อนไหว: {selected_name}**")
+            if not df_show.empty: st.dataframe(df_show, use_container_width=True, hide_index=True)
+            else: st.info(f"ไม่พบประวัติการเคลื่อนไหวในเดือนที่เลือก")
+        else: st.info(f"ยังไม่มีประวัติการรับ-จ่าย ของเวชภัณฑ์ {selected_name}")
+
+        st.divider()
+        st.subheader(f"สรุปยอดคงเหลือปัจจุบัน")
+        if not df_i.empty:
+            df_i_active = df_i[df_i['qty'] > 0]
+            if not df_i_active.empty:
+                total_current = df_i_active['qty'].sum()
+                st.metric(f"รวมทั้งสิ้น ({selected_name})", f"{total_current:,} {selected_unit}")
+                st.dataframe(df_i_active[['lot_no', 'exp_date', 'qty']].rename(columns={'lot_no': 'เลข Lot', 'exp_date': 'วันหมดอายุ', 'qty': f'คงเหลือ ({selected_unit})'}), hide_index=True)
+            else: st.warning("ยอดเวชภัณฑ์ในคลังเป็น 0")
+        else: st.warning("ไม่มีข้อมูลในคลัง (ยอดยกเป็น 0)")
+else: st.info("ยังไม่มีข้อมูลเวชภัณฑ์ในระบบ")
@@ -0,0 +1,132 @@
+import streamlit as st
+import pandas as pd
+from pharmacy.db import supabase, get_medicine_names, invalidate_cache
+from pharmacy.auth import current_user_name
+from pharmacy.submit import flash, form_token, form_key
+from pharmacy.stocktake import (open_count, save_counts, post_count, cancel_count, get_open_count, load_lines, load_movements,
+                                compute_variance, summarize, with_names, export_template, parse_count_file, stock_count_error_message, skipped_message)
+
+st.header("📝 ตรวจนับสต๊อก (Stock Take)")
+recorder_name = current_user_name()
+count = get_open_count()
+
+if not count:
+    st.info("ยังไม่มีรอบตรวจนับที่เปิดอยู่ เมื่อเริ่มรอบ ระบบจะบันทึกยอดคงเหลือทุกล็อต ณ เวลานั้นไว้เป็นยอดตั้งต้น (ระหว่างนับยังรับ-เบิกได้ตามปกติ)")
+    form_token("stock_count_open")
+    with st.form(form_key("stock_count_open", "open_stock_count_form")):
+        note = st.text_input("หมายเหตุรอบนับ", value=f"ตรวจนับประจำวันที่ {pd.Timestamp.now(tz='Asia/Bangkok'):%d/%m/%Y}")
+        if st.form_submit_button("▶️ เริ่มรอบตรวจนับ", type="primary", use_container_width=True, key=form_key("stock_count_open", "stock_count_open_submit")):
+            try:
+                result = open_count(recorder_name, note, form="stock_count_open")
+                flash(f"เปิดรอบตรวจนับแล้ว ({result['lines']:,} ล็อต)"); st.rerun()
+            except Exception as e: st.error(stock_count_error_message(e) or f"เกิดข้อผิดพลาด: {e}")
+
+    past = pd.DataFrame(supabase.table("stock_counts").select("*").neq("status", "OPEN").order("id", desc=True).limit(10).execute().data)
+    if not past.empty:
+        st.subheader("🗂️ รอบตรวจนับที่ผ่านมา")
+        past['เริ่มนับ'] = pd.to_datetime(past['snapshot_at'], utc=True, format='ISO8601').dt.tz_convert('Asia/Bangkok').dt.strftime('%d/%m/%Y %H:%M')
+        past['สถานะ'] = past['status'].map({'POSTED': 'ปรับยอดแล้ว', 'CANCELLED': 'ยกเลิก'})
+        past['ปรับยอด (ล็อต)'] = past['result'].map(lambda r: r.get('lines_adjusted') if isinstance(r, dict) else None)
+        past['เกิน'] = past['result'].map(lambda r: r.get('qty_over') if isinstance(r, dict) else None)
+        past['ขาด'] = past['result'].map(lambda r: r.get('qty_short') if isinstance(r, dict) else None)
+        past['ข้าม (ล็อตกักกัน/ระงับ)'] = past['result'].map(lambda r: r.get('lines_skipped', 0) if isinstance(r, dict) else None)
+        st.dataframe(past[['id', 'เริ่มนับ', 'สถานะ', 'note', 'closed_by', 'ปรับยอด (ล็อต)', 'เกิน', 'ขาด', 'ข้าม (ล็อตกักกัน/ระงับ)']].rename(columns={'id': 'รอบที่', 'note': 'หมายเหตุ', 'closed_by': 'ผู้ปิดรอบ'}), hide_index=True, use_container_width=True)
+    st.stop()
+
+count_id = count['id']
+snapshot_at = pd.to_datetime(count['snapshot_at'], utc=True, format='ISO8601')
+st.caption(f"รอบที่ {count_id} | ยอดตั้งต้น ณ {snapshot_at.tz_convert('Asia/Bangkok'):%d/%m/%Y %H:%M} น. | เปิดโดย {count.get('created_by') or '-'} | {count.get('note') or ''}")
+
+meds = get_medicine_names()
+lines = load_lines(count_id)
+if lines.empty:
+    st.warning("รอบนี้ไม่มีล็อตให้นับ")
+else:
+    view = with_names(lines, meds).sort_values(['generic_name', 'exp_date', 'lot_no'])
+
+tab_grid, tab_import, tab_review = st.tabs(["✏️ กรอกยอดนับ", "📂 นำเข้าไฟล์ยอดนับ", "📊 ส่วนต่างและยืนยันปรับยอด"])
+
+with tab_grid:
+    if not lines.empty:
+        c1, c2 = st.columns([3, 1])
+        search = c1.text_input("🔍 ค้นหาชื่อยา / เลข Lot")
+        only_pending = c2.toggle("เฉพาะที่ยังไม่นับ")
+        grid = view
+        if search: grid = grid[grid['generic_name'].astype(str).str.contains(search, case=False, regex=False) | grid['lot_no'].astype(str).str.contains(search, case=False, regex=False)]
+        if only_pending: grid = grid[grid['counted_qty'].isna()]
+        grid = grid[['id', 'generic_name', 'unit', 'lot_no', 'exp_date', 'snapshot_qty', 'counted_qty']].astype({'counted_qty': 'Int32'})
+        st.caption(f"แสดง {len(grid):,} จาก {len(view):,} ล็อต")
+        edited = st.data_editor(grid, hide_index=True, use_container_width=True, key=f"stock_count_grid_{count_id}",
+                                disabled=['id', 'generic_name', 'unit', 'lot_no', 'exp_date', 'snapshot_qty'],
+                                column_config={"id": None, "generic_name": "ชื่อยา", "unit": "หน่วย", "lot_no": "เลข Lot", "exp_date": "วันหมดอายุ",
+                                               "snapshot_qty": st.column_config.NumberColumn("ยอดตั้งต้น"),
+                                               "counted_qty": st.column_config.NumberColumn("ยอดนับได้", min_value=0, step=1)})
+        # 🌟 ส่งเฉพาะบรรทัดที่เปลี่ยนจริง (เทียบทั้งคอลัมน์ครั้งเดียว) ในคำขอเดียว
+        changed = edited[edited['counted_qty'].fillna(-1).ne(grid['counted_qty'].fillna(-1))]
+        if st.button(f"💾 บันทึกยอดนับ ({len(changed):,} รายการที่แก้ไข)", type="primary", use_container_width=True, disabled=changed.empty):
+            try:
+                save_counts(count_id, changed, recorder_name)
+                del st.session_state[f"stock_count_grid_{count_id}"]
+                flash("บันทึกยอดนับแล้ว"); st.rerun()
+            except Exception as e: st.error(stock_count_error_message(e) or f"เกิดข้อผิดพลาด: {e}")
+
+with tab_import:
+    if not lines.empty:
+        st.download_button("📄 ดาวน์โหลดใบนับ (CSV)", data=export_template(lines, meds), file_name=f"ใบตรวจนับ_รอบที่_{count_id}.csv", mime="text/csv")
+        st.caption("กรอกคอลัมน์ 'ยอดนับได้' แล้วนำเข้ากลับ (รองรับ CSV/Excel จับคู่ด้วย 'รหัสบรรทัด' หรือ 'รหัสยา' + 'เลข Lot' ช่องที่เว้นว่างจะไม่ถูกเปลี่ยน)")
+        uploaded = st.file_uploader("นำเข้าไฟล์ยอดนับ", type=["csv", "xlsx"])
+        if uploaded is not None:
+            try:
+                counts, unmatched = parse_count_file(uploaded, lines)
+                st.write(f"พบยอดนับ **{len(counts):,}** ล็อต")
+                if not unmatched.empty:
+                    st.warning(f"มี {len(unmatched):,} แถวที่ไม่ตรงกับล็อตในรอบนี้ (จะไม่ถูกบันทึก)")
+                    st.dataframe(unmatched, hide_index=True, use_container_width=True)
+                if st.button("📥 บันทึกยอดนับจากไฟล์", type="primary", use_container_width=True, disabled=counts.empty):
+                    save_counts(count_id, counts, recorder_name)
+                    st.session_state.pop(f"stock_count_grid_{count_id}", None)
+                    flash("นำเข้ายอดนับแล้ว"); st.rerun()
+            except ValueError as e: st.error(f"❌ {e}")
+            except Exception as e: st.error(stock_count_error_message(e) or f"เกิดข้อผิดพลาด: {e}")
+
+with tab_review:
+    if not lines.empty:
+        result = compute_variance(view, load_movements(snapshot_at.isoformat()))
+        s = summarize(result)
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("นับแล้ว", f"{s['counted']:,} / {s['lines']:,}")
+        m2.metric("ตรงยอด", f"{s['matched']:,}")
+        m3.metric("เกิน (ชิ้น)", f"{s['over']:,}")
+        m4.metric("ขาด (ชิ้น)", f"{s['short']:,}")
+        diff = result[result['result'].isin(['เกิน', 'ขาด'])]
+        if not diff.empty:
+            st.dataframe(diff[['generic_name', 'lot_no', 'snapshot_qty', 'counted_qty', 'variance', 'movement', 'expected_now', 'new_qty', 'result']].rename(columns={
+                'generic_name': 'ชื่อยา', 'lot_no': 'เลข Lot', 'snapshot_qty': 'ยอดตั้งต้น', 'counted_qty': 'ยอดนับได้', 'variance': 'ส่วนต่าง',
+                'movement': 'รับ/เบิกระหว่างนับ', 'expected_now': 'ยอดในระบบตอนนี้', 'new_qty': 'ยอดหลังปรับ', 'result': 'ผล'}), hide_index=True, use_container_width=True)
+        else: st.success("ยังไม่พบส่วนต่างจากยอดที่นับแล้ว")
+        if s['negative']: st.error(f"มี {s['negative']:,} ล็อตที่ยอดหลังปรับจะติดลบ กรุณาตรวจสอบยอดนับ")
+        if s['counted'] < s['lines']: st.info(f"ล็อตที่ยังไม่นับ ({s['lines'] - s['counted']:,} ล็อต) จะไม่ถูกปรับยอด")
+
+    st.divider()
+    if st.session_state.role == 'admin':
+        form_token(f"stock_count_post_{count_id}")
+        confirm = st.checkbox("ยืนยันปรับยอดคลังตามผลตรวจนับ (บันทึกเป็นรายการ 'ปรับยอดตรวจนับ' และปิดรอบ)")
+        c1, c2 = st.columns(2)
+        if c1.button("✅ ยืนยันปรับยอดและปิดรอบ", type="primary", use_container_width=True, key=form_key(f"stock_count_post_{count_id}", "stock_count_post_submit")):
+            if not confirm: st.error("กรุณาติ๊กช่องยืนยันก่อน")
+            else:
+                try:
+                    # 🌟 ปรับยอดทุกล็อตพร้อมบันทึกประวัติใน transaction เดียวฝั่งเซิร์ฟเวอร์
+                    r = post_count(count_id, recorder_name, form=f"stock_count_post_{count_id}")
+                    invalidate_cache()
+                    flash(f"ปรับยอดแล้ว {r['lines_adjusted']:,} ล็อต (เกิน {r['qty_over']:,} / ขาด {r['qty_short']:,} ชิ้น)")
+                    # 🌟 ล็อตที่ถูกกักกัน/ระงับระหว่างนับ เซิร์ฟเวอร์ข้ามไม่ปรับยอด (migrations/021)
+                    if skipped_message(r): flash(skipped_message(r, meds), icon="⚠️")
+                    st.rerun()
+                except Exception as e: st.error(stock_count_error_message(e) or f"เกิดข้อผิดพลาด: {e}")
+        with c2:
+            st.markdown('<div class="red-btn-hook"></div>', unsafe_allow_html=True)
+            if st.button("ยกเลิกรอบตรวจนับ", type="primary", use_container_width=True):
+                cancel_count(count_id, recorder_name)
+                flash("ยกเลิกรอบตรวจนับแล้ว"); st.rerun()
+    else: st.info("การยืนยันปรับยอดและปิดรอบ ทำได้โดยผู้ดูแลระบบ (Admin) เท่านั้น")
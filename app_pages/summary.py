@@ -0,0 +1,237 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from pharmacy.db import get_medicines, get_transactions_view, get_archived_months, get_archived_transactions_view, fetch, get_month_balances, get_stock_as_of, get_month_valuation, get_dispense_usage
+from pharmacy.valuation import with_medicines, group_valuation, totals, baht, VALUE_COLUMNS, VALUE_LABELS, GROUP_LABELS
+from pharmacy.abc import abc_table, abc_ven_matrix, class_summary, BASIS_LABELS, LEVEL_LABELS, VEN_LABELS, COLUMN_LABELS, ABC_LIMITS
+from pharmacy.utils import format_thai_month
+
+st.header("📊 สรุปยอด และ ขอเบิกเวชภัณฑ์")
+tab_summary, tab_reorder, tab_abc = st.tabs(["📅 สรุปยอดรับ-จ่าย ประจำเดือน", "🛒 รายงานขอเบิก", "🔠 วิเคราะห์ ABC / VEN"])
+
+with tab_summary:
+    st.caption("รายงานสรุปยอดยกมา การรับเข้า เบิกจ่าย และยอดคงเหลือ ณ สิ้นเดือน แยกตามรายการยา (เดือนปัจจุบันแสดงยอดคงเหลือ ณ ตอนนี้)")
+    df_trans = get_transactions_view()
+    if not df_trans.empty:
+        df_trans['ym'] = df_trans['created_at'].dt.tz_convert('Asia/Bangkok').dt.strftime('%Y-%m')
+        archived_months = get_archived_months()
+        all_months = sorted(set(df_trans['ym'].dropna()) | set(archived_months), reverse=True)
+        if all_months:
+            month_opts = {ym: format_thai_month(ym) + (" 🗄️ เก็บถาวร" if ym in archived_months else "") for ym in all_months}
+            selected_ym = st.selectbox("เลือกเดือนที่ต้องการดูรายงาน:", options=all_months, format_func=lambda x: month_opts[x])
+            st.divider()
+            st.subheader(f"รายงานประจำเดือน: {format_thai_month(selected_ym)}")
+
+            df_month = df_trans[df_trans['ym'] == selected_ym]
+            if selected_ym in archived_months: df_month = pd.concat([df_month, get_archived_transactions_view([selected_ym])], ignore_index=True)
+            df_recv = df_month[df_month['action_type'] == 'RECEIVE'].groupby('medicine_id', observed=True)['qty_change'].sum().reset_index()
+            df_recv.rename(columns={'qty_change': 'receive_qty'}, inplace=True)
+            df_disp = df_month[df_month['action_type'] == 'DISPENSE'].groupby('medicine_id', observed=True)['qty_change'].sum().reset_index()
+            df_disp['qty_change'] = df_disp['qty_change'].abs()
+            df_disp.rename(columns={'qty_change': 'dispense_qty'}, inplace=True)
+            expire_qty = -df_month[df_month['action_type'] == 'EXPIRE'].groupby('medicine_id', observed=True)['qty_change'].sum()
+            adjust_qty = df_month[df_month['action_type'] == 'ADJUST'].groupby('medicine_id', observed=True)['qty_change'].sum()
+
+            # 🌟 ยอดยกมา/คงเหลือของเดือนที่เลือก จาก snapshot สิ้นเดือน + รายการหลังจากนั้น (คำสั่งเดียวฝั่งเซิร์ฟเวอร์)
+            balances = get_month_balances(selected_ym)
+            if balances is None:
+                st.warning("ไม่มียอดคงเหลือสิ้นเดือนที่บันทึกไว้ก่อนเก็บถาวรประวัติของเดือนนี้ จึงแสดงเฉพาะยอดรับ-จ่าย")
+                balances = pd.DataFrame(columns=['medicine_id', 'opening', 'closing'])
+            balances = balances.assign(medicine_id=balances['medicine_id'].astype(str)).set_index('medicine_id')
+            meds = get_medicines()
+
+            if not meds.empty:
+                report = pd.merge(meds[['id', 'generic_name', 'unit', 'min_stock']], df_recv, left_on='id', right_on='medicine_id', how='left')
+                report = pd.merge(report, df_disp, left_on='id', right_on='medicine_id', how='left')
+                report['receive_qty'] = report['receive_qty'].fillna(0).astype(int)
+                report['dispense_qty'] = report['dispense_qty'].fillna(0).astype(int)
+                report['expire_qty'] = report['id'].map(expire_qty).fillna(0).astype(int)
+                report['adjust_qty'] = report['id'].map(adjust_qty).fillna(0).astype(int)
+                report['opening'] = report['id'].astype(str).map(balances['opening']).fillna(0).astype(int)
+                report['closing'] = report['id'].astype(str).map(balances['closing']).fillna(0).astype(int)
+                report['min_stock'] = report['min_stock'].fillna(0).astype(int)
+                report_display = report[['generic_name', 'unit', 'min_stock', 'opening', 'receive_qty', 'dispense_qty', 'expire_qty', 'adjust_qty', 'closing']].copy()
+                report_display.insert(0, 'ลำดับ', range(1, len(report_display) + 1))
+                report_display.columns = ['ลำดับ', 'รายการ', 'หน่วยนับ', 'จุดสั่งซื้อ', 'ยอดยกมา', 'รับมา', 'เบิกจ่าย', 'ตัดหมดอายุ', 'ปรับยอดตรวจนับ', 'คงเหลือ']
+                st.dataframe(report_display, use_container_width=True, hide_index=True)
+                csv = report_display.to_csv(index=False).encode('utf-8-sig')
+                st.download_button(label="ดาวน์โหลดรายงาน (CSV)", data=csv, file_name=f'Summary_Report_{selected_ym}.csv', mime='text/csv')
+
+                # 🌟 มูลค่าคลัง/ต้นทุนเบิกจ่าย ตามราคาทุนของล็อตที่ตัดจริง (คำนวณรายยาฝั่งเซิร์ฟเวอร์ แล้วรวมเป็นหมวด/กลุ่มยาที่นี่)
+                st.divider()
+                st.subheader("💰 มูลค่าคลังและต้นทุนการเบิกจ่าย (ราคาทุนรายล็อต)")
+                valuation = get_month_valuation(selected_ym)
+                if valuation is None: st.warning("เดือนนี้อยู่ในช่วงที่เก็บถาวรแล้ว และไม่มียอดสิ้นเดือนที่บันทึกไว้ จึงคำนวณมูลค่าไม่ได้")
+                elif valuation.empty: st.info("ไม่มีมูลค่าคลังในเดือนที่เลือก")
+                else:
+                    valued = with_medicines(valuation, fetch("medicines", ["id", "generic_name", "unit", "category", "drug_group"]))
+                    total = totals(valued)
+                    v1, v2, v3, v4 = st.columns(4)
+                    v1.metric("มูลค่ายกมา", baht(total['opening_value']))
+                    v2.metric("มูลค่ารับเข้า", baht(total['receive_value']))
+                    v3.metric("ต้นทุนเบิกจ่าย", baht(total['dispense_cost']))
+                    v4.metric("มูลค่าคงเหลือ", baht(total['closing_value']))
+                    if total['uncosted_qty']: st.caption(f"⚠️ มียอดคงเหลือ {int(total['uncosted_qty']):,} หน่วยที่ยังไม่มีราคาทุน (ไม่ถูกนับในมูลค่า) กำหนดราคาทุนรายล็อตได้ที่หน้า 'ข้อมูลยา (Master Data)'")
+                    group_by = st.radio("สรุปตาม", ['category', 'drug_group', 'medicine_id'], format_func=lambda x: {**GROUP_LABELS, 'medicine_id': 'รายการยา'}[x], horizontal=True)
+                    if group_by == 'medicine_id':
+                        value_view = valued.sort_values('closing_value', ascending=False)[['generic_name', 'unit'] + VALUE_COLUMNS + ['uncosted_qty']].rename(columns={'generic_name': 'รายการ', 'unit': 'หน่วยนับ', **VALUE_LABELS})
+                    else: value_view = group_valuation(valued, group_by).rename(columns={**GROUP_LABELS, **VALUE_LABELS})
+                    st.dataframe(value_view, use_container_width=True, hide_index=True, column_config={label: st.column_config.NumberColumn(format="%.2f") for label in [VALUE_LABELS[c] for c in VALUE_COLUMNS]})
+                    st.download_button(label="ดาวน์โหลดมูลค่าคลัง (CSV)", data=value_view.to_csv(index=False).encode('utf-8-sig'), file_name=f'Inventory_Value_{selected_ym}_{group_by}.csv', mime='text/csv')
+            else: st.warning("ไม่พบข้อมูลเวชภัณฑ์ในระบบ")
+        else: st.info("ยังไม่มีข้อมูลในเดือนที่เลือก")
+
+        with st.expander("🔎 ยอดคงเหลือ ณ วันที่ย้อนหลัง (รายยา + Lot)"):
+            as_of_day = st.date_input("ยอดคงเหลือ ณ สิ้นวันที่", value=datetime.date.today(), max_value=datetime.date.today(), format="DD/MM/YYYY")
+            stock = get_stock_as_of(as_of_day)
+            if stock is None: st.warning("วันที่เลือกอยู่ในช่วงที่เก็บถาวรแล้ว ดูย้อนหลังได้เฉพาะยอด ณ สิ้นเดือนที่บันทึกไว้")
+            elif stock.empty: st.info("ไม่มียอดคงเหลือ ณ วันที่เลือก")
+            else:
+                names = get_medicines()[['id', 'generic_name', 'unit']].astype({'id': str})
+                stock = stock.assign(medicine_id=stock['medicine_id'].astype(str)).merge(names, left_on='medicine_id', right_on='id', how='left')
+                st.dataframe(stock[['generic_name', 'unit', 'lot_no', 'qty']].rename(columns={'generic_name': 'รายการ', 'unit': 'หน่วยนับ', 'lot_no': 'เลข Lot', 'qty': 'คงเหลือ'}), hide_index=True, use_container_width=True)
+    else: st.info("ยังไม่มีประวัติการทำรายการรับ-จ่ายในระบบ")
+
+with tab_reorder:
+    st.subheader("🛒 จัดการและรายงานใบขอเบิกเวชภัณฑ์")
+    meds = get_medicines()
+    if not meds.empty:
+        # ล็อตที่ถูกระงับเรียกคืน (RECALLED) ไม่นับเป็นยอดคงเหลือ ยาที่เหลือแต่ล็อตระงับจึงขึ้นในใบขอเบิก
+        inv = fetch("inventory", ["medicine_id", "qty"], [("eq", "status", "ACTIVE")])
+        if not inv.empty:
+            inv_agg = inv.groupby('medicine_id', observed=True)['qty'].sum().reset_index()
+            df_all = pd.merge(meds, inv_agg, left_on='id', right_on='medicine_id', how='left')
+            df_all['qty'] = df_all['qty'].fillna(0).astype(int)
+        else:
+            df_all = meds.copy()
+            df_all['qty'] = 0
+
+        low_stock_ids = df_all[df_all['qty'] <= df_all['min_stock']]['id'].tolist()
+        base_ids = [id for id in low_stock_ids if id not in st.session_state.reorder_manual_removed]
+        table_med_ids = list(set(base_ids + st.session_state.reorder_manual_added))
+        df_table = df_all[df_all['id'].isin(table_med_ids)].copy()
+        df_available = df_all[~df_all['id'].isin(table_med_ids)].copy()
+
+        st.markdown("##### 📝 รายการขอเบิก")
+        st.caption("💡 **วิธีแก้ไขจำนวน:** คลิกที่ตัวเลขในช่อง 'จำนวนขอเบิก' เพื่อพิมพ์แก้ได้เลย <br>💡 **วิธีลบรายการ:** ติ๊กเครื่องหมายถูกที่ช่อง **'ลบรายการ'** ท้ายตาราง แถวนั้นจะหายวับไปทันทีครับ!", unsafe_allow_html=True)
+
+        if not df_table.empty:
+            df_table['suggested_reorder'] = df_table.apply(lambda row: st.session_state.reorder_quantities.get(row['id'], row['min_stock']), axis=1)
+            df_display_reorder = df_table[['generic_name', 'unit', 'min_stock', 'qty', 'suggested_reorder']].copy()
+            df_display_reorder.insert(0, 'ลำดับ', range(1, len(df_display_reorder) + 1))
+            df_display_reorder['ลบรายการ'] = False
+            df_display_reorder.columns = ['ลำดับ', 'รายการ', 'หน่วยนับ', 'อัตราใช้ต่อเดือน', 'จำนวนคงเหลือ', 'จำนวนขอเบิก', 'ลบรายการ']
+
+            edited_df = st.data_editor(
+                df_display_reorder, hide_index=True, use_container_width=True,
+                disabled=["ลำดับ", "รายการ", "หน่วยนับ", "อัตราใช้ต่อเดือน", "จำนวนคงเหลือ"], 
+                column_config={"ลบรายการ": st.column_config.CheckboxColumn("ลบรายการ", help="ติ๊กถูกช่องนี้ แถวนี้จะถูกลบทิ้งทันที", default=False)},
+                key="reorder_table" 
+            )
+
+            needs_rerun = False
+            for idx, row in edited_df.iterrows():
+                med_name = row['รายการ']
+                med_id = df_all[df_all['generic_name'] == med_name]['id'].values[0]
+                if st.session_state.reorder_quantities.get(med_id) != row['จำนวนขอเบิก']:
+                    st.session_state.reorder_quantities[med_id] = row['จำนวนขอเบิก']
+                if row['ลบรายการ'] == True:
+                    if med_id in st.session_state.reorder_manual_added: st.session_state.reorder_manual_added.remove(med_id)
+                    else:
+                        if med_id not in st.session_state.reorder_manual_removed: st.session_state.reorder_manual_removed.append(med_id)
+                    if med_id in st.session_state.reorder_quantities: del st.session_state.reorder_quantities[med_id]
+                    needs_rerun = True 
+
+            if needs_rerun:
+                if "reorder_table" in st.session_state: del st.session_state["reorder_table"]
+                st.rerun()
+
+            st.divider()
+            final_export_df = edited_df.drop(columns=['ลบรายการ']).copy()
+            final_export_df['ลำดับ'] = range(1, len(final_export_df) + 1) 
+            # 🌟 สร้างไฟล์ Excel ในคิวงานเบื้องหลังเมื่อกดปุ่ม (ไม่เขียน xlsx ใหม่ทุก rerun ระหว่างแก้ตาราง) ตารางเดิมได้ไฟล์เดิมทันที
+            from pharmacy.background import start_job, job_result, download_artifact
+            from pharmacy.exports import requisition_file
+            export_inputs = (final_export_df, datetime.date.today())
+            if st.button("📄 สร้างไฟล์ใบขอเบิก (Excel)", type="primary"):
+                start_job("requisition", "requisition", export_inputs, lambda df=final_export_df, today=export_inputs[1]: requisition_file(df, today), label="ใบขอเบิก")
+            requisition = job_result("requisition", "กำลังสร้างไฟล์ใบขอเบิก...", inputs=export_inputs)
+            if requisition: download_artifact(requisition, "📥 ดาวน์โหลดไฟล์ขอเบิก (.xlsx)" if requisition[1].endswith('.xlsx') else "📥 ดาวน์โหลดไฟล์ขอเบิก (CSV รองรับ Excel)", type="primary")
+        else: st.success("✅ ยอดคงคลังเพียงพอทุกรายการ (หากต้องการออกใบเบิก ให้ค้นหาแล้วกดปุ่มเพิ่มลงตารางด้านล่างได้เลยครับ)")
+
+        st.divider()
+        st.markdown("##### ➕ เพิ่มรายการขอเบิก (นอกเหนือจากที่ระบบแนะนำ)")
+        st.info("💡 กล่องค้นหาด้านล่าง จะแสดงเฉพาะ 'รายชื่อยาที่ยังไม่มีอยู่ในตาราง' เท่านั้นครับ")
+        c_add1, c_add2, c_add3 = st.columns([3, 1, 1])
+        with c_add1:
+            if not df_available.empty:
+                avail_dict = dict(zip(df_available['id'], df_available['generic_name'] + " (" + df_available['unit'] + ")"))
+                add_choice_id = st.selectbox("เลือกรายการเวชภัณฑ์:", options=[None] + df_available['id'].tolist(), format_func=lambda x: "-- เลือกรายการเวชภัณฑ์ --" if x is None else avail_dict[x], label_visibility="collapsed")
+            else:
+                add_choice_id = None
+                st.selectbox("เลือกรายการเวชภัณฑ์:", ["(เวชภัณฑ์ทุกตัวอยู่ในตารางขอเบิกหมดแล้ว)"], disabled=True, label_visibility="collapsed")
+        with c_add2:
+            if st.button("➕ เพิ่มลงตาราง", use_container_width=True):
+                if add_choice_id is not None:
+                    st.session_state.reorder_manual_added.append(add_choice_id)
+                    if add_choice_id in st.session_state.reorder_manual_removed: st.session_state.reorder_manual_removed.remove(add_choice_id)
+                    st.rerun()
+        with c_add3:
+            if st.button("🔄 ล้างรายการที่เพิ่มเอง", use_container_width=True):
+                st.session_state.reorder_manual_added = []
+                st.session_state.reorder_manual_removed = []
+                st.session_state.reorder_quantities = {}
+                if "reorder_table" in st.session_state: del st.session_state["reorder_table"]
+                st.rerun()
+    else: st.warning("ไม่พบข้อมูลเวชภัณฑ์ในระบบ")
+
+with tab_abc:
+    st.subheader("🔠 วิเคราะห์การใช้ยาแบบ ABC และ ABC-VEN")
+    st.caption(f"เรียงรายการจากใช้มากไปน้อยแล้วสะสมสัดส่วน: A = {ABC_LIMITS[0]:.0%} แรกของยอดใช้, B = ถัดมาจนถึง {ABC_LIMITS[1]:.0%}, C = ที่เหลือ (รวมยาที่ไม่มีการเบิกจ่ายในช่วงที่เลือก) | VEN กำหนดรายยาได้ที่หน้า 'ข้อมูลยา (Master Data)'")
+    today = datetime.date.today()
+    c1, c2, c3 = st.columns([2, 1, 1])
+    abc_range = c1.date_input("ช่วงวันที่เบิกจ่าย", value=(today - datetime.timedelta(days=364), today), max_value=today, format="DD/MM/YYYY", key="abc_range")
+    basis = c2.radio("จัดชั้นตาม", list(BASIS_LABELS), format_func=BASIS_LABELS.get, key="abc_basis")
+    level = c3.radio("ระดับ", list(LEVEL_LABELS), format_func=LEVEL_LABELS.get, key="abc_level")
+    if len(abc_range) != 2: st.info("กรุณาเลือกวันเริ่มต้นและวันสิ้นสุด")
+    else:
+        # 🌟 ดึงยอดเบิกจ่ายรายยาของทั้งช่วงครั้งเดียว (แคชตามช่วงวันที่) แล้วจัดชั้น/สรุประดับหมวด-กลุ่มยาในหน่วยความจำ
+        usage = get_dispense_usage(*abc_range)
+        meds = get_medicines()
+        if meds.empty: st.warning("ไม่พบข้อมูลเวชภัณฑ์ในระบบ")
+        elif usage.empty: st.info("ไม่มีรายการเบิกจ่ายในช่วงวันที่เลือก")
+        else:
+            table = abc_table(usage, meds, level, basis)
+            summary = class_summary(table, basis)
+            m1, m2, m3 = st.columns(3)
+            for col, cls in zip((m1, m2, m3), "ABC"):
+                col.metric(f"ชั้น {cls}", f"{int(summary.loc[cls, 'items']):,} {'รายการ' if level == 'medicine_id' else LEVEL_LABELS[level]}", f"{summary.loc[cls, 'share']:.1f}% ของ{BASIS_LABELS[basis]}", delta_color="off")
+            if basis == 'dispense_value' and table['uncosted_qty'].sum(): st.caption(f"⚠️ มียอดเบิกจ่าย {int(table['uncosted_qty'].sum()):,} หน่วยที่ยังไม่มีราคาทุน (ไม่ถูกนับในมูลค่า)")
+
+            show_cols = (['generic_name', 'unit'] if level == 'medicine_id' else [level, 'items']) + ['dispense_qty', 'dispense_value', 'share', 'cum_share', 'abc']
+            if level == 'medicine_id': show_cols += ['ven_class', 'abc_ven', 'matrix_group']
+            view = table[show_cols].rename(columns=COLUMN_LABELS)
+            st.dataframe(view, use_container_width=True, hide_index=True, column_config={COLUMN_LABELS[c]: st.column_config.NumberColumn(format="%.2f") for c in ('dispense_value', 'share', 'cum_share')})
+
+            sheets = {"ABC": view}
+            if level == 'medicine_id':
+                st.markdown("##### ตาราง ABC-VEN (จำนวนรายการ / สัดส่วนยอดใช้ %)")
+                st.caption("กลุ่ม I (AV, AE, AN, BV, CV) ควบคุมใกล้ชิด, กลุ่ม II (BE, CE, BN) ควบคุมปานกลาง, กลุ่ม III (CN) ทบทวนความจำเป็นในการสำรอง")
+                counts, shares = abc_ven_matrix(table, basis)
+                labels = {**VEN_LABELS, '-': 'ยังไม่กำหนด VEN'}
+                m1, m2 = st.columns(2)
+                m1.dataframe(counts.rename(columns=labels), use_container_width=True)
+                m2.dataframe(shares.rename(columns=labels), use_container_width=True, column_config={labels[c]: st.column_config.NumberColumn(format="%.1f") for c in shares.columns})
+                sheets["ABC-VEN จำนวน"] = counts.rename(columns=labels).reset_index()
+                sheets["ABC-VEN สัดส่วน"] = shares.rename(columns=labels).reset_index()
+
+            file_tag = f"{abc_range[0]:%Y%m%d}_{abc_range[1]:%Y%m%d}_{level}"
+            d1, d2 = st.columns(2)
+            d1.download_button("ดาวน์โหลด ABC (CSV)", data=view.to_csv(index=False).encode('utf-8-sig'), file_name=f"ABC_{file_tag}.csv", mime="text/csv", use_container_width=True)
+            import io
+            buffer = io.BytesIO()
+            try:
+                with pd.ExcelWriter(buffer) as writer:
+                    for name, sheet in sheets.items(): sheet.to_excel(writer, index=False, sheet_name=name)
+                d2.download_button("ดาวน์โหลด ABC / ABC-VEN (Excel)", data=buffer.getvalue(), file_name=f"ABC_VEN_{file_tag}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
+            except Exception: d2.caption("ส่งออก Excel ไม่ได้ในเครื่องนี้ (ไม่มีตัวเขียนไฟล์ .xlsx) ใช้ไฟล์ CSV แทน")
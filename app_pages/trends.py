@@ -0,0 +1,60 @@
+import streamlit as st
+import pandas as pd
+import datetime
+from pharmacy.db import get_medicines, get_drug_groups, get_movement_series
+from pharmacy.dimensions import group_names
+from pharmacy.trends import complete_series, pick_bucket, bucket_start, trend_per_year, year_over_year, MEASURE_LABELS, BUCKET_LABELS
+
+st.header("📈 แนวโน้มการใช้ยา")
+st.caption("ยอดรับเข้า/เบิกจ่ายจากสรุปรายวันในฐานข้อมูล (รวมปีงบประมาณที่เก็บถาวรแล้ว) ช่วงยาวจะสรุปเป็นรายสัปดาห์/รายเดือนให้อัตโนมัติ")
+meds = get_medicines()
+if meds.empty: st.warning("ไม่พบข้อมูลเวชภัณฑ์ในระบบ")
+else:
+    today = datetime.date.today()
+    c1, c2 = st.columns([1, 3])
+    scope = c1.radio("ดูแนวโน้มของ", ["รายการยา", "กลุ่มยา", "ทั้งคลัง"], key="trend_scope")
+    medicine_id = drug_group = None
+    if scope == "รายการยา":
+        med_dict = dict(zip(meds['id'], meds['generic_name'] + " (" + meds['unit'] + ")"))
+        medicine_id = c2.selectbox("เลือกรายการเวชภัณฑ์:", options=meds['id'].tolist(), format_func=lambda x: med_dict[x], key="trend_medicine")
+        title = med_dict[medicine_id]
+    elif scope == "กลุ่มยา":
+        groups = group_names(get_drug_groups(), in_use=True)
+        drug_group = c2.selectbox("เลือกกลุ่มยา:", options=groups, key="trend_group") if groups else None
+        if drug_group is None: c2.info("ยังไม่มีการกำหนดกลุ่มยาในหน้า 'ข้อมูลยา (Master Data)'")
+        title = f"กลุ่มยา {drug_group}"
+    else: title = "ทั้งคลัง"
+
+    c3, c4, c5 = st.columns([2, 1, 2])
+    trend_range = c3.date_input("ช่วงวันที่", value=(today.replace(year=today.year - 3, day=1), today), max_value=today, format="DD/MM/YYYY", key="trend_range")
+    bucket_choice = c4.selectbox("สรุปเป็น", ["auto"] + list(BUCKET_LABELS), format_func=lambda b: "อัตโนมัติ" if b == "auto" else BUCKET_LABELS[b], key="trend_bucket")
+    measures = c5.multiselect("ยอดที่แสดง", list(MEASURE_LABELS), default=['dispense_qty'], format_func=MEASURE_LABELS.get, key="trend_measures")
+
+    if len(trend_range) != 2: st.info("กรุณาเลือกวันเริ่มต้นและวันสิ้นสุด")
+    elif scope == "กลุ่มยา" and drug_group is None: pass
+    else:
+        start, end = trend_range
+        bucket = pick_bucket(start, end) if bucket_choice == "auto" else bucket_choice
+        # 🌟 ขอตั้งแต่วันแรกของช่วงแรก ให้ช่วงแรกบนกราฟเป็นยอดเต็มช่วง แล้วเติมช่วงที่ไม่มีความเคลื่อนไหวเป็น 0
+        rows = get_movement_series(bucket_start(start, bucket), end, bucket, medicine_id, drug_group)
+        series = complete_series(rows, start, end, bucket)
+        if rows is None or rows.empty: st.info("ไม่มีความเคลื่อนไหวในช่วงวันที่เลือก")
+        else:
+            unit = meds.loc[meds['id'] == medicine_id, 'unit'].iloc[0] if medicine_id else "หน่วย"
+            total, per_month = int(series['dispense_qty'].sum()), series['dispense_qty'].sum() / max(((end - start).days + 1) / 30.44, 1)
+            slope = trend_per_year(series['dispense_qty'], bucket, partial_last=bucket_start(today, bucket) <= end)
+            m1, m2, m3 = st.columns(3)
+            m1.metric("เบิกจ่ายรวมทั้งช่วง", f"{total:,} {unit}")
+            m2.metric("เฉลี่ยต่อเดือน", f"{per_month:,.1f} {unit}")
+            m3.metric("แนวโน้มการเบิกจ่าย", f"{slope:+.1f}% ต่อปี" if slope is not None else "-", help="ความชันของเส้นตรงที่ fit กับยอดแต่ละช่วง เทียบกับค่าเฉลี่ย (ไม่นับช่วงปัจจุบันที่ยังไม่ครบ)")
+
+            st.markdown(f"**{title}** ({BUCKET_LABELS[bucket]}, {len(series):,} จุด)")
+            if measures: st.line_chart(series[measures].rename(columns=MEASURE_LABELS))
+            if bucket in ('day', 'week', 'month') and (end - start).days > 366 and st.toggle("ซ้อนกราฟเบิกจ่ายรายปี (เทียบเดือนเดียวกันของแต่ละปี)", key="trend_yoy"):
+                st.line_chart(year_over_year(series))
+
+            with st.expander("ตารางข้อมูล"):
+                view = series.rename(columns=MEASURE_LABELS).rename_axis("ช่วงเริ่มวันที่").reset_index()
+                view["ช่วงเริ่มวันที่"] = view["ช่วงเริ่มวันที่"].dt.strftime('%d/%m/%Y')
+                st.dataframe(view, use_container_width=True, hide_index=True)
+                st.download_button("ดาวน์โหลด (CSV)", data=view.to_csv(index=False).encode('utf-8-sig'), file_name=f"Trend_{medicine_id or drug_group or 'all'}_{start:%Y%m%d}_{end:%Y%m%d}.csv", mime="text/csv")
@@ -0,0 +1,105 @@
+import sys
+import json
+import argparse
+import datetime
+from pharmacy.pg import connect
+from pharmacy.archive import default_archive_uri, fiscal_year_cutoff, write_staging, publish_staging, discard_staging
+
+# --- ย้ายประวัติรับ-จ่ายของปีงบประมาณที่ปิดแล้วไปเก็บถาวร (ใช้ร่วมกับ migrations/004_transaction_archive.sql) ---
+# ตัวอย่าง: python archive_transactions.py --fiscal-year 2567 [--archive-uri s3://bucket/pharmacy-archive] [--dry-run]
+# ต้องตั้งค่า DATABASE_URL และติดตั้ง pip install -r requirements-service.txt
+# ขั้นตอน (ใน transaction เดียว): เลือกแถวก่อนวันเริ่มปีงบถัดไป -> เขียน Parquet ลงโฟลเดอร์พัก -> ตรวจจำนวนแถว/ผลรวม
+#   -> บันทึกยอดยกมาต่อยา+Lot -> ลบแถวเดิม -> บันทึกทะเบียน แล้วจึงย้ายไฟล์เข้าที่เก็บจริงหลัง commit
+# แถวต้นฉบับที่ยังมีรายการปรับปรุงเกิดหลังวันตัดยอด จะอยู่ในตารางต่อทั้งกลุ่ม (ไม่แยกคู่กัน)
+
+STREAM_CHUNK = 20000
+
+SELECT_ARCHIVE_SET = """
+create temp table _archive_set on commit drop as
+select t.id from public.transactions t
+where t.created_at < %(cutoff)s
+  and not exists (select 1 from public.transactions c where c.ref_id = coalesce(t.ref_id, t.id) and c.created_at >= %(cutoff)s)
+"""
+
+STREAM_ROWS = """
+select t.id::text as id, t.medicine_id, t.action_type, t.qty_change, t.lot_no, t.user_name, t.note, t.created_at,
+       t.ref_id::text as ref_id, t.entry_kind, t.carry_forward,
+       extract(year from p.at at time zone 'Asia/Bangkok')::int as year, extract(month from p.at at time zone 'Asia/Bangkok')::int as month
+from _archive_set a
+join public.transactions t on t.id = a.id
+left join public.transactions o on o.id = t.ref_id
+cross join lateral (select coalesce(o.created_at, t.created_at) as at) p
+order by year, month, t.medicine_id, t.created_at
+"""
+
+INSERT_CARRY_FORWARD = """
+insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, created_at, carry_forward)
+select t.medicine_id, 'INITIAL', sum(t.qty_change), t.lot_no, %(user_name)s, %(note)s, %(cutoff)s, true
+from _archive_set a join public.transactions t on t.id = a.id
+group by t.medicine_id, t.lot_no
+having sum(t.qty_change) <> 0
+"""
+
+def _stream(conn):
+    with conn.cursor(name="archive_stream") as cur:
+        cur.execute(STREAM_ROWS)
+        while True:
+            rows = cur.fetchmany(STREAM_CHUNK)
+            if not rows: break
+            yield rows
+
+def archive_fiscal_year(conn, fiscal_year, uri, user_name="SYSTEM", dry_run=False):
+    cutoff = fiscal_year_cutoff(fiscal_year)
+    if cutoff > datetime.datetime.now(cutoff.tzinfo): raise SystemExit(f"❌ ปีงบประมาณ {fiscal_year} ยังไม่ปิด (สิ้นสุด {cutoff:%d/%m/%Y})")
+    tag = f"fy{fiscal_year}"
+    with conn.transaction():
+        # กันไม่ให้รันซ้อนกันสองรอบ
+        conn.execute("select pg_advisory_xact_lock(hashtext('archive_transactions'))")
+        done = conn.execute("select fiscal_year, status from public.transaction_archives where cutoff >= %s order by cutoff desc limit 1", (cutoff,)).fetchone()
+        if done: raise SystemExit(f"❌ เก็บถาวรถึงปีงบประมาณ {done['fiscal_year']} ไปแล้ว (สถานะ {done['status']})")
+        conn.execute(SELECT_ARCHIVE_SET, {"cutoff": cutoff})
+        expected = conn.execute("select count(*) as n, coalesce(sum(t.qty_change), 0) as qty from _archive_set a join public.transactions t on t.id = a.id").fetchone()
+        result = {"fiscal_year": fiscal_year, "cutoff": cutoff.isoformat(), "rows": expected['n'], "qty_sum": int(expected['qty']), "uri": uri}
+        if dry_run or expected['n'] == 0: return dict(result, dry_run=dry_run)
+
+        try:
+            _, rows, qty = write_staging(_stream(conn), uri, tag)
+            if (rows, qty) != (expected['n'], expected['qty']):
+                raise RuntimeError(f"ARCHIVE_MISMATCH: เขียนได้ {rows} แถว ผลรวม {qty} แต่ในตารางมี {expected['n']} แถว ผลรวม {expected['qty']}")
+            carried = conn.execute(INSERT_CARRY_FORWARD, {"cutoff": cutoff, "user_name": user_name, "note": f"ยอดยกมาจากปีงบประมาณ {fiscal_year} (ประวัติเก่าย้ายไปเก็บถาวรแล้ว)"}).rowcount
+            conn.execute("set local pharmacy.archiving = 'on'")
+            deleted = conn.execute("delete from public.transactions t using _archive_set a where t.id = a.id").rowcount
+            conn.execute("set local pharmacy.archiving = 'off'")
+            conn.execute("insert into public.transaction_archives (cutoff, fiscal_year, row_count, qty_sum, carry_forward_rows, uri) values (%s, %s, %s, %s, %s, %s)",
+                         (cutoff, fiscal_year, deleted, qty, carried, uri))
+        except BaseException:
+            discard_staging(uri, tag)
+            raise
+    result.update(carry_forward_rows=carried, files=publish_staging(uri, tag))
+    conn.execute("update public.transaction_archives set status = 'PUBLISHED' where cutoff = %s", (cutoff,))
+    return result
+
+# รอบที่ลบจากตารางแล้วแต่ย้ายไฟล์ไม่สำเร็จ (เช่น เครื่องดับหลัง commit) -> ย้ายไฟล์ที่ค้างในโฟลเดอร์พักให้เสร็จ
+def publish_pending(conn):
+    published = []
+    for row in conn.execute("select cutoff, fiscal_year, uri from public.transaction_archives where status = 'COMMITTED' order by cutoff").fetchall():
+        files = publish_staging(row['uri'], f"fy{row['fiscal_year']}")
+        conn.execute("update public.transaction_archives set status = 'PUBLISHED' where cutoff = %s", (row['cutoff'],))
+        published.append({"fiscal_year": row['fiscal_year'], "files": files})
+    return published
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ย้ายประวัติรับ-จ่ายของปีงบประมาณที่ปิดแล้วไปเก็บเป็นไฟล์ Parquet")
+    parser.add_argument("--fiscal-year", type=int, help="ปีงบประมาณ (พ.ศ.) ที่ต้องการเก็บถาวร รวมทุกปีก่อนหน้าที่ยังไม่ได้เก็บ")
+    parser.add_argument("--archive-uri", default=default_archive_uri())
+    parser.add_argument("--dry-run", action="store_true", help="นับจำนวนแถวที่จะถูกย้ายอย่างเดียว ไม่เปลี่ยนแปลงข้อมูล")
+    parser.add_argument("--publish-pending", action="store_true", help="ย้ายไฟล์ของรอบที่ค้างอยู่ในโฟลเดอร์พักให้เสร็จ")
+    args = parser.parse_args(argv)
+    conn = connect()
+    if args.publish_pending: result = publish_pending(conn)
+    elif args.fiscal_year: result = archive_fiscal_year(conn, args.fiscal_year, args.archive_uri, dry_run=args.dry_run)
+    else: parser.error("ต้องระบุ --fiscal-year หรือ --publish-pending")
+    print(json.dumps(result, ensure_ascii=False, default=str, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
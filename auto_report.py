@@ -1,169 +1,158 @@
 import os
-import requests
+import sys
 import json
-import pandas as pd
+import time
+import calendar
 import datetime
-from supabase import create_client
+import urllib.request
+
+# --- ส่งรายงานเข้า LINE ตามรอบ: สรุปรายเดือน / ยาใกล้หมดอายุรายสัปดาห์ / ยาต่ำกว่าจุดสั่งซื้อรายวัน ---
+# 🌟 ส่วนตรวจเวลาใช้แค่ไลบรารีมาตรฐาน: อ่านการตั้งค่าและรอบล่าสุดของทุกงานด้วยคำขอเดียว (RPC report_schedule ใน migrations/010)
+#    pandas/supabase (pharmacy.reports) ถูก import ก็ต่อเมื่อมีงานถึงเวลาจริงเท่านั้น รอบที่ยังไม่ถึงเวลาจึงจบเร็วมาก
+# รอบที่พลาด (GitHub Actions เลื่อนเวลา/ไม่ได้รัน/เครื่องดับ) จะถูกส่งย้อนหนึ่งครั้งถ้ายังอยู่ในช่วง catch_up ของงานนั้น
+#   python auto_report.py                ตรวจแล้วส่งงานที่ถึงเวลา (GitHub Actions รายชั่วโมง)
+#   python auto_report.py --check        แค่บอกว่างานไหนถึงเวลา (เขียน due=... ลง $GITHUB_OUTPUT ถ้ามี)
+#   python auto_report.py --serve        รันค้างไว้และตรวจทุก 60 วินาที (ใช้บนเครื่องเซิร์ฟเวอร์แทน GitHub Actions)
+#   python auto_report.py --run monthly  ส่งงานที่ระบุทันทีโดยไม่สนเวลา (ไม่บันทึกรอบ)
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 LINE_TOKEN = os.environ.get("LINE_BOT_TOKEN")
 LINE_TARGET_ID = os.environ.get("LINE_TARGET_ID")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-THAI_MONTHS = {'01': 'มกราคม', '02': 'กุมภาพันธ์', '03': 'มีนาคม', '04': 'เมษายน', '05': 'พฤษภาคม', '06': 'มิถุนายน', '07': 'กรกฎาคม', '08': 'สิงหาคม', '09': 'กันยายน', '10': 'ตุลาคม', '11': 'พฤศจิกายน', '12': 'ธันวาคม'}
-
-def send_line_message(token, target_id, message):
-    url = "https://api.line.me/v2/bot/message/push"
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
-    data = {"to": target_id, "messages": [{"type": "text", "text": message}]}
-    requests.post(url, headers=headers, data=json.dumps(data))
-
-def generate_and_send_report():
-    # 🌟 1. ดึงข้อมูลการตั้งค่า (วัน และ เวลา) จากฐานข้อมูล
-    try:
-        settings_res = supabase.table("settings").select("*").eq("id", 1).execute()
-        if settings_res.data:
-            target_day = int(settings_res.data[0].get('report_day', 1))
-            target_hour = int(settings_res.data[0].get('report_hour', 10))
-        else:
-            target_day, target_hour = 1, 10
-    except:
-        target_day, target_hour = 1, 10
-        
-    # 🌟 2. ดึงเวลาปัจจุบัน (เวลาประเทศไทย UTC+7)
-    tz_th = datetime.timezone(datetime.timedelta(hours=7))
-    now_th = datetime.datetime.now(tz_th)
-    current_day = now_th.day
-    current_hour = now_th.hour
-    
-    # 🌟 3. ตรวจสอบว่า "วัน" และ "ชั่วโมง" ตรงกับที่ตั้งไว้หรือไม่
-    if current_day != target_day or current_hour != target_hour:
-        print(f"ยังไม่ถึงเวลาส่ง -> ปัจจุบัน: วันที่ {current_day} เวลา {current_hour}:00 | กำหนดส่ง: วันที่ {target_day} เวลา {target_hour}:00")
-        return
-        
-    print(f"✅ ถึงเวลาส่งรายงาน! (วันที่ {target_day} เวลา {target_hour}:00 น.) เริ่มดึงข้อมูล...")
-
-    first_day_of_this_month = now_th.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    last_day_of_prev_month = first_day_of_this_month - datetime.timedelta(days=1)
-    first_day_of_prev_month = last_day_of_prev_month.replace(day=1)
-    
-    month_name = THAI_MONTHS.get(last_day_of_prev_month.strftime('%m'))
-    year_th = last_day_of_prev_month.year + 543
-    report_title = f"📊 สรุปคลังเวชภัณฑ์ประจำเดือน {month_name} {year_th}"
-
+TZ_TH = datetime.timezone(datetime.timedelta(hours=7))
+SETTINGS_TTL = 300
+SERVE_INTERVAL = 60
+
+def _rpc(fn, params=None):
+    req = urllib.request.Request(f"{SUPABASE_URL.rstrip('/')}/rest/v1/rpc/{fn}", data=json.dumps(params or {}).encode(), method="POST",
+                                 headers={"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}", "Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as res: body = res.read()
+    return json.loads(body) if body else None
+
+_schedule = {"at": None, "value": None}
+
+# อ่านซ้ำเมื่อเก่ากว่า SETTINGS_TTL วินาที (โหมด --serve) รันครั้งเดียวจึงอ่านแค่ครั้งเดียว
+def load_schedule(max_age=SETTINGS_TTL):
+    if _schedule["value"] is None or time.monotonic() - _schedule["at"] > max_age:
+        _schedule.update(value=_rpc("report_schedule"), at=time.monotonic())
+    return _schedule["value"]
+
+def _at_hour(dt, hour):
+    return dt.replace(hour=hour, minute=0, second=0, microsecond=0)
+
+# 🌟 วันที่ตั้งไว้เกินจำนวนวันของเดือนนั้น (เช่น 31 ในเดือนเมษายน, 29-31 ในเดือนกุมภาพันธ์) = วันสุดท้ายของเดือน
+def _month_day(dt, day):
+    return dt.replace(day=min(day, calendar.monthrange(dt.year, dt.month)[1]))
+
+# เวลาของรอบล่าสุดที่ <= now ของแต่ละงาน (None = ปิดงานนั้นไว้)
+def monthly_slot(s, now):
+    day, hour = min(max(int(s.get('report_day') or 1), 1), 31), int(s.get('report_hour') if s.get('report_hour') is not None else 10)
+    slot = _at_hour(_month_day(now, day), hour)
+    if slot > now: slot = _at_hour(_month_day(now.replace(day=1) - datetime.timedelta(days=1), day), hour)
+    return slot
+
+def weekly_slot(s, now):
+    if not s.get('weekly_report_enabled'): return None
+    slot = _at_hour(now, int(s.get('report_hour') if s.get('report_hour') is not None else 10))
+    slot -= datetime.timedelta(days=(now.isoweekday() - int(s.get('weekly_report_weekday') or 1)) % 7)
+    return slot - datetime.timedelta(days=7) if slot > now else slot
+
+def daily_slot(s, now):
+    if not s.get('daily_report_enabled'): return None
+    slot = _at_hour(now, int(s.get('daily_report_hour') if s.get('daily_report_hour') is not None else 8))
+    return slot - datetime.timedelta(days=1) if slot > now else slot
+
+# ชื่องาน -> (ชื่อใน job_state, ฟังก์ชันหารอบ, ส่งย้อนได้นานสุดหลังเวลารอบ)
+JOBS = {
+    "monthly": ("report_monthly", monthly_slot, datetime.timedelta(days=3)),
+    "weekly_expiry": ("report_weekly_expiry", weekly_slot, datetime.timedelta(days=1)),
+    "daily_low_stock": ("report_daily_low_stock", daily_slot, datetime.timedelta(hours=6)),
+}
+
+def due_jobs(schedule, now):
+    settings, last = schedule.get('settings') or {}, schedule.get('last') or {}
+    due = []
+    for name, (job, slot_fn, catch_up) in JOBS.items():
+        slot = slot_fn(settings, now)
+        if slot is None or now - slot > catch_up: continue
+        if last.get(job) and datetime.date.fromisoformat(last[job]) >= slot.date(): continue
+        due.append((name, slot))
+    return due
+
+_client = None
+
+def build_message(name, slot, settings):
+    # 🌟 โหลดโมดูลหนักเฉพาะตอนมีงานต้องส่งจริง
+    global _client
+    from supabase import create_client
+    from pharmacy import reports
+    _client = _client or create_client(SUPABASE_URL, SUPABASE_KEY)
+    if name == "monthly": return reports.generate_monthly_executive_report(_client, slot.date())
+    if name == "weekly_expiry": return reports.weekly_expiry_report(_client, slot.date(), days=int(settings.get('alert_expiry_days') or 90))
+    return reports.daily_low_stock_report(_client, slot.date())
+
+def send(message):
+    from pharmacy.line import send_line_message
+    token, target = LINE_TOKEN, LINE_TARGET_ID
+    if not (token and target):
+        # ไม่ได้ตั้ง secrets ไว้ ใช้ค่าที่บันทึกจากหน้า Admin
+        row = (_client.table("settings").select("line_token, line_target_id").eq("id", 1).execute().data or [{}])[0]
+        token, target = token or row.get('line_token'), target or row.get('line_target_id')
+    return bool(token and target) and send_line_message(token, target, message)
+
+def run_job(name, slot, settings):
+    job = JOBS[name][0]
+    # จองรอบก่อนส่ง ถ้ามีอีกตัวส่งรอบนี้ไปแล้ว (หรือกำลังส่ง) จะข้าม
+    claim = _rpc("report_job_claim", {"p_job": job, "p_slot": slot.date().isoformat()})
+    if not claim['claimed']:
+        print(f"⏭️ {name}: รอบ {slot:%d/%m/%Y %H:%M} ส่งไปแล้ว")
+        return False
+    ok, result = False, None
     try:
-        meds_res = supabase.table("medicines").select("id, generic_name, unit, min_stock, category").eq("is_active", True).execute()
-        meds = pd.DataFrame(meds_res.data)
-        inv_df = pd.DataFrame(supabase.table("inventory").select("*").execute().data)
-        trans_res = supabase.table("transactions").select("*").gte("created_at", str(first_day_of_prev_month)).lt("created_at", str(first_day_of_this_month)).execute()
-        trans_df = pd.DataFrame(trans_res.data)
+        message = build_message(name, slot, settings)
+        ok = send(message)
+        result = {"chars": len(message), "sent": ok}
     except Exception as e:
-        send_line_message(LINE_TOKEN, LINE_TARGET_ID, f"❌ เกิดข้อผิดพลาดการดึงข้อมูลจากฐานข้อมูล: {e}")
-        return
-
-    if meds.empty:
-        msg_part1 = "\n\n❌ ไม่พบข้อมูล Master Data ในระบบ"
-        msg_part2 = "\n\n📥 รับเข้ามากที่สุด 5 อันดับ:\n(ไม่มีการเคลื่อนไหว)"
-        msg_part3 = "\n\n📤 เบิกจ่ายมากที่สุด 5 อันดับ:\n(ไม่มีการเคลื่อนไหว)"
-        msg_part4 = "\n\n⚠️ แจ้งเตือน: ต่ำกว่าจุดสั่งซื้อ\n(ไม่มีข้อมูล Master Data)"
-        msg_part5 = "\n\n⏰ แจ้งเตือน: ใกล้หมดอายุ (<90 วัน)\n(ไม่มีข้อมูลสต๊อก)"
-        final_message = report_title + msg_part1 + msg_part2 + msg_part3 + msg_part4 + msg_part5
-        send_line_message(LINE_TOKEN, LINE_TARGET_ID, final_message)
-        return
-
-    meds['category'] = meds['category'].astype(str).str.strip() 
-
-    drugs_in_stock = 0
-    supplies_in_stock = 0
-    if not inv_df.empty:
-        inv_agg_current = inv_df.groupby('medicine_id')['qty'].sum().reset_index()
-        inv_active_current = inv_agg_current[inv_agg_current['qty'] > 0]
-        if not inv_active_current.empty:
-            active_meds = pd.merge(inv_active_current, meds, left_on='medicine_id', right_on='id', how='left')
-            drugs_in_stock = len(active_meds[active_meds['category'].isin(['ยาในบัญชี', 'ยานอกบัญชี', 'เวชภัณฑ์ยา'])])
-            supplies_in_stock = len(active_meds[active_meds['category'].isin(['เวชภัณฑ์/วัสดุ', 'เวชภัณฑ์ที่มิใช่ยา'])])
-
-    msg_part1 = f"\n\n🏥 ข้อมูล ณ ปัจจุบัน (ที่มียอดคงเหลือ):\n- เวชภัณฑ์ยา: {drugs_in_stock} รายการ\n- เวชภัณฑ์มิใช่ยา: {supplies_in_stock} รายการ"
-
-    msg_part2 = "\n\n📥 รับเข้ามากที่สุด 5 อันดับ:"
-    msg_part3 = "\n\n📤 เบิกจ่ายมากที่สุด 5 อันดับ:"
-    
-    if not trans_df.empty:
-        df_merged = pd.merge(trans_df, meds[['id', 'generic_name', 'unit']], left_on='medicine_id', right_on='id', how='left')
-        
-        df_recv = df_merged[df_merged['action_type'] == 'RECEIVE'].groupby('generic_name')['qty_change'].sum().reset_index()
-        df_recv = df_recv.sort_values(by='qty_change', ascending=False).head(5)
-        if not df_recv.empty:
-            for idx, row in df_recv.iterrows():
-                unit_vals = meds[meds['generic_name'] == row['generic_name']]['unit'].values
-                unit = unit_vals[0] if len(unit_vals) > 0 else ''
-                msg_part2 += f"\n{idx+1}. {row['generic_name']} (+{int(row['qty_change'])} {unit})"
-        else: msg_part2 += "\n(ไม่มีการเคลื่อนไหว)"
-
-        df_disp = df_merged[df_merged['action_type'] == 'DISPENSE'].copy()
-        df_disp['qty_change'] = df_disp['qty_change'].abs()
-        df_disp = df_disp.groupby('generic_name')['qty_change'].sum().reset_index()
-        df_disp = df_disp.sort_values(by='qty_change', ascending=False).head(5)
-        if not df_disp.empty:
-            for idx, row in df_disp.iterrows():
-                unit_vals = meds[meds['generic_name'] == row['generic_name']]['unit'].values
-                unit = unit_vals[0] if len(unit_vals) > 0 else ''
-                msg_part3 += f"\n{idx+1}. {row['generic_name']} (-{int(row['qty_change'])} {unit})"
-        else: msg_part3 += "\n(ไม่มีการเคลื่อนไหว)"
-    else:
-        msg_part2 += "\n(ไม่มีการเคลื่อนไหว)"
-        msg_part3 += "\n(ไม่มีการเคลื่อนไหว)"
-
-    msg_part4 = "\n\n⚠️ แจ้งเตือน: ต่ำกว่าจุดสั่งซื้อ"
-    
-    if not inv_df.empty:
-        inv_agg = inv_df.groupby('medicine_id')['qty'].sum().reset_index()
-        df_stock = pd.merge(meds, inv_agg, left_on='id', right_on='medicine_id', how='left')
-        df_stock['qty'] = df_stock['qty'].fillna(0)
-    else:
-        df_stock = meds.copy()
-        df_stock['qty'] = 0
-        
-    df_stock['qty'] = pd.to_numeric(df_stock['qty'], errors='coerce').fillna(0)
-    df_stock['min_stock'] = pd.to_numeric(df_stock['min_stock'], errors='coerce').fillna(0)
-        
-    low_stock = df_stock[df_stock['qty'] <= df_stock['min_stock']]
-    low_total = len(low_stock)
-    low_drugs = len(low_stock[low_stock['category'].isin(['ยาในบัญชี', 'ยานอกบัญชี', 'เวชภัณฑ์ยา'])])
-    low_supplies = len(low_stock[low_stock['category'].isin(['เวชภัณฑ์/วัสดุ', 'เวชภัณฑ์ที่มิใช่ยา'])])
-
-    msg_part4 += f"\nรวมทั้งหมด {low_total} รายการ แบ่งเป็น:"
-    msg_part4 += f"\n💊 เวชภัณฑ์ยา จำนวน {low_drugs} รายการ"
-    msg_part4 += f"\n📦 เวชภัณฑ์ที่มิใช่ยา จำนวน {low_supplies} รายการ"
-
-    msg_part5 = "\n\n⏰ แจ้งเตือน: ใกล้หมดอายุ (<90 วัน)"
-    if not inv_df.empty:
-        inv_active = inv_df[inv_df['qty'] > 0].copy()
-        if not inv_active.empty:
-            inv_active['exp_date'] = pd.to_datetime(inv_active['exp_date'])
-            near_exp_raw = inv_active[inv_active['exp_date'] <= now_th.replace(tzinfo=None) + pd.Timedelta(days=90)]
-            if not near_exp_raw.empty:
-                near_exp = pd.merge(near_exp_raw, meds[['id', 'generic_name']], left_on='medicine_id', right_on='id', how='left')
-                msg_part5 += f" ({len(near_exp)} ล็อต)"
-                count_exp = 0
-                for _, row in near_exp.iterrows():
-                    if count_exp >= 10: break
-                    exp_str = row['exp_date'].strftime('%d/%m/%Y')
-                    msg_part5 += f"\n- {row['generic_name']} (Lot: {row['lot_no']})\n  เหลือ {int(row['qty'])} | หมด: {exp_str}"
-                    count_exp += 1
-                if len(near_exp) > 10: 
-                    msg_part5 += f"\n...และอื่นๆ อีก {len(near_exp)-10} ล็อต"
-            else: 
-                msg_part5 += "\n(ไม่มีรายการเสี่ยงหมดอายุ)"
-        else: 
-            msg_part5 += "\n(ไม่มีรายการเสี่ยงหมดอายุ)"
-    else: 
-        msg_part5 += "\n(ไม่มีข้อมูลสต๊อก)"
-
-    final_message = report_title + msg_part1 + msg_part2 + msg_part3 + msg_part4 + msg_part5
-    send_line_message(LINE_TOKEN, LINE_TARGET_ID, final_message)
+        result = {"error": str(e)}
+    finally:
+        # ส่งไม่สำเร็จจะคืน watermark เดิม รอบถัดไปจึงลองใหม่ (ภายในช่วง catch_up)
+        _rpc("report_job_finish", {"p_job": job, "p_slot": slot.date().isoformat(), "p_ok": ok, "p_previous": claim['previous'], "p_result": result})
+    _schedule["value"].setdefault('last', {})[job] = slot.date().isoformat() if ok else claim['previous']
+    print(f"{'✅' if ok else '❌'} {name}: รอบ {slot:%d/%m/%Y %H:%M} {json.dumps(result, ensure_ascii=False)}")
+    return ok
+
+def run_due(now=None):
+    now = now or datetime.datetime.now(TZ_TH)
+    schedule = load_schedule()
+    due = due_jobs(schedule, now)
+    if not due:
+        print(f"ยังไม่ถึงเวลาส่ง -> ปัจจุบัน: {now:%d/%m/%Y %H:%M}")
+        return []
+    return [name for name, slot in due if run_job(name, slot, schedule.get('settings') or {})]
+
+def check(now=None):
+    now = now or datetime.datetime.now(TZ_TH)
+    due = [name for name, _ in due_jobs(load_schedule(), now)]
+    print(f"งานที่ถึงเวลา: {', '.join(due) if due else '-'}")
+    if os.environ.get("GITHUB_OUTPUT"):
+        with open(os.environ["GITHUB_OUTPUT"], "a") as f: f.write(f"due={','.join(due)}\n")
+    return due
+
+def serve(interval=SERVE_INTERVAL):
+    print(f"⏱️ เริ่มตัวตั้งเวลารายงาน (ตรวจทุก {interval} วินาที)")
+    while True:
+        try: run_due()
+        except Exception as e: print(f"❌ ตรวจรอบไม่สำเร็จ: {e}")
+        time.sleep(interval)
 
 if __name__ == "__main__":
-    generate_and_send_report()
+    args = sys.argv[1:]
+    if "--check" in args: check()
+    elif "--serve" in args: serve()
+    elif "--run" in args:
+        name = args[args.index("--run") + 1]
+        schedule = load_schedule()
+        slot = datetime.datetime.now(TZ_TH)
+        sys.exit(0 if send(build_message(name, slot, schedule.get('settings') or {})) else "❌ ส่ง LINE ไม่สำเร็จ")
+    else: run_due()
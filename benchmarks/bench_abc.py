@@ -0,0 +1,74 @@
+import argparse
+import datetime
+import os
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from benchmarks.load_sessions import setup_database, drop_database, DB_NAME
+from pharmacy.abc import abc_table, USAGE_COLUMNS
+
+# --- วัดเวลาวิเคราะห์ ABC ทั้งปี: ดึงสรุปทีละเดือนแล้วรวมเอง (แบบ export CSV รายเดือนเดิม) เทียบกับ dispense_usage ครั้งเดียว ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_abc --meds 500 --rows 200000
+#   monthly = stock_month_valuation 12 ครั้ง (ตัวเดียวกับตารางมูลค่าในหน้าสรุปยอด) แล้ว concat + groupby ใน pandas
+#   range   = dispense_usage(ต้นช่วง, ปลายช่วง) ครั้งเดียว (migrations/014_abc_ven.sql)
+# ทั้งสองแบบจัดชั้น ABC ด้วย abc_table เหมือนกัน และต้องได้ชั้นตรงกันทุกรายการ
+
+def seed_ledger(conn, rows, days):
+    n_lots = conn.execute("select count(*) as n from inventory").fetchone()["n"]
+    # รายการเบิกจ่ายสุ่มกระจายทั้งช่วง + ราคาทุนต่อล็อต
+    conn.execute("update inventory set unit_cost = 1 + (id % 50)")
+    conn.execute("""
+        insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, created_at)
+        select i.medicine_id, 'DISPENSE', -(1 + g %% 20), i.lot_no, 'bench', 'bench', now() - (g %% %s) * interval '1 day' - (g %% 86400) * interval '1 second'
+        from generate_series(1, %s) g
+        join inventory i on i.id = 1 + (g * 7919) %% %s""", (days, rows, n_lots))
+    conn.execute("analyze transactions")
+
+def monthly(conn, start, end):
+    frames, month = [], start.replace(day=1)
+    while month <= end:
+        rows = conn.execute("select medicine_id, dispense_cost from stock_month_valuation(%s)", (month,)).fetchall()
+        frames.append(pd.DataFrame(rows, columns=["medicine_id", "dispense_cost"]))
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    df = pd.concat(frames).groupby("medicine_id", as_index=False)["dispense_cost"].sum()
+    return df.rename(columns={"dispense_cost": "dispense_value"}).assign(dispense_qty=0, uncosted_qty=0)
+
+def by_range(conn, start, end):
+    return pd.DataFrame(conn.execute("select * from dispense_usage(%s, %s)", (start, end)).fetchall(), columns=USAGE_COLUMNS)
+
+def main():
+    parser = argparse.ArgumentParser(description="ABC analysis over a year: month-by-month rollups vs one range query")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--meds", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=200000, help="จำนวนรายการเบิกจ่ายในสมุดบัญชี")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, meds = setup_database(args.dsn, args.meds, 3, 100000)
+    end = datetime.date.today()
+    # ช่วง 12 เดือนเต็ม (ต้นเดือนเมื่อ 11 เดือนก่อน ถึงวันนี้) ให้ผลรวมรายเดือนครอบคลุมช่วงเดียวกันพอดี
+    start = (end.replace(day=1) - datetime.timedelta(days=330)).replace(day=1)
+    rows, checks = [], []
+    try:
+        seed_ledger(conn, args.rows, (end - start).days)
+        catalog = pd.DataFrame({"id": meds, "generic_name": meds, "unit": "เม็ด", "category": "เวชภัณฑ์ยา", "drug_group": [f"G{i % 12}" for i in range(len(meds))]})
+        result = {}
+        for label, fn in (("monthly rollups x12", monthly), ("dispense_usage range", by_range)):
+            def run(fn=fn, label=label): result[label] = abc_table(fn(conn, start, end).astype({"dispense_value": float}), catalog)
+            t = measure(run, repeat=args.repeat)
+            rows.append({"path": label, "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"]})
+        a, b = (result[k].set_index("medicine_id") for k in ("monthly rollups x12", "dispense_usage range"))
+        checks.append({"medicines": len(b), "class_mismatch": int((a["abc"] != b.loc[a.index, "abc"]).sum()),
+                       "value_diff": float((a["dispense_value"] - b.loc[a.index, "dispense_value"]).abs().max())})
+        rows.append({"path": "speedup", "p50_ms": rows[0]["p50_ms"] / rows[1]["p50_ms"], "p95_ms": ""})
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report(f"ABC over {(end - start).days + 1} days ({args.rows:,} dispense rows, {args.meds:,} medicines, database {DB_NAME})", rows)
+    report("Same classes from both paths (ต้องเป็น 0)", checks)
+
+if __name__ == "__main__":
+    main()
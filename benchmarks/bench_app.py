@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.harness import measure, report
+
+# --- วัดเวลาเริ่มต้น (cold start) และเวลา rerun ของแต่ละหน้าผ่าน Streamlit AppTest ---
+# เปรียบเทียบกับเวอร์ชันเก่าได้ด้วย --baseline-ref (เช่น --baseline-ref a713731)
+# ถ้าต้องการวัดกับฐานข้อมูลจริง ให้ตั้ง SUPABASE_URL และ SUPABASE_KEY ก่อนรัน
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.abspath(SCRIPT)))
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_import = time.perf_counter() - t0
+
+def new_app():
+    at = AppTest.from_file(SCRIPT, default_timeout=120)
+    if os.environ.get("SUPABASE_URL"):
+        at.secrets["supabase"] = {"supabase_url": os.environ["SUPABASE_URL"], "supabase_key": os.environ.get("SUPABASE_KEY", "")}
+    if LOGGED_IN:
+        at.session_state["user"] = "benchmark"
+        at.session_state["role"] = "admin"
+        at.session_state["user_email"] = "bench@example.com"
+        at.session_state["full_name"] = "Benchmark"
+    return at
+
+at = new_app()
+t0 = time.perf_counter(); at.run(); t_first = time.perf_counter() - t0
+reruns = []
+for _ in range(REPEAT):
+    t0 = time.perf_counter(); at.run(); reruns.append(time.perf_counter() - t0)
+print(json.dumps({"import_s": t_import, "first_run_s": t_first, "reruns_s": reruns}))
+'''
+
+def run_child(script, logged_in, repeat):
+    code = CHILD.replace("SCRIPT", repr(script)).replace("LOGGED_IN", repr(logged_in)).replace("REPEAT", str(repeat))
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(script), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def export_baseline(ref):
+    tmp = tempfile.mkdtemp(prefix="bench_baseline_")
+    subprocess.run(f"git archive {ref} | tar -x -C {tmp}", shell=True, cwd=ROOT, check=True)
+    return os.path.join(tmp, "streamlit_app.py")
+
+def bench_script(label, script, repeat):
+    rows = []
+    for logged_in in (False, True):
+        res = run_child(script, logged_in, repeat)
+        reruns = sorted(r * 1000 for r in res["reruns_s"])
+        rows.append({"version": label, "state": "logged-in" if logged_in else "login page", "cold_start_ms": (res["import_s"] + res["first_run_s"]) * 1000, "rerun_p50_ms": reruns[len(reruns) // 2], "rerun_max_ms": reruns[-1]})
+    return rows
+
+def bench_imports():
+    # เวลา import โมดูลบริการแต่ละตัวใน process ใหม่ (ยืนยันว่าโมดูลหนักถูกแยกออกจากเส้นทางหลัก)
+    rows = []
+    for mod in ("pharmacy.db", "pharmacy.reports", "pharmacy.line"):
+        code = f"import time; t=time.perf_counter(); import {mod}; print(time.perf_counter()-t)"
+        stats = measure(lambda: subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, check=True), repeat=3, warmup=0)
+        rows.append({"module": mod, "cold_import_p50_ms": stats["p50_ms"]})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start and rerun latency of the Streamlit app")
+    parser.add_argument("--baseline-ref", help="git ref to compare against (e.g. a713731)")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = bench_script("current", os.path.join(ROOT, "streamlit_app.py"), args.repeat)
+    if args.baseline_ref: rows += bench_script(args.baseline_ref, export_baseline(args.baseline_ref), args.repeat)
+    report("Streamlit app: cold start / rerun", rows)
+    report("Service module cold import", bench_imports())
+
+if __name__ == "__main__":
+    main()
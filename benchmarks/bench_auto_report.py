@@ -0,0 +1,71 @@
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.harness import measure, report
+
+# --- วัด cold start ของ auto_report.py ในรอบที่ยังไม่ถึงเวลาส่ง (กรณีที่เกิดเกือบทุกชั่วโมงบน GitHub Actions) ---
+# รันสคริปต์ใน process ใหม่ทุกครั้ง โดยชี้ SUPABASE_URL ไปที่ PostgREST จำลองในเครื่อง (ตอบการตั้งค่าที่ยังไม่ถึงเวลาส่งเสมอ)
+# จึงวัดเฉพาะเวลาเริ่มโปรแกรม + import + อ่านการตั้งค่า ไม่รวมเวลาเครือข่ายจริง
+# เปรียบเทียบกับเวอร์ชันเก่าได้ด้วย --baseline-ref (เช่น --baseline-ref e2ec840)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class FakePostgrest(BaseHTTPRequestHandler):
+    def log_message(self, *args): pass
+
+    def _json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # เวอร์ชันเก่า: supabase.table("settings").select("*") -> วันส่งที่ไม่ใช่วันนี้
+    def do_GET(self):
+        self._json([{"id": 1, "report_day": datetime.date.today().day % 28 + 1, "report_hour": 10}])
+
+    # เวอร์ชันปัจจุบัน: rpc/report_schedule -> ทุกงานส่งรอบล่าสุดไปแล้ว
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        today = datetime.date.today().isoformat()
+        self._json({"settings": {"report_day": 1, "report_hour": 10}, "last": {"report_monthly": today, "report_weekly_expiry": today, "report_daily_low_stock": today}})
+
+def export_baseline(ref):
+    tmp = tempfile.mkdtemp(prefix="bench_baseline_")
+    subprocess.run(f"git archive {ref} | tar -x -C {tmp}", shell=True, cwd=ROOT, check=True)
+    return tmp
+
+def bench_noop(label, root, url, repeat):
+    env = dict(os.environ, SUPABASE_URL=url, SUPABASE_KEY="bench", LINE_BOT_TOKEN="", LINE_TARGET_ID="", GITHUB_OUTPUT="")
+    run = lambda: subprocess.run([sys.executable, "auto_report.py"], cwd=root, env=env, capture_output=True, check=True)
+    out = run().stdout.decode().strip().splitlines()
+    stats = measure(run, repeat=repeat)
+    # ru_maxrss ของ children คือค่าสูงสุดของทุก process ลูกที่รันไปแล้ว จึงวัดเวอร์ชันที่ใช้หน่วยความจำน้อยก่อน
+    rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {"version": label, "cold_start_p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"], "max_rss_mb_so_far": rss_mb, "output": out[-1] if out else ""}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the not-yet-due path of auto_report.py")
+    parser.add_argument("--baseline-ref", help="git ref to compare against (e.g. e2ec840)")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePostgrest)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    rows = [bench_noop("current", ROOT, url, args.repeat)]
+    if args.baseline_ref: rows.append(bench_noop(args.baseline_ref, export_baseline(args.baseline_ref), url, args.repeat))
+    server.shutdown()
+    report("auto_report.py: cold start of the not-yet-due path", rows)
+
+if __name__ == "__main__":
+    main()
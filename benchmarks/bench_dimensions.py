@@ -0,0 +1,70 @@
+import argparse
+import os
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from benchmarks.load_sessions import setup_database, drop_database, DB_NAME
+from pharmacy.dimensions import category_kind, kind_counts, group_names, CATEGORY_COLUMNS, GROUP_COLUMNS, DRUG, SUPPLY
+
+# --- วัดการแยกยา/มิใช่ยาและรายชื่อกลุ่มยา: เทียบข้อความแบบเดิม กับตารางมิติที่มีรหัส (migrations/018_medicine_dimensions.sql) ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_dimensions --meds 3000
+#   strings = ดึง category/drug_group ของยาทุกรายการ แล้ว .astype(str).str.strip().isin([...]) และหา unique ของกลุ่มยา (Dashboard + Master Data เดิม)
+#   keyed   = อ่านตารางมิติ (จำนวนรายการต่อรหัสนับไว้แล้ว) / map category_id -> kind สำหรับรายงานที่ต้องแยกทีละแถว
+
+LEGACY_DRUG = ['ยาในบัญชี', 'ยานอกบัญชี', 'เวชภัณฑ์ยา']
+LEGACY_SUPPLY = ['เวชภัณฑ์/วัสดุ', 'เวชภัณฑ์ที่มิใช่ยา']
+
+def seed(conn, groups):
+    # หมวดเดิมหลายแบบปนกัน (มีช่องว่างหัวท้ายบ้าง) และกลุ่มยา groups กลุ่ม ผ่าน trigger เหมือนบันทึกจากหน้า Master Data
+    conn.execute("""update medicines m set category = (array[' ยาในบัญชี', 'ยานอกบัญชี', 'เวชภัณฑ์ยา ', 'เวชภัณฑ์/วัสดุ', 'เวชภัณฑ์ที่มิใช่ยา'])[1 + abs(hashtext(m.id)) %% 5],
+                           drug_group = 'กลุ่มที่ ' || (abs(hashtext(m.id || 'g')) %% %s), is_active = abs(hashtext(m.id || 'a')) %% 10 <> 0""", (groups,))
+    conn.execute("analyze")
+
+def strings(conn):
+    meds = pd.DataFrame(conn.execute("select id, category, drug_group, is_active from medicines").fetchall())
+    active = meds[meds['is_active']]
+    cat = active['category'].astype(str).str.strip()
+    groups = sorted(g for g in meds['drug_group'].dropna().astype(str).str.strip().unique() if g and g != '-')
+    return {DRUG: int(cat.isin(LEGACY_DRUG).sum()), SUPPLY: int(cat.isin(LEGACY_SUPPLY).sum())}, groups
+
+def keyed(conn):
+    categories = pd.DataFrame(conn.execute(f"select {', '.join(CATEGORY_COLUMNS)} from medicine_categories").fetchall())
+    groups = pd.DataFrame(conn.execute(f"select {', '.join(GROUP_COLUMNS)} from drug_groups order by name").fetchall())
+    return kind_counts(categories), group_names(groups[groups['medicine_count'] > 0])
+
+def main():
+    parser = argparse.ArgumentParser(description="Category/drug-group classification: repeated string matching vs keyed dimension tables")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--meds", type=int, default=3000)
+    parser.add_argument("--groups", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, _ = setup_database(args.dsn, args.meds, 1, 100)
+    rows, checks = [], []
+    try:
+        seed(conn, args.groups)
+        out = {}
+        for label, fn in (("strings", strings), ("keyed", keyed)):
+            t = measure(lambda fn=fn, label=label: out.__setitem__(label, fn(conn)), repeat=args.repeat)
+            rows.append({"path": f"dashboard counts + group list ({label})", "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"]})
+        checks.append({"check": "counts", "strings": out["strings"][0], "keyed": out["keyed"][0], "ok": out["strings"][0] == out["keyed"][0]})
+        checks.append({"check": "groups", "strings": len(out["strings"][1]), "keyed": len(out["keyed"][1]), "ok": out["strings"][1] == out["keyed"][1]})
+
+        # แยกทีละแถว (รายงาน LINE): ข้อความ strip + isin เทียบกับ map ด้วยรหัส บนรายการยาที่โหลดมาแล้ว
+        meds = pd.DataFrame(conn.execute("select id, category, category_id from medicines").fetchall())
+        categories = pd.DataFrame(conn.execute(f"select {', '.join(CATEGORY_COLUMNS)} from medicine_categories").fetchall())
+        for label, fn in (("strings", lambda: meds['category'].astype(str).str.strip().isin(LEGACY_DRUG)), ("keyed", lambda: category_kind(meds, categories) == DRUG)):
+            t = measure(fn, repeat=args.repeat)
+            rows.append({"path": f"classify {len(meds):,} rows ({label})", "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"]})
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report(f"Category dimensions ({args.meds:,} medicines, {args.groups} drug groups, database {DB_NAME})", rows)
+    report("Same result from both paths (ok ต้องเป็น True)", checks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import time
+
+from benchmarks.harness import report
+from pharmacy.fefo import LotBook, allocate_fefo
+
+# --- วัด throughput ของการเบิกจ่ายแบบ batch ---
+# ส่วนที่ 1 (รันได้เสมอ): จัดสรร FEFO ในหน่วยความจำ
+# ส่วนที่ 2 (ถ้าตั้ง DATABASE_URL): บันทึกจริงลง Postgres ใน schema ชั่วคราว bench_dispense แล้วลบทิ้ง
+
+SCHEMA = "bench_dispense"
+
+def make_data(n_meds, lots_per_med, n_lines, seed=1):
+    rnd = random.Random(seed)
+    meds = [f"MED-{m:05d}" for m in range(n_meds)]
+    lots, lot_id = [], 1
+    for med in meds:
+        for l in range(lots_per_med):
+            lots.append({"id": lot_id, "medicine_id": med, "lot_no": f"L{lot_id}", "exp_date": f"20{27 + l % 3}-{1 + rnd.randrange(12):02d}-01", "qty": rnd.randint(500, 5000)})
+            lot_id += 1
+    lines = [{"key": f"HIS-{i}", "medicine_id": rnd.choice(meds), "qty": rnd.randint(1, 30)} for i in range(n_lines)]
+    return meds, lots, lines
+
+def bench_memory(meds, lots, lines):
+    t0 = time.perf_counter()
+    results = allocate_fefo(LotBook(lots), lines, set(meds))
+    elapsed = time.perf_counter() - t0
+    ok = sum(r['status'] == 'OK' for r in results)
+    return {"path": "in-memory FEFO", "lines": len(lines), "ok": ok, "seconds": elapsed, "lines_per_s": len(lines) / elapsed}
+
+def bench_postgres(meds, lots, lines, chunk_size):
+    from pharmacy.dispense_service import dispense_batch
+    from pharmacy.pg import connect, _id_types
+    conn = connect()
+    conn.execute(f"drop schema if exists {SCHEMA} cascade")
+    conn.execute(f"create schema {SCHEMA}")
+    conn.execute(f"set search_path to {SCHEMA}")
+    _id_types.clear()
+    conn.execute("create table medicines (id text primary key, generic_name text, unit text, is_active boolean default true)")
+    conn.execute("create table inventory (id bigserial primary key, medicine_id text references medicines(id), lot_no text, mfg_date date, exp_date date, qty integer, status text not null default 'ACTIVE')")
+    conn.execute("create table transactions (id bigserial primary key, medicine_id text, action_type text, qty_change integer, lot_no text, user_name text, note text, created_at timestamptz default now())")
+    conn.execute("create table dispense_requests (idempotency_key text primary key, result jsonb not null, created_at timestamptz not null default now())")
+    conn.execute("create index on inventory (medicine_id, exp_date) where qty > 0")
+    with conn.cursor() as cur:
+        with cur.copy("copy medicines (id, generic_name, unit) from stdin") as cp:
+            for m in meds: cp.write_row((m, m, "เม็ด"))
+        with cur.copy("copy inventory (id, medicine_id, lot_no, exp_date, qty) from stdin") as cp:
+            for l in lots: cp.write_row((l['id'], l['medicine_id'], l['lot_no'], l['exp_date'], l['qty']))
+    rows = []
+    try:
+        for label, batch in (("postgres first run", lines), ("postgres replay (idempotent)", lines)):
+            t0 = time.perf_counter()
+            results = dispense_batch(conn, batch, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - t0
+            rows.append({"path": label, "lines": len(batch), "ok": sum(r['status'] == 'OK' for r in results), "seconds": elapsed, "lines_per_s": len(batch) / elapsed})
+        neg = conn.execute("select count(*) as n from inventory where qty < 0").fetchone()['n']
+        rows.append({"path": "negative lots after run", "lines": neg, "ok": "", "seconds": 0.0, "lines_per_s": 0.0})
+    finally:
+        conn.execute(f"drop schema if exists {SCHEMA} cascade")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch FEFO dispensing")
+    parser.add_argument("--meds", type=int, default=1500)
+    parser.add_argument("--lots-per-med", type=int, default=4)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    meds, lots, lines = make_data(args.meds, args.lots_per_med, args.lines)
+    rows = [bench_memory(meds, lots, lines)]
+    if os.environ.get("DATABASE_URL"): rows += bench_postgres(meds, lots, lines, args.chunk_size)
+    else: print("(ข้ามการวัดกับ Postgres: ยังไม่ได้ตั้ง DATABASE_URL)")
+    report("Batch dispense throughput", rows)
+
+if __name__ == "__main__":
+    main()
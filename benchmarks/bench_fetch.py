@@ -0,0 +1,79 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.bench_frames import make_rows
+from benchmarks.harness import measure, report
+from pharmacy.fetch import read_csv_payload
+from pharmacy.frames import typed_frame, apply_schema, memory_mb
+
+# --- เทียบขนาดข้อมูลที่ส่งผ่านเครือข่ายและเวลาแปลงเป็น DataFrame: JSON select("*") เดิม กับ CSV เฉพาะคอลัมน์ ---
+# ส่วนที่ 1 (รันได้เสมอ): สร้าง payload แบบเดียวกับที่ PostgREST ส่งกลับมา (JSON และ CSV) จากข้อมูลสังเคราะห์
+# ส่วนที่ 2 (ถ้าตั้ง SUPABASE_URL และ SUPABASE_KEY): ดึงตาราง transactions จริงทั้งสองแบบ
+
+# คอลัมน์ที่หน้าแดชบอร์ด/สรุปยอดใช้จริง
+PROJECTED = ["medicine_id", "action_type", "qty_change", "created_at"]
+
+def json_payload(rows):
+    return json.dumps(rows, ensure_ascii=False).encode()
+
+def csv_payload(rows, columns):
+    # รูปแบบเดียวกับ CSV ของ PostgREST: NULL = ช่องว่าง, boolean = t/f, เวลาแบบข้อความของ Postgres
+    def cell(v):
+        if v is None: return ''
+        if isinstance(v, bool): return 't' if v else 'f'
+        return v.replace('T', ' ').replace('+00:00', '+00') if isinstance(v, str) and v[:4].isdigit() and 'T' in v else v
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator='\n')
+    w.writerow(columns)
+    for r in rows: w.writerow([cell(r[c]) for c in columns])
+    return buf.getvalue().encode()
+
+def decode_json(payload):
+    return typed_frame(json.loads(payload), "transactions")
+
+def decode_csv(payload, columns):
+    return apply_schema(read_csv_payload(payload.decode(), columns), "transactions")
+
+def bench_synthetic(n, repeat):
+    trans, _ = make_rows(n, 800, 20)
+    all_cols = list(trans[0].keys())
+    cases = [("JSON select(*) (เดิม)", json_payload(trans), decode_json),
+             ("CSV select(*)", csv_payload(trans, all_cols), lambda p: decode_csv(p, all_cols)),
+             (f"JSON select({len(PROJECTED)} cols)", json_payload([{c: r[c] for c in PROJECTED} for r in trans]), decode_json),
+             (f"CSV select({len(PROJECTED)} cols)", csv_payload(trans, PROJECTED), lambda p: decode_csv(p, PROJECTED))]
+    rows = []
+    for label, payload, decode in cases:
+        df = decode(payload)
+        rows.append(dict(path=label, rows=len(df), wire_kb=len(payload) / 1024, gzip_kb=len(gzip.compress(payload, 6)) / 1024, frame_mb=memory_mb(df),
+                         **{f"decode_{k}": v for k, v in measure(lambda: decode(payload), repeat=repeat).items() if k in ("p50_ms", "p95_ms")}))
+    report(f"Synthetic payloads ({n:,} transactions)", rows)
+
+def bench_live(repeat):
+    from supabase import create_client
+    from pharmacy.fetch import fetch_frame
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    def legacy(): return pd.DataFrame(client.table("transactions").select("*").order("created_at", desc=True).execute().data)
+    def projected(): return fetch_frame(client, "transactions", PROJECTED, order="created_at", desc=True)
+    report("Live Supabase transactions", [
+        dict(path="JSON select(*) (เดิม, ถูกตัดที่ max-rows)", rows=len(legacy()), **measure(legacy, repeat=repeat)),
+        dict(path="fetch_frame CSV projected (ทุกหน้า)", rows=len(projected()), **measure(projected, repeat=repeat)),
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs projected CSV fetch for PostgREST payloads")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench_synthetic(args.rows, args.repeat)
+    if os.environ.get("SUPABASE_URL") and os.environ.get("SUPABASE_KEY"): bench_live(args.repeat)
+    else: print("(ข้ามการวัดกับ Supabase จริง: ยังไม่ได้ตั้ง SUPABASE_URL / SUPABASE_KEY)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import datetime
+import random
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from pharmacy.frames import typed_frame, add_display_columns, memory_mb
+from pharmacy.utils import ACTION_TYPE_TH
+
+# --- วัดหน่วยความจำต่อ session ของ DataFrame ที่โหลดจาก Supabase: แบบเดิม (pd.DataFrame ตรงๆ) เทียบกับ typed_frame ---
+# ข้อมูลสังเคราะห์มีหน้าตาเหมือน response.data ของ supabase-py (list ของ dict, created_at เป็นข้อความ ISO)
+
+def make_rows(n_trans, n_meds, n_users, seed=1):
+    rnd = random.Random(seed)
+    start = datetime.datetime(2024, 10, 1, tzinfo=datetime.timezone.utc)
+    meds = [f"MED-{m:05d}" for m in range(n_meds)]
+    users = [f"staff{u}@phonbok.go.th" for u in range(n_users)]
+    trans = []
+    for i in range(n_trans):
+        action = rnd.choices(["DISPENSE", "RECEIVE", "EXPIRE"], [85, 14, 1])[0]
+        qty = rnd.randint(1, 60)
+        trans.append({"id": i + 1, "medicine_id": rnd.choice(meds), "action_type": action, "qty_change": qty if action == "RECEIVE" else -qty,
+                      "lot_no": f"LOT{rnd.randrange(n_meds * 4):06d}", "user_name": rnd.choice(users), "note": rnd.choice(["จ่ายหน้างาน", "เบิกจ่ายจาก HIS", ""]),
+                      "created_at": (start + datetime.timedelta(seconds=rnd.randrange(365 * 86400))).isoformat(), "ref_id": None, "entry_kind": None, "carry_forward": False})
+    inv = [{"id": i + 1, "medicine_id": meds[i % n_meds], "lot_no": f"LOT{i:06d}", "mfg_date": "2024-01-01", "exp_date": "2027-01-01",
+            "qty": rnd.randint(0, 5000), "status": "ACTIVE", "quarantined_qty": 0, "quarantined_at": None} for i in range(n_meds * 4)]
+    return trans, inv
+
+# ขั้นตอนเดิมที่แต่ละหน้าทำซ้ำทุก rerun
+def legacy_display(df):
+    df = df.copy()
+    df['created_at_dt'] = pd.to_datetime(df['created_at'], utc=True).dt.tz_convert('Asia/Bangkok')
+    df['ym'] = df['created_at_dt'].dt.strftime('%Y-%m')
+    df['created_at_str'] = df['created_at_dt'].dt.strftime('%d/%m/%Y %H:%M:%S')
+    df['action_type_th'] = df['action_type'].map(ACTION_TYPE_TH).fillna(df['action_type'])
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory of typed DataFrames built from Supabase payloads")
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--meds", type=int, default=800)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=20, help="จำนวน session ที่เปิดพร้อมกัน (ใช้ประมาณหน่วยความจำรวม)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    trans, inv = make_rows(args.transactions, args.meds, args.users)
+    rows = []
+    for table, data in (("transactions", trans), ("inventory", inv)):
+        legacy, typed = pd.DataFrame(data), typed_frame(data, table)
+        rows.append({"frame": table, "rows": len(data), "legacy_mb": memory_mb(legacy), "typed_mb": memory_mb(typed),
+                     "saving_pct": 100 * (1 - memory_mb(typed) / memory_mb(legacy)), f"saved_mb_x{args.sessions}_sessions": args.sessions * (memory_mb(legacy) - memory_mb(typed))})
+    legacy_view, typed_view = legacy_display(pd.DataFrame(trans)), add_display_columns(typed_frame(trans, "transactions"))
+    rows.append({"frame": "transactions + display columns", "rows": len(trans), "legacy_mb": memory_mb(legacy_view), "typed_mb": memory_mb(typed_view),
+                 "saving_pct": 100 * (1 - memory_mb(typed_view) / memory_mb(legacy_view)), f"saved_mb_x{args.sessions}_sessions": args.sessions * (memory_mb(legacy_view) - memory_mb(typed_view))})
+    report("Memory per session (deep)", rows)
+
+    # เวลาที่ใช้ต่อ rerun: สร้าง DataFrame + คอลัมน์แสดงผล
+    from pharmacy.db import with_display_columns
+    typed = typed_frame(trans, "transactions")
+    with_display_columns(typed)
+    report("Per-rerun build time", [
+        dict(path="legacy: DataFrame + parse/strftime every rerun", **measure(lambda: legacy_display(pd.DataFrame(trans)), repeat=args.repeat)),
+        dict(path="typed_frame + add_display_columns (uncached)", **measure(lambda: add_display_columns(typed_frame(trans, "transactions")), repeat=args.repeat)),
+        dict(path="typed_frame + with_display_columns (cache hit)", **measure(lambda: with_display_columns(typed_frame(trans, "transactions")), repeat=args.repeat)),
+    ])
+
+if __name__ == "__main__":
+    main()
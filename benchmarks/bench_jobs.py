@@ -0,0 +1,66 @@
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from pharmacy.jobs import JobRunner, content_key, ACTIVE
+from pharmacy.exports import requisition_file
+from pharmacy.frames import add_display_columns
+
+# --- วัดเวลาที่ script thread ของ Streamlit ค้างระหว่างสร้างไฟล์ส่งออก: สร้างเองใน rerun เทียบกับส่งเข้าคิวงาน (pharmacy/jobs.py) ---
+# รัน: python -m benchmarks.bench_jobs  (ไม่ต้องใช้ฐานข้อมูล ใช้ตารางสังเคราะห์)
+#   inline  = สร้างไฟล์ใน rerun (แบบเดิมใต้ st.spinner) ผู้ใช้รอทั้งหมด
+#   submit  = content_key + ส่งงานเข้าคิว (สิ่งที่ rerun ต้องรอจริง) ส่วน ready = เวลาจนไฟล์พร้อมให้ดาวน์โหลด
+#   cached  = สั่งซ้ำด้วยข้อมูลเดิม ได้งาน DONE ทันทีจากแคช
+
+def requisition(rows):
+    return pd.DataFrame({"ลำดับ": range(1, rows + 1), "รายการ": [f"Drug {i}" for i in range(rows)], "หน่วยนับ": "เม็ด",
+                         "คงเหลือ": [i % 500 for i in range(rows)], "จำนวนขอเบิก": [(i * 7) % 1000 for i in range(rows)]})
+
+def ledger(rows):
+    now = pd.Timestamp("2026-10-01", tz="UTC")
+    return pd.DataFrame({"id": range(rows), "medicine_id": [f"MED-{i % 800:04d}" for i in range(rows)], "action_type": ["DISPENSE", "RECEIVE"] * (rows // 2) + ["DISPENSE"] * (rows % 2),
+                         "qty_change": [(i % 20) - 10 for i in range(rows)], "lot_no": "L1", "user_name": "bench", "note": "",
+                         "created_at": now - pd.to_timedelta(range(rows), unit="min")})
+
+def ledger_csv(df):
+    return add_display_columns(df.copy()).to_csv(index=False).encode("utf-8-sig"), "history.csv", "text/csv"
+
+def wait(runner, job_id):
+    while runner.status(job_id)["status"] in ACTIVE: time.sleep(0.005)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export artifacts: inline in the script thread vs background job queue")
+    parser.add_argument("--requisition-rows", type=int, default=2000)
+    parser.add_argument("--ledger-rows", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    today = datetime.date(2026, 10, 19)
+    req, led = requisition(args.requisition_rows), ledger(args.ledger_rows)
+    builders = {f"requisition ({args.requisition_rows:,} rows)": ("requisition", (req, today), lambda: requisition_file(req, today)),
+                f"history CSV ({args.ledger_rows:,} rows)": ("history_csv", (led,), lambda: ledger_csv(led))}
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        runner = JobRunner(os.path.join(tmp, "jobs.sqlite"))
+        for label, (kind, inputs, build) in builders.items():
+            inline = measure(build, repeat=args.repeat)
+            submit, ready = [], []
+            for i in range(args.repeat):
+                t0 = time.perf_counter()
+                # ข้อมูลต่างกันทุกรอบ (ใส่ลำดับรอบใน key) ให้สร้างไฟล์ใหม่จริง
+                job_id = runner.submit(kind, content_key(kind, *inputs, i), build)
+                submit.append((time.perf_counter() - t0) * 1000)
+                wait(runner, job_id)
+                ready.append((time.perf_counter() - t0) * 1000)
+            cached = measure(lambda: runner.submit(kind, content_key(kind, *inputs, 0), build), repeat=args.repeat)
+            rows.append({"artifact": label, "inline_p50_ms": inline["p50_ms"], "submit_p50_ms": sorted(submit)[len(submit) // 2],
+                         "ready_p50_ms": sorted(ready)[len(ready) // 2], "cached_p50_ms": cached["p50_ms"]})
+    report("Script thread blocked per export (submit/cached = เวลาที่ rerun ต้องรอ)", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.harness import summarize, report
+from benchmarks.load_sessions import setup_database, drop_database, check_invariants, _connect, DB_NAME
+from pharmacy import outbox
+
+# --- ทดสอบคิวออฟไลน์ (pharmacy/outbox.py + migrations/013_submit_batch.sql) ด้วยการตัดเครือข่ายไปยัง Postgres ในเครื่องจริงๆ ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_offline --ops 300 --batch-sizes 1,50
+# เครื่องหน้างานต่อฐานข้อมูลผ่าน proxy TCP ในสคริปต์นี้ (หน่วงเวลา --latency-ms ต่อรอบเหมือนเน็ตจริง)
+#   1. ทำรายการรับเข้า/เบิกจ่าย/แก้ไขรายการตามปกติผ่าน submit_once
+#   2. ตัด proxy (ทุก connection ขาดทันที) -> คำสั่งถัดไปเข้าคิว SQLite ระหว่างนั้นอีกจุดบริการเบิกยาบางตัวจนหมด (ให้เกิดข้อขัดแย้ง)
+#   3. ปิด/เปิดไฟล์คิวใหม่ (คิวต้องไม่หาย) แล้วต่อ proxy กลับ
+#   4. ส่งก้อนแรกแต่ทิ้งผล (จำลองเน็ตหลุดก่อนได้รับผล) จากนั้น replay ทั้งคิว ก้อนแรกต้องได้ DUPLICATE ไม่บันทึกซ้ำ
+# ตรวจหลังรัน: ล็อตติดลบ, ยอดคลังไม่ตรงสมุดบัญชี, ยอดเบิกที่เครื่องหน้างานรู้ไม่ตรงสมุดบัญชี, คำสั่งที่หายหรือถูกบันทึกซ้ำ
+
+QTY_PER_LOT = 200
+# ยาที่อีกจุดบริการเบิกจนหมดระหว่างออฟไลน์
+DRAINED = 2
+
+# proxy ระหว่างเครื่องหน้างานกับ Postgres: cut() ปิดทุก connection และไม่รับใหม่, restore() เปิดพอร์ตเดิมอีกครั้ง
+class Link:
+    def __init__(self, upstream, latency_ms):
+        self.upstream, self.delay = upstream, latency_ms / 1000
+        self.socks, self.lock = [], threading.Lock()
+        self.port = None
+        self.restore()
+
+    def restore(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", self.port or 0))
+        self.port = self.listener.getsockname()[1]
+        self.listener.listen()
+        threading.Thread(target=self._accept, args=(self.listener,), daemon=True).start()
+
+    def cut(self):
+        with self.lock:
+            for s in [self.listener] + self.socks:
+                try: s.shutdown(socket.SHUT_RDWR)
+                except OSError: pass
+                s.close()
+            self.socks = []
+
+    def _accept(self, listener):
+        while True:
+            try: client, _ = listener.accept()
+            except OSError: return
+            server = socket.socket(socket.AF_UNIX if isinstance(self.upstream, str) else socket.AF_INET, socket.SOCK_STREAM)
+            server.connect(self.upstream)
+            with self.lock: self.socks += [client, server]
+            threading.Thread(target=self._pump, args=(client, server, 0), daemon=True).start()
+            threading.Thread(target=self._pump, args=(server, client, self.delay), daemon=True).start()
+
+    @staticmethod
+    def _pump(src, dst, delay):
+        try:
+            while data := src.recv(65536):
+                if delay: time.sleep(delay)
+                dst.sendall(data)
+        except OSError: pass
+
+def _upstream(dsn):
+    from psycopg.conninfo import conninfo_to_dict
+    info = conninfo_to_dict(dsn)
+    host, port = info.get("host") or "/tmp", int(info.get("port") or 5432)
+    return os.path.join(host, f".s.PGSQL.{port}") if host.startswith("/") else (host, port)
+
+def _command(rng, meds, state):
+    r = rng.random()
+    if r < 0.2:
+        state["n"] += 1
+        med = rng.choice(meds)
+        return "receive_lots", {"p_lines": [{"medicine_id": med, "lot_no": f"OFF-{state['n']}", "exp_date": "2030-01-01", "qty": 20, "unit_cost": 1.0}], "p_user_name": "front", "p_note": "offline bench"}, None, 0
+    if r < 0.3:
+        # แก้ยอดยกมาของล็อตแรกเพิ่มทีละ 1 (effect = ผลต่อยอดที่หน้าประวัติส่งมาตอนเข้าคิว)
+        med = rng.choice(meds)
+        state["amend"][med] += 1
+        return "ledger_amend", {"p_trans_id": state["initial"][med], "p_new_qty_change": state["amend"][med], "p_note": "offline bench", "p_user_name": "front"}, [{"medicine_id": med, "lot_no": f"{med}-L0", "qty": 1}], 0
+    qty = rng.randint(1, 15)
+    return "dispense_fefo", {"p_lines": [{"medicine_id": rng.choice(meds), "qty": qty}], "p_user_name": "front", "p_note": "offline bench"}, None, qty
+
+def _lots(conn, meds=None):
+    rows = conn.execute("select id, medicine_id, lot_no, exp_date::text as exp_date, qty from inventory where qty > 0 and status = 'ACTIVE' and exp_date >= current_date").fetchall()
+    return [r for r in rows if meds is None or r["medicine_id"] in meds]
+
+def run(dsn, batch_size, args):
+    import pandas as pd
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+    direct, meds = setup_database(dsn, args.meds, 3, QTY_PER_LOT)
+    state = {"n": 0, "amend": {m: QTY_PER_LOT for m in meds},
+             "initial": {r["medicine_id"]: str(r["id"]) for r in direct.execute("select id, medicine_id from transactions where action_type = 'INITIAL' and lot_no like '%-L0'")}}
+    link = Link(_upstream(dsn), args.latency_ms)
+    front_dsn = make_conninfo(dsn, host="127.0.0.1", port=link.port, dbname=DB_NAME, connect_timeout=2)
+    path = os.path.join(tempfile.mkdtemp(), "outbox.sqlite")
+    box = outbox.open_outbox(path)
+    front = {"conn": None}
+
+    def client():
+        if front["conn"] is None: front["conn"] = _connect(front_dsn)
+        return front["conn"]
+
+    def send(batch):
+        try: return client().execute("select submit_batch(%s::jsonb) as r", (json.dumps(batch),)).fetchone()["r"]
+        except psycopg.OperationalError: front["conn"] = None; raise
+
+    rng = random.Random(args.seed)
+    kill_at, restore_at = args.ops // 3, 2 * args.ops // 3
+    dispense_qty, online_ms, other_dispensed = {}, [], 0
+    stats = {"online_ok": 0, "online_rejected": 0, "queued": 0}
+    try:
+        for i in range(args.ops):
+            if i == kill_at:
+                mirror = pd.DataFrame(_lots(direct))
+                link.cut()
+            if kill_at <= i < restore_at and i % 10 == 0:
+                # อีกจุดบริการ (ต่อฐานข้อมูลได้ตามปกติ) เบิกยา DRAINED ตัวแรกจนหมด
+                for m in meds[:DRAINED]:
+                    left = direct.execute("select coalesce(sum(qty), 0) as q from inventory where medicine_id = %s and qty > 0 and status = 'ACTIVE' and exp_date >= current_date", (m,)).fetchone()["q"]
+                    if left:
+                        direct.execute("select dispense_fefo(%s::jsonb, 'other', 'other station')", (json.dumps([{"medicine_id": m, "qty": int(left)}]),))
+                        other_dispensed += int(left)
+            if i == restore_at:
+                provisional = outbox.provisional_lots(mirror, outbox.commands(box, outbox.PENDING))
+                box.close()
+                box = outbox.open_outbox(path)
+                link.restore()
+                pending = outbox.commands(box, outbox.PENDING)
+                # ส่งก้อนแรกสำเร็จแต่ไม่ได้รับผล
+                send([{"token": c["token"], "action": c["action"], "params": c["params"]} for c in pending[:batch_size]])
+                t0 = time.perf_counter()
+                replayed = outbox.replay(box, send, batch_size)
+                replay_s = time.perf_counter() - t0
+                # ยอดชั่วคราวที่เครื่องหน้างานเห็นตอนออฟไลน์ ต้องตรงกับยอดจริงหลัง replay สำหรับยาที่ไม่มีใครแตะระหว่างนั้น
+                untouched = set(meds[DRAINED:])
+                server = pd.DataFrame(_lots(direct, untouched))
+                provisional = provisional[provisional["medicine_id"].isin(untouched)]
+                diff = provisional.groupby("medicine_id")["qty"].sum().sub(server.groupby("medicine_id")["qty"].sum(), fill_value=0)
+            action, params, effect, qty = _command(rng, meds, state)
+            token = str(uuid.uuid4())
+            if qty: dispense_qty[token] = qty
+            # คิวยังค้างอยู่ -> ต่อท้ายคิวเพื่อรักษาลำดับคำสั่ง
+            if outbox.counts(box).get(outbox.PENDING):
+                outbox.enqueue(box, action, params, token, effect); stats["queued"] += 1
+                continue
+            t0 = time.perf_counter()
+            try:
+                client().execute("select submit_once(%s, %s, %s::jsonb)", (token, action, json.dumps(params)))
+                online_ms.append((time.perf_counter() - t0) * 1000); stats["online_ok"] += 1
+            except psycopg.OperationalError:
+                front["conn"] = None
+                outbox.enqueue(box, action, params, token, effect); stats["queued"] += 1
+            except psycopg.Error:
+                dispense_qty.pop(token, None); stats["online_rejected"] += 1
+        if outbox.counts(box).get(outbox.PENDING): outbox.replay(box, send, batch_size)
+
+        queued = outbox.commands(box)
+        stored = {str(r["token"]) for r in direct.execute("select token from form_submissions").fetchall()}
+        for c in queued:
+            if c["status"] != outbox.APPLIED: dispense_qty.pop(c["token"], None)
+        lost_or_doubled = sum((c["status"] == outbox.APPLIED) != (c["token"] in stored) for c in queued)
+        invariants = check_invariants(direct, sum(dispense_qty.values()) + other_dispensed)
+    finally:
+        link.cut()
+        box.close()
+        direct.close()
+        if not args.keep: drop_database(dsn)
+    conflicts = [c for c in queued if c["status"] == outbox.CONFLICT]
+    run_row = dict(batch_size=batch_size, online_ok=stats["online_ok"], online_rejected=stats["online_rejected"], queued=stats["queued"], replayed=sum(replayed[k] for k in ("applied", "duplicate", "conflict")),
+                   batches=replayed["batches"], replay_s=replay_s, replay_cmd_per_s=sum(replayed[k] for k in ("applied", "duplicate", "conflict")) / replay_s, online_p50_ms=summarize(online_ms)["p50_ms"])
+    check_row = dict(batch_size=batch_size, duplicate_on_resend=replayed["duplicate"], conflicts=len(conflicts), conflicts_not_stock=sum(not outbox.is_conflict(c["error"]) for c in conflicts),
+                     lost_or_doubled=lost_or_doubled, provisional_mismatch_meds=int((diff != 0).sum()), **invariants)
+    return run_row, check_row
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline write-ahead queue: cut the link to a local Postgres, queue, then replay in batches")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--ops", type=int, default=300)
+    parser.add_argument("--meds", type=int, default=6)
+    parser.add_argument("--batch-sizes", default=f"1,{outbox.DEFAULT_BATCH_SIZE}", help="ขนาดก้อนที่ใช้ replay คั่นด้วยจุลภาค (รันแยกกันทีละค่า)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="หน่วงเวลาต่อรอบของ proxy (จำลองเน็ตระหว่างเครื่องหน้างานกับเซิร์ฟเวอร์)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    runs, checks = [], []
+    for size in [int(s) for s in args.batch_sizes.split(",")]:
+        r, c = run(args.dsn, size, args)
+        runs.append(r); checks.append(c)
+    report("Replay after reconnect", runs)
+    report("Invariants (ต้องเป็น 0 ยกเว้น duplicate_on_resend ≤ ขนาดก้อนแรก, conflicts และยอดเบิก)", checks)
+    if any(c["lost_or_doubled"] or c["negative_lots"] or c["ledger_inventory_mismatch_lots"] or c["dispensed_diff"] or c["conflicts_not_stock"] or c["provisional_mismatch_meds"] for c in checks): raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
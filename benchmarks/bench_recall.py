@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from benchmarks.load_sessions import setup_database, drop_database, DB_NAME
+from benchmarks.check_query_plans import seed
+from pharmacy.fetch import PAGE_SIZE
+from pharmacy.frames import TRANSACTION_COLUMNS
+from pharmacy.fefo import LotBook, allocate_fefo
+from pharmacy.dispense_service import StaleLots, load_lots, _commit_chunk, dispense_batch
+
+# --- วัดเวลาตามรอย Lot บนสมุดบัญชีหลายล้านแถว: ดึงประวัติทั้งหมดมากรองเอง เทียบกับค้นด้วยดัชนี (migrations/016, 017) ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_recall --rows 2000000
+#   history = ดึงทุกแถวแบบหน้าประวัติ แล้วกรองเลข Lot ใน pandas (วิธีเดิม: เลื่อนหาในหน้าประวัติ)
+#   trace   = คำสั่งเดียวกับที่ PostgREST สร้างจาก get_lot_trace/get_lot_stock (lot_no in (...) order by created_at, id แบ่งหน้า)
+# และวัดการระงับล็อต (lot_recall) แล้วตรวจว่า dispense_fefo ไม่ตัดจ่ายล็อตที่ถูกระงับ
+# รวมถึง batch จาก HIS (dispense_service) ที่โหลดล็อตไว้ก่อนระงับ: ก้อนที่บันทึกหลังระงับต้องจัดสรรใหม่ ไม่ตัดล็อตที่ถูกระงับ
+
+def history_scan(conn, lots):
+    rows = conn.execute(f"select {', '.join(TRANSACTION_COLUMNS)} from transactions order by created_at desc, id").fetchall()
+    df = pd.DataFrame(rows, columns=TRANSACTION_COLUMNS)
+    return df[df['lot_no'].isin(lots)], len(rows)
+
+def trace(conn, lots):
+    pages, offset = [], 0
+    while True:
+        page = conn.execute(f"select {', '.join(TRANSACTION_COLUMNS)} from transactions where lot_no = any(%s) order by created_at, id limit %s offset %s",
+                            (list(lots), PAGE_SIZE, offset)).fetchall()
+        pages.extend(page)
+        if len(page) < PAGE_SIZE: break
+        offset += PAGE_SIZE
+    stock = conn.execute("select id, medicine_id, lot_no, exp_date, qty, quarantined_qty, status from inventory where lot_no = any(%s) order by id", (list(lots),)).fetchall()
+    return pd.DataFrame(pages, columns=TRANSACTION_COLUMNS), len(pages) + len(stock)
+
+def block(conn, lots):
+    with conn.transaction(force_rollback=True):
+        conn.execute("select lot_recall(%s, null, 'bench', true, 'bench')", (list(lots),))
+
+def main():
+    parser = argparse.ArgumentParser(description="Lot trace on a multi-million-row ledger: full history scan vs indexed lot lookup")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--meds", type=int, default=500)
+    parser.add_argument("--lots", type=int, default=24, help="จำนวนล็อตต่อยา")
+    parser.add_argument("--rows", type=int, default=2000000, help="จำนวนรายการในสมุดบัญชี")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, meds = setup_database(args.dsn, args.meds, args.lots, 100000)
+    rows, checks = [], []
+    try:
+        seed(conn, args.rows, 1095, 10)
+        one = [f"{meds[len(meds) // 2]}-L3"]
+        many = [f"{m}-L3" for m in meds[:10]]
+        out = {}
+        old = measure(lambda: out.__setitem__("history", history_scan(conn, one)), repeat=1)
+        rows.append({"path": "history scan (1 lot)", "rows_transferred": out["history"][1], "p50_ms": old["p50_ms"], "p95_ms": old["p95_ms"]})
+        for label, lots in (("trace 1 lot", one), ("trace 10 lots", many)):
+            t = measure(lambda lots=lots: out.__setitem__(label, trace(conn, lots)), repeat=args.repeat)
+            rows.append({"path": label, "rows_transferred": out[label][1], "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"]})
+        t = measure(lambda: block(conn, many), repeat=args.repeat)
+        rows.append({"path": "lot_recall block 10 lots", "rows_transferred": "", "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"]})
+        checks.append({"check": "trace = history scan", "ok": sorted(out["history"][0]['id']) == sorted(out["trace 1 lot"][0]['id'])})
+
+        # ระงับล็อตที่จะหมดอายุก่อน (FEFO จะเลือกล็อตนี้ก่อนถ้าไม่ถูกระงับ) แล้วเบิกยาตัวเดียวกัน
+        med = meds[0]
+        first = conn.execute("select lot_no from inventory where medicine_id = %s and status = 'ACTIVE' and qty > 0 and exp_date >= current_date order by exp_date, id limit 1", (med,)).fetchone()["lot_no"]
+        conn.execute("select lot_recall(%s, %s, 'bench', true, 'bench')", ([first], med))
+        alloc = conn.execute("select dispense_fefo(%s::jsonb, 'bench', 'bench') as r", (json.dumps([{"medicine_id": med, "qty": 5}]),)).fetchone()["r"]["allocations"]
+        checks.append({"check": f"dispense_fefo skips recalled lot {first}", "ok": all(a["lot_no"] != first for a in alloc)})
+        # ระงับระหว่าง load_lots กับ _commit_chunk ของ dispense_service
+        med2 = meds[1]
+        line = {"key": f"bench-recall-{med2}", "medicine_id": med2, "qty": 5, "user_name": "bench", "note": "bench"}
+        allocated = allocate_fefo(LotBook(load_lots(conn, {med2})), [line], {med2})
+        held = allocated[0]["allocations"][0]
+        conn.execute("select lot_recall(%s, %s, 'bench', true, 'bench')", ([held["lot_no"]], med2))
+        before = conn.execute("select qty from inventory where id = %s", (held["inventory_id"],)).fetchone()["qty"]
+        try: stale = not _commit_chunk(conn, [(line, allocated[0])])
+        except StaleLots: stale = True
+        after = conn.execute("select qty from inventory where id = %s", (held["inventory_id"],)).fetchone()["qty"]
+        checks.append({"check": f"dispense_service commit rejects lot {held['lot_no']} recalled after load_lots", "ok": stale and before == after})
+        result = dispense_batch(conn, [line])[0]
+        checks.append({"check": "dispense_batch re-allocates around recalled lot", "ok": result["status"] == "OK" and all(a["lot_no"] != held["lot_no"] for a in result["allocations"])})
+        conn.execute("insert into inventory (medicine_id, lot_no, exp_date, qty) values (%s, %s, current_date + 365, 10)", (med, first))
+        checks.append({"check": "re-received recalled lot is held", "ok": conn.execute("select bool_and(status = 'RECALLED') as ok from inventory where lot_no = %s", (first,)).fetchone()["ok"]})
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report(f"Lot trace ({args.rows:,} ledger rows, {args.meds:,} medicines x {args.lots} lots, database {DB_NAME})", rows)
+    report("Checks (ok ต้องเป็น True)", checks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import datetime
+import random
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from pharmacy.receive_grid import empty_grid, validate_grid, receive_payload, parse_dates
+
+# --- วัดเวลาตรวจใบส่งของในโหมดตาราง (pharmacy/receive_grid.py) ซึ่งรันทุก rerun ระหว่างกรอก/วางข้อมูล ---
+# รัน: python -m benchmarks.bench_receive_grid  (ไม่ต้องใช้ฐานข้อมูล)
+#   vectorized = validate_grid ทั้งใบครั้งเดียว
+#   per-row    = ตรวจเงื่อนไขเดียวกันทีละแถวด้วย Python (แบบที่ฟอร์มเดิมทำกับ widget ทีละชุด)
+
+def make_grid(n_rows, meds, seed=1):
+    rnd = random.Random(seed)
+    grid = empty_grid(n_rows)
+    for i in range(n_rows):
+        med = rnd.choice(meds)
+        exp = datetime.date(2027, 1, 1) + datetime.timedelta(days=rnd.randrange(900))
+        grid.iloc[i] = [med, f"L{i}", "01/01/2569", f"{exp.day}/{exp.month}/{exp.year + 543}", f"{rnd.randint(1, 5000):,}", str(rnd.randint(1, 200) / 4)]
+    return grid
+
+def per_row(grid, meds, stock_lots, today):
+    ids = {m.lower(): m for m in meds}
+    stock = {(r['medicine_id'], str(r['lot_no']).lower()): pd.Timestamp(r['exp_date']) for r in stock_lots.to_dict('records')}
+    seen, out = {}, []
+    for r in grid.to_dict('records'):
+        med = ids.get(str(r['medicine'] or '').strip().lower())
+        mfg, exp = parse_dates(pd.Series([r['mfg_date']]))[0], parse_dates(pd.Series([r['exp_date']]))[0]
+        qty = pd.to_numeric(str(r['qty']).replace(',', ''), errors='coerce')
+        problems = [p for p, bad in (("unknown", med is None), ("no_exp", pd.isna(exp)), ("expired", exp < pd.Timestamp(today)),
+                                     ("exp_before_mfg", pd.notna(mfg) and exp <= mfg), ("bad_qty", pd.isna(qty) or qty <= 0),
+                                     ("dup_in_stock", (med, r['lot_no'].lower()) in stock and stock[(med, r['lot_no'].lower())] != exp)) if bad]
+        key = (med, r['lot_no'].lower())
+        if key in seen: problems.append("dup_in_sheet")
+        seen[key] = True
+        out.append(problems)
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive grid validation: vectorized vs per-row")
+    parser.add_argument("--meds", type=int, default=800)
+    parser.add_argument("--rows", default="20,100,500,2000", help="จำนวนบรรทัดในใบส่งของ คั่นด้วยจุลภาค")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    meds = [f"MED-{m:04d}" for m in range(args.meds)]
+    catalog = pd.DataFrame({"id": meds, "generic_name": [f"Drug {m}" for m in meds], "unit": "เม็ด"})
+    stock_lots = pd.DataFrame({"medicine_id": meds, "lot_no": "L0", "exp_date": "2028-01-01"})
+    today = datetime.date(2026, 10, 19)
+    rows = []
+    for n in [int(x) for x in args.rows.split(",")]:
+        grid = make_grid(n, meds)
+        vec = measure(lambda: receive_payload(validate_grid(grid, catalog, stock_lots, today)), repeat=args.repeat)
+        loop = measure(lambda: per_row(grid, meds, stock_lots, today), repeat=args.repeat)
+        rows.append({"rows": n, "vectorized_p50_ms": vec["p50_ms"], "per_row_p50_ms": loop["p50_ms"], "speedup": loop["p50_ms"] / vec["p50_ms"]})
+    report("Validate a supplier invoice on every rerun", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import io
+import os
+import zipfile
+import argparse
+import datetime
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from benchmarks.load_sessions import setup_database, drop_database, DB_NAME
+from benchmarks.check_query_plans import seed
+from pharmacy import stock_cards
+from pharmacy.frames import TRANSACTION_COLUMNS, apply_schema, add_display_columns
+from pharmacy.ledger import fold_ledger
+
+# --- วัดการสร้าง Stock Card ของยาทุกรายการ: เลือกทีละรายการแบบหน้า Stock Card เทียบกับชุดเดียว (pharmacy/stock_cards.py) ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_stock_cards --meds 1500 --rows 1000000 --workers 4
+#   one-by-one = ต่อรายการยา: ดึงประวัติทั้งหมดของยา + ล็อตของยา (2 query) แล้ว fold_ledger + cumsum + จัดรูปแบบเป็น CSV (งานของหน้า Stock Card)
+#   batch      = stock_cards.generate: ยอดยกมาคำสั่งเดียว + อ่านสมุดบัญชีทีละ --batch รายการยา + จัดรูปแบบในพูล --workers โปรเซส
+# ตรวจว่ายอดคงเหลือสุดท้ายของทุกรายการตรงกับ one-by-one และกับ stock_as_of ณ สิ้นวันสุดท้าย (ทั้งช่วงเต็มและช่วงที่มียอดยกมา)
+
+def one_by_one(conn, meds):
+    closing = {}
+    for med in meds:
+        rows = conn.execute(f"select {', '.join(TRANSACTION_COLUMNS)} from transactions where medicine_id = %s order by created_at, id", (med,)).fetchall()
+        lots = pd.DataFrame(conn.execute("select lot_no, exp_date, qty from inventory where medicine_id = %s", (med,)).fetchall(), columns=['lot_no', 'exp_date', 'qty'])
+        df = fold_ledger(apply_schema(pd.DataFrame(rows, columns=TRANSACTION_COLUMNS), "transactions"))
+        if df.empty:
+            closing[med] = 0
+            continue
+        df = df.merge(lots.drop_duplicates('lot_no')[['lot_no', 'exp_date']], on='lot_no', how='left').sort_values('created_at')
+        df['running_balance'] = df['qty_change'].cumsum()
+        df = add_display_columns(df, '%d/%m/%Y %H:%M')
+        df[['created_at_str', 'action_type_th', 'lot_no', 'exp_date', 'qty_change', 'running_balance', 'user_name', 'note']].to_csv(index=False)
+        closing[med] = int(df['running_balance'].iloc[-1])
+    return closing
+
+def batch(conn, meds, date_from, date_to, workers, batch_size, fmt='zip'):
+    buffer, ticks = io.BytesIO(), []
+    result = stock_cards.generate(meds, lambda at: stock_cards.pg_opening(conn, at), lambda ids, start, end: stock_cards.pg_movements(conn, ids, start, end),
+                                  stock_cards.pg_lots(conn), date_from, date_to, buffer, fmt=fmt, workers=workers, batch_size=batch_size,
+                                  progress=lambda done, total: ticks.append(done))
+    return result, buffer.getvalue(), ticks
+
+def closing_from_zip(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        summary = pd.read_csv(z.open('_สรุปทุกรายการ.csv'), dtype={'รหัสยา': str})
+    return dict(zip(summary['รหัสยา'], summary['คงเหลือ'].astype(int)))
+
+def stock_as_of(conn, date_to):
+    _, end = stock_cards.day_bounds(date_to, date_to)
+    return {r['medicine_id']: int(r['qty']) for r in conn.execute("select medicine_id, sum(qty)::bigint as qty from stock_as_of(%s) group by medicine_id", (end,)).fetchall()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit stock cards for every medicine: one item at a time vs one batched pass")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--meds", type=int, default=1500)
+    parser.add_argument("--lots", type=int, default=4, help="จำนวนล็อตต่อยา")
+    parser.add_argument("--rows", type=int, default=1000000, help="จำนวนรายการในสมุดบัญชี")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=stock_cards.DEFAULT_WORKERS)
+    parser.add_argument("--batch", type=int, default=stock_cards.BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, med_ids = setup_database(args.dsn, args.meds, args.lots, 100000)
+    rows, checks = [], []
+    try:
+        seed(conn, args.rows, args.days, 10)
+        meds = pd.DataFrame(conn.execute("select id, generic_name, unit from medicines where is_active").fetchall(), columns=['id', 'generic_name', 'unit'])
+        today = datetime.date.today()
+        full_from, part_from = today - datetime.timedelta(days=args.days + 7), today - datetime.timedelta(days=args.days // 4)
+        out = {}
+        t = measure(lambda: out.__setitem__("one", one_by_one(conn, meds['id'].tolist())), repeat=1, warmup=0)
+        rows.append({"path": f"one-by-one ({len(meds):,} x 2 queries)", "medicines": len(meds), "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"], "size_kb": ""})
+        for label, workers in (("batch, 1 worker", 1), (f"batch, {args.workers} workers", args.workers)):
+            t = measure(lambda workers=workers, label=label: out.__setitem__(label, batch(conn, meds, full_from, today, workers, args.batch)), repeat=args.repeat, warmup=0)
+            rows.append({"path": label, "medicines": out[label][0]["medicines"], "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"], "size_kb": round(len(out[label][1]) / 1024)})
+        full = out[f"batch, {args.workers} workers"]
+        as_of = stock_as_of(conn, today)
+        closing = closing_from_zip(full[1])
+        checks.append({"check": "closing = one-by-one (full history)", "ok": all(closing[m] == out["one"][m] for m in meds['id'])})
+        checks.append({"check": "closing = stock_as_of (full history)", "ok": all(closing[m] == as_of.get(m, 0) for m in meds['id'])})
+        checks.append({"check": "one card per medicine + summary", "ok": len(zipfile.ZipFile(io.BytesIO(full[1])).namelist()) == len(meds) + 1})
+        checks.append({"check": "progress reaches total", "ok": full[2][-1] == len(meds) and full[2] == sorted(full[2])})
+        part = batch(conn, meds, part_from, today, args.workers, args.batch)
+        checks.append({"check": f"closing = stock_as_of (from {part_from}, opening + VOIDs of older rows)", "ok": all(v == as_of.get(m, 0) for m, v in closing_from_zip(part[1]).items())})
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report(f"Stock cards ({args.rows:,} ledger rows, {args.meds:,} medicines, batch {args.batch}, database {DB_NAME}, {os.cpu_count()} CPUs)", rows)
+    report("Checks (ok ต้องเป็น True)", checks)
+
+if __name__ == "__main__":
+    main()
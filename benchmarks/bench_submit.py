@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+
+from benchmarks.harness import measure, report
+from benchmarks.load_sessions import setup_database, drop_database, _connect, DB_NAME
+
+# --- วัดเวลาที่ปุ่มบันทึกบล็อก session ต่อหนึ่งครั้ง ก่อน/หลังเปลี่ยนเป็น submit_once + toast (migrations/012_form_submissions.sql) ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_submit
+#   before = เรียกฟังก์ชันตรงๆ แล้ว time.sleep ตามที่หน้าเว็บเดิมหน่วงไว้ก่อน st.rerun()
+#   after  = เรียกผ่าน submit_once พร้อม token (ไม่มีการหน่วง)
+# และจำลองดับเบิลคลิก: ส่ง token เดียวกันสองครั้งพร้อมกัน นับจำนวนครั้งที่ถูกบันทึกจริง (ก่อน = 2, หลัง = 1)
+
+# เวลาหน่วงเดิมของแต่ละหน้า (วินาที)
+OLD_SLEEP = {"receive_lots": 1.5, "dispense_fefo": 2.0, "ledger_amend": 1.5}
+QTY_PER_LOT = 100000
+
+def _params(action, med, user, state):
+    if action == "receive_lots":
+        state["n"] += 1
+        return {"p_lines": [{"medicine_id": med, "lot_no": f"BENCH-{state['n']}", "exp_date": "2030-01-01", "qty": 10, "unit_cost": 1.5}], "p_user_name": user, "p_note": "bench"}
+    if action == "dispense_fefo": return {"p_lines": [{"medicine_id": med, "qty": 1}], "p_user_name": user, "p_note": "bench"}
+    # แก้จำนวนยอดยกมาเพิ่มขึ้นทีละ 1 (ยอดเดิม QTY_PER_LOT) ให้ล็อตไม่ติดลบ
+    state["amend"] = state.get("amend", QTY_PER_LOT) + 1
+    return {"p_trans_id": state["trans_id"], "p_new_qty_change": state["amend"], "p_note": "bench", "p_user_name": user}
+
+def _direct(conn, action, params):
+    if action == "ledger_amend":
+        return conn.execute("select ledger_amend(%s, %s, %s, %s) as r", (params["p_trans_id"], params["p_new_qty_change"], params["p_note"], params["p_user_name"])).fetchone()["r"]
+    return conn.execute(f"select {action}(%s::jsonb, %s, %s) as r", (json.dumps(params["p_lines"]), params["p_user_name"], params["p_note"])).fetchone()["r"]
+
+def _submit(conn, action, params, token=None):
+    return conn.execute("select submit_once(%s, %s, %s::jsonb) as r", (token or str(uuid.uuid4()), action, json.dumps(params))).fetchone()["r"]
+
+def _ledger_rows(conn):
+    return conn.execute("select count(*) as n from transactions").fetchone()["n"]
+
+# สองคำขอพร้อมกันจาก connection แยก (เหมือนสองรอบ rerun ของ session เดียวกัน)
+def double_click(dsn, action, params, with_token):
+    token, barrier, errors = str(uuid.uuid4()), threading.Barrier(2), []
+    def click():
+        conn = _connect(dsn, DB_NAME)
+        barrier.wait()
+        try: _submit(conn, action, params, token) if with_token else _direct(conn, action, params)
+        except Exception as e: errors.append(str(e).splitlines()[0])
+        conn.close()
+    threads = [threading.Thread(target=click) for _ in range(2)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return 2 - len(errors), errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-action save latency before/after idempotent form submission")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, meds = setup_database(args.dsn, 4, 3, QTY_PER_LOT)
+    state = {"n": 0, "trans_id": str(conn.execute("select id from transactions where action_type = 'INITIAL' order by id limit 1").fetchone()["id"])}
+    rows, clicks = [], []
+    try:
+        for action, sleep_s in OLD_SLEEP.items():
+            before = measure(lambda: (_direct(conn, action, _params(action, meds[0], "bench", state)), time.sleep(sleep_s)), repeat=args.repeat)
+            after = measure(lambda: _submit(conn, action, _params(action, meds[0], "bench", state)), repeat=args.repeat)
+            rows.append({"action": action, "before_p50_ms": before["p50_ms"], "after_p50_ms": after["p50_ms"], "after_p95_ms": after["p95_ms"], "speedup": before["p50_ms"] / after["p50_ms"]})
+            for label, with_token in (("before", False), ("after", True)):
+                n0 = _ledger_rows(conn)
+                applied, errors = double_click(args.dsn, action, _params(action, meds[1], "bench", state), with_token)
+                clicks.append({"action": action, "version": label, "applied": applied, "ledger_rows_added": _ledger_rows(conn) - n0, "rejected": errors[0] if errors else ""})
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report("Save button: time the session is blocked per click", rows)
+    report("Double click (same form render submitted twice at once)", clicks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import datetime
+import os
+
+import pandas as pd
+
+from benchmarks.harness import measure, report
+from benchmarks.load_sessions import setup_database, drop_database, DB_NAME
+from pharmacy.trends import SERIES_COLUMNS, complete_series, pick_bucket, bucket_start
+
+# --- วัดเวลาวาดกราฟแนวโน้มหลายปี: ดึงรายการดิบมา resample เอง เทียบกับ movement_series จาก daily_movements (migrations/015) ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.bench_trends --meds 300 --rows 500000
+#   raw    = รายการเบิกจ่ายของยา/ทั้งคลังในช่วงนั้นทุกแถว แล้ว resample ใน pandas
+#   series = movement_series ครั้งเดียว ได้เฉพาะจุดบนกราฟ
+# และวัดต้นทุนของ trigger ที่ปรับยอดรายวันต่อการบันทึกหนึ่งครั้ง (เปิด/ปิด trigger)
+
+def seed_ledger(conn, rows, days):
+    n_lots = conn.execute("select count(*) as n from inventory").fetchone()["n"]
+    conn.execute("""
+        insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, created_at)
+        select i.medicine_id, case when g %% 5 = 0 then 'RECEIVE' else 'DISPENSE' end, case when g %% 5 = 0 then 50 else -(1 + g %% 20) end,
+               i.lot_no, 'bench', 'bench', now() - (g %% %s) * interval '1 day' - (g %% 86400) * interval '1 second'
+        from generate_series(1, %s) g
+        join inventory i on i.id = 1 + (g::bigint * 7919) %% %s""", (days, rows, n_lots))
+    conn.execute("analyze")
+
+def raw(conn, start, end, bucket, medicine_id):
+    rows = conn.execute("""select created_at, qty_change from transactions
+                           where action_type = 'DISPENSE' and created_at >= %s and (%s::text is null or medicine_id = %s)""",
+                        (start, medicine_id, medicine_id)).fetchall()
+    df = pd.DataFrame(rows, columns=["created_at", "qty_change"])
+    day = pd.to_datetime(df["created_at"], utc=True).dt.tz_convert("Asia/Bangkok").dt.tz_localize(None).dt.normalize()
+    freq = {"day": "D", "week": "W-MON", "month": "MS", "quarter": "QS"}[bucket]
+    return (-df["qty_change"]).groupby(day).sum().resample(freq, label="left", closed="left").sum(), len(rows)
+
+def series(conn, start, end, bucket, medicine_id):
+    rows = conn.execute("select * from movement_series(%s, %s, %s, %s)", (bucket_start(start, bucket), end, bucket, medicine_id)).fetchall()
+    return complete_series(pd.DataFrame(rows, columns=SERIES_COLUMNS), start, end, bucket), len(rows)
+
+def insert_one(conn, med):
+    conn.execute("insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note) values (%s, 'DISPENSE', -1, %s, 'bench', 'bench')", (med, f"{med}-L0"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-year consumption trend: raw ledger rows vs pre-aggregated daily series")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--meds", type=int, default=300)
+    parser.add_argument("--rows", type=int, default=500000, help="จำนวนรายการในสมุดบัญชี")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, meds = setup_database(args.dsn, args.meds, 3, 100000)
+    end = datetime.date.today()
+    start = end.replace(year=end.year - args.years, day=1)
+    bucket = pick_bucket(start, end)
+    rows, checks = [], []
+    try:
+        seed_ledger(conn, args.rows, (end - start).days)
+        for label, medicine_id in (("one medicine", meds[0]), ("whole stock", None)):
+            out = {}
+            for path, fn in (("raw", raw), ("series", series)):
+                def run(fn=fn, path=path): out[path] = fn(conn, start, end, bucket, medicine_id)
+                t = measure(run, repeat=args.repeat)
+                rows.append({"scope": label, "path": path, "rows_transferred": out[path][1], "p50_ms": t["p50_ms"], "p95_ms": t["p95_ms"]})
+            a, b = out["raw"][0], out["series"][0]["dispense_qty"]
+            checks.append({"scope": label, "points": len(b), "mismatch": int((a.reindex(b.index, fill_value=0) != b).sum())})
+        with_trigger = measure(lambda: insert_one(conn, meds[1]), repeat=200)
+        conn.execute("alter table transactions disable trigger transactions_daily_movements")
+        without = measure(lambda: insert_one(conn, meds[1]), repeat=200)
+        conn.execute("alter table transactions enable trigger transactions_daily_movements")
+        rows.append({"scope": "single insert", "path": "trigger on / off", "rows_transferred": "", "p50_ms": f"{with_trigger['p50_ms']:.2f} / {without['p50_ms']:.2f}", "p95_ms": f"{with_trigger['p95_ms']:.2f} / {without['p95_ms']:.2f}"})
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report(f"Trend over {args.years} years, bucket={bucket} ({args.rows:,} ledger rows, {args.meds:,} medicines, database {DB_NAME})", rows)
+    report("Same dispense series from both paths (mismatch ต้องเป็น 0)", checks)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+
+from benchmarks.harness import report
+from benchmarks.load_sessions import setup_database, drop_database, DB_NAME
+from pharmacy.frames import TRANSACTION_COLUMNS
+
+# --- ตรวจแผนการค้นของคำสั่งที่แอปเรียกบ่อย: ต้องใช้ดัชนี ไม่ใช่ Seq Scan ทั้งตาราง (migrations/016_hot_path_indexes.sql, 017) ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.check_query_plans  (exit 1 ถ้ามีคำสั่งไหนตก)
+# สร้างฐานข้อมูลชั่วคราวผ่าน migrate (ไฟล์ migrations ทั้งหมด) เติมข้อมูลขนาดเดียวกับ benchmark อื่นๆ แล้ว EXPLAIN ANALYZE ทีละคำสั่ง
+# คำสั่งเขียนแบบเดียวกับที่ PostgREST สร้างจาก pharmacy/fetch.py (order by <คอลัมน์>, id limit PAGE_SIZE) และคำสั่งข้างในฟังก์ชัน RPC
+# ตารางแถวเดียว (settings) Seq Scan เป็นแผนที่ถูกต้องอยู่แล้ว จึงไม่นับ
+
+def seed(conn, rows, days, profiles):
+    n_lots = conn.execute("select count(*) as n from inventory").fetchone()["n"]
+    conn.execute("""
+        insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, created_at)
+        select i.medicine_id, case when g %% 5 = 0 then 'RECEIVE' else 'DISPENSE' end, case when g %% 5 = 0 then 50 else -(1 + g %% 20) end,
+               i.lot_no, 'bench', 'bench', now() - (g %% %s) * interval '1 day' - (g %% 86400) * interval '1 second'
+        from generate_series(1, %s) g
+        join inventory i on i.id = 1 + (g::bigint * 7919) %% %s""", (days, rows, n_lots))
+    # รายการยกเลิก 1% และล็อตที่ถูกกักกัน 2% ให้ดัชนีแบบมีเงื่อนไขมีข้อมูลจริง
+    conn.execute("""insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, ref_id, entry_kind)
+                    select medicine_id, action_type, -qty_change, lot_no, 'bench', 'bench', id, 'VOID' from transactions where id % 100 = 7""")
+    conn.execute("update inventory set status = 'QUARANTINE', quarantined_qty = qty, quarantined_at = now() where id % 50 = 0")
+    conn.execute("insert into profiles (id, email, full_name, role, is_approved) select gen_random_uuid(), 'user' || g || '@example.com', 'User ' || g, 'staff', true from generate_series(1, %s) g", (profiles,))
+    conn.execute("insert into settings (id) values (1) on conflict do nothing")
+    conn.execute("analyze")
+
+def hot_queries(conn, meds):
+    med = meds[len(meds) // 2]
+    lot = conn.execute("select lot_no from inventory where medicine_id = %s limit 1", (med,)).fetchone()["lot_no"]
+    tid = conn.execute("select id from transactions where ref_id is null and medicine_id = %s limit 1", (med,)).fetchone()["id"]
+    uid = conn.execute("select id from profiles limit 1").fetchone()["id"]
+    today = datetime.date.today()
+    first = today.replace(day=1)
+    prev = (first - datetime.timedelta(days=1)).replace(day=1)
+    cols = ", ".join(TRANSACTION_COLUMNS)
+    page = "limit 1000 offset 0"
+    # (ชื่อ, SQL, พารามิเตอร์, ตารางที่ห้าม Seq Scan)
+    return [
+        ("stock card: ledger ของยา", f"select {cols} from transactions where medicine_id = %s order by created_at, id {page}", (med,), {"transactions"}),
+        ("stock card: ล็อตของยา", f"select lot_no, exp_date, qty from inventory where medicine_id = %s order by id {page}", (med,), {"inventory"}),
+        ("master data: ล็อตเรียงวันหมดอายุ", "select id, lot_no, exp_date, qty, status, unit_cost from inventory where medicine_id = %s order by exp_date", (med,), {"inventory"}),
+        ("receive grid: วันหมดอายุของล็อต", f"select id, medicine_id, lot_no, exp_date from inventory where medicine_id = any(%s) order by id {page}", (meds[:20],), {"inventory"}),
+        ("dispense_fefo: ล็อต FEFO", "select id, lot_no, qty from inventory where medicine_id = %s and qty > 0 and status = 'ACTIVE' and exp_date >= %s order by exp_date, id", (med, today), {"inventory"}),
+        ("รายงานเดือน: ledger ช่วงเวลา", f"select medicine_id, action_type, qty_change from transactions where created_at >= %s and created_at < %s order by id {page}", (prev, first), {"transactions"}),
+        ("ตรวจนับ: รายการหลังเปิดรอบ", f"select medicine_id, lot_no, qty_change from transactions where created_at > %s order by id {page}", (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=2),), {"transactions"}),
+        ("ประวัติ: หน้าแรกจากใหม่ไปเก่า", f"select {cols} from transactions order by created_at desc, id {page}", (), {"transactions"}),
+        ("คิวงาน: ledger_head", "select id, created_at from transactions order by created_at desc, id desc limit 1", (), {"transactions"}),
+        ("ตามรอย Lot", f"select {cols} from transactions where lot_no = %s order by created_at, id {page}", (lot,), {"transactions"}),
+        ("ตามรอย Lot: คงเหลือในคลัง", f"select id, medicine_id, lot_no, exp_date, qty, quarantined_qty, status from inventory where lot_no = any(%s) order by id {page}", ([lot],), {"inventory"}),
+        ("ledger_correct: รายการปรับปรุงของแถว", "select coalesce(sum(qty_change), 0) from transactions where ref_id = %s", (tid,), {"transactions"}),
+        ("รายงานหมดอายุรายสัปดาห์", f"select medicine_id, lot_no, exp_date, qty from inventory where status = 'ACTIVE' and qty > 0 and exp_date <= %s order by id {page}", (today + datetime.timedelta(days=90),), {"inventory"}),
+        ("Admin: คลังกักกัน", "select medicine_id, lot_no, exp_date, quarantined_qty, quarantined_at from inventory where status = 'QUARANTINE' and quarantined_qty > 0 order by exp_date", (), {"inventory"}),
+        ("Admin: ผู้ใช้ตามอีเมล", "select * from profiles where email = %s", ("user500@example.com",), {"profiles"}),
+        ("login: ผู้ใช้ตาม id", "select * from profiles where id = %s", (uid,), {"profiles"}),
+        ("settings id = 1 (ตารางแถวเดียว)", "select line_token, line_target_id from settings where id = 1", (), set()),
+        ("แนวโน้ม: movement_series ของยา", "select day, dispense_qty from daily_movements where medicine_id = %s and day between %s and %s", (med, today - datetime.timedelta(days=1095), today), {"daily_movements"}),
+    ]
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []): yield from plan_nodes(child)
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the app's hot queries on seeded data and fail on sequential scans")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--meds", type=int, default=500)
+    parser.add_argument("--lots", type=int, default=24, help="จำนวนล็อตต่อยา (ค่าเริ่มต้น = รับเข้าเดือนละล็อตตลอด 2 ปี)")
+    parser.add_argument("--rows", type=int, default=200000, help="จำนวนรายการในสมุดบัญชี")
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--plans", action="store_true", help="พิมพ์แผนเต็มของคำสั่งที่ไม่ผ่าน")
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    conn, meds = setup_database(args.dsn, args.meds, args.lots, 100000)
+    rows, failed = [], []
+    try:
+        seed(conn, args.rows, 1095, args.profiles)
+        for name, sql, params, watched in hot_queries(conn, meds):
+            plan = conn.execute("explain (analyze, format json) " + sql, params).fetchone()["QUERY PLAN"][0]
+            nodes = list(plan_nodes(plan["Plan"]))
+            seq = sorted({n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in watched})
+            scans = [f"{n['Node Type']} {n.get('Index Name') or n.get('Relation Name')}" for n in nodes if "Relation Name" in n]
+            rows.append({"query": name, "scan": ", ".join(dict.fromkeys(scans)), "ms": plan["Execution Time"], "result": "FAIL seq scan " + ", ".join(seq) if seq else "ok"})
+            if seq: failed.append((name, plan))
+    finally:
+        conn.close()
+        if not args.keep: drop_database(args.dsn)
+    report(f"Hot query plans ({args.rows:,} ledger rows, {args.meds:,} medicines x {args.lots} lots, {args.profiles:,} profiles, database {DB_NAME})", rows)
+    if args.plans:
+        for name, plan in failed: print(f"\n-- {name}\n{json.dumps(plan['Plan'], indent=2, ensure_ascii=False)}")
+    if failed:
+        print(f"\n❌ {len(failed)} คำสั่งใช้ Seq Scan: {', '.join(n for n, _ in failed)}")
+        return 1
+    print("\n✅ ทุกคำสั่งใช้ดัชนี")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import statistics
+import time
+
+# --- เครื่องมือวัดเวลากลางสำหรับสคริปต์ benchmark ทุกตัว ---
+# รันด้วย: python -m benchmarks.<ชื่อสคริปต์>  (ผลลัพธ์พิมพ์ออกทางหน้าจอ สามารถ > bench_output.txt ได้)
+
+def measure(fn, repeat=10, warmup=1):
+    for _ in range(warmup): fn()
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return summarize(timings)
+
+def summarize(timings_ms):
+    ordered = sorted(timings_ms)
+    def pct(p): return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {"n": len(ordered), "mean_ms": statistics.fmean(ordered), "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": ordered[-1]}
+
+def report(title, rows):
+    print(f"\n== {title} ==")
+    if not rows: print("(ไม่มีผลลัพธ์)"); return
+    keys = list(rows[0].keys())
+    widths = {k: max(len(k), *(len(_fmt(r.get(k))) for r in rows)) for k in keys}
+    print("  ".join(k.ljust(widths[k]) for k in keys))
+    for r in rows: print("  ".join(_fmt(r.get(k)).ljust(widths[k]) for k in keys))
+
+def _fmt(v):
+    if isinstance(v, float): return f"{v:,.2f}"
+    return str(v)
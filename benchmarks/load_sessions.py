@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.harness import summarize, report
+from pharmacy.migrate import migrate
+
+# --- ทดสอบโหลด: จำลองเจ้าหน้าที่ N คนกดฟอร์มเบิกจ่าย/รับเข้าพร้อมกัน กับ Postgres ในเครื่อง ---
+# รัน: DATABASE_URL=postgresql://... python -m benchmarks.load_sessions --sessions 20 --ops 50 --mode both
+# สร้างฐานข้อมูลชั่วคราว (migrations/*.sql ผ่าน pharmacy/migrate.py) ทุกครั้ง แล้วลบทิ้งเมื่อจบ ผลจึงทำซ้ำได้ด้วย --seed เดิม
+#   atomic = เรียก dispense_fefo / receive_lots แบบเดียวกับหน้าเว็บปัจจุบัน
+#   legacy = ลำดับคำสั่งแบบเดิม (อ่านยอด -> คำนวณ -> UPDATE ยอดใหม่ทีละล็อต, แต่ละคำสั่ง commit แยกกัน)
+# ตรวจหลังรัน: ล็อตติดลบ, ยอดในคลังไม่ตรงกับผลรวมสมุดบัญชี, ยอดที่ client ได้รับแจ้งว่าเบิกสำเร็จไม่ตรงกับสมุดบัญชี
+
+DB_NAME = "pharmacy_loadtest"
+
+def _connect(dsn, dbname=None):
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.conninfo import make_conninfo
+    return psycopg.connect(make_conninfo(dsn, dbname=dbname) if dbname else dsn, row_factory=dict_row, autocommit=True)
+
+def setup_database(dsn, n_meds, lots_per_med, qty_per_lot):
+    admin = _connect(dsn)
+    admin.execute(f"drop database if exists {DB_NAME} with (force)")
+    admin.execute(f"create database {DB_NAME}")
+    admin.close()
+    conn = _connect(dsn, DB_NAME)
+    migrate(conn)
+    meds = [f"MED-{m:03d}" for m in range(n_meds)]
+    with conn.cursor() as cur:
+        cur.executemany("insert into medicines (id, generic_name, unit) values (%s, %s, 'เม็ด')", [(m, m) for m in meds])
+        for m in meds:
+            for l in range(lots_per_med):
+                lot_no = f"{m}-L{l}"
+                cur.execute("insert into inventory (medicine_id, lot_no, mfg_date, exp_date, qty) values (%s, %s, current_date - 30, current_date + %s, %s)", (m, lot_no, 100 + 30 * l, qty_per_lot))
+                cur.execute("insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note) values (%s, 'INITIAL', %s, %s, 'SEED', 'ยอดยกมา')", (m, qty_per_lot, lot_no))
+    return conn, meds
+
+def drop_database(dsn):
+    admin = _connect(dsn)
+    admin.execute(f"drop database if exists {DB_NAME} with (force)")
+    admin.close()
+
+# --- การทำรายการหนึ่งครั้งของแต่ละโหมด: คืนจำนวนที่เบิกได้จริง (0 ถ้าถูกปฏิเสธเพราะยอดไม่พอ) ---
+
+def atomic_dispense(conn, lines, user):
+    try:
+        conn.execute("select dispense_fefo(%s::jsonb, %s, %s)", (json.dumps(lines), user, "load test"))
+        return sum(l['qty'] for l in lines)
+    except Exception as e:
+        if "INSUFFICIENT_STOCK" in str(e): return 0
+        raise
+
+def atomic_receive(conn, lines, user):
+    conn.execute("select receive_lots(%s::jsonb, %s, %s)", (json.dumps(lines), user, "load test"))
+
+def legacy_dispense(conn, lines, user):
+    # เหมือน bulk_dispense_form เดิม: เช็กยอดรวมก่อน แล้วค่อยวนตัดทีละล็อตด้วยยอดที่อ่านมา
+    today = "(now() at time zone 'Asia/Bangkok')::date"
+    for l in lines:
+        avail = conn.execute(f"select coalesce(sum(qty), 0) as q from inventory where medicine_id = %s and qty > 0 and status = 'ACTIVE' and exp_date >= {today}", (l['medicine_id'],)).fetchone()['q']
+        if l['qty'] > avail: return 0
+    for l in lines:
+        need = l['qty']
+        lots = conn.execute(f"select id, lot_no, qty from inventory where medicine_id = %s and qty > 0 and status = 'ACTIVE' and exp_date >= {today} order by exp_date", (l['medicine_id'],)).fetchall()
+        for lot in lots:
+            if need <= 0: break
+            take = min(lot['qty'], need)
+            conn.execute("update inventory set qty = %s where id = %s", (lot['qty'] - take, lot['id']))
+            conn.execute("insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note) values (%s, 'DISPENSE', %s, %s, %s, 'load test')", (l['medicine_id'], -take, lot['lot_no'], user))
+            need -= take
+    return sum(l['qty'] for l in lines)
+
+def legacy_receive(conn, lines, user):
+    for l in lines:
+        conn.execute("insert into inventory (medicine_id, lot_no, mfg_date, exp_date, qty) values (%(medicine_id)s, %(lot_no)s, %(mfg_date)s, %(exp_date)s, %(qty)s)", l)
+        conn.execute("insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note) values (%s, 'RECEIVE', %s, %s, %s, 'load test')", (l['medicine_id'], l['qty'], l['lot_no'], user))
+
+MODES = {"atomic": (atomic_dispense, atomic_receive), "legacy": (legacy_dispense, legacy_receive)}
+
+def run_session(dsn, mode, meds, n_ops, receive_ratio, seed, session_no, out):
+    dispense, receive = MODES[mode]
+    rnd = random.Random(seed * 1000 + session_no)
+    conn = _connect(dsn, DB_NAME)
+    user = f"staff{session_no}@loadtest"
+    stats = out[session_no] = {"latency": defaultdict(list), "outcome": defaultdict(int), "dispensed": 0}
+    for i in range(n_ops):
+        t0 = time.perf_counter()
+        try:
+            if rnd.random() < receive_ratio:
+                lines = [{"medicine_id": rnd.choice(meds), "lot_no": f"R{session_no}-{i}-{k}", "mfg_date": "2025-01-01", "exp_date": "2030-01-01", "qty": rnd.randint(10, 50)} for k in range(rnd.randint(1, 2))]
+                receive(conn, lines, user)
+                op, outcome = "receive", "ok"
+            else:
+                # ใบเบิกหนึ่งใบมีหลายรายการ (รหัสยาไม่ซ้ำกันในใบ เหมือนหลัง groupby ในหน้าเว็บ)
+                lines = [{"medicine_id": m, "qty": rnd.randint(1, 15)} for m in rnd.sample(meds, rnd.randint(1, 3))]
+                got = dispense(conn, lines, user)
+                stats["dispensed"] += got
+                op, outcome = "dispense", "ok" if got else "rejected"
+        except Exception as e:
+            op, outcome = "error", type(e).__name__
+        stats["latency"][op].append((time.perf_counter() - t0) * 1000)
+        stats["outcome"][f"{op}:{outcome}"] += 1
+    conn.close()
+
+def check_invariants(conn, client_dispensed):
+    negative = conn.execute("select count(*) as n from inventory where qty < 0").fetchone()['n']
+    mismatch = conn.execute("""
+        select count(*) as n from
+            (select medicine_id, lot_no, sum(qty + quarantined_qty) as inv from inventory group by 1, 2) i
+            full join (select medicine_id, lot_no, sum(qty_change) as led from transactions group by 1, 2) t using (medicine_id, lot_no)
+        where coalesce(i.inv, 0) <> coalesce(t.led, 0)""").fetchone()['n']
+    ledger_dispensed = conn.execute("select coalesce(-sum(qty_change), 0) as q from transactions where action_type = 'DISPENSE'").fetchone()['q']
+    return {"negative_lots": negative, "ledger_inventory_mismatch_lots": mismatch, "client_dispensed": client_dispensed, "ledger_dispensed": int(ledger_dispensed),
+            "dispensed_diff": client_dispensed - int(ledger_dispensed)}
+
+def run_mode(dsn, mode, args):
+    conn, meds = setup_database(dsn, args.meds, args.lots_per_med, args.qty_per_lot)
+    out = {}
+    threads = [threading.Thread(target=run_session, args=(dsn, mode, meds, args.ops, args.receive_ratio, args.seed, s, out)) for s in range(args.sessions)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - t0
+
+    latency, outcome = defaultdict(list), defaultdict(int)
+    for s in out.values():
+        for op, values in s["latency"].items(): latency[op] += values
+        for k, v in s["outcome"].items(): outcome[k] += v
+    total_ops = sum(len(v) for v in latency.values())
+    rows = [dict(mode=mode, op=op, ops_per_s=len(v) / elapsed, **summarize(v)) for op, v in sorted(latency.items())]
+    invariants = check_invariants(conn, sum(s["dispensed"] for s in out.values()))
+    conn.close()
+    if not args.keep: drop_database(dsn)
+    outcomes = {k: outcome.get(k, 0) for k in ("dispense:ok", "dispense:rejected", "receive:ok")}
+    outcomes["errors"] = sum(v for k, v in outcome.items() if k not in outcomes)
+    return rows, dict(mode=mode, sessions=args.sessions, ops=total_ops, seconds=elapsed, ops_per_s=total_ops / elapsed, **outcomes), dict(mode=mode, **invariants)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent dispense/receive load test against a local Postgres")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="connection string ที่มีสิทธิ์สร้างฐานข้อมูล (ค่าเริ่มต้น DATABASE_URL)")
+    parser.add_argument("--mode", choices=["atomic", "legacy", "both"], default="both")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--ops", type=int, default=50, help="จำนวนรายการต่อ session")
+    parser.add_argument("--meds", type=int, default=8, help="จำนวนรายการยา (ยิ่งน้อยยิ่งแย่งล็อตเดียวกัน)")
+    parser.add_argument("--lots-per-med", type=int, default=3)
+    parser.add_argument("--qty-per-lot", type=int, default=200)
+    parser.add_argument("--receive-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบฐานข้อมูลทดสอบหลังรัน")
+    args = parser.parse_args()
+    if not args.dsn: parser.error("ต้องระบุ --dsn หรือ DATABASE_URL")
+
+    latency_rows, summary_rows, invariant_rows = [], [], []
+    for mode in (["atomic", "legacy"] if args.mode == "both" else [args.mode]):
+        l, s, i = run_mode(args.dsn, mode, args)
+        latency_rows += l; summary_rows.append(s); invariant_rows.append(i)
+    report("Throughput", summary_rows)
+    report("Latency per operation", latency_rows)
+    report("Invariants (ต้องเป็น 0 ทุกช่อง ยกเว้นยอดเบิก)", invariant_rows)
+    if any(r["negative_lots"] or r["ledger_inventory_mismatch_lots"] or r["dispensed_diff"] for r in invariant_rows if r["mode"] == "atomic"): raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import sys
+import json
+import argparse
+from pharmacy.pg import connect
+
+# --- สร้างยอดเคลื่อนไหวรายวัน (daily_movements ใน migrations/015_daily_movements.sql) ใหม่ทั้งตาราง ---
+# ตัวอย่าง: python daily_movements.py [--archive-uri s3://bucket/pharmacy-archive]
+# ปกติ trigger ปรับยอดให้เองทุกคำสั่ง ใช้สคริปต์นี้ตอนติดตั้งหลังเคยเก็บถาวรไปแล้ว (ใส่ --archive-uri ให้รวมประวัติในไฟล์ Parquet ด้วย)
+# หรือเมื่อต้องการตรวจซ่อม ทำใน transaction เดียว: สร้างจากตาราง transactions แล้วบวกยอดจากที่เก็บถาวรเพิ่ม
+
+UPSERT_ARCHIVED = """
+insert into public.daily_movements as d (medicine_id, day, receive_qty, dispense_qty, expire_qty, adjust_qty, net_qty)
+values (%s, %s, %s, %s, %s, %s, %s)
+on conflict (medicine_id, day) do update set
+    receive_qty = d.receive_qty + excluded.receive_qty, dispense_qty = d.dispense_qty + excluded.dispense_qty,
+    expire_qty = d.expire_qty + excluded.expire_qty, adjust_qty = d.adjust_qty + excluded.adjust_qty, net_qty = d.net_qty + excluded.net_qty
+"""
+
+def rebuild(conn, archive_uri=None):
+    with conn.transaction():
+        result = conn.execute("select public.daily_movements_rebuild() as r").fetchone()['r']
+        if archive_uri:
+            from pharmacy.archive import load_archived
+            from pharmacy.frames import typed_frame
+            from pharmacy.trends import daily_movements, SERIES_COLUMNS
+            # รหัสยาในไฟล์ Parquet ที่เปลี่ยนไปแล้ว (migrations/024) ต้องรวมเข้ากับรหัสปัจจุบัน
+            renames = typed_frame(conn.execute("select old_id, new_id, renamed_at from public.medicine_renames").fetchall(), "medicine_renames")
+            daily = daily_movements(load_archived(archive_uri, renames=renames if len(renames) else None))
+            with conn.cursor() as cur:
+                cur.executemany(UPSERT_ARCHIVED, daily[['medicine_id', 'day'] + SERIES_COLUMNS[1:]].astype(object).itertuples(index=False, name=None))
+            result['archived_rows'] = len(daily)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างตาราง daily_movements ใหม่จากสมุดบัญชี (และประวัติที่เก็บถาวร)")
+    parser.add_argument("--archive-uri", help="ที่เก็บไฟล์ Parquet จาก archive_transactions.py (ไม่ระบุ = นับเฉพาะตาราง transactions)")
+    args = parser.parse_args(argv)
+    print(json.dumps(rebuild(connect(), args.archive_uri), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pharmacy.dispense_service import connect, dispense_batch, summarize_results, DEFAULT_CHUNK_SIZE
+
+# --- จุดเชื่อมต่อสำหรับระบบ HIS: เบิกจ่ายแบบ batch ผ่าน CLI หรือ HTTP API (รันในเครื่อง) ---
+# ต้องตั้งค่า DATABASE_URL (connection string ของ Postgres/Supabase) และติดตั้ง psycopg ก่อน
+#   python dispense_api.py batch lines.json        (หรือ .csv ที่มีคอลัมน์ key, medicine_id, qty, note)
+#   python dispense_api.py serve --port 8600       แล้ว POST /dispense {"lines": [...]}
+# ถ้าตั้ง DISPENSE_API_TOKEN ไว้ ทุก request ต้องแนบ Header: Authorization: Bearer <token>
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+def read_lines(path):
+    if path == "-": data = json.load(sys.stdin)
+    elif path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f: return list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f: data = json.load(f)
+    return data["lines"] if isinstance(data, dict) else data
+
+def run_batch(args):
+    lines = read_lines(args.file)
+    conn = connect()
+    t0 = time.perf_counter()
+    results = dispense_batch(conn, lines, user_name=args.user, note=args.note, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - t0
+    json.dump(results, sys.stdout, ensure_ascii=False, default=str, indent=1)
+    print(f"\n{len(lines)} บรรทัด ใน {elapsed:.2f} วินาที ({len(lines) / max(elapsed, 1e-9):,.0f} บรรทัด/วินาที) {summarize_results(results)}", file=sys.stderr)
+
+_local = threading.local()
+
+def _conn():
+    # หนึ่ง connection ต่อหนึ่ง thread ของ HTTP server
+    if getattr(_local, "conn", None) is None or _local.conn.closed: _local.conn = connect()
+    return _local.conn
+
+class DispenseHandler(BaseHTTPRequestHandler):
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        token = os.environ.get("DISPENSE_API_TOKEN")
+        return not token or self.headers.get("Authorization") == f"Bearer {token}"
+
+    def do_GET(self):
+        if self.path == "/health": self._send(200, {"status": "ok"})
+        else: self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/dispense": return self._send(404, {"error": "not found"})
+        if not self._authorized(): return self._send(401, {"error": "unauthorized"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES: return self._send(413, {"error": "invalid body size"})
+        try:
+            body = json.loads(self.rfile.read(length))
+            lines = body["lines"] if isinstance(body, dict) else body
+            if not isinstance(lines, list): raise ValueError("lines must be a list")
+        except (ValueError, KeyError) as e:
+            return self._send(400, {"error": f"invalid JSON: {e}"})
+        opts = body if isinstance(body, dict) else {}
+        try:
+            t0 = time.perf_counter()
+            results = dispense_batch(_conn(), lines, user_name=opts.get("user_name") or "HIS", note=opts.get("note") or "เบิกจ่ายจาก HIS", chunk_size=int(opts.get("chunk_size") or DEFAULT_CHUNK_SIZE))
+            self._send(200, {"summary": summarize_results(results), "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1), "results": results})
+        except Exception as e:
+            _local.conn = None
+            self._send(500, {"error": str(e)})
+
+def serve(args):
+    server = ThreadingHTTPServer((args.host, args.port), DispenseHandler)
+    print(f"🚀 Dispense API พร้อมใช้งานที่ http://{args.host}:{args.port} (POST /dispense, GET /health)")
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch dispense service for HIS integration")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_batch = sub.add_parser("batch", help="dispense a JSON/CSV file of lines and print per-line results")
+    p_batch.add_argument("file", help="path to .json/.csv, or - for JSON on stdin")
+    p_batch.add_argument("--user", default="HIS")
+    p_batch.add_argument("--note", default="เบิกจ่ายจาก HIS")
+    p_batch.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p_batch.set_defaults(func=run_batch)
+    p_serve = sub.add_parser("serve", help="run the local HTTP API")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8600)
+    p_serve.set_defaults(func=serve)
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+import json
+from supabase import create_client
+
+# --- งานรายคืน: ตัดยาหมดอายุเข้าคลังกักกัน (เรียกฟังก์ชัน expire_sweep ใน migrations/003) ---
+# ทุกรอบตัดล็อต ACTIVE ที่หมดอายุแล้วทั้งหมด รวมล็อตที่รับเข้ามาทั้งที่หมดอายุไปแล้ว (migrations/022)
+# --full ยังรับไว้ให้ cron เดิม แต่ผลเหมือนรอบปกติ
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+
+def run_sweep(full=False):
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    result = supabase.rpc("expire_sweep", {"p_full": full, "p_user_name": "SYSTEM"}).execute().data
+    print(f"🗑️ ตัดยาหมดอายุเรียบร้อย: {json.dumps(result, ensure_ascii=False)}")
+    return result
+
+if __name__ == "__main__":
+    run_sweep(full="--full" in sys.argv[1:])
@@ -0,0 +1,28 @@
+import sys
+import json
+import argparse
+from pharmacy.pg import connect
+from pharmacy.migrate import migrate, status
+
+# --- อัปเดตโครงสร้างฐานข้อมูลตาม migrations/*.sql (แทนการคัดลอก SQL ไปรันเองใน Supabase SQL Editor) ---
+# ตัวอย่าง: python migrate.py            รันไฟล์ที่ยังไม่ได้รันทั้งหมด
+#           python migrate.py --status   ดูว่าไฟล์ไหนรันแล้ว/ยังไม่รัน/ถูกแก้หลังรัน
+#           python migrate.py --baseline 015   ฐานข้อมูลเดิมที่รัน 000-015 ด้วยมือไปแล้ว: ลงทะเบียนโดยไม่รันซ้ำ แล้วรันไฟล์ที่ใหม่กว่า
+# ต้องตั้งค่า DATABASE_URL (connection string ของ Postgres/Supabase) และติดตั้ง pip install -r requirements-service.txt
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="รัน migrations/*.sql ที่ยังไม่ได้รัน ตามลำดับเลขเวอร์ชัน")
+    parser.add_argument("--status", action="store_true", help="แสดงสถานะของแต่ละไฟล์ ไม่เปลี่ยนแปลงฐานข้อมูล")
+    parser.add_argument("--baseline", help="ลงทะเบียนไฟล์ถึงเวอร์ชันนี้ว่ารันแล้ว โดยไม่รันซ้ำ (เช่น 015)")
+    parser.add_argument("--target", help="รันถึงเวอร์ชันนี้เท่านั้น")
+    args = parser.parse_args(argv)
+    conn = connect()
+    if args.status:
+        rows = status(conn)
+        for r in rows: print(f"{r['version']}  {r['status']:<8} {r['name']}" + (f"  ({r['applied_at']:%Y-%m-%d %H:%M})" if r['applied_at'] else ""))
+        return 1 if any(r['status'] == 'CHANGED' for r in rows) else 0
+    ran = migrate(conn, baseline=args.baseline, target=args.target)
+    print(json.dumps({"applied": ran, "pending": [r['version'] for r in status(conn) if r['status'] == 'PENDING']}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    sys.exit(main())
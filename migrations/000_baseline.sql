@@ -0,0 +1,45 @@
+-- =====================================================================
+-- 000: ตารางหลักที่แอปใช้ (เดิมสร้างด้วยมือใน Supabase ก่อนมี migrations) สำหรับติดตั้งใหม่/ฐานข้อมูลทดสอบ
+-- ใช้ create table if not exists ทั้งหมด ฐานข้อมูลเดิมที่มีตารางอยู่แล้วจะไม่ถูกแก้ไข
+-- คอลัมน์ที่เพิ่มภายหลัง (ref_id, status, unit_cost, ven_class ฯลฯ) อยู่ใน migration ของฟีเจอร์นั้นๆ
+-- profiles ใน Supabase ผูกกับ auth.users (id เดียวกัน) ที่นี่ไม่ใส่ foreign key เพื่อให้รันบน Postgres ธรรมดาได้
+-- =====================================================================
+
+create table if not exists public.medicines (
+    id text primary key,
+    generic_name text,
+    unit text,
+    category text,
+    drug_group text,
+    min_stock integer default 0,
+    is_active boolean default true
+);
+
+create table if not exists public.inventory (
+    id bigint generated by default as identity primary key,
+    medicine_id text references public.medicines(id),
+    lot_no text,
+    mfg_date date,
+    exp_date date,
+    qty integer default 0
+);
+
+create table if not exists public.transactions (
+    id bigint generated by default as identity primary key,
+    medicine_id text,
+    action_type text,
+    qty_change integer,
+    lot_no text,
+    user_name text,
+    note text,
+    created_at timestamptz default now()
+);
+
+create table if not exists public.profiles (
+    id uuid primary key,
+    email text,
+    full_name text,
+    role text default 'staff',
+    is_approved boolean default false,
+    created_at timestamptz default now()
+);
@@ -0,0 +1,95 @@
+-- =====================================================================
+-- 001: สมุดบัญชีแบบต่อท้ายอย่างเดียว (Append-only ledger)
+-- การแก้ไข/ยกเลิกประวัติจะไม่ UPDATE หรือ DELETE แถวเดิมอีกต่อไป
+-- แต่จะบันทึก "รายการปรับปรุง" (compensating entry) ที่ชี้กลับไปหาแถวต้นฉบับ
+--   ref_id     -> id ของรายการต้นฉบับ
+--   entry_kind -> 'AMEND' (แก้ไขจำนวน/หมายเหตุ) หรือ 'VOID' (ยกเลิกทั้งรายการ)
+-- รายการปรับปรุงใช้ action_type เดียวกับต้นฉบับ ยอดรวมตามประเภทจึงหักล้างกันเองอัตโนมัติ
+-- =====================================================================
+
+-- ref_id ต้องเป็นชนิดเดียวกับ transactions.id (bigint หรือ uuid แล้วแต่ที่สร้างไว้ใน Supabase)
+do $$
+declare id_type text;
+begin
+    select format_type(a.atttypid, a.atttypmod) into id_type
+    from pg_attribute a
+    where a.attrelid = 'public.transactions'::regclass and a.attname = 'id';
+    execute format('alter table public.transactions add column if not exists ref_id %s references public.transactions(id)', id_type);
+end $$;
+
+alter table public.transactions add column if not exists entry_kind text;
+alter table public.transactions drop constraint if exists transactions_entry_kind_check;
+alter table public.transactions add constraint transactions_entry_kind_check
+    check ((entry_kind is null and ref_id is null) or (entry_kind in ('AMEND', 'VOID') and ref_id is not null));
+
+create index if not exists transactions_ref_id_idx on public.transactions (ref_id) where ref_id is not null;
+create index if not exists inventory_medicine_lot_idx on public.inventory (medicine_id, lot_no);
+
+-- 🌟 ห้ามลบ และห้ามแก้ตัวเลข/ประเภทของแถวในสมุดบัญชี
+-- (ยังอนุญาตให้เปลี่ยน medicine_id ได้ เพราะหน้า Master Data ใช้ตอนเปลี่ยนรหัสยา)
+create or replace function public.transactions_append_only() returns trigger
+language plpgsql as $$
+begin
+    if tg_op = 'DELETE' then
+        raise exception 'APPEND_ONLY_LEDGER';
+    end if;
+    if (new.qty_change, new.action_type, new.lot_no, new.ref_id, new.entry_kind, new.created_at)
+       is distinct from (old.qty_change, old.action_type, old.lot_no, old.ref_id, old.entry_kind, old.created_at) then
+        raise exception 'APPEND_ONLY_LEDGER';
+    end if;
+    return new;
+end $$;
+
+drop trigger if exists transactions_append_only on public.transactions;
+create trigger transactions_append_only before update or delete on public.transactions
+    for each row execute function public.transactions_append_only();
+
+-- 🌟 บันทึกรายการปรับปรุง + ปรับยอด Lot ในคลัง ภายใน transaction เดียวฝั่งเซิร์ฟเวอร์ (1 round-trip)
+create or replace function public.ledger_correct(p_trans_id text, p_new_qty_change integer, p_note text, p_user_name text, p_void boolean)
+returns jsonb
+language plpgsql as $$
+declare
+    v_id public.transactions.id%type := p_trans_id;
+    v_orig public.transactions%rowtype;
+    v_net integer;
+    v_delta integer;
+    v_inv_id public.inventory.id%type;
+    v_inv_qty integer;
+begin
+    -- ล็อกแถวต้นฉบับไว้ เพื่อไม่ให้สองคนแก้รายการเดียวกันพร้อมกัน
+    select * into v_orig from public.transactions where id = v_id for update;
+    if not found then raise exception 'TRANSACTION_NOT_FOUND'; end if;
+    if v_orig.ref_id is not null then raise exception 'CANNOT_CORRECT_COMPENSATING_ENTRY'; end if;
+    if exists (select 1 from public.transactions where ref_id = v_id and entry_kind = 'VOID') then
+        raise exception 'ALREADY_VOIDED';
+    end if;
+
+    select v_orig.qty_change + coalesce(sum(qty_change), 0) into v_net from public.transactions where ref_id = v_id;
+    v_delta := case when p_void then -v_net else p_new_qty_change - v_net end;
+
+    if v_delta <> 0 then
+        select id, qty into v_inv_id, v_inv_qty from public.inventory
+        where medicine_id = v_orig.medicine_id and lot_no = v_orig.lot_no
+        order by id limit 1 for update;
+        if found then
+            if v_inv_qty + v_delta < 0 then raise exception 'NEGATIVE_STOCK'; end if;
+            update public.inventory set qty = qty + v_delta where id = v_inv_id;
+        end if;
+    end if;
+
+    insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, ref_id, entry_kind)
+    values (v_orig.medicine_id, v_orig.action_type, v_delta, v_orig.lot_no, p_user_name, coalesce(p_note, v_orig.note), v_orig.id,
+            case when p_void then 'VOID' else 'AMEND' end);
+
+    return jsonb_build_object('qty_delta', v_delta, 'inventory_found', v_inv_id is not null);
+end $$;
+
+create or replace function public.ledger_amend(p_trans_id text, p_new_qty_change integer, p_note text, p_user_name text)
+returns jsonb language sql as $$
+    select public.ledger_correct(p_trans_id, p_new_qty_change, p_note, p_user_name, false);
+$$;
+
+create or replace function public.ledger_void(p_trans_id text, p_note text, p_user_name text)
+returns jsonb language sql as $$
+    select public.ledger_correct(p_trans_id, null, p_note, p_user_name, true);
+$$;
@@ -0,0 +1,13 @@
+-- =====================================================================
+-- 002: รองรับการเบิกจ่ายแบบ batch จากระบบ HIS (ดู dispense_api.py)
+-- =====================================================================
+
+-- เก็บผลลัพธ์ของทุก idempotency key ที่ทำสำเร็จแล้ว ถ้า HIS ส่งซ้ำจะได้ผลเดิมกลับไปโดยไม่ตัดสต๊อกซ้ำ
+create table if not exists public.dispense_requests (
+    idempotency_key text primary key,
+    result jsonb not null,
+    created_at timestamptz not null default now()
+);
+
+-- ดึงล็อตที่มียอดตามลำดับ FEFO ของยาหลายตัวพร้อมกัน
+create index if not exists inventory_fefo_idx on public.inventory (medicine_id, exp_date) where qty > 0;
@@ -0,0 +1,63 @@
+-- =====================================================================
+-- 003: ตัดยาหมดอายุเข้าคลังกักกัน (Quarantine) อัตโนมัติทุกคืน (ดู expiry_sweep.py)
+-- ล็อตที่หมดอายุจะถูกเปลี่ยนสถานะเป็น QUARANTINE, ย้ายยอดไปไว้ที่ quarantined_qty
+-- และบันทึกรายการ EXPIRE (ติดลบ) ในสมุดบัญชี ยอดคงเหลือในคลังจึงตรงกับผลรวมของ transactions เสมอ
+-- =====================================================================
+
+alter table public.inventory add column if not exists status text not null default 'ACTIVE';
+alter table public.inventory add column if not exists quarantined_qty integer not null default 0;
+alter table public.inventory add column if not exists quarantined_at timestamptz;
+alter table public.inventory drop constraint if exists inventory_status_check;
+alter table public.inventory add constraint inventory_status_check check (status in ('ACTIVE', 'QUARANTINE'));
+
+-- ใช้หาเฉพาะล็อตที่ยังใช้งานอยู่และหมดอายุในช่วงที่กำหนด (ไม่ต้องสแกนทั้งตาราง)
+create index if not exists inventory_active_exp_idx on public.inventory (exp_date) where status = 'ACTIVE';
+
+-- สถานะของงานที่รันตามเวลา (เก็บ watermark เพื่อให้รอบถัดไปทำเฉพาะส่วนที่เพิ่มขึ้น)
+create table if not exists public.job_state (
+    job text primary key,
+    watermark date,
+    last_run_at timestamptz,
+    last_result jsonb
+);
+
+-- 🌟 ตัดยาหมดอายุแบบ set-based ในคำสั่งเดียว เฉพาะล็อตที่ exp_date อยู่ในช่วง [watermark เดิม, p_as_of)
+-- p_full = true จะสแกนล็อตที่หมดอายุทั้งหมดใหม่ (เช่น รอบแรก หรือมีการรับยาที่หมดอายุไปแล้วเข้ามา)
+create or replace function public.expire_sweep(p_as_of date default null, p_full boolean default false, p_user_name text default 'SYSTEM')
+returns jsonb
+language plpgsql as $$
+declare
+    v_as_of date := coalesce(p_as_of, (now() at time zone 'Asia/Bangkok')::date);
+    v_from date;
+    v_result jsonb;
+begin
+    insert into public.job_state (job) values ('expire_sweep') on conflict do nothing;
+    -- ล็อกแถวสถานะงาน กันไม่ให้รันซ้อนกันสองรอบ
+    select watermark into v_from from public.job_state where job = 'expire_sweep' for update;
+    if p_full then v_from := null; end if;
+
+    with expired as (
+        select id, medicine_id, lot_no, qty from public.inventory
+        where status = 'ACTIVE' and exp_date < v_as_of and (v_from is null or exp_date >= v_from)
+        for update
+    ), moved as (
+        update public.inventory i
+        set status = 'QUARANTINE', quarantined_qty = i.quarantined_qty + e.qty, quarantined_at = now(), qty = 0
+        from expired e where i.id = e.id
+        returning e.medicine_id, e.lot_no, e.qty
+    ), written as (
+        insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+        select medicine_id, 'EXPIRE', -qty, lot_no, p_user_name, 'ตัดจำหน่ายยาหมดอายุ (ย้ายเข้าคลังกักกัน)' from moved where qty > 0
+        returning qty_change
+    )
+    select jsonb_build_object(
+        'as_of', v_as_of, 'from', v_from,
+        'lots_quarantined', (select count(*) from moved),
+        'lots_written_off', (select count(*) from written),
+        'qty_written_off', coalesce((select -sum(qty_change) from written), 0)
+    ) into v_result;
+
+    update public.job_state set watermark = greatest(coalesce(watermark, v_as_of), v_as_of), last_run_at = now(), last_result = v_result
+    where job = 'expire_sweep';
+    return v_result;
+end $$;
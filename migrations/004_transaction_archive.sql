@@ -0,0 +1,53 @@
+-- =====================================================================
+-- 004: ย้ายประวัติของปีงบประมาณที่ปิดแล้วไปเก็บถาวรเป็นไฟล์ Parquet (ดู archive_transactions.py)
+-- แถวที่ถูกย้ายออกจะถูกแทนด้วย "ยอดยกมา" (action_type = 'INITIAL', carry_forward = true)
+-- หนึ่งแถวต่อยา+Lot ณ วันเริ่มปีงบใหม่ ผลรวมของ transactions ต่อ Lot จึงเท่าเดิมทุกประการ
+-- =====================================================================
+
+alter table public.transactions add column if not exists carry_forward boolean not null default false;
+
+-- ทะเบียนการเก็บถาวรแต่ละรอบ (COMMITTED = ลบจากตารางแล้ว, PUBLISHED = ย้ายไฟล์เข้าที่เก็บถาวรแล้ว)
+create table if not exists public.transaction_archives (
+    id bigint generated always as identity primary key,
+    cutoff timestamptz not null unique,
+    fiscal_year integer not null,
+    row_count bigint not null,
+    qty_sum bigint not null,
+    carry_forward_rows integer not null,
+    uri text not null,
+    status text not null default 'COMMITTED' check (status in ('COMMITTED', 'PUBLISHED')),
+    created_at timestamptz not null default now()
+);
+
+-- 🌟 ยังคงห้ามลบ/แก้ไขเหมือนเดิม ยกเว้นการลบโดยคำสั่งเก็บถาวร
+-- ซึ่งต้องเปิด set local pharmacy.archiving = 'on' ภายใน transaction เดียวกับที่บันทึกยอดยกมา
+create or replace function public.transactions_append_only() returns trigger
+language plpgsql as $$
+begin
+    if tg_op = 'DELETE' then
+        if current_setting('pharmacy.archiving', true) = 'on' then return old; end if;
+        raise exception 'APPEND_ONLY_LEDGER';
+    end if;
+    if (new.qty_change, new.action_type, new.lot_no, new.ref_id, new.entry_kind, new.created_at, new.carry_forward)
+       is distinct from (old.qty_change, old.action_type, old.lot_no, old.ref_id, old.entry_kind, old.created_at, old.carry_forward) then
+        raise exception 'APPEND_ONLY_LEDGER';
+    end if;
+    return new;
+end $$;
+
+-- ค้นแถวตามช่วงเวลา (เลือกแถวที่จะเก็บถาวร และเรียงประวัติในหน้าเว็บ)
+create index if not exists transactions_created_at_idx on public.transactions (created_at);
+
+-- ยอดยกมาจากการเก็บถาวรแทนผลรวมของประวัติที่ถูกย้ายออกไป จึงห้ามแก้ไข/ยกเลิกผ่าน ledger_correct
+create or replace function public.transactions_protect_carry_forward() returns trigger
+language plpgsql as $$
+begin
+    if new.ref_id is not null and exists (select 1 from public.transactions where id = new.ref_id and carry_forward) then
+        raise exception 'CANNOT_CORRECT_CARRY_FORWARD';
+    end if;
+    return new;
+end $$;
+
+drop trigger if exists transactions_protect_carry_forward on public.transactions;
+create trigger transactions_protect_carry_forward before insert on public.transactions
+    for each row execute function public.transactions_protect_carry_forward();
@@ -0,0 +1,74 @@
+-- =====================================================================
+-- 005: เบิกจ่าย/รับเข้าจากหน้าเว็บแบบ atomic ฝั่งเซิร์ฟเวอร์ (แทนการอ่านยอด -> คำนวณ -> UPDATE ทีละล็อตจากฝั่งแอป)
+-- เดิมสองคนกดเบิกยาตัวเดียวกันพร้อมกันจะอ่านยอดเดิมทั้งคู่ แล้วเขียนทับกัน (oversell / ยอดในคลังไม่ตรงกับสมุดบัญชี)
+-- =====================================================================
+
+-- 🌟 p_lines = [{"medicine_id": "...", "qty": 5}, ...] ตัดตาม FEFO ทั้งใบใน transaction เดียว
+-- ถ้ายาตัวใดยอดไม่พอ จะยกเลิกทั้งใบ (ไม่ตัดบางส่วน) ด้วย error INSUFFICIENT_STOCK:<medicine_id>:<ยอดที่มี>:<ยอดที่ขอ>
+create or replace function public.dispense_fefo(p_lines jsonb, p_user_name text, p_note text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_today date := (now() at time zone 'Asia/Bangkok')::date;
+    v_line record;
+    v_lot record;
+    v_avail integer;
+    v_need integer;
+    v_take integer;
+    v_alloc jsonb := '[]'::jsonb;
+begin
+    -- รวมยอดตามรหัสยา และล็อกตามลำดับรหัสยา เพื่อไม่ให้ใบเบิกที่ส่งพร้อมกัน deadlock กัน
+    for v_line in
+        select medicine_id, sum(qty)::integer as qty from jsonb_to_recordset(p_lines) as x(medicine_id text, qty integer)
+        group by medicine_id order by medicine_id
+    loop
+        if v_line.qty is null or v_line.qty <= 0 then raise exception 'INVALID_QTY:%', v_line.medicine_id; end if;
+        select coalesce(sum(l.qty), 0) into v_avail from (
+            select qty from public.inventory
+            where medicine_id = v_line.medicine_id and qty > 0 and status = 'ACTIVE' and exp_date >= v_today
+            order by id for update
+        ) l;
+        if v_avail < v_line.qty then raise exception 'INSUFFICIENT_STOCK:%:%:%', v_line.medicine_id, v_avail, v_line.qty; end if;
+
+        v_need := v_line.qty;
+        for v_lot in
+            select id, lot_no, qty from public.inventory
+            where medicine_id = v_line.medicine_id and qty > 0 and status = 'ACTIVE' and exp_date >= v_today
+            order by exp_date, id
+        loop
+            exit when v_need <= 0;
+            v_take := least(v_lot.qty, v_need);
+            update public.inventory set qty = qty - v_take where id = v_lot.id;
+            insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+            values (v_line.medicine_id, 'DISPENSE', -v_take, v_lot.lot_no, p_user_name, p_note);
+            v_alloc := v_alloc || jsonb_build_object('medicine_id', v_line.medicine_id, 'lot_no', v_lot.lot_no, 'qty', v_take);
+            v_need := v_need - v_take;
+        end loop;
+    end loop;
+    return jsonb_build_object('allocations', v_alloc);
+end $$;
+
+-- p_lines = [{"medicine_id", "lot_no", "mfg_date", "exp_date", "qty"}, ...] บันทึกล็อตและประวัติรับเข้าพร้อมกันทั้งใบ
+create or replace function public.receive_lots(p_lines jsonb, p_user_name text, p_note text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_count integer;
+begin
+    if exists (select 1 from jsonb_to_recordset(p_lines) as x(qty integer) where qty is null or qty <= 0) then
+        raise exception 'INVALID_QTY';
+    end if;
+    with lines as (
+        select * from jsonb_to_recordset(p_lines) as x(medicine_id text, lot_no text, mfg_date date, exp_date date, qty integer)
+    ), lots as (
+        insert into public.inventory (medicine_id, lot_no, mfg_date, exp_date, qty)
+        select medicine_id, lot_no, mfg_date, exp_date, qty from lines
+        returning medicine_id, lot_no, qty
+    ), ledger as (
+        insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+        select medicine_id, 'RECEIVE', qty, lot_no, p_user_name, p_note from lots
+        returning 1
+    )
+    select count(*) into v_count from ledger;
+    return jsonb_build_object('lots', v_count);
+end $$;
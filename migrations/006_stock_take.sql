@@ -0,0 +1,116 @@
+-- =====================================================================
+-- 006: ตรวจนับสต๊อก (Stock-take) แบบเป็นรอบ
+-- เปิดรอบ = บันทึกยอดคงเหลือรายล็อต ณ เวลานั้นไว้ (snapshot) -> กรอกยอดนับ -> ยืนยันปรับยอดทั้งรอบใน transaction เดียว
+-- ส่วนต่าง = ยอดนับ - ยอดตอน snapshot แล้วนำไปบวกกับยอดปัจจุบัน การเบิก/รับระหว่างนับจึงไม่ถูกนับซ้ำหรือหายไป
+-- ผลการปรับยอดบันทึกเป็นรายการ ADJUST ในสมุดบัญชี
+-- =====================================================================
+
+create table if not exists public.stock_counts (
+    id bigint generated always as identity primary key,
+    status text not null default 'OPEN' check (status in ('OPEN', 'POSTED', 'CANCELLED')),
+    snapshot_at timestamptz not null default now(),
+    created_by text,
+    note text,
+    closed_at timestamptz,
+    closed_by text,
+    result jsonb
+);
+-- เปิดได้ครั้งละหนึ่งรอบ
+create unique index if not exists stock_counts_one_open_idx on public.stock_counts ((true)) where status = 'OPEN';
+
+-- inventory_id ต้องเป็นชนิดเดียวกับ inventory.id (bigint หรือ uuid)
+do $$
+declare id_type text;
+begin
+    select format_type(a.atttypid, a.atttypmod) into id_type
+    from pg_attribute a
+    where a.attrelid = 'public.inventory'::regclass and a.attname = 'id';
+    execute format('create table if not exists public.stock_count_lines (
+        id bigint generated always as identity primary key,
+        count_id bigint not null references public.stock_counts(id) on delete cascade,
+        inventory_id %s not null references public.inventory(id),
+        medicine_id text not null,
+        lot_no text,
+        exp_date date,
+        snapshot_qty integer not null,
+        counted_qty integer check (counted_qty >= 0),
+        counted_by text,
+        counted_at timestamptz
+    )', id_type);
+end $$;
+create index if not exists stock_count_lines_count_idx on public.stock_count_lines (count_id);
+
+-- 🌟 เปิดรอบนับ: snapshot ทุกล็อตที่มียอดและยังไม่ถูกกักกัน ด้วยคำสั่งเดียว
+create or replace function public.stock_count_open(p_user_name text, p_note text default null)
+returns jsonb
+language plpgsql as $$
+declare
+    v_id bigint;
+    v_lines integer;
+begin
+    if exists (select 1 from public.stock_counts where status = 'OPEN') then raise exception 'STOCK_COUNT_ALREADY_OPEN'; end if;
+    insert into public.stock_counts (created_by, note) values (p_user_name, p_note) returning id into v_id;
+    insert into public.stock_count_lines (count_id, inventory_id, medicine_id, lot_no, exp_date, snapshot_qty)
+    select v_id, id, medicine_id, lot_no, exp_date, qty from public.inventory where qty > 0 and status = 'ACTIVE';
+    get diagnostics v_lines = row_count;
+    return jsonb_build_object('count_id', v_id, 'lines', v_lines);
+end $$;
+
+-- p_counts = [{"id": <line id>, "counted_qty": 12}, ...] บันทึกยอดนับหลายบรรทัดในคำสั่งเดียว (counted_qty = null คือยังไม่นับ)
+create or replace function public.stock_count_save(p_count_id bigint, p_counts jsonb, p_user_name text)
+returns jsonb
+language plpgsql as $$
+declare v_updated integer;
+begin
+    perform 1 from public.stock_counts where id = p_count_id and status = 'OPEN';
+    if not found then raise exception 'STOCK_COUNT_NOT_OPEN'; end if;
+    update public.stock_count_lines l
+    set counted_qty = c.counted_qty, counted_by = p_user_name, counted_at = now()
+    from jsonb_to_recordset(p_counts) as c(id bigint, counted_qty integer)
+    where l.id = c.id and l.count_id = p_count_id;
+    get diagnostics v_updated = row_count;
+    return jsonb_build_object('updated', v_updated);
+end $$;
+
+-- 🌟 ยืนยันปรับยอดทั้งรอบ: ล็อกล็อตตามลำดับ id, ตรวจไม่ให้ติดลบ, ปรับยอด + บันทึก ADJUST แบบ set-based
+create or replace function public.stock_count_post(p_count_id bigint, p_user_name text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_status text;
+    v_result jsonb;
+begin
+    select status into v_status from public.stock_counts where id = p_count_id for update;
+    if not found then raise exception 'STOCK_COUNT_NOT_FOUND'; end if;
+    if v_status <> 'OPEN' then raise exception 'STOCK_COUNT_NOT_OPEN'; end if;
+
+    drop table if exists _stock_adjust;
+    create temp table _stock_adjust on commit drop as
+    select inventory_id, medicine_id, lot_no, counted_qty - snapshot_qty as variance
+    from public.stock_count_lines
+    where count_id = p_count_id and counted_qty is not null and counted_qty <> snapshot_qty;
+
+    perform 1 from public.inventory i where i.id in (select inventory_id from _stock_adjust) order by i.id for update;
+    if exists (select 1 from public.inventory i join _stock_adjust a on a.inventory_id = i.id where i.qty + a.variance < 0) then
+        raise exception 'NEGATIVE_STOCK';
+    end if;
+
+    update public.inventory i set qty = i.qty + a.variance from _stock_adjust a where i.id = a.inventory_id;
+    insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+    select medicine_id, 'ADJUST', variance, lot_no, p_user_name, 'ปรับยอดจากการตรวจนับสต๊อก รอบที่ ' || p_count_id from _stock_adjust;
+
+    select jsonb_build_object(
+        'lines_counted', (select count(*) from public.stock_count_lines where count_id = p_count_id and counted_qty is not null),
+        'lines_adjusted', count(*),
+        'qty_over', coalesce(sum(variance) filter (where variance > 0), 0),
+        'qty_short', coalesce(-sum(variance) filter (where variance < 0), 0)
+    ) into v_result from _stock_adjust;
+    update public.stock_counts set status = 'POSTED', closed_at = now(), closed_by = p_user_name, result = v_result where id = p_count_id;
+    return v_result;
+end $$;
+
+create or replace function public.stock_count_cancel(p_count_id bigint, p_user_name text)
+returns void
+language sql as $$
+    update public.stock_counts set status = 'CANCELLED', closed_at = now(), closed_by = p_user_name where id = p_count_id and status = 'OPEN';
+$$;
@@ -0,0 +1,14 @@
+-- =====================================================================
+-- 007: บาร์โค้ด GS1 (GTIN) ของเวชภัณฑ์ สำหรับโหมดสแกนรับเข้า/เบิกจ่าย
+-- ยาหนึ่งรายการมีได้หลาย GTIN (ต่างผู้ผลิต หรือต่างขนาดบรรจุ) pack_qty = จำนวนหน่วยนับต่อการสแกนหนึ่งครั้ง
+-- GTIN เก็บแบบ 14 หลักเสมอ (GTIN-8/12/13 เติม 0 ด้านหน้า)
+-- =====================================================================
+
+create table if not exists public.medicine_barcodes (
+    gtin text primary key check (gtin ~ '^[0-9]{14}$'),
+    medicine_id text not null references public.medicines(id) on update cascade on delete cascade,
+    pack_qty integer not null default 1 check (pack_qty > 0),
+    note text,
+    created_at timestamptz not null default now()
+);
+create index if not exists medicine_barcodes_medicine_idx on public.medicine_barcodes (medicine_id);
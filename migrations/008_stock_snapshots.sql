@@ -0,0 +1,152 @@
+-- =====================================================================
+-- 008: ยอดคงเหลือสิ้นเดือน (Month-end snapshot) รายยา+Lot และการถามยอด ณ เวลาใดๆ (ดู stock_snapshot.py)
+-- as_of = วันสุดท้ายของเดือน (เวลาไทย) เก็บยอดจากสมุดบัญชี ณ สิ้นวันนั้น (created_at < 00:00 น. ของวันถัดไป)
+-- ยอด ณ เวลา X = snapshot ล่าสุดก่อน X + ผลรวมรายการหลัง snapshot ถึง X (ไม่ต้องไล่ทั้งสมุดบัญชี)
+-- สมุดบัญชีเป็นแบบเพิ่มต่อท้ายอย่างเดียวและ created_at ไม่ย้อนหลัง snapshot ของเดือนที่ปิดแล้วจึงไม่เปลี่ยนอีก
+-- 🌟 หลังเก็บถาวร (004) ประวัติก่อนวันตัดยอดเหลือเป็นยอดยกมา (carry_forward) ณ วันตัดยอด:
+--    ถ้าเริ่มจาก snapshot ต้องไม่นับยอดยกมาซ้ำ และยอด ณ เวลาก่อนวันตัดยอดตอบได้จาก snapshot ที่ตรงเวลาพอดีเท่านั้น
+-- =====================================================================
+
+create table if not exists public.stock_snapshots (
+    as_of date not null,
+    medicine_id text not null,
+    lot_no text not null,
+    qty integer not null,
+    primary key (as_of, medicine_id, lot_no)
+);
+
+-- ทะเบียนเดือนที่บันทึกแล้ว (แยกจากตัวยอด เพราะเก็บเฉพาะล็อตที่ยอดไม่เป็นศูนย์)
+create table if not exists public.stock_snapshot_runs (
+    as_of date primary key,
+    lot_rows integer not null,
+    qty_total bigint not null,
+    based_on date,
+    created_at timestamptz not null default now()
+);
+
+create or replace function public.bkk_day_end(p_day date)
+returns timestamptz
+language sql immutable as $$ select ((p_day + 1)::timestamp at time zone 'Asia/Bangkok') $$;
+
+create or replace function public.archive_cutoff()
+returns timestamptz
+language sql stable as $$ select max(cutoff) from public.transaction_archives $$;
+
+-- บันทึก snapshot ของวันที่ p_as_of จาก snapshot ก่อนหน้า (ถ้ามี) + รายการในช่วงระหว่างนั้น
+create or replace function public.stock_snapshot_write(p_as_of date)
+returns jsonb
+language plpgsql as $$
+declare
+    v_end timestamptz := public.bkk_day_end(p_as_of);
+    v_cutoff timestamptz := public.archive_cutoff();
+    v_base date;
+    v_rows integer;
+    v_total bigint;
+begin
+    if v_end > now() then raise exception 'SNAPSHOT_NOT_CLOSED'; end if;
+    if v_cutoff is not null and v_end <= v_cutoff then raise exception 'SNAPSHOT_BEFORE_ARCHIVE'; end if;
+    select max(as_of) into v_base from public.stock_snapshot_runs where as_of < p_as_of;
+    if v_base is not null and v_cutoff is not null and public.bkk_day_end(v_base) < v_cutoff then v_base := null; end if;
+
+    delete from public.stock_snapshots where as_of = p_as_of;
+    insert into public.stock_snapshots (as_of, medicine_id, lot_no, qty)
+    select p_as_of, medicine_id, lot_no, sum(qty)
+    from (
+        select medicine_id, lot_no, qty from public.stock_snapshots where as_of = v_base
+        union all
+        select medicine_id, coalesce(lot_no, '-'), qty_change from public.transactions
+        where created_at < v_end
+          and (v_base is null or (created_at >= public.bkk_day_end(v_base) and not carry_forward))
+    ) s
+    group by medicine_id, lot_no
+    having sum(qty) <> 0;
+    get diagnostics v_rows = row_count;
+    select coalesce(sum(qty), 0) into v_total from public.stock_snapshots where as_of = p_as_of;
+
+    insert into public.stock_snapshot_runs (as_of, lot_rows, qty_total, based_on) values (p_as_of, v_rows, v_total, v_base)
+    on conflict (as_of) do update set lot_rows = excluded.lot_rows, qty_total = excluded.qty_total, based_on = excluded.based_on, created_at = now();
+    return jsonb_build_object('as_of', p_as_of, 'lot_rows', v_rows, 'qty_total', v_total, 'based_on', v_base);
+end $$;
+
+-- งานตามเวลา: บันทึกทุกสิ้นเดือนที่ปิดแล้วแต่ยังไม่มี snapshot (ต่อจากเดือนล่าสุดที่มี รันพลาดรอบไหนก็เติมให้เอง)
+-- p_backfill = true ย้อนไปตั้งแต่เดือนแรกในสมุดบัญชี (หรือเดือนแรกหลังวันตัดยอดเก็บถาวร)
+create or replace function public.stock_snapshot_run(p_backfill boolean default false)
+returns jsonb
+language plpgsql as $$
+declare
+    v_last date := date_trunc('month', (now() at time zone 'Asia/Bangkok'))::date - 1;
+    v_cutoff timestamptz := public.archive_cutoff();
+    v_from date;
+    v_month date;
+    v_written jsonb := '[]'::jsonb;
+begin
+    insert into public.job_state (job) values ('stock_snapshot') on conflict do nothing;
+    perform 1 from public.job_state where job = 'stock_snapshot' for update;
+
+    if p_backfill or not exists (select 1 from public.stock_snapshot_runs) then
+        select (date_trunc('month', min(created_at) at time zone 'Asia/Bangkok') + interval '1 month - 1 day')::date into v_from from public.transactions;
+    else
+        select (date_trunc('month', max(as_of)) + interval '2 month - 1 day')::date into v_from from public.stock_snapshot_runs;
+    end if;
+    if v_cutoff is not null then
+        v_from := greatest(v_from, (date_trunc('month', v_cutoff at time zone 'Asia/Bangkok') + interval '1 month - 1 day')::date);
+    end if;
+
+    v_month := v_from;
+    while v_month is not null and v_month <= v_last loop
+        if not exists (select 1 from public.stock_snapshot_runs where as_of = v_month) then
+            v_written := v_written || public.stock_snapshot_write(v_month);
+        end if;
+        v_month := (date_trunc('month', v_month) + interval '2 month - 1 day')::date;
+    end loop;
+
+    update public.job_state set watermark = v_last, last_run_at = now(), last_result = jsonb_build_object('written', jsonb_array_length(v_written))
+    where job = 'stock_snapshot';
+    return jsonb_build_object('last_closed_month', v_last, 'written', v_written);
+end $$;
+
+-- 🌟 ยอดคงเหลือรายยา+Lot ณ เวลา p_at = snapshot ล่าสุดก่อนหน้า + รายการหลังจากนั้น
+create or replace function public.stock_as_of(p_at timestamptz)
+returns table (medicine_id text, lot_no text, qty bigint)
+language plpgsql stable as $$
+declare
+    v_cutoff timestamptz := public.archive_cutoff();
+    v_base date;
+begin
+    select max(r.as_of) into v_base from public.stock_snapshot_runs r where public.bkk_day_end(r.as_of) <= p_at;
+    if v_cutoff is not null and p_at <= v_cutoff then
+        -- ประวัติก่อนวันตัดยอดอยู่ในที่เก็บถาวร ตอบได้เฉพาะเวลาที่ตรงกับ snapshot พอดี
+        if v_base is null or public.bkk_day_end(v_base) <> p_at then raise exception 'HISTORY_ARCHIVED'; end if;
+    elsif v_base is not null and v_cutoff is not null and public.bkk_day_end(v_base) < v_cutoff then
+        v_base := null;
+    end if;
+
+    return query
+    select s.medicine_id, s.lot_no, sum(s.qty)::bigint
+    from (
+        select x.medicine_id, x.lot_no, x.qty::bigint as qty from public.stock_snapshots x where x.as_of = v_base
+        union all
+        select t.medicine_id, coalesce(t.lot_no, '-'), t.qty_change::bigint from public.transactions t
+        where t.created_at < p_at
+          and (v_base is null or (t.created_at >= public.bkk_day_end(v_base) and not t.carry_forward))
+    ) s
+    group by s.medicine_id, s.lot_no
+    having sum(s.qty) <> 0;
+end $$;
+
+-- ยอดยกมา/คงเหลือรายยาของเดือน p_month (วันใดก็ได้ในเดือน) ในคำสั่งเดียว เดือนปัจจุบันใช้ยอด ณ ตอนนี้เป็นยอดคงเหลือ
+create or replace function public.stock_month_balances(p_month date)
+returns table (medicine_id text, opening bigint, closing bigint)
+language sql stable as $$
+    with bounds as (
+        select date_trunc('month', p_month)::date as first_day
+    ), o as (
+        select a.medicine_id, sum(a.qty) as qty from bounds b, public.stock_as_of(public.bkk_day_end(b.first_day - 1)) a group by a.medicine_id
+    ), c as (
+        select a.medicine_id, sum(a.qty) as qty
+        from bounds b, public.stock_as_of(least(now(), public.bkk_day_end((b.first_day + interval '1 month - 1 day')::date))) a
+        group by a.medicine_id
+    )
+    select coalesce(o.medicine_id, c.medicine_id), coalesce(o.qty, 0)::bigint, coalesce(c.qty, 0)::bigint
+    from o full join c on c.medicine_id = o.medicine_id
+$$;
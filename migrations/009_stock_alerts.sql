@@ -0,0 +1,177 @@
+-- =====================================================================
+-- 009: แจ้งเตือนยาต่ำกว่าจุดสั่งซื้อ / ยาหมด / ล็อตใกล้หมดอายุ ผ่าน LINE แบบตามเหตุการณ์ (ดู stock_alerts.py)
+-- ทุกคำสั่งที่เพิ่มรายการในสมุดบัญชี (รับเข้า เบิกจ่าย ปรับยอด ตัดหมดอายุ แก้ไข/ยกเลิก) จะประเมินสถานะใหม่
+-- เฉพาะยาที่อยู่ในคำสั่งนั้น (statement trigger + transition table) ไม่สแกนทั้งคลัง
+-- 🌟 Hysteresis: ลงเป็น LOW เมื่อยอด <= min_stock แต่จะกลับเป็น OK เมื่อยอด > min_stock + alert_band_pct% เท่านั้น
+--    ยาที่ยอดแกว่งรอบจุดสั่งซื้อจึงไม่สลับสถานะไปมา
+-- 🌟 Debounce: สถานะที่ยังไม่ได้แจ้ง (level <> notified_level) ต้องค้างอยู่อย่างน้อย alert_debounce_minutes จึงจะถูกส่ง
+--    ถ้ากลับมาเท่าระดับที่แจ้งไปแล้วก่อนครบเวลา จะไม่มีการแจ้งเลย
+-- งานส่ง (stock_alerts.py) รวมทุกรายการที่ถึงเวลาเป็นข้อความ LINE เดียวต่อรอบ แล้วเรียก stock_alert_ack
+-- =====================================================================
+
+create table if not exists public.settings (id integer primary key);
+alter table public.settings add column if not exists alert_band_pct integer not null default 20;
+alter table public.settings add column if not exists alert_debounce_minutes integer not null default 10;
+alter table public.settings add column if not exists alert_expiry_days integer not null default 90;
+
+-- สถานะปัจจุบันของแต่ละยา (OK / LOW / OUT) และระดับที่แจ้งไปล่าสุด
+create table if not exists public.stock_alert_state (
+    medicine_id text primary key,
+    level text not null check (level in ('OK', 'LOW', 'OUT')),
+    qty integer not null,
+    min_stock integer not null,
+    changed_at timestamptz not null default now(),
+    notified_level text not null default 'OK' check (notified_level in ('OK', 'LOW', 'OUT')),
+    notified_at timestamptz
+);
+create index if not exists stock_alert_state_pending_idx on public.stock_alert_state (changed_at) where level <> notified_level;
+
+-- ล็อตใกล้หมดอายุ แจ้งครั้งเดียวต่อล็อต
+do $$
+declare id_type text;
+begin
+    select format_type(a.atttypid, a.atttypmod) into id_type
+    from pg_attribute a
+    where a.attrelid = 'public.inventory'::regclass and a.attname = 'id';
+    execute format('create table if not exists public.expiry_alerts (
+        inventory_id %s primary key references public.inventory(id) on delete cascade,
+        medicine_id text not null,
+        lot_no text,
+        exp_date date not null,
+        created_at timestamptz not null default now(),
+        status text not null default ''PENDING'' check (status in (''PENDING'', ''SENT'', ''SKIPPED'')),
+        sent_at timestamptz
+    )', id_type);
+end $$;
+create index if not exists expiry_alerts_pending_idx on public.expiry_alerts (created_at) where status = 'PENDING';
+
+-- ประเมินระดับใหม่ของยาที่ระบุ (set-based) แล้ว upsert เฉพาะแถวที่ระดับเปลี่ยน
+create or replace function public.stock_alert_evaluate(p_medicine_ids text[])
+returns void
+language plpgsql as $$
+declare
+    v_band integer;
+begin
+    select alert_band_pct into v_band from public.settings where id = 1;
+    v_band := coalesce(v_band, 20);
+
+    with cur as (
+        select m.id as medicine_id, coalesce(m.min_stock, 0) as min_stock,
+               coalesce((select sum(i.qty) from public.inventory i where i.medicine_id = m.id and i.status = 'ACTIVE'), 0)::integer as qty
+        from public.medicines m
+        where m.id = any(p_medicine_ids) and coalesce(m.is_active, true)
+    ), next as (
+        select c.medicine_id, c.qty, c.min_stock,
+               case
+                   when c.qty <= 0 then 'OUT'
+                   when c.qty <= c.min_stock then 'LOW'
+                   -- อยู่ในช่วง band: คงระดับเดิมไว้ (ถ้าเดิมหมด ตอนนี้มียอดแล้วถือว่ายังต่ำ)
+                   when s.level in ('LOW', 'OUT') and c.qty <= c.min_stock + ceil(c.min_stock * v_band / 100.0) then 'LOW'
+                   else 'OK'
+               end as level,
+               s.level as old_level
+        from cur c left join public.stock_alert_state s on s.medicine_id = c.medicine_id
+    )
+    insert into public.stock_alert_state as s (medicine_id, level, qty, min_stock)
+    select medicine_id, level, qty, min_stock from next
+    where level is distinct from coalesce(old_level, 'OK')
+    on conflict (medicine_id) do update set level = excluded.level, qty = excluded.qty, min_stock = excluded.min_stock, changed_at = now();
+end $$;
+
+create or replace function public.stock_alert_on_ledger()
+returns trigger
+language plpgsql as $$
+declare
+    v_days integer;
+begin
+    perform public.stock_alert_evaluate(array(select distinct medicine_id from new_rows where medicine_id is not null));
+
+    -- ล็อตที่รับเข้ามาโดยวันหมดอายุอยู่ในช่วงเตือนอยู่แล้ว (ล็อตที่เข้าช่วงตามเวลา stock_alert_pending จะเป็นผู้เพิ่ม)
+    if exists (select 1 from new_rows where action_type = 'RECEIVE') then
+        select alert_expiry_days into v_days from public.settings where id = 1;
+        insert into public.expiry_alerts (inventory_id, medicine_id, lot_no, exp_date)
+        select i.id, i.medicine_id, i.lot_no, i.exp_date
+        from public.inventory i
+        join (select distinct medicine_id, lot_no from new_rows where action_type = 'RECEIVE') r on r.medicine_id = i.medicine_id and r.lot_no is not distinct from i.lot_no
+        where i.status = 'ACTIVE' and i.qty > 0 and i.exp_date <= (now() at time zone 'Asia/Bangkok')::date + coalesce(v_days, 90)
+        on conflict do nothing;
+    end if;
+    return null;
+end $$;
+
+drop trigger if exists transactions_stock_alert on public.transactions;
+create trigger transactions_stock_alert after insert on public.transactions
+referencing new table as new_rows for each statement execute function public.stock_alert_on_ledger();
+
+-- แก้จุดสั่งซื้อ / เปิด-ปิดการใช้งานยา ในหน้าข้อมูลยา ก็ประเมินใหม่เฉพาะยาที่ถูกแก้
+create or replace function public.stock_alert_on_medicine()
+returns trigger
+language plpgsql as $$
+begin
+    perform public.stock_alert_evaluate(array(
+        select n.id from new_rows n join old_rows o on o.id = n.id
+        where n.min_stock is distinct from o.min_stock or n.is_active is distinct from o.is_active));
+    return null;
+end $$;
+
+drop trigger if exists medicines_stock_alert on public.medicines;
+create trigger medicines_stock_alert after update on public.medicines
+referencing old table as old_rows new table as new_rows for each statement execute function public.stock_alert_on_medicine();
+
+-- 🌟 รายการที่ถึงเวลาแจ้ง: ระดับยาที่เปลี่ยนค้างเกินเวลา debounce + ล็อตใกล้หมดอายุที่ยังไม่ได้แจ้ง
+-- ก่อนคืนผล จะเพิ่มล็อตที่เพิ่งเข้าช่วงเตือนตามเวลา (ต่อจาก watermark ของรอบก่อน) และข้ามล็อตที่ใช้หมด/ถูกกักกันไปแล้ว
+create or replace function public.stock_alert_pending(p_debounce_minutes integer default null)
+returns jsonb
+language plpgsql as $$
+declare
+    v_today date := (now() at time zone 'Asia/Bangkok')::date;
+    v_days integer;
+    v_debounce integer;
+    v_from date;
+begin
+    select alert_expiry_days, alert_debounce_minutes into v_days, v_debounce from public.settings where id = 1;
+    v_days := coalesce(v_days, 90);
+    v_debounce := coalesce(p_debounce_minutes, v_debounce, 10);
+
+    insert into public.job_state (job) values ('stock_alert') on conflict do nothing;
+    select watermark into v_from from public.job_state where job = 'stock_alert' for update;
+    insert into public.expiry_alerts (inventory_id, medicine_id, lot_no, exp_date)
+    select id, medicine_id, lot_no, exp_date from public.inventory
+    where status = 'ACTIVE' and qty > 0 and exp_date <= v_today + v_days and (v_from is null or exp_date > v_from + v_days)
+    on conflict do nothing;
+    update public.job_state set watermark = v_today, last_run_at = now() where job = 'stock_alert';
+
+    update public.expiry_alerts a set status = 'SKIPPED', sent_at = now()
+    from public.inventory i
+    where a.status = 'PENDING' and i.id = a.inventory_id and (i.status <> 'ACTIVE' or i.qty <= 0);
+
+    return jsonb_build_object(
+        'stock', coalesce((
+            select jsonb_agg(jsonb_build_object('medicine_id', s.medicine_id, 'generic_name', m.generic_name, 'unit', m.unit,
+                                                'level', s.level, 'notified_level', s.notified_level, 'min_stock', s.min_stock,
+                                                'qty', (select coalesce(sum(i.qty), 0) from public.inventory i where i.medicine_id = s.medicine_id and i.status = 'ACTIVE'))
+                             order by m.generic_name)
+            from public.stock_alert_state s join public.medicines m on m.id = s.medicine_id
+            where s.level <> s.notified_level and s.changed_at <= now() - make_interval(mins => v_debounce) and coalesce(m.is_active, true)
+        ), '[]'::jsonb),
+        'expiry', coalesce((
+            select jsonb_agg(jsonb_build_object('inventory_id', a.inventory_id, 'medicine_id', a.medicine_id, 'generic_name', m.generic_name, 'unit', m.unit,
+                                                'lot_no', a.lot_no, 'exp_date', a.exp_date, 'qty', i.qty)
+                             order by a.exp_date, m.generic_name)
+            from public.expiry_alerts a join public.inventory i on i.id = a.inventory_id left join public.medicines m on m.id = a.medicine_id
+            where a.status = 'PENDING'
+        ), '[]'::jsonb));
+end $$;
+
+-- เรียกหลังส่ง LINE สำเร็จ: p_stock = [{"medicine_id", "level"}] ระดับที่แจ้งไป, p_expiry = inventory_id ของล็อตที่แจ้งไป
+-- (ส่งไม่สำเร็จจะไม่ ack รอบถัดไปจึงส่งซ้ำให้เอง)
+create or replace function public.stock_alert_ack(p_stock jsonb, p_expiry jsonb)
+returns void
+language plpgsql as $$
+begin
+    update public.stock_alert_state s set notified_level = x.level, notified_at = now()
+    from jsonb_to_recordset(coalesce(p_stock, '[]'::jsonb)) as x(medicine_id text, level text)
+    where s.medicine_id = x.medicine_id;
+    update public.expiry_alerts set status = 'SENT', sent_at = now()
+    where status = 'PENDING' and inventory_id::text in (select jsonb_array_elements_text(coalesce(p_expiry, '[]'::jsonb)));
+end $$;
@@ -0,0 +1,52 @@
+-- =====================================================================
+-- 010: ตารางเวลารายงาน LINE หลายงาน (รายเดือน / ยาใกล้หมดอายุรายสัปดาห์ / ยาต่ำกว่าจุดสั่งซื้อรายวัน) ดู auto_report.py
+-- 🌟 auto_report.py อ่านการตั้งค่าและรอบล่าสุดของทุกงานด้วยคำขอเดียว (report_schedule) โดยไม่ต้องโหลด pandas/supabase
+-- รอบที่ส่งแล้วเก็บใน job_state (watermark = วันที่ของรอบ) งานที่พลาดรอบ (เช่น GitHub Actions เลื่อนเวลา) จะถูกส่งย้อนในรอบถัดไป
+-- =====================================================================
+
+-- คอลัมน์เดิมของตารางตั้งค่า (ฐานข้อมูลที่สร้างใหม่จาก migrations จะยังไม่มี)
+alter table public.settings add column if not exists report_day integer default 1;
+alter table public.settings add column if not exists report_hour integer default 10;
+alter table public.settings add column if not exists line_token text;
+alter table public.settings add column if not exists line_target_id text;
+alter table public.settings add column if not exists weekly_report_enabled boolean not null default false;
+alter table public.settings add column if not exists weekly_report_weekday integer not null default 1 check (weekly_report_weekday between 1 and 7);
+alter table public.settings add column if not exists daily_report_enabled boolean not null default false;
+alter table public.settings add column if not exists daily_report_hour integer not null default 8 check (daily_report_hour between 0 and 23);
+
+create or replace function public.report_schedule()
+returns jsonb
+language sql stable as $$
+    select jsonb_build_object(
+        'settings', coalesce((select jsonb_build_object('report_day', report_day, 'report_hour', report_hour,
+                                                        'weekly_report_enabled', weekly_report_enabled, 'weekly_report_weekday', weekly_report_weekday,
+                                                        'daily_report_enabled', daily_report_enabled, 'daily_report_hour', daily_report_hour,
+                                                        'alert_expiry_days', alert_expiry_days)
+                              from public.settings where id = 1), '{}'::jsonb),
+        'last', coalesce((select jsonb_object_agg(job, watermark) from public.job_state where job like 'report_%'), '{}'::jsonb))
+$$;
+
+-- จองรอบก่อนส่ง (กันสองตัวส่งรอบเดียวกันซ้ำ เช่น GitHub Actions กับโหมด --serve) คืน claimed และ watermark เดิมไว้คืนค่าถ้าส่งไม่สำเร็จ
+create or replace function public.report_job_claim(p_job text, p_slot date)
+returns jsonb
+language plpgsql as $$
+declare
+    v_prev date;
+begin
+    insert into public.job_state (job) values (p_job) on conflict do nothing;
+    select watermark into v_prev from public.job_state where job = p_job for update;
+    if v_prev is not null and v_prev >= p_slot then return jsonb_build_object('claimed', false, 'previous', v_prev); end if;
+    update public.job_state set watermark = p_slot, last_run_at = now() where job = p_job;
+    return jsonb_build_object('claimed', true, 'previous', v_prev);
+end $$;
+
+create or replace function public.report_job_finish(p_job text, p_slot date, p_ok boolean, p_previous date default null, p_result jsonb default null)
+returns void
+language plpgsql as $$
+begin
+    if p_ok then
+        update public.job_state set last_result = p_result where job = p_job;
+    else
+        update public.job_state set watermark = p_previous, last_result = p_result where job = p_job and watermark = p_slot;
+    end if;
+end $$;
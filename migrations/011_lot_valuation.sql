@@ -0,0 +1,98 @@
+-- =====================================================================
+-- 011: ราคาทุนรายล็อต และมูลค่าคลัง / ต้นทุนการเบิกจ่ายรายเดือน (สำหรับงานการเงิน)
+-- ราคาทุนต่อหน่วยบันทึกที่ล็อตตอนรับเข้า (inventory.unit_cost)
+-- 🌟 ทุกแถวในสมุดบัญชีระบุล็อตที่ตัดจริงตาม FEFO อยู่แล้ว มูลค่าจึงเป็น qty_change x ราคาทุนของล็อตนั้น (ไม่ใช่ราคาเฉลี่ยทั้งยา)
+--    ล็อตเก่าที่ไม่มีราคาทุน ใช้ราคาเฉลี่ยของล็อตอื่นของยาเดียวกันแทน ถ้าไม่มีเลยจะนับเป็นยอด "ยังไม่มีราคาทุน"
+-- มูลค่ารายเดือนคำนวณแบบ set-based ในคำสั่งเดียว ยอดยกมา/คงเหลือรายล็อตมาจาก stock_as_of (snapshot สิ้นเดือนใน 008 + รายการหลังจากนั้น)
+-- จึงอ่านเฉพาะรายการใหม่หลัง snapshot ล่าสุด ไม่ต้องไล่ทั้งสมุดบัญชี และแก้ราคาทุนย้อนหลังแล้วมูลค่าทุกเดือนเปลี่ยนตามทันที
+-- =====================================================================
+
+alter table public.inventory add column if not exists unit_cost numeric(12, 4);
+alter table public.inventory drop constraint if exists inventory_unit_cost_check;
+alter table public.inventory add constraint inventory_unit_cost_check check (unit_cost >= 0);
+
+-- รับเข้าทั้งใบ (แทนของ 005) เพิ่ม unit_cost ต่อบรรทัด (ไม่ระบุได้)
+create or replace function public.receive_lots(p_lines jsonb, p_user_name text, p_note text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_count integer;
+begin
+    if exists (select 1 from jsonb_to_recordset(p_lines) as x(qty integer) where qty is null or qty <= 0) then
+        raise exception 'INVALID_QTY';
+    end if;
+    if exists (select 1 from jsonb_to_recordset(p_lines) as x(unit_cost numeric) where unit_cost < 0) then
+        raise exception 'INVALID_COST';
+    end if;
+    with lines as (
+        select * from jsonb_to_recordset(p_lines) as x(medicine_id text, lot_no text, mfg_date date, exp_date date, qty integer, unit_cost numeric)
+    ), lots as (
+        insert into public.inventory (medicine_id, lot_no, mfg_date, exp_date, qty, unit_cost)
+        select medicine_id, lot_no, mfg_date, exp_date, qty, unit_cost from lines
+        returning medicine_id, lot_no, qty
+    ), ledger as (
+        insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+        select medicine_id, 'RECEIVE', qty, lot_no, p_user_name, p_note from lots
+        returning 1
+    )
+    select count(*) into v_count from ledger;
+    return jsonb_build_object('lots', v_count);
+end $$;
+
+-- ราคาทุนที่ใช้ตีมูลค่าของแต่ละยา+Lot (ล็อตเดียวกันที่รับหลายครั้งใช้ค่าเฉลี่ย) และราคาเฉลี่ยของยาไว้ใช้แทนล็อตที่ไม่มีราคา
+create or replace view public.lot_costs as
+    with lot as (
+        select medicine_id, coalesce(lot_no, '-') as lot_no, avg(unit_cost) as unit_cost
+        from public.inventory where unit_cost is not null
+        group by medicine_id, coalesce(lot_no, '-')
+    )
+    select l.medicine_id, l.lot_no, l.unit_cost, avg(l.unit_cost) over (partition by l.medicine_id) as medicine_avg_cost
+    from lot l;
+
+-- 🌟 มูลค่าของทุกแถวในสมุดบัญชี (รวมต้นทุนของทุกรายการเบิกจ่ายตามล็อตที่ FEFO ตัดจริง)
+create or replace view public.transaction_values as
+    select t.id, t.created_at, t.medicine_id, t.lot_no, t.action_type, t.qty_change,
+           coalesce(l.unit_cost, m.medicine_avg_cost) as unit_cost,
+           t.qty_change * coalesce(l.unit_cost, m.medicine_avg_cost) as value
+    from public.transactions t
+    left join public.lot_costs l on l.medicine_id = t.medicine_id and l.lot_no = coalesce(t.lot_no, '-')
+    left join (select distinct medicine_id, medicine_avg_cost from public.lot_costs) m on m.medicine_id = t.medicine_id;
+
+-- มูลค่ารายยาของเดือน p_month: ยกมา + รับ - เบิก (ต้นทุนขาย) - ตัดหมดอายุ + ปรับยอด + อื่นๆ = คงเหลือ
+-- เดือนปัจจุบันใช้ยอด ณ ตอนนี้เป็นยอดคงเหลือ (เหมือน stock_month_balances)
+create or replace function public.stock_month_valuation(p_month date)
+returns table (medicine_id text, opening_value numeric, receive_value numeric, dispense_cost numeric, expire_value numeric,
+               adjust_value numeric, other_value numeric, closing_value numeric, closing_qty bigint, uncosted_qty bigint)
+language sql stable as $$
+    with b as (
+        select public.bkk_day_end(date_trunc('month', p_month)::date - 1) as t0,
+               least(now(), public.bkk_day_end((date_trunc('month', p_month) + interval '1 month - 1 day')::date)) as t1
+    ), rows as (
+        select a.medicine_id, a.lot_no, 'OPEN' as kind, a.qty from b, public.stock_as_of(b.t0) a
+        union all
+        select a.medicine_id, a.lot_no, 'CLOSE', a.qty from b, public.stock_as_of(b.t1) a
+        union all
+        select t.medicine_id, coalesce(t.lot_no, '-'), t.action_type, sum(t.qty_change)
+        from b, public.transactions t
+        where t.created_at >= b.t0 and t.created_at < b.t1 and not t.carry_forward
+        group by t.medicine_id, coalesce(t.lot_no, '-'), t.action_type
+    ), costed as (
+        select r.medicine_id, r.kind, r.qty, r.qty * coalesce(l.unit_cost, m.medicine_avg_cost) as value,
+               coalesce(l.unit_cost, m.medicine_avg_cost) is null as uncosted
+        from rows r
+        left join public.lot_costs l on l.medicine_id = r.medicine_id and l.lot_no = r.lot_no
+        left join (select distinct medicine_id, medicine_avg_cost from public.lot_costs) m on m.medicine_id = r.medicine_id
+    )
+    select medicine_id,
+           coalesce(sum(value) filter (where kind = 'OPEN'), 0),
+           coalesce(sum(value) filter (where kind = 'RECEIVE'), 0),
+           coalesce(-sum(value) filter (where kind = 'DISPENSE'), 0),
+           coalesce(-sum(value) filter (where kind = 'EXPIRE'), 0),
+           coalesce(sum(value) filter (where kind = 'ADJUST'), 0),
+           coalesce(sum(value) filter (where kind not in ('OPEN', 'CLOSE', 'RECEIVE', 'DISPENSE', 'EXPIRE', 'ADJUST')), 0),
+           coalesce(sum(value) filter (where kind = 'CLOSE'), 0),
+           coalesce(sum(qty) filter (where kind = 'CLOSE'), 0)::bigint,
+           coalesce(sum(qty) filter (where kind = 'CLOSE' and uncosted), 0)::bigint
+    from costed
+    group by medicine_id
+$$;
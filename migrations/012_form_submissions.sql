@@ -0,0 +1,49 @@
+-- =====================================================================
+-- 012: บันทึกฟอร์มจากหน้าเว็บได้ครั้งเดียวต่อ token (กันดับเบิลคลิก/กดซ้ำ รับเข้าหรือเบิกจ่ายซ้ำ)
+-- ทุกฟอร์มที่แสดงมี token (uuid) ของตัวเอง ส่งมาพร้อมคำสั่งผ่าน submit_once (ดู pharmacy/submit.py)
+-- 🌟 จอง token และทำรายการจริงใน transaction เดียวกัน:
+--    - token ที่เคยทำสำเร็จแล้ว -> DUPLICATE_SUBMISSION โดยไม่แตะสต๊อก
+--    - กดพร้อมกันสองครั้ง คำขอที่สองจะรอที่ primary key จนคำขอแรก commit แล้วจึงถูกปฏิเสธ
+--    - คำสั่งจริงผิดพลาด -> การจอง token ถูก rollback ไปด้วย ผู้ใช้แก้ไขแล้วกดส่งใหม่ด้วย token เดิมได้
+-- แนวเดียวกับ dispense_requests ของ batch จาก HIS (002)
+-- =====================================================================
+
+create table if not exists public.form_submissions (
+    token uuid primary key,
+    action text not null,
+    user_name text,
+    result jsonb,
+    created_at timestamptz not null default now()
+);
+create index if not exists form_submissions_created_idx on public.form_submissions (created_at);
+
+-- p_params: พารามิเตอร์ชุดเดียวกับที่ส่งให้ฟังก์ชันนั้นตรงๆ (ชื่อ p_...)
+create or replace function public.submit_once(p_token uuid, p_action text, p_params jsonb)
+returns jsonb
+language plpgsql as $$
+declare
+    v_result jsonb;
+begin
+    if p_action not in ('receive_lots', 'dispense_fefo', 'ledger_amend', 'ledger_void', 'stock_count_open', 'stock_count_post', 'expire_sweep') then
+        raise exception 'UNKNOWN_ACTION:%', p_action;
+    end if;
+
+    insert into public.form_submissions (token, action, user_name) values (p_token, p_action, p_params->>'p_user_name')
+    on conflict (token) do nothing;
+    if not found then raise exception 'DUPLICATE_SUBMISSION'; end if;
+
+    v_result := case p_action
+        when 'receive_lots' then public.receive_lots(p_params->'p_lines', p_params->>'p_user_name', p_params->>'p_note')
+        when 'dispense_fefo' then public.dispense_fefo(p_params->'p_lines', p_params->>'p_user_name', p_params->>'p_note')
+        when 'ledger_amend' then public.ledger_amend(p_params->>'p_trans_id', (p_params->>'p_new_qty_change')::integer, p_params->>'p_note', p_params->>'p_user_name')
+        when 'ledger_void' then public.ledger_void(p_params->>'p_trans_id', p_params->>'p_note', p_params->>'p_user_name')
+        when 'stock_count_open' then public.stock_count_open(p_params->>'p_user_name', p_params->>'p_note')
+        when 'stock_count_post' then public.stock_count_post((p_params->>'p_count_id')::bigint, p_params->>'p_user_name')
+        when 'expire_sweep' then public.expire_sweep(null, coalesce((p_params->>'p_full')::boolean, false), p_params->>'p_user_name')
+    end;
+
+    update public.form_submissions set result = v_result where token = p_token;
+    -- token ใช้กันการส่งซ้ำในไม่กี่นาที จึงเก็บไว้แค่ 7 วัน
+    delete from public.form_submissions where created_at < now() - interval '7 days';
+    return v_result;
+end $$;
@@ -0,0 +1,31 @@
+-- =====================================================================
+-- 013: ส่งคำสั่งที่ค้างในคิวออฟไลน์ของเครื่องหน้างานกลับเข้าระบบทีละก้อน (ดู pharmacy/outbox.py)
+-- รับคำสั่งหลายรายการในคำขอเดียว ทำตามลำดับที่ส่งมา แต่ละคำสั่งผ่าน submit_once (012) ด้วย token เดิมของฟอร์ม
+-- 🌟 แต่ละคำสั่งอยู่ใน subtransaction ของตัวเอง: คำสั่งที่ขัดแย้ง (เช่น ยอดไม่พอเพราะมีคนเบิกไปก่อน) ถูกปฏิเสธเฉพาะรายการนั้น
+--    คำสั่งอื่นในก้อนยังบันทึกต่อได้ ผลของทุกคำสั่งส่งกลับตามลำดับ
+-- ส่งก้อนเดิมซ้ำ (เช่น เน็ตหลุดก่อนได้รับผล) ได้อย่างปลอดภัย คำสั่งที่เคยบันทึกแล้วจะได้สถานะ DUPLICATE ไม่บันทึกซ้ำ
+-- =====================================================================
+
+-- p_commands: [{"token": uuid, "action": "receive_lots", "params": {...}}, ...]
+create or replace function public.submit_batch(p_commands jsonb)
+returns jsonb
+language plpgsql as $$
+declare
+    v_cmd record;
+    v_result jsonb;
+    v_out jsonb := '[]'::jsonb;
+begin
+    for v_cmd in
+        select x.token, x.action, x.params
+        from rows from (jsonb_to_recordset(p_commands) as (token uuid, action text, params jsonb)) with ordinality as x(token, action, params, n)
+        order by x.n
+    loop
+        begin
+            v_result := public.submit_once(v_cmd.token, v_cmd.action, v_cmd.params);
+            v_out := v_out || jsonb_build_object('token', v_cmd.token, 'status', 'APPLIED', 'result', v_result);
+        exception when others then
+            v_out := v_out || jsonb_build_object('token', v_cmd.token, 'status', case when sqlerrm = 'DUPLICATE_SUBMISSION' then 'DUPLICATE' else 'REJECTED' end, 'error', sqlerrm);
+        end;
+    end loop;
+    return v_out;
+end $$;
@@ -0,0 +1,28 @@
+-- =====================================================================
+-- 014: วิเคราะห์การใช้ยาแบบ ABC และ ABC-VEN (สำหรับคณะกรรมการเภสัชกรรมและการบำบัด)
+-- medicines.ven_class = ความจำเป็นทางคลินิกของยา V (Vital), E (Essential), N (Non-essential) กำหนดที่หน้า Master Data
+-- 🌟 dispense_usage รวมปริมาณ/มูลค่าการเบิกจ่ายรายยาของช่วงวันที่ใดก็ได้ในคำสั่งเดียว (อ่านสมุดบัญชีรอบเดียว ไม่ต้องดึงทีละเดือน)
+--    มูลค่าใช้ราคาทุนของล็อตที่ตัดจริงจาก transaction_values (011) รายการแก้ไข/ยกเลิกใช้ action_type เดียวกับต้นฉบับจึงหักล้างกันเอง
+--    เดือนที่เก็บถาวรไปแล้วไม่อยู่ในตารางนี้ แอปอ่านเพิ่มจากไฟล์ Parquet แล้วรวมกันเอง (ดู pharmacy/abc.py)
+-- =====================================================================
+
+alter table public.medicines add column if not exists ven_class text;
+alter table public.medicines drop constraint if exists medicines_ven_class_check;
+alter table public.medicines add constraint medicines_ven_class_check check (ven_class in ('V', 'E', 'N'));
+
+-- ช่วงวันที่ใช้ created_at อย่างเดียว ดัชนีแบบมีเงื่อนไขนี้ให้สแกนเฉพาะแถวเบิกจ่ายในช่วงนั้น
+create index if not exists transactions_dispense_created_at_idx on public.transactions (created_at) include (medicine_id, lot_no, qty_change) where action_type = 'DISPENSE';
+
+-- ยอดเบิกจ่ายสุทธิรายยาตั้งแต่ต้นวัน p_from ถึงสิ้นวัน p_to (เวลาไทย)
+create or replace function public.dispense_usage(p_from date, p_to date)
+returns table (medicine_id text, dispense_qty bigint, dispense_value numeric, uncosted_qty bigint)
+language sql stable as $$
+    select v.medicine_id,
+           coalesce(-sum(v.qty_change), 0)::bigint,
+           coalesce(-sum(v.value), 0),
+           coalesce(-sum(v.qty_change) filter (where v.unit_cost is null), 0)::bigint
+    from public.transaction_values v
+    where v.action_type = 'DISPENSE'
+      and v.created_at >= public.bkk_day_end(p_from - 1) and v.created_at < public.bkk_day_end(p_to)
+    group by v.medicine_id
+$$;
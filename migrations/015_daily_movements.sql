@@ -0,0 +1,95 @@
+-- =====================================================================
+-- 015: ยอดเคลื่อนไหวรายวันต่อยา (รับเข้า / เบิกจ่าย / ตัดหมดอายุ / ปรับยอด) สำหรับหน้าแนวโน้มการใช้ยา (app_pages/trends.py)
+-- 🌟 ปรับยอดทีละคำสั่งด้วย statement trigger (รวม new_rows เป็นวันละแถวต่อยาแล้ว upsert บวกเพิ่ม) ไม่ต้องสแกนสมุดบัญชีใหม่
+--    กราฟหลายปีอ่านจากตารางนี้ แล้วรวมเป็นรายสัปดาห์/เดือนในฐานข้อมูล (movement_series) ส่งมาเฉพาะจุดที่แสดงบนกราฟ
+-- รายการแก้ไข/ยกเลิกนับเข้าวันของรายการต้นฉบับ (ยกเลิกรายการที่บันทึกผิดแล้วยอดของวันนั้นหายไปด้วย ไม่เหลือเป็นยอดติดลบวันอื่น)
+-- ยอดยกมาจากการเก็บถาวร (carry_forward) ไม่ใช่การเคลื่อนไหวจึงไม่นับ และการลบตอนเก็บถาวร (004) ไม่กระทบตารางนี้
+--    ประวัติหลายปีจึงยังดูได้หลังย้ายไปเก็บเป็น Parquet แล้ว (ปีที่เก็บถาวรไปก่อนติดตั้ง migration นี้ เติมด้วย daily_movements.py --archive-uri)
+-- =====================================================================
+
+create table if not exists public.daily_movements (
+    medicine_id text not null,
+    day date not null,
+    receive_qty bigint not null default 0,
+    dispense_qty bigint not null default 0,
+    expire_qty bigint not null default 0,
+    adjust_qty bigint not null default 0,
+    net_qty bigint not null default 0,
+    primary key (medicine_id, day)
+);
+
+-- กราฟของทั้งคลัง/กลุ่มยาอ่านตามช่วงวัน (กราฟรายยาใช้ primary key)
+create index if not exists daily_movements_day_idx on public.daily_movements (day);
+
+create or replace function public.daily_movements_on_ledger()
+returns trigger
+language plpgsql as $$
+begin
+    insert into public.daily_movements as d (medicine_id, day, receive_qty, dispense_qty, expire_qty, adjust_qty, net_qty)
+    select n.medicine_id, (coalesce(o.created_at, n.created_at) at time zone 'Asia/Bangkok')::date,
+           coalesce(sum(n.qty_change) filter (where n.action_type = 'RECEIVE'), 0),
+           coalesce(-sum(n.qty_change) filter (where n.action_type = 'DISPENSE'), 0),
+           coalesce(-sum(n.qty_change) filter (where n.action_type = 'EXPIRE'), 0),
+           coalesce(sum(n.qty_change) filter (where n.action_type not in ('RECEIVE', 'DISPENSE', 'EXPIRE')), 0),
+           sum(n.qty_change)
+    from new_rows n
+    left join public.transactions o on o.id = n.ref_id
+    where not n.carry_forward and n.medicine_id is not null
+    group by 1, 2
+    on conflict (medicine_id, day) do update set
+        receive_qty = d.receive_qty + excluded.receive_qty,
+        dispense_qty = d.dispense_qty + excluded.dispense_qty,
+        expire_qty = d.expire_qty + excluded.expire_qty,
+        adjust_qty = d.adjust_qty + excluded.adjust_qty,
+        net_qty = d.net_qty + excluded.net_qty;
+    return null;
+end $$;
+
+drop trigger if exists transactions_daily_movements on public.transactions;
+create trigger transactions_daily_movements after insert on public.transactions
+referencing new table as new_rows for each statement execute function public.daily_movements_on_ledger();
+
+-- สร้างใหม่ทั้งตารางจากแถวที่อยู่ใน transactions (ติดตั้งครั้งแรก / ตรวจซ่อม) ล็อกตารางไว้ให้คำสั่งที่บันทึกพร้อมกันรอจนเสร็จ
+-- ประวัติที่เก็บถาวรไม่อยู่ในตาราง transactions แล้ว daily_movements.py --archive-uri จะบวกเพิ่มใน transaction เดียวกัน
+create or replace function public.daily_movements_rebuild()
+returns jsonb
+language plpgsql as $$
+declare
+    v_rows integer;
+begin
+    lock table public.daily_movements in exclusive mode;
+    delete from public.daily_movements;
+    insert into public.daily_movements (medicine_id, day, receive_qty, dispense_qty, expire_qty, adjust_qty, net_qty)
+    select t.medicine_id, (coalesce(o.created_at, t.created_at) at time zone 'Asia/Bangkok')::date,
+           coalesce(sum(t.qty_change) filter (where t.action_type = 'RECEIVE'), 0),
+           coalesce(-sum(t.qty_change) filter (where t.action_type = 'DISPENSE'), 0),
+           coalesce(-sum(t.qty_change) filter (where t.action_type = 'EXPIRE'), 0),
+           coalesce(sum(t.qty_change) filter (where t.action_type not in ('RECEIVE', 'DISPENSE', 'EXPIRE')), 0),
+           sum(t.qty_change)
+    from public.transactions t
+    left join public.transactions o on o.id = t.ref_id
+    where not t.carry_forward and t.medicine_id is not null
+    group by 1, 2;
+    get diagnostics v_rows = row_count;
+    return jsonb_build_object('rows', v_rows);
+end $$;
+
+-- 🌟 ยอดเคลื่อนไหวช่วง p_from..p_to (รวมหัวท้าย) รวมเป็นช่วงละหนึ่งแถว p_bucket = day | week | month | quarter | year
+-- กรองเป็นยาตัวเดียว (p_medicine_id) หรือทั้งกลุ่มยา (p_drug_group) ไม่ระบุทั้งคู่ = ทั้งคลัง
+create or replace function public.movement_series(p_from date, p_to date, p_bucket text default 'day', p_medicine_id text default null, p_drug_group text default null)
+returns table (bucket date, receive_qty bigint, dispense_qty bigint, expire_qty bigint, adjust_qty bigint, net_qty bigint)
+language plpgsql stable as $$
+begin
+    if p_bucket not in ('day', 'week', 'month', 'quarter', 'year') then raise exception 'BAD_BUCKET'; end if;
+    return query
+    select date_trunc(p_bucket, d.day)::date,
+           sum(d.receive_qty)::bigint, sum(d.dispense_qty)::bigint, sum(d.expire_qty)::bigint, sum(d.adjust_qty)::bigint, sum(d.net_qty)::bigint
+    from public.daily_movements d
+    where d.day between p_from and p_to
+      and (p_medicine_id is null or d.medicine_id = p_medicine_id)
+      and (p_drug_group is null or d.medicine_id in (select m.id from public.medicines m where m.drug_group = p_drug_group))
+    group by 1
+    order by 1;
+end $$;
+
+select public.daily_movements_rebuild();
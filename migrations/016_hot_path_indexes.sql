@@ -0,0 +1,23 @@
+-- =====================================================================
+-- 016: ดัชนีของคำสั่งที่หน้าเว็บ/งานตามเวลาเรียกบ่อย (ตรวจแผนการค้นด้วย python -m benchmarks.check_query_plans)
+-- PostgREST แบ่งหน้าด้วย order by <คอลัมน์>, id limit/offset (pharmacy/fetch.py) ดัชนีจึงต่อท้ายด้วย id ให้เรียงได้โดยไม่ต้อง sort
+-- ดัชนีที่มีอยู่แล้ว: inventory (medicine_id, lot_no) [001], inventory FEFO (medicine_id, exp_date) where qty > 0 [002],
+--   inventory (exp_date) where ACTIVE [003], transactions (ref_id) [001], รายการเบิกจ่ายตามเวลา [014]
+-- =====================================================================
+
+-- บัญชีคุมคลัง (stock card): รายการของยาตัวเดียวเรียงตามเวลา
+create index if not exists transactions_medicine_created_idx on public.transactions (medicine_id, created_at, id);
+
+-- 🌟 ช่วงเวลา (รายงานประจำเดือน, รายการหลังเปิดรอบตรวจนับ, เก็บถาวร) และหน้าประวัติที่เรียงจากใหม่ไปเก่า
+--    ต่อท้ายด้วย id แทนดัชนี created_at เดิม (004) รายการล่าสุด (ledger_head ของคิวงาน) อ่านได้จากปลายดัชนีทันที
+create index if not exists transactions_created_at_id_idx on public.transactions (created_at, id);
+drop index if exists public.transactions_created_at_idx;
+
+-- ค้นประวัติตามเลข Lot (ตามรอยล็อต / เรียกคืนยา) ข้ามทุกรายการยา
+create index if not exists transactions_lot_no_idx on public.transactions (lot_no, medicine_id);
+
+-- คลังกักกัน (หน้า Admin): ล็อตที่ถูกกักกันเรียงตามวันหมดอายุ
+create index if not exists inventory_quarantine_idx on public.inventory (exp_date) where status = 'QUARANTINE' and quarantined_qty > 0;
+
+-- อนุมัติ/ลบผู้ใช้ในหน้า Admin อ้างด้วยอีเมล
+create index if not exists profiles_email_idx on public.profiles (email);
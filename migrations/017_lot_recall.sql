@@ -0,0 +1,150 @@
+-- =====================================================================
+-- 017: เรียกคืนยาตามเลข Lot (ตามรอยการเบิกจ่าย + ระงับล็อตไม่ให้ถูกตัดจ่ายแบบ FEFO) ดูหน้า "ตามรอย Lot / เรียกคืนยา"
+-- ล็อตที่ถูกระงับมีสถานะ RECALLED: ยอดยังอยู่ใน qty (ยาอยู่ในคลังจริง รอส่งคืนบริษัท) จึงไม่ต้องบันทึกรายการในสมุดบัญชี
+-- ทุกที่ที่ตัดจ่าย/นับยอดพร้อมเบิก (dispense_fefo, dispense_service, get_inventory_view, แจ้งเตือนสต๊อก) ใช้เฉพาะ status = 'ACTIVE' อยู่แล้ว
+-- ตามรอยรายการในสมุดบัญชีใช้ดัชนี transactions (lot_no, medicine_id) จาก 016
+-- =====================================================================
+
+alter table public.inventory drop constraint if exists inventory_status_check;
+alter table public.inventory add constraint inventory_status_check check (status in ('ACTIVE', 'QUARANTINE', 'RECALLED'));
+
+-- ยอดคงเหลือของล็อตที่ถูกเรียกคืน (ค้นด้วยเลข Lot ข้ามทุกรายการยา)
+create index if not exists inventory_lot_no_idx on public.inventory (lot_no);
+
+-- ประกาศเรียกคืนหนึ่งแถวต่อเลข Lot, medicine_id ว่าง = ทุกรายการยาที่มีเลข Lot นี้
+create table if not exists public.lot_recalls (
+    id bigint generated by default as identity primary key,
+    lot_no text not null,
+    medicine_id text,
+    reason text,
+    blocked boolean not null default false,
+    created_by text,
+    created_at timestamptz not null default now(),
+    released_by text,
+    released_at timestamptz
+);
+create index if not exists lot_recalls_open_idx on public.lot_recalls (lot_no) where released_at is null;
+
+-- 🌟 รับเข้าล็อตใหม่ที่เลข Lot อยู่ในประกาศที่ยังระงับอยู่ (เช่น บริษัทส่งยาล็อตเดิมมาอีก) ถูกระงับทันทีตั้งแต่ตอนบันทึก
+create or replace function public.inventory_recall_hold()
+returns trigger
+language plpgsql as $$
+begin
+    if new.status = 'ACTIVE' and exists (
+        select 1 from public.lot_recalls r
+        where r.lot_no = new.lot_no and r.blocked and r.released_at is null and (r.medicine_id is null or r.medicine_id = new.medicine_id)
+    ) then new.status := 'RECALLED'; end if;
+    return new;
+end $$;
+
+drop trigger if exists inventory_recall_hold on public.inventory;
+create trigger inventory_recall_hold before insert on public.inventory
+for each row execute function public.inventory_recall_hold();
+
+-- 🌟 บันทึกประกาศเรียกคืนของหลาย Lot พร้อมกัน p_block = true ระงับล็อตที่ยังใช้งานอยู่ในคำสั่งเดียวกัน
+-- UPDATE ล็อกแถวล็อต ใบเบิกที่กำลังตัดล็อตเดียวกันอยู่จะรอ แล้วเห็นสถานะใหม่ (ไม่ถูกตัดจ่ายหลังระงับแล้ว)
+create or replace function public.lot_recall(p_lots text[], p_medicine_id text, p_reason text, p_block boolean, p_user_name text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_result jsonb;
+begin
+    if not exists (select 1 from unnest(p_lots) l where nullif(trim(l), '') is not null) then raise exception 'NO_LOTS'; end if;
+    with lots as (
+        select distinct trim(l) as lot_no from unnest(p_lots) l where nullif(trim(l), '') is not null
+    ), recalls as (
+        insert into public.lot_recalls (lot_no, medicine_id, reason, blocked, created_by)
+        select lot_no, nullif(p_medicine_id, ''), p_reason, coalesce(p_block, false), p_user_name from lots
+        returning id
+    ), held as (
+        update public.inventory i set status = 'RECALLED'
+        from lots l
+        where coalesce(p_block, false) and i.lot_no = l.lot_no and (nullif(p_medicine_id, '') is null or i.medicine_id = p_medicine_id) and i.status = 'ACTIVE'
+        returning i.qty
+    )
+    select jsonb_build_object(
+        'recall_ids', (select jsonb_agg(id order by id) from recalls),
+        'lots_blocked', (select count(*) from held),
+        'qty_blocked', coalesce((select sum(qty) from held), 0)
+    ) into v_result;
+    return v_result;
+end $$;
+
+-- ยกเลิกการระงับ (เช่น บริษัทแจ้งว่าล็อตนี้ไม่เกี่ยว) ล็อตที่ยังติดประกาศอื่นที่ระงับอยู่จะยังถูกระงับต่อ
+-- ล็อตที่หมดอายุไปแล้วระหว่างถูกระงับ ย้ายเข้าคลังกักกันพร้อมบันทึก EXPIRE แบบเดียวกับ expire_sweep (003)
+create or replace function public.lot_recall_release(p_recall_id bigint, p_user_name text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_today date := (now() at time zone 'Asia/Bangkok')::date;
+    v_recall public.lot_recalls;
+    v_result jsonb;
+begin
+    update public.lot_recalls set released_by = p_user_name, released_at = now()
+    where id = p_recall_id and released_at is null
+    returning * into v_recall;
+    if not found then raise exception 'RECALL_NOT_FOUND'; end if;
+
+    with freed as (
+        select i.id, i.qty, i.exp_date < v_today as expired from public.inventory i
+        where v_recall.blocked and i.status = 'RECALLED' and i.lot_no = v_recall.lot_no
+          and (v_recall.medicine_id is null or i.medicine_id = v_recall.medicine_id)
+          and not exists (
+              select 1 from public.lot_recalls r
+              where r.lot_no = i.lot_no and r.blocked and r.released_at is null and (r.medicine_id is null or r.medicine_id = i.medicine_id)
+          )
+        for update of i
+    ), moved as (
+        update public.inventory i
+        set status = case when f.expired then 'QUARANTINE' else 'ACTIVE' end,
+            quarantined_qty = case when f.expired then i.quarantined_qty + f.qty else i.quarantined_qty end,
+            quarantined_at = case when f.expired then now() else i.quarantined_at end,
+            qty = case when f.expired then 0 else i.qty end
+        from freed f where i.id = f.id
+        returning i.medicine_id, i.lot_no, f.qty, f.expired
+    ), written as (
+        insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+        select medicine_id, 'EXPIRE', -qty, lot_no, p_user_name, 'ตัดจำหน่ายยาหมดอายุ (ย้ายเข้าคลังกักกันหลังยกเลิกการระงับ)' from moved where expired and qty > 0
+        returning 1
+    )
+    select jsonb_build_object(
+        'lots_released', (select count(*) from moved where not expired),
+        'lots_quarantined', (select count(*) from moved where expired),
+        'rows_written', (select count(*) from written)
+    ) into v_result;
+    return v_result;
+end $$;
+
+-- เพิ่มคำสั่งเรียกคืน/ยกเลิกการระงับในรายการที่ส่งผ่าน submit_once ได้ (012) กันกดซ้ำแล้วบันทึกประกาศซ้ำ
+create or replace function public.submit_once(p_token uuid, p_action text, p_params jsonb)
+returns jsonb
+language plpgsql as $$
+declare
+    v_result jsonb;
+begin
+    if p_action not in ('receive_lots', 'dispense_fefo', 'ledger_amend', 'ledger_void', 'stock_count_open', 'stock_count_post', 'expire_sweep', 'lot_recall', 'lot_recall_release') then
+        raise exception 'UNKNOWN_ACTION:%', p_action;
+    end if;
+
+    insert into public.form_submissions (token, action, user_name) values (p_token, p_action, p_params->>'p_user_name')
+    on conflict (token) do nothing;
+    if not found then raise exception 'DUPLICATE_SUBMISSION'; end if;
+
+    v_result := case p_action
+        when 'receive_lots' then public.receive_lots(p_params->'p_lines', p_params->>'p_user_name', p_params->>'p_note')
+        when 'dispense_fefo' then public.dispense_fefo(p_params->'p_lines', p_params->>'p_user_name', p_params->>'p_note')
+        when 'ledger_amend' then public.ledger_amend(p_params->>'p_trans_id', (p_params->>'p_new_qty_change')::integer, p_params->>'p_note', p_params->>'p_user_name')
+        when 'ledger_void' then public.ledger_void(p_params->>'p_trans_id', p_params->>'p_note', p_params->>'p_user_name')
+        when 'stock_count_open' then public.stock_count_open(p_params->>'p_user_name', p_params->>'p_note')
+        when 'stock_count_post' then public.stock_count_post((p_params->>'p_count_id')::bigint, p_params->>'p_user_name')
+        when 'expire_sweep' then public.expire_sweep(null, coalesce((p_params->>'p_full')::boolean, false), p_params->>'p_user_name')
+        when 'lot_recall' then public.lot_recall(array(select jsonb_array_elements_text(p_params->'p_lots')), p_params->>'p_medicine_id', p_params->>'p_reason',
+                                                 coalesce((p_params->>'p_block')::boolean, false), p_params->>'p_user_name')
+        when 'lot_recall_release' then public.lot_recall_release((p_params->>'p_recall_id')::bigint, p_params->>'p_user_name')
+    end;
+
+    update public.form_submissions set result = v_result where token = p_token;
+    -- token ใช้กันการส่งซ้ำในไม่กี่นาที จึงเก็บไว้แค่ 7 วัน
+    delete from public.form_submissions where created_at < now() - interval '7 days';
+    return v_result;
+end $$;
@@ -0,0 +1,133 @@
+-- =====================================================================
+-- 018: หมวดหมู่และกลุ่มยาเป็นตารางมิติที่มีรหัสเป็นตัวเลข (แทนการเทียบข้อความซ้ำๆ ใน Dashboard/รายงาน/Master Data)
+-- medicine_categories: ชื่อหมวดเดิมทุกแบบ (ยาในบัญชี, ยานอกบัญชี, เวชภัณฑ์/วัสดุ ฯลฯ) ผูกกับชนิด DRUG / SUPPLY ที่เดียว
+-- drug_groups: รายชื่อกลุ่มยา (ใช้เป็นตัวเลือกในหน้า Master Data และหน้าแนวโน้ม)
+-- 🌟 ทั้งสองตารางเก็บจำนวนรายการยา (ทั้งหมด / ที่เปิดใช้งาน) ต่อรหัสไว้ ปรับยอดด้วย trigger ทุกครั้งที่แก้ medicines
+--    Dashboard นับยา/มิใช่ยาได้จากตารางมิติ ไม่ต้องโหลดรายการยาทั้งหมดมานับ
+-- คอลัมน์ข้อความ category / drug_group ยังเป็นค่าที่หน้าเว็บบันทึก trigger แปลงเป็น category_id / drug_group_id ให้เอง
+-- (กลุ่มยาที่พิมพ์เพิ่มใหม่ถูกเพิ่มเข้า drug_groups อัตโนมัติ)
+-- =====================================================================
+
+create table if not exists public.medicine_categories (
+    id smallint generated by default as identity primary key,
+    name text not null unique,
+    kind text not null check (kind in ('DRUG', 'SUPPLY')),
+    medicine_count integer not null default 0,
+    active_count integer not null default 0
+);
+
+insert into public.medicine_categories (name, kind) values
+    ('เวชภัณฑ์ยา', 'DRUG'), ('ยาในบัญชี', 'DRUG'), ('ยานอกบัญชี', 'DRUG'),
+    ('เวชภัณฑ์ที่มิใช่ยา', 'SUPPLY'), ('เวชภัณฑ์/วัสดุ', 'SUPPLY')
+on conflict (name) do nothing;
+
+create table if not exists public.drug_groups (
+    id integer generated by default as identity primary key,
+    name text not null unique,
+    medicine_count integer not null default 0,
+    active_count integer not null default 0
+);
+
+-- กลุ่มยาตั้งต้น (เดิมอยู่ในหน้า Master Data)
+insert into public.drug_groups (name) values
+    ('กลุ่มยาแก้ปวด-ลดไข้'), ('กลุ่มยาแก้แพ้'), ('กลุ่มยาระงับอาการไอ ขับเสมหะ'), ('กลุ่มยารักษาโรคหืด'), ('กลุ่มยาต้านแบคทีเรีย / ยาปฏิชีวนะ'),
+    ('กลุ่มยาถ่ายพยาธิ'), ('กลุ่มยาลดกรด - ขับลม'), ('กลุ่มยาระบาย'), ('กลุ่มยาแก้ท้องเสีย'), ('กลุ่มยาแก้ปวดเกร็งในช่องท้อง'),
+    ('กลุ่มยาแก้คลื่นไส้อาเจียน-วิงเวียนศีรษะ'), ('กลุ่มน้ำเกลือและสารน้ำให้ทางหลอดเลือดดำ'), ('กลุ่มยาชาเฉพาะที่'), ('กลุ่มยาช่วยชีวิต'),
+    ('กลุ่มน้ำยาฆ่าเชื้อ'), ('กลุ่มยาที่ใช้สำหรับผิวหนัง'), ('กลุ่มยาหยอดตา-ยาหยอดหู-ยาป้ายแผลในปาก'), ('กลุ่มยาบำรุงโลหิต-ยาวิตามิน'), ('กลุ่มยาสมุนไพร')
+on conflict (name) do nothing;
+
+alter table public.medicines add column if not exists category_id smallint references public.medicine_categories(id);
+alter table public.medicines add column if not exists drug_group_id integer references public.drug_groups(id);
+create index if not exists medicines_category_id_idx on public.medicines (category_id);
+create index if not exists medicines_drug_group_id_idx on public.medicines (drug_group_id);
+
+-- ข้อความ -> รหัส (ตัดช่องว่างหัวท้ายครั้งเดียวตอนบันทึก แทน .astype(str).str.strip() ทุกครั้งที่อ่าน)
+-- หมวดที่ไม่รู้จักได้ category_id ว่าง, กลุ่มยา '-' หรือว่าง = ไม่มีกลุ่ม
+create or replace function public.medicines_dimension_keys()
+returns trigger
+language plpgsql as $$
+declare
+    v_group text := nullif(nullif(trim(new.drug_group), ''), '-');
+begin
+    select id into new.category_id from public.medicine_categories where name = trim(new.category);
+    if v_group is null then new.drug_group_id := null;
+    else
+        insert into public.drug_groups (name) values (v_group) on conflict (name) do nothing;
+        select id into new.drug_group_id from public.drug_groups where name = v_group;
+    end if;
+    return new;
+end $$;
+
+drop trigger if exists medicines_dimension_keys on public.medicines;
+create trigger medicines_dimension_keys before insert or update of category, drug_group on public.medicines
+for each row execute function public.medicines_dimension_keys();
+
+-- ปรับจำนวนรายการต่อรหัส: ถอนยอดของค่าเดิม แล้วบวกยอดของค่าใหม่ (ตาราง medicines เล็กและแก้ไม่บ่อย จึงทำทีละแถว)
+create or replace function public.medicines_dimension_counts()
+returns trigger
+language plpgsql as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update public.medicine_categories set medicine_count = medicine_count - 1, active_count = active_count - (old.is_active is true)::integer where id = old.category_id;
+        update public.drug_groups set medicine_count = medicine_count - 1, active_count = active_count - (old.is_active is true)::integer where id = old.drug_group_id;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        update public.medicine_categories set medicine_count = medicine_count + 1, active_count = active_count + (new.is_active is true)::integer where id = new.category_id;
+        update public.drug_groups set medicine_count = medicine_count + 1, active_count = active_count + (new.is_active is true)::integer where id = new.drug_group_id;
+    end if;
+    return null;
+end $$;
+
+drop trigger if exists medicines_dimension_counts on public.medicines;
+create trigger medicines_dimension_counts after insert or delete on public.medicines
+for each row execute function public.medicines_dimension_counts();
+drop trigger if exists medicines_dimension_counts_update on public.medicines;
+create trigger medicines_dimension_counts_update after update on public.medicines
+for each row when (old.category_id is distinct from new.category_id or old.drug_group_id is distinct from new.drug_group_id or old.is_active is distinct from new.is_active)
+execute function public.medicines_dimension_counts();
+
+-- เติมรหัสให้ยาทุกรายการจากข้อความเดิม แล้วนับยอดใหม่ทั้งหมด (รันซ้ำได้ ใช้แก้ยอดถ้าเคยปิด trigger)
+create or replace function public.medicine_dimensions_rebuild()
+returns jsonb
+language plpgsql as $$
+begin
+    insert into public.drug_groups (name)
+    select distinct nullif(nullif(trim(drug_group), ''), '-') from public.medicines where nullif(nullif(trim(drug_group), ''), '-') is not null
+    on conflict (name) do nothing;
+    update public.medicines m set
+        category_id = (select c.id from public.medicine_categories c where c.name = trim(m.category)),
+        drug_group_id = (select g.id from public.drug_groups g where g.name = nullif(nullif(trim(m.drug_group), ''), '-'));
+    update public.medicine_categories c set medicine_count = coalesce(x.n, 0), active_count = coalesce(x.active, 0)
+    from public.medicine_categories c2
+    left join (select category_id, count(*) as n, count(*) filter (where is_active) as active from public.medicines group by category_id) x on x.category_id = c2.id
+    where c.id = c2.id;
+    update public.drug_groups g set medicine_count = coalesce(x.n, 0), active_count = coalesce(x.active, 0)
+    from public.drug_groups g2
+    left join (select drug_group_id, count(*) as n, count(*) filter (where is_active) as active from public.medicines group by drug_group_id) x on x.drug_group_id = g2.id
+    where g.id = g2.id;
+    return jsonb_build_object(
+        'medicines', (select count(*) from public.medicines),
+        'uncategorized', (select count(*) from public.medicines where category_id is null),
+        'drug_groups', (select count(*) from public.drug_groups)
+    );
+end $$;
+
+select public.medicine_dimensions_rebuild();
+
+-- กราฟแนวโน้มรายกลุ่มยา (015): เลือกยาในกลุ่มด้วย drug_group_id แทนการเทียบข้อความ (ชื่อกลุ่มจาก drug_groups ตัดช่องว่างแล้ว)
+create or replace function public.movement_series(p_from date, p_to date, p_bucket text default 'day', p_medicine_id text default null, p_drug_group text default null)
+returns table (bucket date, receive_qty bigint, dispense_qty bigint, expire_qty bigint, adjust_qty bigint, net_qty bigint)
+language plpgsql stable as $$
+begin
+    if p_bucket not in ('day', 'week', 'month', 'quarter', 'year') then raise exception 'BAD_BUCKET'; end if;
+    return query
+    select date_trunc(p_bucket, d.day)::date,
+           sum(d.receive_qty)::bigint, sum(d.dispense_qty)::bigint, sum(d.expire_qty)::bigint, sum(d.adjust_qty)::bigint, sum(d.net_qty)::bigint
+    from public.daily_movements d
+    where d.day between p_from and p_to
+      and (p_medicine_id is null or d.medicine_id = p_medicine_id)
+      and (p_drug_group is null or d.medicine_id in (
+          select m.id from public.medicines m join public.drug_groups g on g.id = m.drug_group_id where g.name = trim(p_drug_group)))
+    group by 1
+    order by 1;
+end $$;
@@ -0,0 +1,73 @@
+-- =====================================================================
+-- 019: แก้ไข/ยกเลิกรายการในสมุดบัญชี (ledger_correct จาก 001) ให้รู้จักล็อตที่ถูกกักกัน (003) และถูกระงับ (017)
+-- เดิมปรับแค่ inventory.qty ของล็อตเสมอ: ยกเลิกรายการ EXPIRE แล้วยอดกลับเข้า qty ทั้งที่ยังค้างอยู่ใน quarantined_qty
+-- (นับซ้ำสองที่ และล็อตยังเป็น QUARANTINE จึงเบิกจ่ายไม่ได้อีกเลย)
+-- 🌟 ล็อตที่ไม่ใช่ ACTIVE จัดการแยกตามกรณี (ไฟล์ 003 รันไปแล้วจึงแก้ฟังก์ชันในไฟล์ใหม่นี้แทน):
+--   รายการ EXPIRE ของล็อตที่กักกันอยู่ -> ย้ายยอดจาก quarantined_qty กลับเข้า qty และกลับเป็น ACTIVE เมื่อไม่มียอดกักกันเหลือ
+--                                          ถ้าล็อตยังหมดอายุอยู่ ยกเลิก/แก้ไขไม่ได้ (CANNOT_VOID_EXPIRE)
+--   รายการอื่นของล็อตที่กักกันอยู่ (เช่น ยกเลิกการเบิกจ่าย) -> ยอดที่คืนเข้าล็อตเป็นยาหมดอายุ จึงเข้า quarantined_qty
+--                                          พร้อมบันทึก EXPIRE คู่กัน ยอดในคลังจึงยังตรงกับผลรวมของสมุดบัญชี
+--   ล็อตที่ถูกระงับ (RECALLED) -> ปรับ qty ตามปกติ ยอดยังถูกระงับอยู่กับล็อต (dispense_fefo ไม่ตัดจ่าย)
+-- =====================================================================
+
+create or replace function public.ledger_correct(p_trans_id text, p_new_qty_change integer, p_note text, p_user_name text, p_void boolean)
+returns jsonb
+language plpgsql as $$
+declare
+    v_id public.transactions.id%type := p_trans_id;
+    v_today date := (now() at time zone 'Asia/Bangkok')::date;
+    v_orig public.transactions%rowtype;
+    v_net integer;
+    v_delta integer;
+    v_inv public.inventory%rowtype;
+    v_quarantine_delta integer := 0;
+begin
+    -- ล็อกแถวต้นฉบับไว้ เพื่อไม่ให้สองคนแก้รายการเดียวกันพร้อมกัน
+    select * into v_orig from public.transactions where id = v_id for update;
+    if not found then raise exception 'TRANSACTION_NOT_FOUND'; end if;
+    if v_orig.ref_id is not null then raise exception 'CANNOT_CORRECT_COMPENSATING_ENTRY'; end if;
+    if exists (select 1 from public.transactions where ref_id = v_id and entry_kind = 'VOID') then
+        raise exception 'ALREADY_VOIDED';
+    end if;
+
+    select v_orig.qty_change + coalesce(sum(qty_change), 0) into v_net from public.transactions where ref_id = v_id;
+    v_delta := case when p_void then -v_net else p_new_qty_change - v_net end;
+
+    if v_delta <> 0 then
+        select * into v_inv from public.inventory
+        where medicine_id = v_orig.medicine_id and lot_no = v_orig.lot_no
+        order by id limit 1 for update;
+        if found then
+            if v_inv.status = 'QUARANTINE' and v_orig.action_type = 'EXPIRE' then
+                -- ยอดที่ตัดจำหน่ายอยู่ใน quarantined_qty: คืนได้เฉพาะเมื่อล็อตยังไม่หมดอายุ (เช่น ตัดผิดล็อต/วันหมดอายุถูกแก้แล้ว)
+                if v_inv.exp_date < v_today then raise exception 'CANNOT_VOID_EXPIRE'; end if;
+                if v_inv.quarantined_qty - v_delta < 0 or v_inv.qty + v_delta < 0 then raise exception 'NEGATIVE_STOCK'; end if;
+                v_quarantine_delta := -v_delta;
+                update public.inventory
+                set qty = qty + v_delta, quarantined_qty = quarantined_qty - v_delta,
+                    status = case when quarantined_qty - v_delta = 0 then 'ACTIVE' else status end,
+                    quarantined_at = case when quarantined_qty - v_delta = 0 then null else quarantined_at end
+                where id = v_inv.id;
+            elsif v_inv.status = 'QUARANTINE' and v_delta > 0 then
+                -- ยาที่คืนเข้าล็อตที่กักกันแล้วเป็นยาหมดอายุ: เข้า quarantined_qty และตัดจำหน่ายคู่กันในสมุดบัญชี
+                v_quarantine_delta := v_delta;
+                update public.inventory set quarantined_qty = quarantined_qty + v_delta where id = v_inv.id;
+            else
+                -- ACTIVE / RECALLED (และการลดยอดของล็อตที่กักกัน ซึ่ง qty = 0 จึงติดลบ)
+                if v_inv.qty + v_delta < 0 then raise exception 'NEGATIVE_STOCK'; end if;
+                update public.inventory set qty = qty + v_delta where id = v_inv.id;
+            end if;
+        end if;
+    end if;
+
+    insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note, ref_id, entry_kind)
+    values (v_orig.medicine_id, v_orig.action_type, v_delta, v_orig.lot_no, p_user_name, coalesce(p_note, v_orig.note), v_orig.id,
+            case when p_void then 'VOID' else 'AMEND' end);
+    if v_quarantine_delta > 0 and v_orig.action_type <> 'EXPIRE' then
+        insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+        values (v_orig.medicine_id, 'EXPIRE', -v_delta, v_orig.lot_no, p_user_name, 'ตัดจำหน่ายยาหมดอายุ (ยอดที่คืนเข้าล็อตที่กักกันแล้วจากการแก้ไข/ยกเลิกรายการ)');
+    end if;
+
+    return jsonb_build_object('qty_delta', v_delta, 'inventory_found', v_inv.id is not null, 'quarantined_delta', v_quarantine_delta,
+                              'lot_status', v_inv.status);
+end $$;
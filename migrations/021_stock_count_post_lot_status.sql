@@ -0,0 +1,56 @@
+-- =====================================================================
+-- 021: ยืนยันปรับยอดตรวจนับ (stock_count_post จาก 006) เฉพาะล็อตที่ยังใช้งานอยู่ (status = 'ACTIVE')
+-- รอบนับเปิดจาก snapshot ของล็อต ACTIVE แต่ระหว่างนับล็อตอาจถูกกักกัน (003) หรือถูกระงับเรียกคืน (017)
+-- เดิมปรับ qty ของล็อตเหล่านั้นด้วย: ล็อตที่กักกันแล้วมี qty = 0 (ยอดอยู่ใน quarantined_qty) ส่วนต่างจาก snapshot จึงผิดทั้งหมด
+-- 🌟 ล็อก inventory ก่อนแล้วข้ามบรรทัดที่ล็อตไม่ใช่ ACTIVE แล้ว (ไม่ปรับยอด ไม่บันทึก ADJUST)
+--    คืนรายการที่ข้ามใน result.skipped ให้หน้าตรวจนับแจ้งผู้ใช้ไปตรวจสอบล็อตนั้นแยก
+-- =====================================================================
+
+create or replace function public.stock_count_post(p_count_id bigint, p_user_name text)
+returns jsonb
+language plpgsql as $$
+declare
+    v_status text;
+    v_skipped jsonb;
+    v_result jsonb;
+begin
+    select status into v_status from public.stock_counts where id = p_count_id for update;
+    if not found then raise exception 'STOCK_COUNT_NOT_FOUND'; end if;
+    if v_status <> 'OPEN' then raise exception 'STOCK_COUNT_NOT_OPEN'; end if;
+
+    drop table if exists _stock_adjust;
+    create temp table _stock_adjust on commit drop as
+    select id as line_id, inventory_id, medicine_id, lot_no, counted_qty - snapshot_qty as variance
+    from public.stock_count_lines
+    where count_id = p_count_id and counted_qty is not null and counted_qty <> snapshot_qty;
+
+    -- สถานะล็อตอ่านหลังล็อกแถวแล้ว (กักกัน/ระงับที่ commit ก่อนหน้าเห็นแน่นอน ส่วนที่ตามมาต้องรอรอบนี้)
+    perform 1 from public.inventory i where i.id in (select inventory_id from _stock_adjust) order by i.id for update;
+    with skipped as (
+        delete from _stock_adjust a using public.inventory i
+        where i.id = a.inventory_id and i.status <> 'ACTIVE'
+        returning a.line_id, a.medicine_id, a.lot_no, a.variance, i.status
+    )
+    select coalesce(jsonb_agg(jsonb_build_object('line_id', line_id, 'medicine_id', medicine_id, 'lot_no', lot_no, 'variance', variance, 'status', status)
+                              order by medicine_id, lot_no), '[]'::jsonb)
+    into v_skipped from skipped;
+
+    if exists (select 1 from public.inventory i join _stock_adjust a on a.inventory_id = i.id where i.qty + a.variance < 0) then
+        raise exception 'NEGATIVE_STOCK';
+    end if;
+
+    update public.inventory i set qty = i.qty + a.variance from _stock_adjust a where i.id = a.inventory_id;
+    insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+    select medicine_id, 'ADJUST', variance, lot_no, p_user_name, 'ปรับยอดจากการตรวจนับสต๊อก รอบที่ ' || p_count_id from _stock_adjust;
+
+    select jsonb_build_object(
+        'lines_counted', (select count(*) from public.stock_count_lines where count_id = p_count_id and counted_qty is not null),
+        'lines_adjusted', count(*),
+        'qty_over', coalesce(sum(variance) filter (where variance > 0), 0),
+        'qty_short', coalesce(-sum(variance) filter (where variance < 0), 0),
+        'lines_skipped', jsonb_array_length(v_skipped),
+        'skipped', v_skipped
+    ) into v_result from _stock_adjust;
+    update public.stock_counts set status = 'POSTED', closed_at = now(), closed_by = p_user_name, result = v_result where id = p_count_id;
+    return v_result;
+end $$;
@@ -0,0 +1,45 @@
+-- =====================================================================
+-- 022: ตัดยาหมดอายุ (expire_sweep จาก 003) ให้เก็บล็อตที่รับเข้ามาทั้งที่หมดอายุไปแล้วด้วยทุกรอบ
+-- เดิมรอบปกติกรอง exp_date >= watermark ล็อตที่รับเข้าหลังรอบก่อน (receive_lots / ฟอร์มรับเข้า / โหมดสแกน รับวันหมดอายุย้อนหลังได้)
+-- โดยมี exp_date ก่อน watermark จึงไม่ถูกตัดเลย ค้างเป็น ACTIVE และนับเป็นยอดคงเหลือตลอดไปจนกว่าจะมีคนกดสแกนทั้งหมด
+-- 🌟 ไม่ต้องมีขอบล่าง: หลังแต่ละรอบไม่มีล็อต ACTIVE ที่ exp_date < วันรอบนั้นเหลืออยู่ ดัชนีบางส่วน inventory_active_exp_idx (003)
+--    จึงอ่านเฉพาะล็อตที่เพิ่งถึงวันหมดอายุ + ล็อตที่เพิ่งรับเข้าแบบหมดอายุแล้ว ต้นทุนเท่ารอบแบบ watermark เดิม
+-- p_full ยังรับไว้ (คิวออฟไลน์/สคริปต์เดิมส่งมา) แต่ทุกรอบสแกนครบแล้ว watermark เหลือไว้แสดงวันที่รอบล่าสุด
+-- =====================================================================
+
+create or replace function public.expire_sweep(p_as_of date default null, p_full boolean default false, p_user_name text default 'SYSTEM')
+returns jsonb
+language plpgsql as $$
+declare
+    v_as_of date := coalesce(p_as_of, (now() at time zone 'Asia/Bangkok')::date);
+    v_result jsonb;
+begin
+    insert into public.job_state (job) values ('expire_sweep') on conflict do nothing;
+    -- ล็อกแถวสถานะงาน กันไม่ให้รันซ้อนกันสองรอบ
+    perform 1 from public.job_state where job = 'expire_sweep' for update;
+
+    with expired as (
+        select id, medicine_id, lot_no, qty from public.inventory
+        where status = 'ACTIVE' and exp_date < v_as_of
+        for update
+    ), moved as (
+        update public.inventory i
+        set status = 'QUARANTINE', quarantined_qty = i.quarantined_qty + e.qty, quarantined_at = now(), qty = 0
+        from expired e where i.id = e.id
+        returning e.medicine_id, e.lot_no, e.qty
+    ), written as (
+        insert into public.transactions (medicine_id, action_type, qty_change, lot_no, user_name, note)
+        select medicine_id, 'EXPIRE', -qty, lot_no, p_user_name, 'ตัดจำหน่ายยาหมดอายุ (ย้ายเข้าคลังกักกัน)' from moved where qty > 0
+        returning qty_change
+    )
+    select jsonb_build_object(
+        'as_of', v_as_of,
+        'lots_quarantined', (select count(*) from moved),
+        'lots_written_off', (select count(*) from written),
+        'qty_written_off', coalesce((select -sum(qty_change) from written), 0)
+    ) into v_result;
+
+    update public.job_state set watermark = greatest(coalesce(watermark, v_as_of), v_as_of), last_run_at = now(), last_result = v_result
+    where job = 'expire_sweep';
+    return v_result;
+end $$;
@@ -0,0 +1,16 @@
+-- =====================================================================
+-- 023: เวอร์ชันของ Master Data และคลังยา สำหรับ key แคชไฟล์ในคิวงานเบื้องหลัง (pharmacy/jobs.py)
+-- ไฟล์ประวัติทั้งหมด / รายงานผู้บริหาร / บัตรคุมคลัง แคชตามรายการล่าสุดในสมุดบัญชี (ledger_head) + วันที่
+-- แต่ข้อมูลในไฟล์ขึ้นกับตารางอื่นที่เปลี่ยนได้โดยไม่มีรายการใหม่ในสมุดบัญชี: เปลี่ยนรหัสยา (020 แก้ medicine_id ของรายการเดิม),
+-- แก้ชื่อ/หน่วย/หมวดยา, กักกัน/ระงับ/ปลดล็อต (สถานะ inventory) จึงได้ไฟล์เก่าที่ผิดไปจนกว่าจะข้ามวัน
+-- 🌟 master_data_version คืน hash ของทุกแถวใน medicines และ inventory ใส่รวมใน inputs ของงาน
+--    คำนวณเฉพาะตอนกดสร้างไฟล์ (สองตารางนี้มีหลักพันแถว) ไม่ต้องมี trigger นับเวอร์ชันบนตารางที่เขียนทุกการเบิกจ่าย
+-- =====================================================================
+
+create or replace function public.master_data_version()
+returns jsonb
+language sql stable as $$
+    select jsonb_build_object(
+        'medicines', (select md5(coalesce(string_agg(m::text, E'\n' order by m.id), '')) from public.medicines m),
+        'inventory', (select md5(coalesce(string_agg(i::text, E'\n' order by i.id), '')) from public.inventory i))
+$$;
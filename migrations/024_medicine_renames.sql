@@ -0,0 +1,69 @@
+-- =====================================================================
+-- 024: ประวัติการเปลี่ยนรหัสยา (medicine_rename จาก 020) สำหรับประวัติที่เก็บถาวรในไฟล์ Parquet (004, archive_transactions.py)
+-- medicine_rename ย้าย medicine_id ในตารางของฐานข้อมูลได้ แต่ไฟล์ Parquet ของปีงบประมาณที่ปิดแล้วยังเป็นรหัสเดิม
+-- หน้าประวัติ / บัตรคุมคลัง / ไฟล์ประวัติทั้งหมดจึงเห็นรหัสเดิมเป็นยาอีกตัว (ไม่มีชื่อยา) และค้นด้วยรหัสใหม่ไม่เจอ
+-- 🌟 medicine_rename บันทึก (รหัสเดิม, รหัสใหม่, เวลา) ลง medicine_renames แล้ว pharmacy/archive.py แปลงรหัสตอนอ่าน
+--    ตามลำดับเวลา (A -> B -> C ต่อกันได้ และรายการที่เกิดหลังเปลี่ยนรหัสแล้วไม่ถูกแปลง แม้รหัสเดิมจะถูกนำกลับมาใช้ใหม่)
+-- การเปลี่ยนรหัสก่อนติดตั้ง migration นี้ไม่มีบันทึก ต้องเพิ่มแถวใน medicine_renames เอง (renamed_at = เวลาที่เปลี่ยนจริง)
+-- ไม่แปลง dispense_requests (002): result ที่เก็บไว้คือคำตอบเดิมที่ส่งให้ HIS ตอนเบิก ส่งซ้ำด้วย key เดิมต้องได้คำตอบเดิม
+-- =====================================================================
+
+create table if not exists public.medicine_renames (
+    id bigserial primary key,
+    old_id text not null,
+    new_id text not null,
+    renamed_at timestamptz not null default now()
+);
+create index if not exists medicine_renames_new_idx on public.medicine_renames (new_id);
+
+-- p_changes = ค่าใหม่ของคอลัมน์อื่นใน medicines (ชื่อ, หน่วย, หมวด ฯลฯ) ที่แก้มาพร้อมกัน คอลัมน์ที่ไม่ส่งมาคงค่าเดิม
+create or replace function public.medicine_rename(p_old_id text, p_new_id text, p_changes jsonb default '{}'::jsonb)
+returns jsonb
+language plpgsql as $$
+declare
+    v_med public.medicines%rowtype;
+    v_moved jsonb := '{}'::jsonb;
+    v_rows integer;
+begin
+    if nullif(trim(p_new_id), '') is null then raise exception 'MEDICINE_ID_REQUIRED'; end if;
+    -- ล็อกแถวยาเดิม กันสองคนเปลี่ยนรหัสเดียวกันพร้อมกัน
+    select * into v_med from public.medicines where id = p_old_id for update;
+    if not found then raise exception 'MEDICINE_NOT_FOUND'; end if;
+    if p_new_id = p_old_id then raise exception 'MEDICINE_ID_UNCHANGED'; end if;
+    if exists (select 1 from public.medicines where id = p_new_id) then raise exception 'MEDICINE_ID_EXISTS'; end if;
+
+    -- เพิ่มรหัสใหม่ก่อน (inventory อ้าง medicines ด้วย foreign key) trigger ของ 018 คำนวณรหัสหมวด/กลุ่มและจำนวนยาต่อหมวดให้เอง
+    v_med := jsonb_populate_record(v_med, coalesce(p_changes, '{}'::jsonb) || jsonb_build_object('id', p_new_id));
+    insert into public.medicines select v_med.*;
+
+    update public.inventory set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('inventory', v_rows);
+    -- trigger append-only (001) อนุญาตให้เปลี่ยน medicine_id ได้อย่างเดียว
+    update public.transactions set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('transactions', v_rows);
+    -- ต้องย้ายก่อนลบรหัสเดิม ไม่งั้นถูกลบตาม on delete cascade
+    update public.medicine_barcodes set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('medicine_barcodes', v_rows);
+    update public.stock_count_lines set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('stock_count_lines', v_rows);
+    update public.stock_snapshots set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('stock_snapshots', v_rows);
+    update public.daily_movements set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('daily_movements', v_rows);
+    update public.expiry_alerts set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('expiry_alerts', v_rows);
+    update public.lot_recalls set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('lot_recalls', v_rows);
+    -- สถานะแจ้งเตือนค้างของรหัสใหม่ (ถ้าเคยมียารหัสนี้แล้วถูกลบ) ไม่ใช่ของยานี้ ลบทิ้งก่อนย้าย
+    delete from public.stock_alert_state where medicine_id = p_new_id;
+    update public.stock_alert_state set medicine_id = p_new_id where medicine_id = p_old_id;
+    get diagnostics v_rows = row_count; v_moved := v_moved || jsonb_build_object('stock_alert_state', v_rows);
+
+    -- ประวัติในไฟล์ Parquet แก้ไม่ได้ ตัวอ่านที่เก็บถาวรใช้ตารางนี้แปลงรหัสเดิมเป็นรหัสปัจจุบันแทน
+    insert into public.medicine_renames (old_id, new_id) values (p_old_id, p_new_id);
+
+    delete from public.medicines where id = p_old_id;
+    -- จุดสั่งซื้อ/การเปิดใช้งานอาจแก้มาพร้อมกัน (trigger ของ 009 ทำงานเฉพาะ update ของ medicines)
+    perform public.stock_alert_evaluate(array[p_new_id]);
+    return jsonb_build_object('old_id', p_old_id, 'new_id', p_new_id, 'moved', v_moved);
+end $$;
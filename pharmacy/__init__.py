@@ -0,0 +1,2 @@
+# แพ็กเกจบริการกลาง (Data / Service Layer) ที่ทุกหน้าของระบบคลังยาใช้ร่วมกัน
+# หมายเหตุ: อย่า import โมดูลหนักๆ (เช่น reports) ไว้ที่นี่ ให้แต่ละหน้าเรียกเองเมื่อจำเป็น
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from pharmacy.valuation import group_keys, GROUP_LABELS
+
+# --- วิเคราะห์การใช้ยาแบบ ABC และ ABC-VEN (ไม่พึ่ง Streamlit ใช้ได้ทั้งหน้าเว็บและสคริปต์) ---
+# ABC: เรียงรายการจากใช้มากไปน้อย (ตามมูลค่าหรือปริมาณ) แล้วสะสมสัดส่วน รายการที่ยอดสะสม "ก่อนถึงตัวเอง" ยังไม่ถึง 80% = A, ถึง 95% = B, ที่เหลือ = C
+# 🌟 คำนวณทั้งแคตตาล็อกด้วย sort + cumsum ครั้งเดียว (ยาที่ไม่มีการใช้ในช่วงนั้นเป็น C) ไม่วนทีละรายการ
+# ABC-VEN: จับคู่ชั้น ABC กับความจำเป็นทางคลินิก (medicines.ven_class) แบ่งเป็นกลุ่มบริหารจัดการ I / II / III
+
+ABC_LIMITS = (0.80, 0.95)
+USAGE_COLUMNS = ['medicine_id', 'dispense_qty', 'dispense_value', 'uncosted_qty']
+BASIS_LABELS = {'dispense_value': 'มูลค่าการใช้ (บาท)', 'dispense_qty': 'ปริมาณการใช้'}
+LEVEL_LABELS = {'medicine_id': 'รายการยา', **GROUP_LABELS}
+VEN_LABELS = {'V': 'V (จำเป็นยิ่ง)', 'E': 'E (จำเป็น)', 'N': 'N (ไม่จำเป็น)'}
+UNCLASSIFIED = '-'
+# I = ควบคุมใกล้ชิดที่สุด, II = ปานกลาง, III = ทบทวนความจำเป็นในการสำรอง
+MATRIX_GROUPS = {'AV': 'I', 'AE': 'I', 'AN': 'I', 'BV': 'I', 'CV': 'I', 'BE': 'II', 'CE': 'II', 'BN': 'II', 'CN': 'III'}
+COLUMN_LABELS = {'generic_name': 'รายการ', 'unit': 'หน่วยนับ', 'category': 'หมวด', 'drug_group': 'กลุ่มยา', 'items': 'จำนวนรายการ',
+                 'dispense_qty': 'ปริมาณการใช้', 'dispense_value': 'มูลค่าการใช้ (บาท)', 'share': 'สัดส่วน (%)', 'cum_share': 'สัดส่วนสะสม (%)',
+                 'abc': 'ABC', 'ven_class': 'VEN', 'abc_ven': 'ABC-VEN', 'matrix_group': 'กลุ่มบริหารจัดการ', 'uncosted_qty': 'ปริมาณที่ยังไม่มีราคาทุน'}
+
+# values: ยอดใช้ต่อรายการ -> ชั้น A/B/C (index เดิม)
+def abc_classes(values, limits=ABC_LIMITS):
+    ordered = values.sort_values(ascending=False, kind='stable')
+    total = ordered.sum()
+    before = (ordered.cumsum() - ordered) / total if total else pd.Series(1.0, index=ordered.index)
+    return pd.Series(np.select([before < limits[0], before < limits[1]], ['A', 'B'], 'C'), index=ordered.index).reindex(values.index)
+
+# รวมยอดจากหลายแหล่ง (สมุดบัญชีปัจจุบัน + ไฟล์เก็บถาวร) ให้เหลือหนึ่งแถวต่อยา
+def combine_usage(*frames):
+    frames = [f.assign(medicine_id=f['medicine_id'].astype(str)) for f in frames if f is not None and not f.empty]
+    if not frames: return pd.DataFrame(columns=USAGE_COLUMNS)
+    return pd.concat(frames, ignore_index=True).groupby('medicine_id', as_index=False)[USAGE_COLUMNS[1:]].sum()
+
+# ยอดเบิกจ่ายจากประวัติที่เก็บถาวร (trans: คอลัมน์ตาม TRANSACTION_COLUMNS) ตีมูลค่าด้วยราคาทุนรายล็อตแบบเดียวกับ transaction_values (011)
+# costs: แถวจาก view lot_costs (medicine_id, lot_no, unit_cost, medicine_avg_cost), start/end: วันที่ (เวลาไทย) รวมหัวท้าย
+def archived_usage(trans, costs, start, end):
+    if trans.empty: return pd.DataFrame(columns=USAGE_COLUMNS)
+    day = trans['created_at'].dt.tz_convert('Asia/Bangkok').dt.date
+    disp = trans[(trans['action_type'] == 'DISPENSE') & (day >= start) & (day <= end)]
+    disp = pd.DataFrame({'medicine_id': disp['medicine_id'].astype(str), 'lot_no': disp['lot_no'].astype(object).fillna('-').astype(str), 'qty': -disp['qty_change'].astype('int64')})
+    costs = costs.assign(medicine_id=costs['medicine_id'].astype(str), lot_no=costs['lot_no'].astype(str))
+    unit_cost = disp.merge(costs[['medicine_id', 'lot_no', 'unit_cost']], on=['medicine_id', 'lot_no'], how='left')['unit_cost'].to_numpy()
+    avg_cost = disp['medicine_id'].map(costs.drop_duplicates('medicine_id').set_index('medicine_id')['medicine_avg_cost']).to_numpy()
+    cost = pd.Series(np.where(pd.isna(unit_cost), avg_cost, unit_cost), index=disp.index, dtype='float64')
+    disp = disp.assign(dispense_qty=disp['qty'], dispense_value=(disp['qty'] * cost).fillna(0), uncosted_qty=disp['qty'].where(cost.isna(), 0))
+    return disp.groupby('medicine_id', as_index=False)[USAGE_COLUMNS[1:]].sum()
+
+# meds: รายการยา (id, generic_name, unit, category, drug_group, ven_class) ยาที่ไม่มีการใช้ในช่วงนั้นยังอยู่ในตาราง (ชั้น C)
+# by: 'medicine_id' | 'category' | 'drug_group', basis: 'dispense_value' | 'dispense_qty'
+def abc_table(usage, meds, by='medicine_id', basis='dispense_value'):
+    cols = ['id', 'generic_name', 'unit', 'category', 'drug_group'] + (['ven_class'] if 'ven_class' in meds.columns else [])
+    df = meds[cols].rename(columns={'id': 'medicine_id'}).astype({'medicine_id': str}).merge(combine_usage(usage), on='medicine_id', how='left')
+    df[USAGE_COLUMNS[1:]] = df[USAGE_COLUMNS[1:]].fillna(0)
+    if by != 'medicine_id':
+        df = df.assign(items=1).groupby(group_keys(df, by))[['items'] + USAGE_COLUMNS[1:]].sum().reset_index()
+    total = df[basis].sum()
+    df['share'] = df[basis] / total * 100 if total else 0.0
+    df['abc'] = abc_classes(df[basis])
+    df = df.sort_values(basis, ascending=False, kind='stable').reset_index(drop=True)
+    df['cum_share'] = df['share'].cumsum()
+    if by == 'medicine_id':
+        ven = df['ven_class'].astype(object).where(df['ven_class'].isin(list(VEN_LABELS)), UNCLASSIFIED) if 'ven_class' in df.columns else UNCLASSIFIED
+        df['ven_class'] = ven
+        df['abc_ven'] = df['abc'] + df['ven_class']
+        df['matrix_group'] = df['abc_ven'].map(MATRIX_GROUPS).fillna(UNCLASSIFIED)
+    return df
+
+# ตาราง 3x3 ของ ABC x VEN: จำนวนรายการ และสัดส่วนยอดใช้ (%) ต่อช่อง
+def abc_ven_matrix(table, basis='dispense_value'):
+    columns = list(VEN_LABELS) + ([UNCLASSIFIED] if (table['ven_class'] == UNCLASSIFIED).any() else [])
+    counts = pd.crosstab(table['abc'], table['ven_class']).reindex(index=['A', 'B', 'C'], columns=columns, fill_value=0)
+    total = table[basis].sum()
+    shares = table.pivot_table(index='abc', columns='ven_class', values=basis, aggfunc='sum').reindex(index=['A', 'B', 'C'], columns=columns).fillna(0)
+    return counts, (shares / total * 100 if total else shares)
+
+def class_summary(table, basis='dispense_value'):
+    summary = table.groupby('abc')[[basis]].agg(['count', 'sum'])
+    summary.columns = ['items', basis]
+    summary = summary.reindex(['A', 'B', 'C'], fill_value=0)
+    total = summary[basis].sum()
+    return summary.assign(share=summary[basis] / total * 100 if total else 0.0)
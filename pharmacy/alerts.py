@@ -0,0 +1,39 @@
+import datetime
+
+# --- จัดข้อความแจ้งเตือนคลังจากผลของ stock_alert_pending (migrations/009) เป็นข้อความ LINE เดียว ---
+# ไม่พึ่ง Streamlit/pandas เพื่อให้งานส่งแจ้งเตือน (stock_alerts.py) เริ่มได้เร็ว
+
+# ค่าเริ่มต้นของคอลัมน์ใน settings (ตรงกับ default ใน migrations/009)
+ALERT_DEFAULTS = {'alert_band_pct': 20, 'alert_debounce_minutes': 10, 'alert_expiry_days': 90}
+
+MAX_LINES = 10
+LEVEL_SECTIONS = [
+    ("OUT", "⛔ ยาหมดคลัง"),
+    ("LOW", "⚠️ ต่ำกว่าจุดสั่งซื้อ"),
+    ("OK", "✅ กลับมาเหนือจุดสั่งซื้อแล้ว"),
+]
+
+def _section(title, lines, unit_word="รายการ"):
+    text = f"\n\n{title} ({len(lines)} {unit_word}):"
+    text += "".join(f"\n- {line}" for line in lines[:MAX_LINES])
+    if len(lines) > MAX_LINES: text += f"\n...และอื่นๆ อีก {len(lines) - MAX_LINES} {unit_word}"
+    return text
+
+# คืน None ถ้าไม่มีอะไรต้องแจ้ง
+def format_alert_message(pending, now=None):
+    stock, expiry = pending.get('stock') or [], pending.get('expiry') or []
+    if not stock and not expiry: return None
+    now = now or datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=7)))
+    message = f"🔔 แจ้งเตือนคลังเวชภัณฑ์ ({now:%d/%m/%Y %H:%M} น.)"
+    for level, title in LEVEL_SECTIONS:
+        rows = [s for s in stock if s['level'] == level]
+        if rows: message += _section(title, [f"{s['generic_name'] or s['medicine_id']} (เหลือ {s['qty']:,} {s['unit'] or ''} | จุดสั่งซื้อ {s['min_stock']:,})" for s in rows])
+    if expiry:
+        lines = [f"{e['generic_name'] or e['medicine_id']} (Lot: {e['lot_no']})\n  เหลือ {e['qty']:,} {e['unit'] or ''} | หมด: {datetime.date.fromisoformat(e['exp_date']):%d/%m/%Y}" for e in expiry]
+        message += _section("⏰ ล็อตใกล้หมดอายุ", lines, "ล็อต")
+    return message
+
+# ส่วนที่ต้อง ack หลังส่งสำเร็จ (ระดับที่แจ้งไป + ล็อตที่แจ้งไป)
+def ack_payload(pending):
+    return ([{"medicine_id": s['medicine_id'], "level": s['level']} for s in pending.get('stock') or []],
+            [e['inventory_id'] for e in pending.get('expiry') or []])
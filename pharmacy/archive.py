@@ -0,0 +1,144 @@
+import os
+import datetime
+from zoneinfo import ZoneInfo
+import pandas as pd
+from pharmacy.frames import apply_schema, TRANSACTION_COLUMNS
+
+# --- ที่เก็บถาวรของประวัติรับ-จ่าย (ไฟล์ Parquet บีบอัด zstd แบ่งโฟลเดอร์ year=YYYY/month=M ตามเวลาไทย) ---
+# ไฟล์นี้ไม่พึ่ง Streamlit ใช้ได้ทั้งหน้าเว็บ (อ่าน) และ archive_transactions.py (เขียน)
+# ที่เก็บเป็น path ในเครื่อง หรือ URI ที่ pyarrow รองรับ เช่น s3://bucket/pharmacy-archive
+# 🌟 รายการปรับปรุง (AMEND/VOID) ถูกเก็บไว้ในโฟลเดอร์เดือนเดียวกับรายการต้นฉบับ
+#    อ่านทีละเดือนจึงได้ครบทั้งกลุ่ม และยุบยอดด้วย fold_ledger ได้ถูกต้อง
+
+TZ = ZoneInfo('Asia/Bangkok')
+ARCHIVE_COLUMNS = TRANSACTION_COLUMNS
+STAGING_DIR = "_staging"
+
+def default_archive_uri():
+    return os.environ.get("ARCHIVE_URI", "archive/transactions")
+
+def fiscal_year_cutoff(fiscal_year):
+    # ปีงบประมาณ พ.ศ. N = 1 ต.ค. (N-544) ถึง 30 ก.ย. (N-543) -> คืนเวลาเริ่มต้นของปีงบถัดไป
+    return datetime.datetime(fiscal_year - 543, 10, 1, tzinfo=TZ)
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.string()), ('medicine_id', pa.string()), ('action_type', pa.string()), ('qty_change', pa.int32()),
+        ('lot_no', pa.string()), ('user_name', pa.string()), ('note', pa.string()), ('created_at', pa.timestamp('us', tz='UTC')),
+        ('ref_id', pa.string()), ('entry_kind', pa.string()), ('carry_forward', pa.bool_()), ('year', pa.int16()), ('month', pa.int8()),
+    ])
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive')
+
+def _fs(uri):
+    from pyarrow import fs
+    if "://" not in uri: return fs.LocalFileSystem(), os.path.abspath(uri)
+    return fs.FileSystem.from_uri(uri)
+
+def _exists(filesystem, path):
+    from pyarrow.fs import FileType
+    return filesystem.get_file_info(path).type != FileType.NotFound
+
+# --- ฝั่งเขียน ---
+
+# chunks: ชุดของรายการ dict (คอลัมน์ตาม ARCHIVE_COLUMNS + year, month) -> เขียนลงโฟลเดอร์พักก่อน คืน (path, จำนวนแถว, ผลรวม qty_change)
+def write_staging(chunks, uri, tag):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    filesystem, root = _fs(uri)
+    staging = f"{root}/{STAGING_DIR}/{tag}"
+    if _exists(filesystem, staging): filesystem.delete_dir(staging)
+    schema = _schema()
+    totals = {"rows": 0, "qty": 0}
+
+    def batches():
+        for rows in chunks:
+            batch = pa.RecordBatch.from_pylist(rows, schema=schema)
+            totals["rows"] += batch.num_rows
+            totals["qty"] += sum(r['qty_change'] for r in rows)
+            yield batch
+
+    ds.write_dataset(batches(), staging, schema=schema, format='parquet', partitioning=_partitioning(), filesystem=filesystem,
+                     file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+                     basename_template='part-{i}.parquet', max_rows_per_group=64 * 1024, existing_data_behavior='error')
+    return staging, totals["rows"], totals["qty"]
+
+# ย้ายไฟล์จากโฟลเดอร์พักเข้าที่เก็บจริง (ชื่อไฟล์ขึ้นต้นด้วย tag ของรอบนั้น จึงไม่ทับไฟล์ของรอบอื่น)
+def publish_staging(uri, tag):
+    from pyarrow.fs import FileSelector, FileType
+    filesystem, root = _fs(uri)
+    staging = f"{root}/{STAGING_DIR}/{tag}"
+    if not _exists(filesystem, staging): return 0
+    moved = 0
+    for info in filesystem.get_file_info(FileSelector(staging, recursive=True)):
+        if info.type != FileType.File: continue
+        part_dir, name = info.path[len(staging) + 1:].rsplit('/', 1)
+        filesystem.create_dir(f"{root}/{part_dir}")
+        filesystem.move(info.path, f"{root}/{part_dir}/{tag}-{name}")
+        moved += 1
+    filesystem.delete_dir(staging)
+    return moved
+
+def discard_staging(uri, tag):
+    filesystem, root = _fs(uri)
+    staging = f"{root}/{STAGING_DIR}/{tag}"
+    if _exists(filesystem, staging): filesystem.delete_dir(staging)
+
+# --- ฝั่งอ่าน ---
+
+# รายชื่อเดือนที่มีในที่เก็บถาวร ('YYYY-MM') อ่านจากชื่อโฟลเดอร์อย่างเดียว ไม่เปิดไฟล์
+def archived_months(uri=None):
+    from pyarrow.fs import FileSelector, FileType
+    filesystem, root = _fs(uri or default_archive_uri())
+    if not _exists(filesystem, root): return []
+    months = []
+    for y in filesystem.get_file_info(FileSelector(root)):
+        if y.type != FileType.Directory or not y.base_name.startswith('year='): continue
+        for m in filesystem.get_file_info(FileSelector(y.path)):
+            if m.type == FileType.Directory and m.base_name.startswith('month='):
+                months.append(f"{int(y.base_name[5:]):04d}-{int(m.base_name[6:]):02d}")
+    return sorted(months, reverse=True)
+
+# 🌟 ไฟล์ Parquet เก็บรหัสยา ณ ตอนเก็บถาวร เปลี่ยนรหัสยาทีหลัง (medicine_rename) แปลงตอนอ่านตาม medicine_renames (migrations/024)
+# renames: DataFrame (old_id, new_id, renamed_at) แปลงเฉพาะรายการที่เกิดก่อนเปลี่ยนรหัส ไล่ตามลำดับเวลาจึงต่อกันได้ (A -> B -> C)
+def apply_renames(df, renames):
+    if renames is None or renames.empty or df.empty: return df
+    ids = df['medicine_id'].astype(object)
+    for old_id, new_id, renamed_at in renames.sort_values('renamed_at')[['old_id', 'new_id', 'renamed_at']].itertuples(index=False):
+        ids = ids.mask((ids == old_id) & (df['created_at'] < renamed_at), new_id)
+    df['medicine_id'] = ids.astype('category')
+    return df
+
+# รหัสยาทุกตัวที่เคยเป็นยา medicine_id (ใช้กรองไฟล์ด้วยรหัสเดิมด้วย แล้วค่อยแปลงรหัส)
+def _former_ids(medicine_id, renames):
+    ids = {str(medicine_id)}
+    if renames is None: return ids
+    for old_id, new_id in renames.sort_values('renamed_at', ascending=False)[['old_id', 'new_id']].itertuples(index=False):
+        if new_id in ids: ids.add(old_id)
+    return ids
+
+# อ่านเฉพาะเดือน/ยาที่ต้องการ: เดือนถูกกรองจากชื่อโฟลเดอร์ ส่วน medicine_id ถูกกรองจากสถิติใน row group ของ Parquet
+# lots: เลข Lot (ตามรอย Lot / เรียกคืนยา) กรองระหว่างอ่าน ไม่ต้องแปลงทั้งไฟล์เป็น DataFrame
+def load_archived(uri=None, months=None, medicine_id=None, lots=None, renames=None):
+    import pyarrow.dataset as ds
+    filesystem, root = _fs(uri or default_archive_uri())
+    if not _exists(filesystem, root): return pd.DataFrame(columns=ARCHIVE_COLUMNS)
+    dataset = ds.dataset(root, filesystem=filesystem, format='parquet', partitioning=_partitioning())
+    flt = None
+    for ym in months or []:
+        y, m = ym.split('-')
+        cond = (ds.field('year') == int(y)) & (ds.field('month') == int(m))
+        flt = cond if flt is None else flt | cond
+    if medicine_id is not None:
+        cond = ds.field('medicine_id').isin(list(_former_ids(medicine_id, renames)))
+        flt = cond if flt is None else flt & cond
+    if lots:
+        cond = ds.field('lot_no').isin([str(l) for l in lots])
+        flt = cond if flt is None else flt & cond
+    # ใช้ชนิดคอลัมน์เดียวกับข้อมูลจาก Supabase (pharmacy/frames.py) เพื่อรวมกับตารางปัจจุบันได้ทันที
+    df = apply_renames(apply_schema(dataset.to_table(columns=ARCHIVE_COLUMNS, filter=flt).to_pandas(), "transactions"), renames)
+    return df[df['medicine_id'] == str(medicine_id)].reset_index(drop=True) if medicine_id is not None and renames is not None and not df.empty else df
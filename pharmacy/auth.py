@@ -0,0 +1,43 @@
+import streamlit as st
+from pharmacy.db import supabase
+from pharmacy.submit import flash
+
+def init_session_state():
+    if 'user' not in st.session_state: st.session_state.user = None
+    if 'role' not in st.session_state: st.session_state.role = None
+    if 'user_email' not in st.session_state: st.session_state.user_email = None
+    if 'full_name' not in st.session_state: st.session_state.full_name = None
+    if 'reorder_manual_added' not in st.session_state: st.session_state.reorder_manual_added = []
+    if 'reorder_manual_removed' not in st.session_state: st.session_state.reorder_manual_removed = []
+    if 'reorder_quantities' not in st.session_state: st.session_state.reorder_quantities = {}
+
+def current_user_name():
+    return st.session_state.full_name if st.session_state.full_name else st.session_state.user_email
+
+def login_user(email, password):
+    try:
+        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        profile = supabase.table("profiles").select("*").eq("id", response.user.id).execute()
+        if profile.data:
+            if profile.data[0]['is_approved']:
+                st.session_state.user = response.user
+                st.session_state.role = profile.data[0]['role']
+                st.session_state.user_email = email
+                saved_name = profile.data[0].get('full_name')
+                st.session_state.full_name = saved_name if saved_name else email
+                flash(f"เข้าสู่ระบบสำเร็จ! ยินดีต้อนรับ {st.session_state.full_name}", icon="👋"); st.rerun()
+            else: st.warning("บัญชีของคุณอยู่ระหว่างรอการอนุมัติจากผู้ดูแลระบบ")
+        else: st.error("ไม่พบข้อมูลสิทธิ์ผู้ใช้งาน หรือบัญชีถูกระงับ")
+    except Exception as e:
+        st.error("อีเมลหรือรหัสผ่านไม่ถูกต้อง")
+
+def logout_user():
+    supabase.auth.sign_out()
+    st.session_state.user = None
+    st.session_state.role = None
+    st.session_state.full_name = None
+    st.session_state.reorder_manual_added = []
+    st.session_state.reorder_manual_removed = []
+    st.session_state.reorder_quantities = {}
+    if "reorder_table" in st.session_state: del st.session_state["reorder_table"]
+    st.rerun()
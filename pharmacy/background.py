@@ -0,0 +1,60 @@
+import os
+import streamlit as st
+from pharmacy import jobs
+
+# --- งานเบื้องหลังของหน้าเว็บ: เชื่อมคิวงาน (pharmacy/jobs.py) กับ session ของผู้ใช้ ---
+# กดปุ่มสร้างไฟล์ -> ส่งงานเข้าคิวแล้วจบ rerun ทันที (ไม่ค้างอยู่ใต้ st.spinner) ผู้ใช้กรอกฟอร์ม/เปลี่ยนหน้าได้ระหว่างรอ
+# 🌟 ระหว่างรอมีแค่ fragment เล็กๆ ถามสถานะทุก POLL_SECONDS วินาที พอเสร็จจึง rerun ทั้งหน้าครั้งเดียวเพื่อแสดงปุ่มดาวน์โหลด
+# ตำแหน่งไฟล์คิวกำหนดด้วย PHARMACY_JOBS (ค่าเริ่มต้น .pharmacy_jobs.sqlite ในโฟลเดอร์ที่รันแอป)
+
+JOBS_PATH = os.environ.get("PHARMACY_JOBS", ".pharmacy_jobs.sqlite")
+POLL_SECONDS = 2
+JOB_ERRORS = {'INTERRUPTED': "งานถูกยกเลิกเพราะเซิร์ฟเวอร์เริ่มใหม่ระหว่างสร้างไฟล์ กรุณากดสร้างอีกครั้ง"}
+
+@st.cache_resource
+def job_runner():
+    runner = jobs.JobRunner(JOBS_PATH)
+    runner.prune()
+    return runner
+
+# name: ชื่อช่องของงานใน session (หนึ่งงานล่าสุดต่อช่อง), inputs: ทุกอย่างที่ผลลัพธ์ขึ้นอยู่ (ใช้ทำ key แคช)
+# build: ฟังก์ชันไม่มีอาร์กิวเมนต์ คืน (bytes, ชื่อไฟล์, mime) ห้ามเรียก st.* ข้างใน
+# progress=True: build รับ report(done, total) ไว้รายงานความคืบหน้า แสดงเป็นแถบระหว่างรอ
+def start_job(name, kind, inputs, build, label=None, progress=False):
+    from pharmacy.auth import current_user_name
+    key = jobs.content_key(kind, *inputs)
+    st.session_state[f"job_{name}"] = job_runner().submit(kind, key, build, label=label, user_name=current_user_name(), progress=progress)
+
+def clear_job(name):
+    st.session_state.pop(f"job_{name}", None)
+
+@st.fragment(run_every=POLL_SECONDS)
+def _poll(job_id, waiting_text):
+    job = job_runner().status(job_id)
+    if job is None or job['status'] not in jobs.ACTIVE: st.rerun()
+    st.info(f"⏳ {waiting_text} (สร้างอยู่เบื้องหลัง ใช้งานส่วนอื่นหรือเปลี่ยนหน้าได้เลย ไฟล์จะรออยู่ที่นี่)")
+    if job.get('progress_total'): st.progress(min(job['progress_done'] / job['progress_total'], 1.0), text=f"{job['progress_done']:,} / {job['progress_total']:,}")
+
+# แสดงสถานะงานล่าสุดของช่องนี้ คืน (bytes, ชื่อไฟล์, mime) เมื่อเสร็จแล้ว นอกนั้นคืน None
+# inputs: ข้อมูลตั้งต้นปัจจุบันของหน้า (ถ้าให้มา) ข้อมูลเปลี่ยนไปจากตอนสั่งงานแล้วจะไม่แสดงไฟล์เก่า
+def job_result(name, waiting_text="กำลังสร้างไฟล์...", inputs=None):
+    job_id = st.session_state.get(f"job_{name}")
+    if not job_id: return None
+    job = job_runner().status(job_id)
+    if job is None or (inputs is not None and jobs.content_key(job['kind'], *inputs) != job['key']):
+        clear_job(name)
+        return None
+    if job['status'] in jobs.ACTIVE:
+        _poll(job_id, waiting_text)
+        return None
+    if job['status'] == jobs.FAILED:
+        st.error(f"❌ สร้างไฟล์ไม่สำเร็จ: {JOB_ERRORS.get(job['error'], job['error'])}")
+        return None
+    artifact = job_runner().artifact(job['key'])
+    if artifact is None: clear_job(name)
+    elif job['cached']: st.caption("⚡ ข้อมูลไม่เปลี่ยนจากครั้งก่อน ใช้ไฟล์ที่สร้างไว้แล้ว")
+    return artifact
+
+def download_artifact(artifact, label, **kwargs):
+    data, file_name, mime = artifact
+    return st.download_button(label, data=data, file_name=file_name, mime=mime, **kwargs)
@@ -0,0 +1,239 @@
+import streamlit as st
+from supabase import create_client
+import pandas as pd
+import datetime
+from pharmacy.frames import typed_frame, add_display_columns, TRANSACTION_COLUMNS
+from pharmacy.offline import offline_read, provisional_inventory
+
+# --- การเชื่อมต่อฐานข้อมูล และฟังก์ชันดึงข้อมูลที่ทุกหน้าใช้ร่วมกัน ---
+
+@st.cache_resource
+def init_connection():
+    try:
+        url = st.secrets["supabase"]["supabase_url"]
+        key = st.secrets["supabase"]["supabase_key"]
+        return create_client(url, key)
+    except:
+        st.error("❌ ไม่พบ Secrets! กรุณาตั้งค่า supabase_url และ supabase_key ใน Streamlit")
+        return None
+
+supabase = init_connection()
+
+# 🌟 Master Data เปลี่ยนไม่บ่อย จึงแคชไว้ข้าม rerun (ล้างแคชทุกครั้งที่มีการบันทึกผ่าน invalidate_cache)
+# ข้อมูลที่ฟอร์มรับเข้า/เบิกจ่ายต้องใช้มีสำเนาในเครื่อง ใช้แทนได้ตอนเน็ตหลุด (ดู pharmacy/offline.py)
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_medicines():
+    return typed_frame(supabase.table("medicines").select("*").eq("is_active", True).execute().data, "medicines")
+
+def get_medicines():
+    return offline_read("medicines", _load_medicines, schema="medicines")
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_medicine_names():
+    return pd.DataFrame(supabase.table("medicines").select("id, generic_name, unit").execute().data)
+
+def get_medicine_names():
+    return offline_read("medicine_names", _load_medicine_names)
+
+# รายการยาทุกตัวรวมที่ปิดใช้งานแล้ว (หน้าแก้ไข Master Data) เฉพาะคอลัมน์ที่ฟอร์มแก้ไขใช้ แคชแบบเดียวกับ get_medicines
+EDIT_MEDICINE_COLUMNS = ["id", "generic_name", "unit", "category_id", "drug_group", "min_stock", "ven_class", "is_active"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_all_medicines():
+    return fetch("medicines", EDIT_MEDICINE_COLUMNS)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_user_name_map():
+    prof_res = supabase.table("profiles").select("email, full_name").execute()
+    if not prof_res.data: return {}
+    prof_df = pd.DataFrame(prof_res.data)
+    valid_prof = prof_df[prof_df['full_name'].notna() & (prof_df['full_name'].astype(str).str.strip() != '') & (prof_df['full_name'].astype(str).str.strip() != 'None')]
+    return {str(e).strip().lower(): str(n).strip() for e, n in zip(valid_prof['email'], valid_prof['full_name'])}
+
+# 🌟 ตารางมิติหมวดหมู่/กลุ่มยา (migrations/018_medicine_dimensions.sql) มีไม่กี่สิบแถว แคชไว้ในหน่วยความจำทั้งตาราง
+# พร้อมจำนวนรายการยาต่อรหัสที่ฐานข้อมูลนับไว้ (ล้างพร้อมแคชอื่นเมื่อแก้ Master Data)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_categories():
+    from pharmacy.dimensions import CATEGORY_COLUMNS
+    return fetch("medicine_categories", CATEGORY_COLUMNS)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_drug_groups():
+    from pharmacy.dimensions import GROUP_COLUMNS
+    return fetch("drug_groups", GROUP_COLUMNS, order="name")
+
+# GTIN 14 หลัก -> (รหัสยา, จำนวนต่อการสแกน) สำหรับโหมดสแกนบาร์โค้ด
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_barcodes():
+    return pd.DataFrame(supabase.table("medicine_barcodes").select("gtin, medicine_id, pack_qty").execute().data, columns=["gtin", "medicine_id", "pack_qty"])
+
+def get_gtin_index():
+    rows = offline_read("barcodes", _load_barcodes)
+    return {g: (m, int(p) if pd.notna(p) and p else 1) for g, m, p in zip(rows['gtin'].astype(str), rows['medicine_id'], rows['pack_qty'])}
+
+def invalidate_cache():
+    st.cache_data.clear()
+
+# 🌟 ดึงเฉพาะคอลัมน์ที่ต้องใช้แบบ CSV เป็นหน้าๆ ได้ DataFrame ที่กำหนดชนิดคอลัมน์แล้ว (ดู pharmacy/fetch.py)
+def fetch(table, columns, filters=(), order=None, desc=False, key=("id",)):
+    from pharmacy.fetch import fetch_frame
+    from pharmacy.profiling import record_rows
+    df = fetch_frame(supabase, table, columns, filters, order, desc, key=key)
+    record_rows(table, len(df))
+    return df
+
+# เลข Lot และวันหมดอายุที่มีอยู่แล้วของยาที่ระบุ (ใช้ตรวจ Lot ซ้ำตอนรับเข้าแบบตาราง)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_lot_expiries(medicine_ids):
+    if not medicine_ids: return pd.DataFrame(columns=["medicine_id", "lot_no", "exp_date"])
+    return fetch("inventory", ["id", "medicine_id", "lot_no", "exp_date"], [("in_", "medicine_id", list(medicine_ids))])
+
+# ล็อตที่พร้อมเบิกจ่าย: มียอด, ไม่ถูกกักกัน และยังไม่หมดอายุ (รวมผลของคำสั่งที่ยังค้างในคิวออฟไลน์)
+def get_inventory_view():
+    meds = get_medicine_names()
+    inv = provisional_inventory(lambda: fetch("inventory", ["id", "medicine_id", "lot_no", "exp_date", "qty"], [("gt", "qty", 0), ("eq", "status", "ACTIVE"), ("gte", "exp_date", str(datetime.date.today()))]))
+    if inv.empty: return pd.DataFrame()
+    merged = pd.merge(inv, meds, left_on="medicine_id", right_on="id", how="left", suffixes=('', '_med'))
+    return merged[merged['qty'] > 0]
+
+def map_user_names(df, col_name='user_name'):
+    if df.empty or col_name not in df.columns: return df
+    try:
+        email_to_name = get_user_name_map()
+        if email_to_name:
+            def replace_name(val):
+                if pd.isna(val): return val
+                clean_val = str(val).strip().lower()
+                return email_to_name.get(clean_val, val)
+            # คอลัมน์ category แปลงเฉพาะค่าที่ไม่ซ้ำ แล้วเก็บกลับเป็น category เหมือนเดิม
+            if isinstance(df[col_name].dtype, pd.CategoricalDtype):
+                df[col_name] = df[col_name].map({c: replace_name(c) for c in df[col_name].cat.categories}).astype('category')
+            else: df[col_name] = df[col_name].apply(replace_name)
+    except: pass
+    return df
+
+# 🌟 คอลัมน์แสดงผล (เวลาไทย, ym, วันที่แบบข้อความ, ป้ายภาษาไทย) คำนวณครั้งเดียวต่อชุดข้อมูล
+# แคชตาม hash ของเนื้อหาทั้งตาราง (Streamlit จะสุ่มแถวมา hash เมื่อเกิน 100k แถว จึงคำนวณ key เอง)
+# rerun ที่ข้อมูลไม่เปลี่ยนจะไม่ต้อง strftime ใหม่ทั้งตาราง
+def with_display_columns(df, fmt='%d/%m/%Y %H:%M:%S'):
+    if df.empty: return df
+    return _display_columns(df, fmt, int(pd.util.hash_pandas_object(df).sum()))
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def _display_columns(_df, fmt, content_key):
+    return add_display_columns(_df.copy(), fmt)
+
+def get_transactions_view(folded=True):
+    from pharmacy.ledger import fold_ledger
+    trans = fetch("transactions", TRANSACTION_COLUMNS, order="created_at", desc=True)
+    meds = get_medicine_names()
+    if trans.empty: return pd.DataFrame()
+    if folded: trans = fold_ledger(trans)
+    merged = pd.merge(trans, meds, left_on="medicine_id", right_on="id", how="left", suffixes=('', '_med'))
+    return map_user_names(merged)
+
+# --- ประวัติของปีงบประมาณที่ปิดแล้ว (ไฟล์ Parquet จาก archive_transactions.py) อ่านแยกจากตาราง transactions ---
+def get_archive_uri():
+    from pharmacy.archive import default_archive_uri
+    try: return st.secrets["archive"]["uri"]
+    except Exception: return default_archive_uri()
+
+# 🌟 ไฟล์ที่เก็บถาวรแล้วไม่มีการแก้ไขอีก จึงแคชได้นานกว่า Master Data
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_archived_months():
+    from pharmacy.archive import archived_months
+    try: return archived_months(get_archive_uri())
+    except Exception: return []
+
+# ประวัติการเปลี่ยนรหัสยา (migrations/024_medicine_renames.sql) ใช้แปลงรหัสเดิมในไฟล์ที่เก็บถาวร
+# (medicine_rename ในหน้า Master Data เรียก invalidate_cache ทุกครั้ง แคชของที่เก็บถาวรจึงไม่ค้างรหัสเดิม)
+RENAME_COLUMNS = ["old_id", "new_id", "renamed_at"]
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_archived_transactions(months=None, medicine_id=None, lots=None):
+    from pharmacy.archive import load_archived
+    return load_archived(get_archive_uri(), months=list(months) if months else None, medicine_id=medicine_id, lots=list(lots) if lots else None,
+                         renames=fetch("medicine_renames", RENAME_COLUMNS))
+
+def get_archived_transactions_view(months, folded=True):
+    from pharmacy.ledger import fold_ledger
+    trans = get_archived_transactions(tuple(months))
+    if trans.empty: return pd.DataFrame()
+    if folded: trans = fold_ledger(trans)
+    merged = pd.merge(trans.assign(archived=True), get_medicine_names(), left_on="medicine_id", right_on="id", how="left", suffixes=('', '_med'))
+    return map_user_names(merged)
+
+# --- ตามรอย Lot / เรียกคืนยา (migrations/017_lot_recall.sql) ---
+# 🌟 ทุกรายการของเลข Lot ที่ระบุ ค้นผ่านดัชนี transactions (lot_no, medicine_id) [016] ไม่ต้องโหลดประวัติทั้งหมดมากรอง
+# include_archive: รวมปีงบประมาณที่ปิดแล้วจากไฟล์ Parquet (กรองเลข Lot ระหว่างอ่าน)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_lot_trace(lots, medicine_id=None, include_archive=False):
+    from pharmacy.ledger import fold_ledger
+    filters = [("in_", "lot_no", list(lots))] + ([("eq", "medicine_id", medicine_id)] if medicine_id else [])
+    trans = fetch("transactions", TRANSACTION_COLUMNS, filters, order="created_at").assign(archived=False)
+    if include_archive and get_archived_months():
+        old = get_archived_transactions(medicine_id=medicine_id, lots=tuple(lots))
+        if not old.empty: trans = pd.concat([old.assign(archived=True), trans], ignore_index=True)
+    if trans.empty: return pd.DataFrame()
+    merged = pd.merge(fold_ledger(trans), get_medicine_names(), left_on="medicine_id", right_on="id", how="left", suffixes=('', '_med'))
+    return map_user_names(merged)
+
+# ยอดในคลังของล็อตที่ค้น ทุกสถานะ (ใช้งาน / กักกัน / ระงับ)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_lot_stock(lots, medicine_id=None):
+    filters = [("in_", "lot_no", list(lots))] + ([("eq", "medicine_id", medicine_id)] if medicine_id else [])
+    return fetch("inventory", ["id", "medicine_id", "lot_no", "exp_date", "qty", "quarantined_qty", "status"], filters)
+
+# ประกาศเรียกคืนที่ยังไม่ยกเลิก ใหม่สุดก่อน
+@st.cache_data(ttl=300, show_spinner=False)
+def get_open_recalls():
+    return fetch("lot_recalls", ["id", "lot_no", "medicine_id", "reason", "blocked", "created_by", "created_at"], [("is_", "released_at", "null")], order="created_at", desc=True)
+
+# --- ยอดคงเหลือย้อนหลัง จาก snapshot สิ้นเดือน + รายการหลังจากนั้น (migrations/008_stock_snapshots.sql) ---
+# คืน None ถ้าเวลาที่ถามอยู่ก่อนวันตัดยอดเก็บถาวรและไม่มี snapshot ตรงเวลานั้น
+def _rpc_frame(fn, params, columns, order, schema="stock_balances"):
+    from pharmacy.fetch import fetch_rpc_frame
+    from pharmacy.profiling import record_rows
+    try:
+        df = fetch_rpc_frame(supabase, fn, params, columns, order, schema=schema)
+        record_rows(fn, len(df))
+        return df
+    except Exception as e:
+        if 'HISTORY_ARCHIVED' in str(e): return None
+        raise
+
+# ยอดยกมา (ต้นเดือน) และคงเหลือ (สิ้นเดือน หรือ ณ ตอนนี้ถ้าเป็นเดือนปัจจุบัน) รายยา ym = 'YYYY-MM'
+@st.cache_data(ttl=300, show_spinner=False)
+def get_month_balances(ym):
+    return _rpc_frame("stock_month_balances", {"p_month": f"{ym}-01"}, ["medicine_id", "opening", "closing"], ["medicine_id"])
+
+# ยอดคงเหลือรายยา+Lot ณ สิ้นวันที่เลือก (เวลาไทย)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_stock_as_of(day):
+    at = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.timezone(datetime.timedelta(hours=7)))
+    return _rpc_frame("stock_as_of", {"p_at": at.isoformat()}, ["medicine_id", "lot_no", "qty"], ["medicine_id", "lot_no"])
+
+# มูลค่าคลังและต้นทุนการเบิกจ่ายรายยาของเดือน ym ตามราคาทุนรายล็อต (migrations/011_lot_valuation.sql)
+@st.cache_data(ttl=300, show_spinner=False)
+def get_month_valuation(ym):
+    from pharmacy.valuation import VALUATION_COLUMNS
+    return _rpc_frame("stock_month_valuation", {"p_month": f"{ym}-01"}, VALUATION_COLUMNS, ["medicine_id"], schema="stock_valuation")
+
+# ปริมาณ/มูลค่าการเบิกจ่ายรายยาช่วง start..end (migrations/014_abc_ven.sql) รวมเดือนที่เก็บถาวรแล้วจากไฟล์ Parquet
+# 🌟 แคชแยกตามช่วงวันที่ เปลี่ยนเกณฑ์/ระดับการสรุปในหน้า ABC ไม่ต้องดึงใหม่
+@st.cache_data(ttl=300, show_spinner=False)
+def get_dispense_usage(start, end):
+    from pharmacy.abc import USAGE_COLUMNS, archived_usage, combine_usage
+    usage = _rpc_frame("dispense_usage", {"p_from": str(start), "p_to": str(end)}, USAGE_COLUMNS, ["medicine_id"], schema="dispense_usage")
+    months = [ym for ym in get_archived_months() if f"{start:%Y-%m}" <= ym <= f"{end:%Y-%m}"]
+    if not months: return combine_usage(usage)
+    costs = fetch("lot_costs", ["medicine_id", "lot_no", "unit_cost", "medicine_avg_cost"], key=("medicine_id", "lot_no"))
+    return combine_usage(usage, archived_usage(get_archived_transactions(tuple(months)), costs, start, end))
+
+# ยอดเคลื่อนไหวรวมเป็นช่วง (วัน/สัปดาห์/เดือน/ไตรมาส) ของยาตัวเดียว กลุ่มยา หรือทั้งคลัง (migrations/015_daily_movements.sql)
+# 🌟 ฐานข้อมูลรวมยอดรายวันให้แล้ว ได้กลับมาเฉพาะจุดบนกราฟ แคชแยกตามช่วง/ขนาดช่วง/ยาที่เลือก
+@st.cache_data(ttl=300, show_spinner=False)
+def get_movement_series(start, end, bucket, medicine_id=None, drug_group=None):
+    from pharmacy.trends import SERIES_COLUMNS
+    params = {"p_from": str(start), "p_to": str(end), "p_bucket": bucket, "p_medicine_id": medicine_id, "p_drug_group": drug_group}
+    return _rpc_frame("movement_series", params, SERIES_COLUMNS, ["bucket"], schema="movement_series")
@@ -0,0 +1,28 @@
+import pandas as pd
+
+# --- หมวดหมู่และกลุ่มยาแบบตารางมิติ (รหัสตัวเลข, ดู migrations/018_medicine_dimensions.sql) ไม่พึ่ง Streamlit ---
+# 🌟 ชื่อหมวดเดิมทุกแบบ (ยาในบัญชี / ยานอกบัญชี / เวชภัณฑ์/วัสดุ ...) ผูกกับชนิด DRUG / SUPPLY ในฐานข้อมูลที่เดียว
+#    ฝั่งแอปแยกยา/มิใช่ยาด้วยการ map category_id -> kind แทน .astype(str).str.strip().isin([...]) ทุกหน้า
+# จำนวนรายการต่อหมวด/กลุ่ม (medicine_count, active_count) ฐานข้อมูลนับไว้ให้แล้วด้วย trigger
+
+DRUG = 'DRUG'
+SUPPLY = 'SUPPLY'
+KIND_LABELS = {DRUG: 'เวชภัณฑ์ยา', SUPPLY: 'เวชภัณฑ์ที่มิใช่ยา'}
+CATEGORY_COLUMNS = ['id', 'name', 'kind', 'medicine_count', 'active_count']
+GROUP_COLUMNS = ['id', 'name', 'medicine_count', 'active_count']
+
+# ชนิด (DRUG / SUPPLY) ของยาแต่ละแถว: join ด้วย category_id (หมวดที่ไม่รู้จักได้ค่าว่าง เหมือนเดิมที่ไม่ถูกนับทั้งสองฝั่ง)
+def category_kind(meds, categories):
+    if meds.empty or categories.empty: return pd.Series(None, index=meds.index, dtype=object)
+    return meds['category_id'].map(dict(zip(categories['id'].tolist(), categories['kind'])))
+
+# จำนวนรายการยา/มิใช่ยาจากยอดที่ตารางมิตินับไว้ column: 'active_count' (เฉพาะที่เปิดใช้งาน) หรือ 'medicine_count'
+def kind_counts(categories, column='active_count'):
+    if categories.empty: return {DRUG: 0, SUPPLY: 0}
+    return categories.groupby('kind')[column].sum().reindex([DRUG, SUPPLY], fill_value=0).astype(int).to_dict()
+
+# ชื่อกลุ่มยาเรียงตามตัวอักษร in_use = เฉพาะกลุ่มที่มียาที่เปิดใช้งานอยู่
+def group_names(groups, in_use=False):
+    if groups.empty: return []
+    if in_use: groups = groups[groups['active_count'] > 0]
+    return sorted(groups['name'].astype(str))
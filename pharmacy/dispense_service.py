@@ -0,0 +1,124 @@
+import json
+from collections import defaultdict
+from pharmacy.fefo import LotBook, allocate_fefo, OK, DUPLICATE, INVALID
+from pharmacy.pg import connect, id_type
+
+# --- บริการเบิกจ่ายแบบ batch (ต่อ Postgres โดยตรงผ่าน psycopg ไม่ผ่าน Streamlit) ---
+# ขั้นตอน: ตรวจ idempotency key -> โหลดล็อตของยาทุกตัวใน batch ครั้งเดียว -> จัดสรร FEFO ในหน่วยความจำ
+#          -> บันทึกทีละก้อน (chunk) ก้อนละ 1 transaction ด้วยคำสั่งแบบ set-based
+# ถ้าระหว่างนั้นมีคนอื่นตัดสต๊อกล็อตเดียวกันไปก่อน ก้อนนั้นจะถูก rollback แล้วจัดสรรใหม่จากยอดล่าสุด
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_RETRIES = 3
+CONFLICT = "CONFLICT"
+
+class StaleLots(Exception):
+    pass
+
+def _parse_line(raw, user_name, note):
+    key = str(raw.get('key') or raw.get('idempotency_key') or '').strip()
+    med_id = str(raw.get('medicine_id') or '').strip()
+    try: qty = int(raw.get('qty'))
+    except (TypeError, ValueError): qty = 0
+    if not key or not med_id or qty <= 0:
+        return None, {"key": key or None, "medicine_id": med_id or None, "qty": raw.get('qty'), "status": INVALID, "allocations": [], "message": "ต้องระบุ key, medicine_id และ qty > 0"}
+    return {"key": key, "medicine_id": med_id, "qty": qty, "user_name": raw.get('user_name') or user_name, "note": raw.get('note') or note}, None
+
+def load_lots(conn, medicine_ids):
+    # วันที่ตามเวลาไทยแบบเดียวกับ dispense_fefo (005) current_date ของ session บน Supabase เป็น UTC ช่วง 00:00-07:00 จะยังเห็นล็อตที่หมดอายุเมื่อวาน
+    return conn.execute("select id, medicine_id, lot_no, exp_date, qty from inventory where medicine_id = any(%s) and qty > 0 and status = 'ACTIVE' and exp_date >= (now() at time zone 'Asia/Bangkok')::date order by medicine_id, exp_date, id", (list(medicine_ids),)).fetchall()
+
+def _known_medicines(conn, medicine_ids):
+    return {r['id'] for r in conn.execute("select id from medicines where id = any(%s)", (list(medicine_ids),)).fetchall()}
+
+def _applied_results(conn, keys):
+    if not keys: return {}
+    rows = conn.execute("select idempotency_key, result from dispense_requests where idempotency_key = any(%s)", (list(keys),)).fetchall()
+    return {r['idempotency_key']: r['result'] for r in rows}
+
+def _commit_chunk(conn, chunk):
+    # chunk: รายการ (line, result) ที่จัดสรรแล้ว -> คืน set ของ key ที่บันทึกสำเร็จใน transaction นี้
+    ok = [(line, res) for line, res in chunk if res['status'] == OK]
+    if not ok: return set()
+    inv_type = id_type(conn, 'inventory')
+    with conn.transaction():
+        rows = conn.execute(
+            "insert into dispense_requests (idempotency_key, result) select * from unnest(%s::text[], %s::jsonb[]) on conflict do nothing returning idempotency_key",
+            ([line['key'] for line, _ in ok], [json.dumps(res, ensure_ascii=False, default=str) for _, res in ok])).fetchall()
+        inserted = {r['idempotency_key'] for r in rows}
+        applied = [(line, res) for line, res in ok if line['key'] in inserted]
+        if not applied: return inserted
+
+        takes = defaultdict(int)
+        for _, res in applied:
+            for a in res['allocations']: takes[a['inventory_id']] += a['qty']
+        inv_ids = sorted(takes)
+        # ล็อกแถวตามลำดับ id ก่อนเสมอ เพื่อไม่ให้ batch ที่รันพร้อมกัน deadlock กัน
+        conn.execute(f"select id from inventory where id = any(%s::{inv_type}[]) order by id for update", (inv_ids,))
+        # 🌟 ตรวจสถานะ/วันหมดอายุซ้ำหลังล็อกแถว: ล็อตที่ถูกระงับ (017) หรือกักกัน (003) หลัง load_lots ไม่ถูกตัด -> StaleLots แล้วจัดสรรใหม่
+        updated = conn.execute(
+            f"update inventory i set qty = i.qty - d.take from unnest(%s::{inv_type}[], %s::int[]) as d(id, take) "
+            "where i.id = d.id and i.qty >= d.take and i.status = 'ACTIVE' and i.exp_date >= (now() at time zone 'Asia/Bangkok')::date returning i.id",
+            (inv_ids, [takes[i] for i in inv_ids])).fetchall()
+        if len(updated) != len(inv_ids): raise StaleLots()
+
+        flat = [(line, a) for line, res in applied for a in res['allocations']]
+        conn.execute(
+            "insert into transactions (medicine_id, action_type, qty_change, lot_no, user_name, note) "
+            "select d.medicine_id, 'DISPENSE', -d.qty, d.lot_no, d.user_name, d.note from unnest(%s::text[], %s::int[], %s::text[], %s::text[], %s::text[]) as d(medicine_id, qty, lot_no, user_name, note)",
+            ([l['medicine_id'] for l, _ in flat], [a['qty'] for _, a in flat], [a['lot_no'] for _, a in flat], [l['user_name'] for l, _ in flat], [l['note'] for l, _ in flat]))
+    return inserted
+
+def dispense_batch(conn, lines, user_name="HIS", note="เบิกจ่ายจาก HIS", chunk_size=DEFAULT_CHUNK_SIZE):
+    results = [None] * len(lines)
+    first_index = {}
+    pending = []
+    for i, raw in enumerate(lines):
+        line, error = _parse_line(raw, user_name, note)
+        if error: results[i] = error
+        elif line['key'] in first_index: results[i] = first_index[line['key']]
+        else:
+            first_index[line['key']] = i
+            pending.append((i, line))
+
+    # 1) key ที่เคยทำสำเร็จแล้วใน batch ก่อนหน้า -> คืนผลเดิม ไม่ตัดสต๊อกซ้ำ
+    done = _applied_results(conn, [line['key'] for _, line in pending])
+    new = []
+    for i, line in pending:
+        if line['key'] in done: results[i] = dict(done[line['key']], status=DUPLICATE)
+        else: new.append((i, line))
+
+    # 2) จัดสรร FEFO ทั้ง batch ในหน่วยความจำ แล้วบันทึกทีละ chunk
+    med_ids = {line['medicine_id'] for _, line in new}
+    known = _known_medicines(conn, med_ids) if med_ids else set()
+    allocated = allocate_fefo(LotBook(load_lots(conn, med_ids)), [line for _, line in new], known)
+    pos, retries = 0, 0
+    while pos < len(new):
+        chunk = list(zip([line for _, line in new[pos:pos + chunk_size]], allocated[pos:pos + chunk_size]))
+        try:
+            inserted = _commit_chunk(conn, chunk)
+        except StaleLots:
+            retries += 1
+            remaining = [line for _, line in new[pos:]]
+            if retries > MAX_RETRIES:
+                for j in range(pos, len(new)): allocated[j] = dict(allocated[j], status=CONFLICT, allocations=[], message="สต๊อกถูกเปลี่ยนระหว่างบันทึก กรุณาส่งใหม่")
+                break
+            allocated[pos:] = allocate_fefo(LotBook(load_lots(conn, {l['medicine_id'] for l in remaining})), remaining, known)
+            continue
+        # key ที่ถูกระบบอื่นบันทึกไปก่อนในจังหวะเดียวกัน -> ถือว่าซ้ำ
+        lost = [line['key'] for line, res in chunk if res['status'] == OK and line['key'] not in inserted]
+        for key, res in _applied_results(conn, lost).items():
+            j = next(j for j in range(pos, pos + len(chunk)) if new[j][1]['key'] == key)
+            allocated[j] = dict(res, status=DUPLICATE)
+        pos += chunk_size
+
+    for (i, _), res in zip(new, allocated): results[i] = res
+    # key ที่ซ้ำกันภายใน batch เดียวกัน -> ชี้ไปยังผลของบรรทัดแรก
+    for i, res in enumerate(results):
+        if isinstance(res, int): results[i] = dict(results[res], status=DUPLICATE)
+    return results
+
+def summarize_results(results):
+    counts = defaultdict(int)
+    for r in results: counts[r['status']] += 1
+    return dict(counts)
@@ -0,0 +1,73 @@
+import io
+import datetime
+import pandas as pd
+from pharmacy.frames import add_display_columns, TRANSACTION_COLUMNS
+
+# --- สร้างไฟล์รายงาน/ส่งออกที่ใช้เวลานาน สำหรับรันในคิวงานเบื้องหลัง (pharmacy/jobs.py) ไม่พึ่ง Streamlit ---
+# ทุกฟังก์ชันรับ supabase client หรือข้อมูลที่หน้าเว็บเตรียมไว้แล้วเข้ามาตรงๆ และคืน (bytes, ชื่อไฟล์, mime)
+# (เธรดของพูลไม่มี ScriptRunContext จึงเรียก st.cache_data / st.session_state ไม่ได้)
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+HISTORY_COLUMNS = {'created_at_str': 'วัน-เวลา', 'action_type_th': 'ประเภท', 'medicine_id': 'รหัสยา', 'generic_name': 'รายการยา', 'lot_no': 'เลข Lot',
+                   'qty_change': 'จำนวน (+/-)', 'unit': 'หน่วย', 'user_name': 'ผู้บันทึก', 'note': 'หมายเหตุ', 'id': 'รหัสรายการ', 'ref_id': 'อ้างอิงรายการ', 'archived': 'เก็บถาวร'}
+
+# เวอร์ชันของสมุดบัญชี: รายการล่าสุด (สมุดบัญชีเพิ่มต่อท้ายอย่างเดียว แก้ไข/ยกเลิกก็เป็นแถวใหม่) ใช้เป็นส่วนหนึ่งของ key แคชไฟล์
+def ledger_head(client):
+    rows = client.table("transactions").select("id, created_at").order("created_at", desc=True).order("id", desc=True).limit(1).execute().data
+    return rows[0] if rows else None
+
+# เวอร์ชันของรายการยาและคลังยา (migrations/023_master_data_version.sql): เปลี่ยนรหัส/ชื่อยา หรือสถานะล็อตโดยไม่มีรายการใหม่ในสมุดบัญชี
+# ก็ได้ key แคชใหม่ ใช้คู่กับ ledger_head ทุกงานที่อ่าน medicines หรือ inventory
+def master_data_version(client):
+    return client.rpc("master_data_version", {}).execute().data
+
+def executive_report_txt(client, today):
+    from pharmacy.reports import generate_monthly_executive_report
+    return generate_monthly_executive_report(client=client, today=today).encode('utf-8'), f"รายงานผู้บริหาร_{today.strftime('%Y_%m')}.txt", "text/plain"
+
+# Excel ถ้ามีตัวเขียน (openpyxl) ไม่มีก็เป็น CSV ที่ Excel เปิดได้
+def requisition_file(df, today):
+    buffer = io.BytesIO()
+    try:
+        df.to_excel(buffer, index=False, sheet_name='ใบขอเบิก')
+        return buffer.getvalue(), f"ใบขอเบิกเวชภัณฑ์_{today.strftime('%Y_%m_%d')}.xlsx", XLSX_MIME
+    except Exception: return df.to_csv(index=False).encode('utf-8-sig'), f"ใบขอเบิกเวชภัณฑ์_{today.strftime('%Y_%m_%d')}.csv", "text/csv"
+
+# 🌟 ประวัติทั้งหมดแบบ Audit Trail (ทุกแถวรวมรายการแก้ไข/ยกเลิก) + ประวัติที่เก็บถาวร เรียงจากใหม่ไปเก่า
+# user_names: อีเมล -> ชื่อ (get_user_name_map ของหน้าเว็บ)
+def history_csv(client, archive_uri=None, user_names=None, today=None):
+    from pharmacy.fetch import fetch_frame
+    trans = fetch_frame(client, "transactions", TRANSACTION_COLUMNS).assign(archived=False)
+    if archive_uri:
+        from pharmacy.archive import load_archived
+        try: old = load_archived(archive_uri, renames=fetch_frame(client, "medicine_renames", ["old_id", "new_id", "renamed_at"]))
+        except Exception: old = pd.DataFrame()
+        if not old.empty: trans = pd.concat([trans, old.assign(archived=True)], ignore_index=True)
+    meds = fetch_frame(client, "medicines", ["id", "generic_name", "unit"])
+    df = trans.merge(meds.rename(columns={'id': 'medicine_id'}), on='medicine_id', how='left').sort_values(['created_at', 'id'], ascending=False, kind='stable')
+    df = add_display_columns(df)
+    if user_names: df['user_name'] = df['user_name'].astype(object).map(lambda v: user_names.get(str(v).strip().lower(), v) if pd.notna(v) else v)
+    out = df[list(HISTORY_COLUMNS)].rename(columns=HISTORY_COLUMNS)
+    today = today or datetime.date.today()
+    return out.to_csv(index=False).encode('utf-8-sig'), f"ประวัติรับ-เบิกทั้งหมด_{today.strftime('%Y_%m_%d')}.csv", "text/csv"
+
+# ตามรอย Lot / เรียกคืนยา: สรุปรายล็อต + ทุกรายการของล็อต (ตารางที่หน้าเว็บเตรียมไว้แล้ว ดู pharmacy/recall.py)
+# ข้อมูลเฉพาะ Lot ที่ค้นมีไม่มาก จึงสร้างทันทีในหน้าเว็บ ไม่ต้องผ่านคิวงาน
+def lot_trace_file(summary, trace, today):
+    name = f"ตามรอยLot_{today.strftime('%Y_%m_%d')}"
+    buffer = io.BytesIO()
+    try:
+        with pd.ExcelWriter(buffer) as writer:
+            summary.to_excel(writer, index=False, sheet_name='สรุปรายล็อต')
+            trace.to_excel(writer, index=False, sheet_name='รายการทั้งหมด')
+        return buffer.getvalue(), f"{name}.xlsx", XLSX_MIME
+    except Exception: return trace.to_csv(index=False).encode('utf-8-sig'), f"{name}.csv", "text/csv"
+
+# 🌟 บัญชีคุมเวชภัณฑ์คงคลังของยาทุกรายการ (ตรวจสอบประจำปี) อ่านสมุดบัญชีทีละชุดยาและจัดรูปแบบในพูลโปรเซส (pharmacy/stock_cards.py)
+# meds: ยาที่เปิดใช้งาน, report(done, total): ความคืบหน้าจากคิวงาน
+def stock_cards_file(client, meds, date_from, date_to, fmt='xlsx', user_names=None, report=None):
+    from pharmacy import stock_cards
+    buffer = io.BytesIO()
+    result = stock_cards.generate(meds, lambda at: stock_cards.rest_opening(client, at), lambda ids, start, end: stock_cards.rest_movements(client, ids, start, end),
+                                  stock_cards.rest_lots(client), date_from, date_to, buffer, fmt=fmt, user_names=user_names, progress=report)
+    return buffer.getvalue(), stock_cards.file_name(date_from, date_to, result['format']), XLSX_MIME if result['format'] == 'xlsx' else stock_cards.ZIP_MIME
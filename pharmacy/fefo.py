@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+# --- การตัดสต๊อกแบบ FEFO (First Expired, First Out) ในหน่วยความจำ ---
+# ไฟล์นี้ไม่พึ่ง Streamlit หรือฐานข้อมูล จึงใช้ร่วมกันได้ทั้งหน้าเว็บและ service ที่รันแบบ headless
+
+OK = "OK"
+DUPLICATE = "DUPLICATE"
+INSUFFICIENT_STOCK = "INSUFFICIENT_STOCK"
+UNKNOWN_MEDICINE = "UNKNOWN_MEDICINE"
+INVALID = "INVALID"
+
+# ยอดคงเหลือรายล็อตของยาแต่ละตัว เรียงตามวันหมดอายุ (ล็อตที่หมดก่อนอยู่หน้า)
+# lots: รายการ dict ที่มี id, medicine_id, lot_no, exp_date, qty
+class LotBook:
+    def __init__(self, lots):
+        self._lots = defaultdict(list)
+        self._total = defaultdict(int)
+        self._start = defaultdict(int)
+        for lot in sorted(lots, key=lambda l: (str(l['exp_date']), str(l['id']))):
+            if lot['qty'] > 0:
+                self._lots[lot['medicine_id']].append(dict(lot))
+                self._total[lot['medicine_id']] += lot['qty']
+
+    def known(self, medicine_id):
+        return medicine_id in self._lots
+
+    def available(self, medicine_id):
+        return self._total.get(medicine_id, 0)
+
+    def take(self, medicine_id, qty):
+        # ตัดจากล็อตที่หมดอายุก่อนจนครบ (เรียกหลังจากเช็กแล้วว่ายอดพอเท่านั้น)
+        lots = self._lots[medicine_id]
+        i = self._start[medicine_id]
+        self._total[medicine_id] -= qty
+        allocations = []
+        while qty > 0:
+            lot = lots[i]
+            take_qty = min(lot['qty'], qty)
+            lot['qty'] -= take_qty
+            qty -= take_qty
+            allocations.append({"inventory_id": lot['id'], "lot_no": lot['lot_no'], "exp_date": str(lot['exp_date']), "qty": take_qty})
+            if lot['qty'] == 0: i += 1
+        self._start[medicine_id] = i
+        return allocations
+
+# จัดสรรล็อตให้ทุกบรรทัดตามลำดับที่ส่งมา บรรทัดที่ยอดไม่พอจะถูกปฏิเสธทั้งบรรทัด (ไม่ตัดบางส่วน)
+# lines: รายการ dict ที่มี key, medicine_id, qty -> คืนผลลัพธ์ตามลำดับเดิม
+def allocate_fefo(book, lines, known_medicines=None):
+    results = []
+    for line in lines:
+        med_id = line['medicine_id']
+        res = {"key": line['key'], "medicine_id": med_id, "qty": line['qty'], "status": OK, "allocations": []}
+        if known_medicines is not None and med_id not in known_medicines:
+            res['status'] = UNKNOWN_MEDICINE
+        elif book.available(med_id) < line['qty']:
+            res['status'] = INSUFFICIENT_STOCK
+            res['available'] = book.available(med_id)
+        else:
+            res['allocations'] = book.take(med_id, line['qty'])
+        results.append(res)
+    return results
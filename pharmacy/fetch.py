@@ -0,0 +1,77 @@
+import io
+import pandas as pd
+from pharmacy.frames import apply_schema
+
+# --- ดึงข้อมูลจำนวนมากจาก PostgREST แบบ CSV เฉพาะคอลัมน์ที่ใช้ (ไม่พึ่ง Streamlit) ---
+# 🌟 ขอเฉพาะคอลัมน์ที่หน้าเว็บใช้จริง และรับเป็น CSV แทน JSON: ไม่มีชื่อคอลัมน์ซ้ำทุกแถว
+#    และ pandas อ่านด้วย parser ภาษา C ได้ทันที ไม่ต้องสร้าง dict ทีละแถวแล้วค่อยแปลงเป็น DataFrame
+# PostgREST ไม่มี output แบบ Arrow จึงใช้ CSV และตัดผลลัพธ์ไว้ที่ max-rows (ค่าเริ่มต้นของ Supabase = 1000)
+# จึงดึงเป็นหน้าๆ จนครบ (PAGE_SIZE ต้องไม่เกิน max-rows ของโปรเจกต์)
+# 🌟 แบ่งหน้าด้วยค่าคีย์ของแถวสุดท้าย (keyset: หน้าถัดไป = แถวที่เรียงอยู่หลังแถวนั้น) แทน offset
+#    offset ทำให้ฐานข้อมูลต้องไล่ข้ามแถวก่อนหน้าทุกหน้า (รวม O(n²)) และถ้ามีแถวเพิ่ม/ลบระหว่างดึง แถวจะเลื่อนหน้าจนซ้ำหรือหาย
+#    คอลัมน์ที่ใช้เรียง (order และ key) จึงต้องไม่เป็น NULL
+
+PAGE_SIZE = 1000
+
+# คอลัมน์ข้อความอิสระที่ค่าว่าง '' เป็นข้อมูลจริง CSV แยก '' กับ NULL ไม่ได้หลังอ่าน จึงคงเป็น '' ไว้
+# คอลัมน์อื่น (รหัสอ้างอิง, วันที่, ตัวเลข, ประเภทรายการ) ช่องว่างคือ NULL -> NaN เหมือนอ่านจาก JSON
+TEXT_COLUMNS = {"note", "lot_no", "generic_name", "unit", "reason"}
+
+# filters: รายการ (ชื่อเมธอด, คอลัมน์, ค่า) เช่น [("gt", "qty", 0), ("eq", "status", "ACTIVE")]
+# key: คอลัมน์ที่รวมกันแล้วไม่ซ้ำ สำหรับ view ที่ไม่มีคอลัมน์ id (เช่น lot_costs ใช้ medicine_id, lot_no)
+def fetch_frame(client, table, columns, filters=(), order=None, desc=False, page_size=PAGE_SIZE, key=("id",)):
+    # เรียงด้วย id (หรือ key) ต่อท้ายเสมอ ลำดับจึงไม่ซ้ำและใช้แบ่งหน้าได้
+    sort = ([(order, desc)] if order else []) + [(col, False) for col in key if col != order]
+    def query(after):
+        q = client.table(table).select(",".join(_select(columns, sort)))
+        for method, col, value in filters: q = getattr(q, method)(col, value)
+        return _page_after(q, sort, after)
+    return apply_schema(_read_pages(query, columns, sort, page_size), table)
+
+# ฟังก์ชันฝั่งเซิร์ฟเวอร์ที่คืนเป็นตาราง (RPC) ก็ถูกตัดที่ max-rows เช่นกัน จึงแบ่งหน้าแบบเดียวกัน
+# order: คอลัมน์ที่รวมกันแล้วไม่ซ้ำ (ใช้แทน id), schema: ชื่อชุดชนิดคอลัมน์ใน pharmacy/frames.py
+def fetch_rpc_frame(client, fn, params, columns, order, schema=None, page_size=PAGE_SIZE):
+    sort = [(col, False) for col in order]
+    def query(after):
+        return _page_after(client.rpc(fn, params).select(",".join(_select(columns, sort))), sort, after)
+    df = _read_pages(query, columns, sort, page_size)
+    return apply_schema(df, schema) if schema else df
+
+# คอลัมน์ที่ใช้เรียงต้องอยู่ในผลลัพธ์ด้วยเพื่ออ่านค่าของแถวสุดท้าย (ตัดทิ้งก่อนคืนผล)
+def _select(columns, sort):
+    return list(dict.fromkeys([*columns, *(col for col, _ in sort)]))
+
+# เงื่อนไข "เรียงอยู่หลังแถวสุดท้ายของหน้าก่อน": คีย์เดียวใช้ gt/lt ตรงๆ (ใช้ดัชนีได้)
+# หลายคอลัมน์ใช้ (a > x) or (a = x and b > y) ... ผ่าน or=(...) ของ PostgREST
+def _page_after(q, sort, after):
+    for col, desc in sort: q = q.order(col, desc=desc)
+    if after is None: return q
+    if len(sort) == 1: return getattr(q, "lt" if sort[0][1] else "gt")(sort[0][0], after[0])
+    conds = []
+    for i, (col, desc) in enumerate(sort):
+        terms = [f"{c}.eq.{_quote(v)}" for (c, _), v in zip(sort[:i], after)] + [f"{col}.{'lt' if desc else 'gt'}.{_quote(after[i])}"]
+        conds.append(f"and({','.join(terms)})" if i else terms[0])
+    return q.or_(",".join(conds))
+
+# ค่าใน or=(...) ใส่เครื่องหมายคำพูดเสมอ (เวลามี , : และช่องว่าง, เลข Lot อาจมี . หรือวงเล็บ)
+def _quote(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _read_pages(query, columns, sort, page_size):
+    select = _select(columns, sort)
+    pages, after = [], None
+    while True:
+        text = query(after).limit(page_size).csv().execute().data
+        page = read_csv_payload(text, select)
+        pages.append(page)
+        if len(page) < page_size: break
+        after = [page[col].iloc[-1] for col, _ in sort]
+    df = pages[0] if len(pages) == 1 else pd.concat(pages, ignore_index=True)
+    return df[list(columns)] if len(select) > len(columns) else df
+
+# CSV ของ PostgREST: NULL เป็นช่องว่าง, boolean เป็น t/f, เวลาเป็นรูปแบบข้อความของ Postgres
+# อ่านทุกคอลัมน์เป็นข้อความก่อน (กันรหัสยาอย่าง 001 กลายเป็นตัวเลข) แล้วให้ apply_schema แปลงชนิดทีหลัง
+# ช่องว่างเป็น NaN เฉพาะคอลัมน์ที่ไม่อยู่ใน TEXT_COLUMNS
+def read_csv_payload(text, columns):
+    if not text: return pd.DataFrame(columns=columns)
+    return pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False, na_values={col: [''] for col in columns if col not in TEXT_COLUMNS})
@@ -0,0 +1,67 @@
+import pandas as pd
+from pharmacy.utils import ACTION_TYPE_TH, ENTRY_KIND_TH
+
+# --- สร้าง DataFrame แบบกำหนดชนิดคอลัมน์จากข้อมูล Supabase (ไม่พึ่ง Streamlit) ---
+# 🌟 ข้อความที่ซ้ำกันมาก (รหัสยา, Lot, ประเภทรายการ, ผู้บันทึก) เก็บเป็น category, จำนวนเป็น int32
+#    และแปลง created_at เป็นเวลา UTC ครั้งเดียวตอนโหลด หน้าเว็บไม่ต้อง parse ซ้ำทุก rerun
+# คอลัมน์ที่ไม่ได้ระบุไว้ (เช่น note, generic_name) ปล่อยเป็นชนิดเดิมที่ pandas เลือกให้
+
+TZ = 'Asia/Bangkok'
+
+TRANSACTION_COLUMNS = ['id', 'medicine_id', 'action_type', 'qty_change', 'lot_no', 'user_name', 'note', 'created_at', 'ref_id', 'entry_kind', 'carry_forward']
+
+SCHEMAS = {
+    "transactions": {"medicine_id": "category", "action_type": "category", "qty_change": "int32", "lot_no": "category",
+                     "user_name": "category", "entry_kind": "category", "carry_forward": "bool", "created_at": "timestamp"},
+    "inventory": {"medicine_id": "category", "lot_no": "category", "qty": "int32", "status": "category", "quarantined_qty": "int32"},
+    "medicines": {"min_stock": "int32", "is_active": "bool", "category_id": "int32", "drug_group_id": "int32"},
+    "medicine_categories": {"id": "int32", "medicine_count": "int32", "active_count": "int32"},
+    "drug_groups": {"id": "int32", "medicine_count": "int32", "active_count": "int32"},
+    "stock_balances": {"medicine_id": "category", "lot_no": "category", "qty": "int32", "opening": "int32", "closing": "int32"},
+    "stock_count_lines": {"medicine_id": "category", "lot_no": "category", "snapshot_qty": "int32", "counted_qty": "int32"},
+    "stock_valuation": {"medicine_id": "category", "opening_value": "float", "receive_value": "float", "dispense_cost": "float", "expire_value": "float",
+                        "adjust_value": "float", "other_value": "float", "closing_value": "float", "closing_qty": "int32", "uncosted_qty": "int32"},
+    "dispense_usage": {"medicine_id": "category", "dispense_qty": "int32", "dispense_value": "float", "uncosted_qty": "int32"},
+    "lot_recalls": {"blocked": "bool", "created_at": "timestamp", "released_at": "timestamp"},
+    "medicine_renames": {"renamed_at": "timestamp"},
+    "movement_series": {"receive_qty": "int32", "dispense_qty": "int32", "expire_qty": "int32", "adjust_qty": "int32", "net_qty": "int32"},
+}
+
+def _convert(s, kind):
+    if kind == "timestamp": return pd.to_datetime(s, utc=True, format='ISO8601')
+    if kind == "float": return pd.to_numeric(s, errors='coerce').astype('float64')
+    if kind == "int32":
+        s = pd.to_numeric(s, errors='coerce')
+        return s.astype('Int32') if s.isna().any() else s.astype('int32')
+    if kind == "bool":
+        if pd.api.types.is_bool_dtype(s): return s
+        return s.map(lambda v: v in (True, 't', 'true', 'True', 1, '1')).astype(bool)
+    return s.astype(kind)
+
+def apply_schema(df, table):
+    for col, kind in SCHEMAS[table].items():
+        if col in df.columns and len(df): df[col] = _convert(df[col], kind)
+    return df
+
+def typed_frame(rows, table):
+    return apply_schema(pd.DataFrame(rows), table)
+
+# คอลัมน์สำหรับแสดงผลที่ทุกหน้าใช้ร่วมกัน: created_at_dt (เวลาไทย), ym, created_at_str และ action_type_th
+# 🌟 ป้ายภาษาไทยแปลงจาก category เฉพาะค่าที่ไม่ซ้ำ แทนการ map ทีละแถว
+def add_display_columns(df, fmt='%d/%m/%Y %H:%M:%S'):
+    if df.empty: return df
+    created = df['created_at'] if isinstance(df['created_at'].dtype, pd.DatetimeTZDtype) else pd.to_datetime(df['created_at'], utc=True, format='ISO8601')
+    df['created_at_dt'] = created.dt.tz_convert(TZ)
+    df['ym'] = pd.Categorical(df['created_at_dt'].dt.year * 100 + df['created_at_dt'].dt.month).rename_categories(lambda v: f"{v // 100:04d}-{v % 100:02d}")
+    df['created_at_str'] = df['created_at_dt'].dt.strftime(fmt)
+    labels = df['action_type'].astype('category')
+    labels = labels.cat.rename_categories([ACTION_TYPE_TH.get(c, c) for c in labels.cat.categories])
+    if 'entry_kind' in df.columns:
+        kind = df['entry_kind'].astype(object).map(ENTRY_KIND_TH)
+        labels = labels.astype(object).where(kind.isna(), kind + ": " + labels.astype(object))
+    if 'amended' in df.columns: labels = labels.astype(object).where(~df['amended'].astype(bool), labels.astype(object) + " (แก้ไขแล้ว)")
+    df['action_type_th'] = labels.astype('category')
+    return df
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
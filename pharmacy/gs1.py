@@ -0,0 +1,80 @@
+import re
+import calendar
+import datetime
+
+# --- อ่านข้อความจากบาร์โค้ด GS1 (DataMatrix / GS1-128) และ EAN/UPC บนกล่องยา (ไม่พึ่ง Streamlit) ---
+# ใช้ AI: (01) GTIN, (10) Lot, (17) วันหมดอายุ, (11) วันผลิต ส่วน AI อื่นอ่านข้ามไปตามความยาวที่ GS1 กำหนด
+# รองรับทั้งข้อความดิบจากเครื่องสแกน (ขึ้นต้นด้วย ]d2 / ]C1 / ]Q3, คั่นฟิลด์ด้วยอักขระ GS) และแบบมีวงเล็บ (01)...(10)...
+# 🌟 เครื่องสแกนแบบคีย์บอร์ดส่วนใหญ่พิมพ์อักขระ GS ไม่ได้ จึงรับ | ~ หรือ <GS> เป็นตัวคั่นแทน (อักขระเหล่านี้ไม่อยู่ในชุดตัวอักษรของ GS1)
+
+GS = '\x1d'
+SEPARATORS = ('<GS>', '{GS}', '|', '~')
+SYMBOLOGY_PREFIX = re.compile(r'^\][A-Za-z][0-9A-Za-z]')
+
+# ความยาวข้อมูล (ไม่รวมรหัส AI) ของ AI ที่ความยาวคงที่ตามมาตรฐาน GS1 (จับคู่ด้วยสองหลักแรก)
+FIXED_LENGTH = {'00': 18, '01': 14, '02': 14, '03': 14, '04': 16, '11': 6, '12': 6, '13': 6, '14': 6, '15': 6, '16': 6, '17': 6, '18': 6, '19': 6,
+                '20': 2, '31': 6, '32': 6, '33': 6, '34': 6, '35': 6, '36': 6, '41': 13}
+# AI ที่รหัสยาวกว่าสองหลัก (ที่เจอบนกล่องยา) -> ความยาวรหัส AI
+AI_LENGTH = {'23': 3, '24': 3, '25': 3, '31': 4, '32': 4, '33': 4, '34': 4, '35': 4, '36': 4, '39': 4, '41': 3, '42': 3, '70': 4, '71': 3, '72': 4, '80': 4, '81': 4}
+
+def gtin_check_digit(body):
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return str((10 - total % 10) % 10)
+
+# แปลง GTIN-8/12/13/14 เป็น 14 หลัก และตรวจเลขตรวจสอบหลักสุดท้าย
+def normalize_gtin(code):
+    code = str(code).strip()
+    if not code.isdigit() or len(code) not in (8, 12, 13, 14): raise ValueError(f"GTIN ไม่ถูกต้อง: {code}")
+    code = code.zfill(14)
+    if gtin_check_digit(code[:-1]) != code[-1]: raise ValueError(f"เลขตรวจสอบของ GTIN ไม่ถูกต้อง: {code}")
+    return code
+
+# YYMMDD -> date (วันที่ 00 หมายถึงวันสุดท้ายของเดือน ตามมาตรฐาน GS1, ปีใช้ช่วง -49..+50 ปีจากปีปัจจุบัน)
+def parse_gs1_date(value, today=None):
+    if not re.fullmatch(r'\d{6}', value): raise ValueError(f"วันที่ไม่ถูกต้อง: {value}")
+    yy, mm, dd = int(value[:2]), int(value[2:4]), int(value[4:])
+    this_year = (today or datetime.date.today()).year
+    year = this_year - this_year % 100 + yy
+    if year - this_year > 50: year -= 100
+    elif this_year - year > 49: year += 100
+    if dd == 0: dd = calendar.monthrange(year, mm)[1]
+    return datetime.date(year, mm, dd)
+
+def _split_elements(data):
+    # แบบมีวงเล็บ: (01)0885...(17)270131(10)AB12
+    if data.startswith('('):
+        return [(ai, value) for ai, value in re.findall(r'\((\d{2,4})\)([^(]*)', data)]
+    elements, i = [], 0
+    while i < len(data):
+        if data[i] == GS: i += 1; continue
+        head = data[i:i + 2]
+        if not head.isdigit(): raise ValueError(f"อ่านรหัส AI ไม่ได้ที่ตำแหน่ง {i}")
+        ai_len = AI_LENGTH.get(head, 2)
+        ai = data[i:i + ai_len]
+        i += ai_len
+        if head in FIXED_LENGTH:
+            value = data[i:i + FIXED_LENGTH[head]]
+            i += FIXED_LENGTH[head]
+        else:
+            end = data.find(GS, i)
+            end = len(data) if end < 0 else end
+            value = data[i:end]
+            i = end
+        elements.append((ai, value))
+    return elements
+
+# คืน dict: gtin (14 หลัก), lot_no, exp_date, mfg_date (ไม่มีในบาร์โค้ดจะเป็น None) และ ais (ค่าดิบทุก AI)
+def parse_gs1(raw, today=None):
+    data = str(raw).strip()
+    data = SYMBOLOGY_PREFIX.sub('', data)
+    for sep in SEPARATORS: data = data.replace(sep, GS)
+    data = data.strip(GS)
+    if not data: raise ValueError("ไม่มีข้อมูลในบาร์โค้ด")
+    # บาร์โค้ด EAN-13/UPC ธรรมดา (มีแต่ GTIN)
+    if data.isdigit() and len(data) in (8, 12, 13):
+        return {"gtin": normalize_gtin(data), "lot_no": None, "exp_date": None, "mfg_date": None, "ais": {}}
+    ais = dict(_split_elements(data))
+    if '01' not in ais: raise ValueError("ไม่พบ GTIN (01) ในบาร์โค้ด")
+    return {"gtin": normalize_gtin(ais['01']), "lot_no": ais.get('10') or None,
+            "exp_date": parse_gs1_date(ais['17'], today) if '17' in ais else None,
+            "mfg_date": parse_gs1_date(ais['11'], today) if '11' in ais else None, "ais": ais}
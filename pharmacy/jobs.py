@@ -0,0 +1,115 @@
+import json
+import uuid
+import sqlite3
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# --- คิวงานเบื้องหลังสำหรับรายงาน/ไฟล์ส่งออกที่ใช้เวลานาน (SQLite ไฟล์เดียว ไม่พึ่ง Streamlit) ---
+# หน้าเว็บส่งงานเข้าคิวแล้วกลับไปทำงานต่อได้ทันที เธรดในพูลสร้างไฟล์แล้วเก็บผลไว้ในตาราง artifacts
+# 🌟 ผลลัพธ์ผูกกับ hash ของข้อมูลตั้งต้น (ชนิดงาน + พารามิเตอร์ + เวอร์ชันของสมุดบัญชี/ตารางที่ส่งออก)
+#    ขอไฟล์เดิมซ้ำจึงได้ทันทีจากแคช และงานเดียวกันที่ยังทำอยู่จะไม่ถูกสั่งซ้อน (ผู้ใช้หลายคนรอผลของงานเดียวกัน)
+# ใช้เธรด (ไม่ใช่ process) เพราะงานส่วนใหญ่รอเครือข่าย/ฐานข้อมูล และต้องใช้ connection เดียวกับแอป
+# งานที่ค้างจากการปิดเซิร์ฟเวอร์กลางทางถูกปิดเป็น FAILED ตอนเปิดใหม่ (ฟังก์ชันสร้างไฟล์ไม่ได้ถูกเก็บไว้ สั่งใหม่ได้เลย)
+
+QUEUED, RUNNING, DONE, FAILED = "QUEUED", "RUNNING", "DONE", "FAILED"
+ACTIVE = (QUEUED, RUNNING)
+DEFAULT_WORKERS = 2
+
+SCHEMA = """
+create table if not exists jobs (
+    id text primary key,
+    kind text not null,
+    key text not null,
+    label text,
+    user_name text,
+    status text not null,
+    cached integer not null default 0,
+    error text,
+    created_at text not null,
+    started_at text,
+    finished_at text,
+    progress_done integer,
+    progress_total integer
+);
+create index if not exists jobs_key_idx on jobs (key, status);
+create table if not exists artifacts (key text primary key, file_name text not null, mime text not null, data blob not null, created_at text not null);
+"""
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+# hash ของข้อมูลตั้งต้น: DataFrame ใช้ hash รายแถวของ pandas (ไม่ต้องแปลงเป็นข้อความ) ส่วนค่าอื่นใช้ JSON ที่เรียง key แล้ว
+def content_key(kind, *inputs):
+    h = hashlib.sha256(kind.encode())
+    for value in inputs:
+        if isinstance(value, pd.DataFrame):
+            h.update(json.dumps([str(c) for c in value.columns] + [str(t) for t in value.dtypes], ensure_ascii=False).encode())
+            h.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+        else: h.update(json.dumps(value, sort_keys=True, default=str, ensure_ascii=False).encode())
+    return h.hexdigest()
+
+class JobRunner:
+    def __init__(self, path, workers=DEFAULT_WORKERS):
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("pragma journal_mode=wal")
+        self.db.executescript(SCHEMA)
+        # ไฟล์คิวที่สร้างก่อนมีคอลัมน์ความคืบหน้า
+        columns = {r['name'] for r in self.db.execute("pragma table_info(jobs)")}
+        for column in ("progress_done", "progress_total"):
+            if column not in columns: self.db.execute(f"alter table jobs add column {column} integer")
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        with self.lock: self.db.execute("update jobs set status = ?, error = ?, finished_at = ? where status in (?, ?)", (FAILED, "INTERRUPTED", _now(), *ACTIVE))
+
+    def _execute(self, sql, params=()):
+        with self.lock: return self.db.execute(sql, params).fetchall()
+
+    # build() -> (bytes, ชื่อไฟล์, mime) รันในเธรดของพูล, key จาก content_key
+    # progress=True: เรียก build(report) แทน โดย report(done, total) บันทึกความคืบหน้าไว้ที่งาน
+    # คืน id ของงาน: มีไฟล์ของ key นี้แล้ว = งาน DONE ทันที, มีงาน key เดียวกันกำลังทำ = id ของงานนั้น
+    def submit(self, kind, key, build, label=None, user_name=None, progress=False):
+        with self.lock:
+            active = self.db.execute("select id from jobs where key = ? and status in (?, ?) order by created_at limit 1", (key, *ACTIVE)).fetchone()
+            if active: return active['id']
+            job_id, cached = str(uuid.uuid4()), self.db.execute("select 1 from artifacts where key = ?", (key,)).fetchone() is not None
+            self.db.execute("insert into jobs (id, kind, key, label, user_name, status, cached, created_at, finished_at) values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (job_id, kind, key, label, user_name, DONE if cached else QUEUED, int(cached), _now(), _now() if cached else None))
+        if not cached: self.pool.submit(self._run, job_id, key, build, progress)
+        return job_id
+
+    def _run(self, job_id, key, build, progress=False):
+        self._execute("update jobs set status = ?, started_at = ? where id = ?", (RUNNING, _now(), job_id))
+        try:
+            report = lambda done, total: self._execute("update jobs set progress_done = ?, progress_total = ? where id = ?", (done, total, job_id))
+            data, file_name, mime = build(report) if progress else build()
+            with self.lock:
+                self.db.execute("begin")
+                self.db.execute("insert into artifacts (key, file_name, mime, data, created_at) values (?, ?, ?, ?, ?) on conflict (key) do nothing",
+                                (key, file_name, mime, sqlite3.Binary(data), _now()))
+                self.db.execute("update jobs set status = ?, finished_at = ? where id = ?", (DONE, _now(), job_id))
+                self.db.execute("commit")
+        except Exception as e:
+            self._execute("update jobs set status = ?, error = ?, finished_at = ? where id = ?", (FAILED, str(e) or type(e).__name__, _now(), job_id))
+
+    def status(self, job_id):
+        rows = self._execute("select * from jobs where id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    # คืน (bytes, ชื่อไฟล์, mime) หรือ None
+    def artifact(self, key):
+        rows = self._execute("select data, file_name, mime from artifacts where key = ?", (key,))
+        return (bytes(rows[0]['data']), rows[0]['file_name'], rows[0]['mime']) if rows else None
+
+    def recent(self, limit=20):
+        return [dict(r) for r in self._execute("select * from jobs order by created_at desc limit ?", (limit,))]
+
+    # ลบไฟล์ที่สร้างไว้นานเกิน keep_days วัน (และประวัติงาน) ไฟล์ที่ต้องใช้อีกจะถูกสร้างใหม่เมื่อสั่ง
+    def prune(self, keep_days=3):
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=keep_days)).isoformat(timespec='seconds')
+        with self.lock:
+            self.db.execute("delete from artifacts where created_at < ?", (cutoff,))
+            self.db.execute("delete from jobs where created_at < ? and status not in (?, ?)", (cutoff, *ACTIVE))
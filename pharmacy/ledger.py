@@ -0,0 +1,61 @@
+import pandas as pd
+from pharmacy.utils import ENTRY_KIND_TH
+
+# --- สมุดบัญชีแบบต่อท้ายอย่างเดียว (ดู migrations/001_ledger_compensating_entries.sql) ---
+# แก้ไข = บันทึกแถว AMEND, ยกเลิก = บันทึกแถว VOID โดยทั้งคู่ชี้กลับไปที่แถวต้นฉบับผ่าน ref_id
+
+LEDGER_ERRORS = {
+    'NEGATIVE_STOCK': "❌ ทำรายการไม่ได้: การปรับยอดนี้จะทำให้สต๊อกคงเหลือใน Lot ติดลบ!",
+    'ALREADY_VOIDED': "❌ รายการนี้ถูกยกเลิกไปแล้ว",
+    'CANNOT_CORRECT_COMPENSATING_ENTRY': "❌ ไม่สามารถแก้ไขรายการปรับปรุงได้ กรุณาเลือกรายการต้นฉบับ",
+    'TRANSACTION_NOT_FOUND': "❌ ไม่พบรายการนี้ในระบบ (อาจถูกเปลี่ยนแปลงโดยผู้ใช้อื่น)",
+    'CANNOT_CORRECT_CARRY_FORWARD': "❌ ยอดยกมาจากการเก็บถาวรประวัติ ไม่สามารถแก้ไขหรือยกเลิกได้",
+    'CANNOT_VOID_EXPIRE': "❌ ยกเลิกการตัดจำหน่ายไม่ได้: ยาใน Lot นี้หมดอายุแล้ว (ยังอยู่ในคลังกักกัน)",
+}
+
+# effect: ผลต่อยอดรายล็อตที่คาดไว้ ใช้แสดงยอดชั่วคราวถ้าต้องเก็บคำสั่งไว้ในคิวออฟไลน์
+# import call_rpc (ต้องใช้ Streamlit) เฉพาะตอนบันทึก fold_ledger จึงใช้ได้ในสคริปต์และโปรเซสที่ไม่มี Streamlit
+def amend_transaction(trans_id, new_qty_change, note, user_name, form=None, effect=None):
+    from pharmacy.submit import call_rpc
+    return call_rpc("ledger_amend", {"p_trans_id": str(trans_id), "p_new_qty_change": int(new_qty_change), "p_note": note, "p_user_name": user_name}, form, effect)
+
+def void_transaction(trans_id, note, user_name, form=None, effect=None):
+    from pharmacy.submit import call_rpc
+    return call_rpc("ledger_void", {"p_trans_id": str(trans_id), "p_note": note, "p_user_name": user_name}, form, effect)
+
+def ledger_error_message(e):
+    for code, msg in LEDGER_ERRORS.items():
+        if code in str(e): return msg
+    return None
+
+def _key(s):
+    # id จาก JSON อาจเป็น int แต่ ref_id ที่มีค่าว่างปนจะกลายเป็น float จึงแปลงเป็น string ให้เทียบกันได้
+    if pd.api.types.is_float_dtype(s): return s.astype('Int64').astype(str)
+    return s.astype(str)
+
+# ยอดสุทธิของแถวต้นฉบับ = ยอดเดิม + รายการแก้ไข/ยกเลิกที่อ้างถึงใน df (แบบเดียวกับ v_net ของ ledger_correct)
+# ตาราง Audit Trail ไม่ได้ fold แถวที่เลือกจึงยังเป็นยอดเดิม ส่วนตารางที่ fold แล้วไม่มีรายการปรับปรุงเหลือ ได้ยอดเดิมกลับมา
+def net_qty_change(df, row):
+    if 'ref_id' not in df.columns: return int(row['qty_change'])
+    return int(row['qty_change']) + int(df.loc[_key(df['ref_id']) == str(row['id']), 'qty_change'].sum())
+
+# 🌟 รวมรายการปรับปรุงเข้ากับแถวต้นฉบับแบบ vectorized: ตัดคู่ที่ถูกยกเลิกออก และแสดงยอดสุทธิของรายการที่ถูกแก้ไข
+def fold_ledger(df):
+    if df.empty or 'ref_id' not in df.columns: return df
+    is_comp = df['ref_id'].notna()
+    if not is_comp.any(): return df.assign(amended=False)
+
+    comp = df[is_comp]
+    comp_key = _key(comp['ref_id'])
+    net_delta = comp['qty_change'].groupby(comp_key).sum()
+    voided = comp_key[comp['entry_kind'] == 'VOID'].unique()
+    latest_note = comp['note'].groupby(comp_key).last() if 'created_at' not in comp.columns else comp.assign(_key=comp_key).sort_values('created_at').groupby('_key')['note'].last()
+
+    base = df[~is_comp]
+    base_key = _key(base['id'])
+    keep = ~base_key.isin(voided)
+    base, base_key = base[keep].copy(), base_key[keep]
+    base['qty_change'] = base['qty_change'] + base_key.map(net_delta).fillna(0).astype(base['qty_change'].dtype)
+    base['note'] = base_key.map(latest_note).fillna(base['note'])
+    base['amended'] = base_key.isin(net_delta.index)
+    return base
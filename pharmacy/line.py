@@ -0,0 +1,12 @@
+import json
+import requests
+
+def send_line_message(token, target_id, message):
+    url = "https://api.line.me/v2/bot/message/push"
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    data = {"to": target_id, "messages": [{"type": "text", "text": message}]}
+    try:
+        response = requests.post(url, headers=headers, data=json.dumps(data))
+        return response.status_code == 200
+    except Exception as e:
+        return False
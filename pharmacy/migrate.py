@@ -0,0 +1,55 @@
+import os
+import re
+import glob
+import hashlib
+
+# --- ลงทะเบียนและรัน migrations/NNN_*.sql ตามลำดับ (ใช้กับ psycopg connection จาก pharmacy/pg.py) ---
+# ตาราง schema_migrations จำว่ารันไฟล์ไหนไปแล้ว รันซ้ำก็ทำเฉพาะไฟล์ใหม่ (แต่ละไฟล์อยู่ใน transaction ของตัวเอง พังกลางทางไม่ค้างครึ่งไฟล์)
+# 🌟 เก็บ checksum ของไฟล์ไว้ด้วย ไฟล์ที่รันไปแล้วถูกแก้ภายหลังจะถูกแจ้ง (ต้องเขียนเป็นไฟล์ใหม่แทนการแก้ไฟล์เดิม)
+# ฐานข้อมูลที่เคยรัน SQL ด้วยมือใน Supabase มาก่อน ใช้ baseline ลงทะเบียนไฟล์ถึงเวอร์ชันนั้นโดยไม่รันซ้ำ
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+SCHEMA = """
+create table if not exists public.schema_migrations (
+    version text primary key,
+    name text not null,
+    checksum text not null,
+    applied_at timestamptz not null default now()
+)
+"""
+
+# [(version, name, path, checksum)] เรียงตามเลขเวอร์ชัน
+def migration_files(root=MIGRATIONS_DIR):
+    files = []
+    for path in sorted(glob.glob(os.path.join(root, "*.sql"))):
+        match = re.match(r"^(\d+)_(.+)\.sql$", os.path.basename(path))
+        if not match: continue
+        with open(path, "rb") as f: checksum = hashlib.sha256(f.read()).hexdigest()
+        files.append((match.group(1), match.group(2), path, checksum))
+    return files
+
+def applied(conn):
+    conn.execute(SCHEMA)
+    return {r['version']: r for r in conn.execute("select version, name, checksum, applied_at from public.schema_migrations").fetchall()}
+
+# สถานะทุกไฟล์: APPLIED / PENDING / CHANGED (รันแล้วแต่ไฟล์ถูกแก้ทีหลัง)
+def status(conn, root=MIGRATIONS_DIR):
+    done = applied(conn)
+    return [{"version": v, "name": n, "status": "PENDING" if v not in done else "APPLIED" if done[v]['checksum'] == c else "CHANGED",
+             "applied_at": done[v]['applied_at'] if v in done else None} for v, n, _, c in migration_files(root)]
+
+# รันไฟล์ที่ยังไม่ได้รัน คืนรายการเวอร์ชันที่รัน baseline: ลงทะเบียนไฟล์ถึงเวอร์ชันนี้โดยไม่รัน
+def migrate(conn, root=MIGRATIONS_DIR, baseline=None, target=None):
+    done, ran = applied(conn), []
+    for version, name, path, checksum in migration_files(root):
+        if version in done or (target is not None and version > target): continue
+        with conn.transaction():
+            # กันไม่ให้สองเครื่องรันพร้อมกัน (เช่น deploy ซ้อนกัน) และตรวจซ้ำหลังได้ล็อก
+            conn.execute("select pg_advisory_xact_lock(hashtext('schema_migrations'))")
+            if conn.execute("select 1 from public.schema_migrations where version = %s", (version,)).fetchone(): continue
+            if baseline is None or version > baseline:
+                with open(path, encoding="utf-8") as f: conn.execute(f.read())
+                ran.append(version)
+            conn.execute("insert into public.schema_migrations (version, name, checksum) values (%s, %s, %s)", (version, name, checksum))
+    return ran
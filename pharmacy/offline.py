@@ -0,0 +1,103 @@
+import os
+import time
+import uuid
+import threading
+import streamlit as st
+from pharmacy import outbox
+
+# --- โหมดออฟไลน์ของหน้าเว็บ: เชื่อมคิวในเครื่อง (pharmacy/outbox.py) เข้ากับ Supabase ---
+# บันทึกไม่ได้เพราะเครือข่าย -> เก็บคำสั่งลงคิว, อ่านไม่ได้ -> ใช้สำเนาล่าสุดในเครื่อง + ผลของคิวที่ค้าง
+# 🌟 เธรดเบื้องหลังหนึ่งตัวต่อเซิร์ฟเวอร์ส่งคิวทุก SYNC_INTERVAL วินาที (ส่งทันทีเมื่อเน็ตกลับมา ไม่ต้องรอผู้ใช้กดอะไร)
+# ตำแหน่งไฟล์คิวกำหนดด้วย PHARMACY_OUTBOX (ค่าเริ่มต้น .pharmacy_outbox.sqlite ในโฟลเดอร์ที่รันแอป)
+
+OUTBOX_PATH = os.environ.get("PHARMACY_OUTBOX", ".pharmacy_outbox.sqlite")
+SYNC_INTERVAL = 30
+MIRROR_EVERY = 60
+ACTION_LABELS = {'receive_lots': "รับเข้า", 'dispense_fefo': "เบิกจ่าย", 'ledger_amend': "แก้ไขรายการ", 'ledger_void': "ยกเลิกรายการ"}
+
+_mirrored_at = {}
+
+@st.cache_resource
+def local_outbox():
+    return outbox.open_outbox(OUTBOX_PATH)
+
+# เครือข่ายใช้ไม่ได้ (ต่อไม่ติด/หมดเวลา) ต่างจากเซิร์ฟเวอร์ตอบกลับว่าผิดพลาด ซึ่งต้องแจ้งผู้ใช้ตามปกติ
+def is_offline_error(e):
+    import httpx
+    return isinstance(e, (httpx.TransportError, ConnectionError, TimeoutError))
+
+def queue_command(fn, params, token, effect=None):
+    outbox.enqueue(local_outbox(), fn, params, token, effect)
+    st.session_state.offline = True
+
+def _send(batch):
+    from pharmacy.db import supabase
+    return supabase.rpc("submit_batch", {"p_commands": batch}).execute().data
+
+# ส่งคิวที่ค้างทั้งหมด คืนสรุปผล หรือ None ถ้าเน็ตยังใช้ไม่ได้/มีเธรดอื่นกำลังส่งอยู่
+def sync():
+    db = local_outbox()
+    if not outbox.counts(db).get(outbox.PENDING): return None
+    try: summary = outbox.replay(db, _send)
+    except Exception as e:
+        if is_offline_error(e): return None
+        raise
+    outbox.prune(db)
+    return summary
+
+@st.cache_resource
+def start_sync_worker():
+    def loop():
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            try:
+                if sync(): st.cache_data.clear()
+            except Exception: pass
+    threading.Thread(target=loop, daemon=True, name="outbox-sync").start()
+    return True
+
+# อ่านข้อมูลผ่าน loader ปกติและเก็บสำเนาไว้ในเครื่อง (ไม่เกินทุก MIRROR_EVERY วินาที) ถ้าเครือข่ายใช้ไม่ได้คืนสำเนาล่าสุดแทน
+# schema: ชื่อตารางใน pharmacy/frames.py SCHEMAS ใช้กำหนดชนิดคอลัมน์ของสำเนาให้เหมือนข้อมูลจริง
+def offline_read(name, loader, schema=None):
+    try: df = loader()
+    except Exception as e:
+        if not is_offline_error(e): raise
+        df, saved_at = outbox.load_mirror(local_outbox(), name)
+        if df is None: raise
+        st.session_state.offline = True
+        if schema:
+            from pharmacy.frames import apply_schema
+            df = apply_schema(df, schema)
+        return df
+    if time.monotonic() - _mirrored_at.get(name, -MIRROR_EVERY) >= MIRROR_EVERY:
+        outbox.save_mirror(local_outbox(), name, df)
+        _mirrored_at[name] = time.monotonic()
+    st.session_state.offline = False
+    return df
+
+# ล็อตที่เบิกได้ = ผลจาก loader (หรือสำเนาตอนออฟไลน์) + คำสั่งที่ยังไม่ได้ส่ง เพื่อไม่ให้เบิกเกินยอดระหว่างรอส่งคิว
+def provisional_inventory(loader):
+    lots = offline_read("inventory", loader, schema="inventory")
+    pending = outbox.commands(local_outbox(), outbox.PENDING)
+    return outbox.provisional_lots(lots, pending) if pending else lots
+
+# แถบด้านข้าง: สถานะการเชื่อมต่อ คิวที่รอส่ง และคำสั่งที่ขัดแย้งให้ผู้ใช้เลือกส่งใหม่หรือทิ้ง
+def sidebar_status():
+    db = local_outbox()
+    n = outbox.counts(db)
+    if st.session_state.get('offline'): st.warning("📴 ออฟไลน์: บันทึกไว้ในเครื่อง จะส่งเข้าระบบอัตโนมัติเมื่อเชื่อมต่อได้")
+    if n.get(outbox.PENDING):
+        st.caption(f"⏳ รอส่งเข้าระบบ {n[outbox.PENDING]:,} รายการ")
+        if st.button("🔄 ส่งตอนนี้", use_container_width=True):
+            summary = sync()
+            if summary: st.cache_data.clear(); st.toast(f"ส่งแล้ว {summary['applied'] + summary['duplicate']:,} รายการ ขัดแย้ง {summary['conflict']:,} รายการ")
+            else: st.toast("ยังเชื่อมต่อไม่ได้ ลองใหม่ภายหลัง", icon="📴")
+    if n.get(outbox.CONFLICT):
+        with st.expander(f"⚠️ รายการที่ส่งไม่สำเร็จ ({n[outbox.CONFLICT]:,})", expanded=True):
+            for cmd in outbox.commands(db, outbox.CONFLICT):
+                reason = "ข้อมูลในระบบเปลี่ยนไประหว่างออฟไลน์" if outbox.is_conflict(cmd['error']) else "ระบบไม่รับคำสั่งนี้"
+                st.markdown(f"**{ACTION_LABELS.get(cmd['action'], cmd['action'])}** ({cmd['params'].get('p_user_name', '-')})  \n{reason}: `{cmd['error']}`")
+                c1, c2 = st.columns(2)
+                if c1.button("ส่งใหม่", key=f"outbox_retry_{cmd['seq']}", use_container_width=True): outbox.retry(db, cmd['seq'], str(uuid.uuid4())); st.rerun()
+                if c2.button("ทิ้ง", key=f"outbox_discard_{cmd['seq']}", use_container_width=True): outbox.discard(db, cmd['seq']); st.rerun()
+
@@ -0,0 +1,149 @@
+import io
+import json
+import sqlite3
+import datetime
+import threading
+import pandas as pd
+from pharmacy.fefo import LotBook
+
+# --- คิวคำสั่งออฟไลน์ของเครื่องหน้างาน (SQLite ไฟล์เดียว ไม่พึ่ง Streamlit) ---
+# เน็ตหลุดระหว่างกดบันทึก -> คำสั่งรับเข้า/เบิกจ่าย/แก้ไข-ยกเลิกรายการถูกเขียนลงคิวในเครื่องก่อน (commit ลงดิสก์ทันที ปิดเครื่องก็ไม่หาย)
+# เมื่อเชื่อมต่อได้ replay() ส่งคำสั่งตามลำดับที่บันทึก ก้อนละ batch_size รายการต่อ 1 คำขอ (submit_batch ใน migrations/013_submit_batch.sql)
+# 🌟 ทุกคำสั่งใช้ token เดิมของฟอร์ม ส่งซ้ำกี่ครั้งก็บันทึกครั้งเดียว (เน็ตหลุดหลังเซิร์ฟเวอร์บันทึกแล้วแต่ยังไม่ได้รับผล -> รอบหน้าได้ DUPLICATE = สำเร็จแล้ว)
+# คำสั่งที่เซิร์ฟเวอร์ปฏิเสธ (เช่น ยอดไม่พอเพราะจุดอื่นเบิกไปก่อน) ถูกพักไว้เป็น CONFLICT ให้ผู้ใช้ตัดสินใจ ไม่ส่งซ้ำเอง
+# ระหว่างออฟไลน์ ยอดคงเหลือที่แสดง = สำเนาล่าสุดจากเซิร์ฟเวอร์ (mirror) + ผลของคำสั่งที่ยังค้างในคิว (ตัด FEFO ในเครื่อง)
+
+PENDING, APPLIED, CONFLICT = "PENDING", "APPLIED", "CONFLICT"
+QUEUEABLE = ('receive_lots', 'dispense_fefo', 'ledger_amend', 'ledger_void')
+# รหัสข้อผิดพลาดที่แปลว่าข้อมูลฝั่งเซิร์ฟเวอร์เปลี่ยนไประหว่างออฟไลน์ (ส่วนอื่นคือคำสั่งไม่ถูกต้อง)
+CONFLICT_CODES = ('INSUFFICIENT_STOCK', 'NEGATIVE_STOCK', 'ALREADY_VOIDED', 'TRANSACTION_NOT_FOUND')
+DEFAULT_BATCH_SIZE = 50
+
+SCHEMA = """
+create table if not exists commands (
+    seq integer primary key autoincrement,
+    token text not null unique,
+    action text not null,
+    params text not null,
+    effect text,
+    status text not null default 'PENDING',
+    error text,
+    result text,
+    queued_at text not null,
+    attempts integer not null default 0,
+    done_at text
+);
+create index if not exists commands_status_idx on commands (status, seq);
+create table if not exists mirror (name text primary key, payload text not null, saved_at text not null);
+"""
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+# lock: คุมการใช้ connection ร่วมกันหลายเธรด, replay_lock: ให้มีการส่งคิวได้ทีละรอบ (ไม่ถือ lock ระหว่างรอเครือข่าย)
+class _Connection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock, self.replay_lock = threading.RLock(), threading.Lock()
+
+def open_outbox(path):
+    db = sqlite3.connect(path, factory=_Connection, check_same_thread=False, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("pragma journal_mode=wal")
+    db.execute("pragma synchronous=full")
+    db.executescript(SCHEMA)
+    return db
+
+# effect: ผลต่อยอดรายล็อตที่คาดไว้ [{"medicine_id", "lot_no", "qty"}] สำหรับคำสั่งที่คำนวณจาก params เองไม่ได้ (แก้ไข/ยกเลิกรายการ)
+def enqueue(db, action, params, token, effect=None):
+    if action not in QUEUEABLE: raise ValueError(f"คำสั่ง {action} บันทึกแบบออฟไลน์ไม่ได้")
+    with db.lock:
+        db.execute("insert into commands (token, action, params, effect, queued_at) values (?, ?, ?, ?, ?) on conflict (token) do nothing",
+                   (token, action, json.dumps(params, ensure_ascii=False, default=str), json.dumps(effect) if effect else None, _now()))
+
+def commands(db, status=None):
+    with db.lock:
+        rows = db.execute("select * from commands" + (" where status = ?" if status else "") + " order by seq", (status,) if status else ()).fetchall()
+    return [dict(r, params=json.loads(r['params']), effect=json.loads(r['effect']) if r['effect'] else None) for r in rows]
+
+def counts(db):
+    with db.lock: return {r['status']: r['n'] for r in db.execute("select status, count(*) as n from commands group by status")}
+
+def _finish(db, seq, status, error=None, result=None):
+    db.execute("update commands set status = ?, error = ?, result = ?, done_at = ? where seq = ?",
+               (status, error, json.dumps(result) if result is not None else None, _now(), seq))
+
+# send(batch) -> รายการผลตามลำดับ [{"token", "status": APPLIED|DUPLICATE|REJECTED, "error"?, "result"?}]
+# ถ้า send โยน exception (เช่น เน็ตหลุดกลางทาง) คำสั่งในก้อนนั้นยังคง PENDING และหยุดรอรอบถัดไป
+# คืน None ถ้ามีอีกเธรดกำลังส่งคิวอยู่
+def replay(db, send, batch_size=DEFAULT_BATCH_SIZE):
+    if not db.replay_lock.acquire(blocking=False): return None
+    summary = {"applied": 0, "duplicate": 0, "conflict": 0, "batches": 0}
+    try:
+        while True:
+            with db.lock:
+                batch = db.execute("select seq, token, action, params from commands where status = ? order by seq limit ?", (PENDING, batch_size)).fetchall()
+                if not batch: return summary
+                db.execute(f"update commands set attempts = attempts + 1 where seq in ({','.join('?' * len(batch))})", [r['seq'] for r in batch])
+            results = send([{"token": r['token'], "action": r['action'], "params": json.loads(r['params'])} for r in batch])
+            by_token = {str(res['token']): res for res in results}
+            with db.lock:
+                db.execute("begin")
+                for r in batch:
+                    res = by_token.get(r['token'])
+                    if res is None: continue
+                    if res['status'] == 'APPLIED': _finish(db, r['seq'], APPLIED, result=res.get('result')); summary['applied'] += 1
+                    elif res['status'] == 'DUPLICATE': _finish(db, r['seq'], APPLIED, error='DUPLICATE'); summary['duplicate'] += 1
+                    else: _finish(db, r['seq'], CONFLICT, error=res.get('error')); summary['conflict'] += 1
+                db.execute("commit")
+            summary['batches'] += 1
+    finally: db.replay_lock.release()
+
+# คำสั่งที่ขัดแย้ง: ส่งใหม่ด้วย token ใหม่ (หลังผู้ใช้ตรวจแล้วว่าต้องการ) หรือทิ้ง
+def retry(db, seq, new_token):
+    with db.lock: db.execute("update commands set status = ?, token = ?, error = null where seq = ? and status = ?", (PENDING, new_token, seq, CONFLICT))
+
+# ถูกปฏิเสธเพราะข้อมูลฝั่งเซิร์ฟเวอร์เปลี่ยนไป (ไม่ใช่เพราะคำสั่งผิด)
+def is_conflict(error):
+    return any(code in str(error or '') for code in CONFLICT_CODES)
+
+def discard(db, seq):
+    with db.lock: db.execute("delete from commands where seq = ? and status = ?", (seq, CONFLICT))
+
+# ลบประวัติคำสั่งที่ส่งสำเร็จแล้วเกิน keep_days วัน
+def prune(db, keep_days=7):
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=keep_days)).isoformat(timespec='seconds')
+    with db.lock: db.execute("delete from commands where status = ? and done_at < ?", (APPLIED, cutoff))
+
+# --- สำเนาข้อมูลที่ใช้แสดงฟอร์มตอนออฟไลน์ (รายการยา, ล็อตที่เบิกได้, GTIN) ---
+
+def save_mirror(db, name, df):
+    with db.lock: db.execute("insert into mirror (name, payload, saved_at) values (?, ?, ?) on conflict (name) do update set payload = excluded.payload, saved_at = excluded.saved_at",
+                             (name, df.to_json(orient='split', date_format='iso', index=False), _now()))
+
+# คืน (DataFrame, เวลาที่บันทึก) หรือ (None, None) ถ้ายังไม่เคยบันทึก
+def load_mirror(db, name):
+    with db.lock: row = db.execute("select payload, saved_at from mirror where name = ?", (name,)).fetchone()
+    if row is None: return None, None
+    return pd.read_json(io.StringIO(row['payload']), orient='split', dtype=False), row['saved_at']
+
+# ล็อตที่เบิกได้ (id, medicine_id, lot_no, exp_date, qty) + ผลของคำสั่งที่ยังค้างในคิวตามลำดับ
+# รับเข้า = เพิ่มล็อตใหม่, เบิกจ่าย = ตัด FEFO จากยอดในเครื่อง, แก้ไข/ยกเลิก = effect ที่บันทึกไว้ตอนเข้าคิว
+def provisional_lots(lots, pending):
+    rows = lots[['id', 'medicine_id', 'lot_no', 'exp_date', 'qty']].to_dict('records') if not lots.empty else []
+    for cmd in pending:
+        p = cmd['params']
+        if cmd['action'] == 'receive_lots':
+            rows += [{"id": f"Q{cmd['seq']}-{i}", "medicine_id": l['medicine_id'], "lot_no": l['lot_no'], "exp_date": l['exp_date'], "qty": int(l['qty'])} for i, l in enumerate(p['p_lines'])]
+        elif cmd['action'] == 'dispense_fefo':
+            book = LotBook(rows)
+            taken = {}
+            for l in p['p_lines']:
+                for a in book.take(l['medicine_id'], min(int(l['qty']), book.available(l['medicine_id']))): taken[a['inventory_id']] = taken.get(a['inventory_id'], 0) + a['qty']
+            for r in rows: r['qty'] -= taken.get(r['id'], 0)
+        elif cmd['effect']:
+            for e in cmd['effect']:
+                hit = next((r for r in rows if r['medicine_id'] == e['medicine_id'] and str(r['lot_no']) == str(e['lot_no'])), None)
+                if hit: hit['qty'] += int(e['qty'])
+    df = pd.DataFrame(rows, columns=['id', 'medicine_id', 'lot_no', 'exp_date', 'qty'])
+    return df[df['qty'] > 0].reset_index(drop=True)
@@ -0,0 +1,18 @@
+import os
+
+# --- การเชื่อมต่อ Postgres โดยตรง (psycopg) สำหรับงาน headless เช่น dispense_api.py และ archive_transactions.py ---
+# ใช้ DATABASE_URL = connection string ของ Postgres/Supabase (ติดตั้งด้วย pip install -r requirements-service.txt)
+
+def connect(dsn=None):
+    import psycopg
+    from psycopg.rows import dict_row
+    return psycopg.connect(dsn or os.environ["DATABASE_URL"], row_factory=dict_row, autocommit=True)
+
+_id_types = {}
+
+def id_type(conn, table):
+    # ชนิดของคอลัมน์ id (bigint / uuid) อ่านจาก catalog เพื่อ cast array ให้ตรงและใช้ index ได้
+    if table not in _id_types:
+        row = conn.execute("select format_type(atttypid, atttypmod) as t from pg_attribute where attrelid = %s::regclass and attname = 'id'", (table,)).fetchone()
+        _id_types[table] = row['t']
+    return _id_types[table]
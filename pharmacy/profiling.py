@@ -0,0 +1,106 @@
+import io
+import time
+import pstats
+import marshal
+import cProfile
+import datetime
+import threading
+import collections
+import pandas as pd
+import streamlit as st
+
+# --- จับโปรไฟล์ของ rerun ถัดไปของหน้าที่เลือก (เปิดจากแท็บ Profiler ในหน้า Admin) ---
+# ใช้ cProfile (ไลบรารีมาตรฐาน) จับเฉพาะเธรดของ session นั้น ผลลัพธ์เก็บไว้ในหน่วยความจำของเซิร์ฟเวอร์ 20 รายการล่าสุด
+# 🌟 แยกเวลาตามกลุ่มจาก self time ของแต่ละฟังก์ชัน (ไม่นับซ้ำ): pandas/arrow, เครือข่าย (Supabase), แคชของ Streamlit, การแสดงผล, โค้ดของแอป
+# ระหว่างจับโปรไฟล์ เวลาที่วัดได้จะช้ากว่าปกติเล็กน้อยจาก overhead ของ cProfile
+
+MAX_CAPTURES = 20
+
+# ตรวจตามลำดับ กลุ่มที่เจาะจงกว่าต้องมาก่อน (เช่น แคชของ Streamlit ก่อน Streamlit ทั้งหมด)
+CATEGORIES = [
+    ("เครือข่าย (Supabase)", ("/httpx/", "/httpcore/", "/h2/", "/hpack/", "/postgrest/", "/supabase/", "/gotrue/", "/supabase_auth/", "/storage3/",
+                             "ssl.py", "socket.py", "_ssl.", "'_socket.", "select.", "selectors.py")),
+    ("pandas / numpy / arrow", ("/pandas/", "/numpy/", "/pyarrow/", "pandas._libs", "numpy.", "pyarrow.lib")),
+    ("แคชของ Streamlit", ("/streamlit/runtime/caching/",)),
+    ("การแสดงผล (Streamlit)", ("/streamlit/",)),
+    ("โค้ดของแอป", ("app_pages/", "pharmacy/", "streamlit_app.py")),
+]
+OTHER = "อื่นๆ (Python)"
+
+_rows = threading.local()
+
+@st.cache_resource
+def _captures():
+    return collections.deque(maxlen=MAX_CAPTURES)
+
+def captures():
+    return list(_captures())
+
+# เรียกจากจุดที่ดึงข้อมูล เพื่อบันทึกจำนวนแถวที่โหลดระหว่าง rerun ที่ถูกจับโปรไฟล์ (นอกช่วงจับโปรไฟล์จะไม่ทำอะไร)
+def record_rows(source, n):
+    counts = getattr(_rows, "counts", None)
+    if counts is not None: counts[source] = counts.get(source, 0) + int(n)
+
+def request_capture(page_title):
+    st.session_state.profile_next = page_title
+
+# ใช้แทน pg.run() ใน streamlit_app.py
+def run_page(pg):
+    if st.session_state.get("profile_next") != pg.title: return pg.run()
+    st.session_state.profile_next = None
+    profiler = cProfile.Profile()
+    _rows.counts = {}
+    wall, cpu = time.perf_counter(), time.thread_time()
+    profiler.enable()
+    try: return pg.run()
+    finally:
+        # st.rerun()/st.stop() ทำงานด้วย exception จึงเก็บผลใน finally เสมอ
+        profiler.disable()
+        _captures().appendleft(summarize(profiler, pg.title, time.perf_counter() - wall, time.thread_time() - cpu, _rows.counts))
+        _rows.counts = None
+
+def categorize(filename, func):
+    key = f"{filename}:{func}".replace("\\", "/")
+    for name, needles in CATEGORIES:
+        if any(n in key for n in needles): return name
+    return OTHER
+
+# ฟังก์ชันของ Python เอง (เช่น posixpath, json, builtins) นับเข้ากลุ่มของผู้เรียกหลัก (caller ที่ใช้เวลาสะสมมากสุด)
+# เช่น json.loads ที่ถูกเรียกจาก postgrest จะถูกนับเป็นเวลาเครือข่าย ไม่ใช่ "อื่นๆ"
+def _categories(raw):
+    own = {k: categorize(k[0], k[2]) for k in raw}
+    resolved = {}
+    for key in raw:
+        chain, k = [], key
+        while k not in resolved and own.get(k) == OTHER and k not in chain:
+            chain.append(k)
+            callers = raw[k][4]
+            k = max(callers, key=lambda c: callers[c][3]) if callers else None
+            if k not in raw: break
+        final = resolved.get(k, own.get(k, OTHER)) if k is not None else OTHER
+        for c in chain: resolved[c] = final
+        resolved.setdefault(key, own[key] if own[key] != OTHER else final)
+    return resolved
+
+def summarize(profiler, page, wall_s, cpu_s, rows):
+    profiler.create_stats()
+    raw = profiler.stats
+    cats = _categories(raw)
+    records = [{"function": f"{func} ({filename.rsplit('/', 1)[-1]}:{line})", "category": cats[(filename, line, func)],
+                "calls": nc, "self_ms": tt * 1000, "cumulative_ms": ct * 1000}
+               for (filename, line, func), (cc, nc, tt, ct, callers) in raw.items()]
+    funcs = pd.DataFrame(records)
+    breakdown = funcs.groupby("category")["self_ms"].sum().sort_values(ascending=False).reset_index()
+    return {"page": page, "at": datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=7))), "wall_ms": wall_s * 1000, "cpu_ms": cpu_s * 1000,
+            "rows": dict(rows or {}), "breakdown": breakdown, "top_self": funcs.nlargest(25, "self_ms"), "top_cumulative": funcs.nlargest(25, "cumulative_ms"),
+            "prof": marshal.dumps(raw)}
+
+class _SavedProfile:
+    def __init__(self, stats): self.stats = stats
+    def create_stats(self): pass
+
+# ข้อความสรุปแบบ pstats (เหมือน python -m pstats) สำหรับแนบในรายงานปัญหา
+def pstats_text(capture, sort="cumulative", limit=40):
+    out = io.StringIO()
+    pstats.Stats(_SavedProfile(marshal.loads(capture["prof"])), stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
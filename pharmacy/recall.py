@@ -0,0 +1,68 @@
+import re
+import pandas as pd
+
+# --- ตามรอย Lot และเรียกคืนยา (ดู migrations/017_lot_recall.sql) ---
+# ส่วนคำนวณไม่พึ่ง Streamlit: รับรายการในสมุดบัญชีของ Lot ที่ค้น (ยุบรายการปรับปรุงแล้ว) และยอดในคลังของล็อตเดียวกัน
+# 🌟 ล็อตที่ถูกระงับมีสถานะ RECALLED ยอดยังอยู่ในคลัง แต่ไม่ถูกตัดจ่ายแบบ FEFO จนกว่าจะยกเลิกการระงับ
+
+RECALL_ERRORS = {
+    'NO_LOTS': "❌ กรุณาระบุเลข Lot อย่างน้อย 1 รายการ",
+    'RECALL_NOT_FOUND': "❌ ไม่พบประกาศนี้ หรือถูกยกเลิกการระงับไปแล้ว",
+}
+
+STATUS_TH = {'ACTIVE': 'ใช้งาน', 'QUARANTINE': 'กักกัน (หมดอายุ)', 'RECALLED': '🚫 ระงับ (เรียกคืน)'}
+
+TRACE_COLUMNS = {'created_at_str': 'วัน-เวลา', 'action_type_th': 'ประเภท', 'medicine_id': 'รหัสยา', 'generic_name': 'รายการยา', 'lot_no': 'เลข Lot',
+                 'qty_change': 'จำนวน (+/-)', 'unit': 'หน่วย', 'user_name': 'ผู้บันทึก', 'note': 'หมายเหตุ / หน่วยงาน'}
+SUMMARY_COLUMNS = {'medicine_id': 'รหัสยา', 'generic_name': 'รายการยา', 'lot_no': 'เลข Lot', 'exp_date': 'วันหมดอายุ', 'status_th': 'สถานะ',
+                   'received_qty': 'รับเข้า', 'dispensed_qty': 'เบิกจ่าย', 'dispense_count': 'จำนวนครั้งที่จ่าย', 'expired_qty': 'ตัดหมดอายุ',
+                   'adjusted_qty': 'ปรับยอด', 'on_hand': 'คงเหลือในคลัง', 'quarantined_qty': 'อยู่ในคลังกักกัน', 'unit': 'หน่วย',
+                   'first_dispense': 'จ่ายครั้งแรก', 'last_dispense': 'จ่ายครั้งล่าสุด'}
+
+def recall_error_message(e):
+    for code, msg in RECALL_ERRORS.items():
+        if code in str(e): return msg
+    return None
+
+# เลข Lot ที่พิมพ์/วางมา คั่นด้วยขึ้นบรรทัดใหม่ จุลภาค หรือ ; (ตัดซ้ำ คงลำดับเดิม) เลข Lot บางบริษัทมีช่องว่างจึงไม่ใช้ช่องว่างเป็นตัวคั่น
+def parse_lots(text):
+    return list(dict.fromkeys(l.strip() for l in re.split(r"[\n,;\t]+", text or "") if l.strip()))
+
+# สรุปรายยา+Lot: รับเข้า/เบิกจ่าย/ตัดหมดอายุ/ปรับยอดจากสมุดบัญชี และยอดคงเหลือจริงจากตาราง inventory
+# trans: รายการของ Lot ที่ค้น (ยุบรายการปรับปรุงแล้ว อาจมีคอลัมน์ archived), inv: medicine_id, lot_no, exp_date, qty, quarantined_qty, status
+def lot_summary(trans, inv):
+    keys = ['medicine_id', 'lot_no']
+    t = trans if len(trans) else pd.DataFrame({c: pd.Series(dtype=object) for c in ['medicine_id', 'lot_no', 'action_type', 'qty_change', 'created_at']}).astype({'qty_change': 'int64'})
+    # ยอดยกมาจากการเก็บถาวรซ้ำกับรายการที่เก็บถาวรไว้ ถ้าอ่านประวัติที่เก็บถาวรมาด้วยจึงไม่นับ
+    if len(t) and 'archived' in t.columns and t['archived'].any() and 'carry_forward' in t.columns: t = t[~t['carry_forward'].fillna(False).astype(bool)]
+    act, qty = t['action_type'].astype(str), t['qty_change'].astype('int64')
+    flows = pd.DataFrame({'medicine_id': t['medicine_id'].astype(str), 'lot_no': t['lot_no'].astype(str),
+                          'received_qty': qty.where(act.isin(['RECEIVE', 'INITIAL']), 0), 'dispensed_qty': -qty.where(act == 'DISPENSE', 0),
+                          'expired_qty': -qty.where(act == 'EXPIRE', 0), 'adjusted_qty': qty.where(act == 'ADJUST', 0), 'dispense_count': (act == 'DISPENSE').astype('int64')})
+    flows = flows.groupby(keys, sort=False).sum()
+    dispensed = t[act == 'DISPENSE']
+    if len(dispensed):
+        span = dispensed['created_at'].groupby([dispensed['medicine_id'].astype(str), dispensed['lot_no'].astype(str)]).agg(['min', 'max'])
+        flows = flows.join(span.rename(columns={'min': 'first_dispense', 'max': 'last_dispense'}).rename_axis(keys))
+
+    stock = inv.assign(medicine_id=inv['medicine_id'].astype(str), lot_no=inv['lot_no'].astype(str), status=inv['status'].astype(str))
+    # ล็อตเดียวกันอาจถูกรับเข้าหลายครั้ง (หลายแถวใน inventory) สถานะที่ระงับอยู่แสดงก่อน
+    stock = stock.groupby(keys, sort=False).agg(exp_date=('exp_date', 'min'), on_hand=('qty', 'sum'), quarantined_qty=('quarantined_qty', 'sum'),
+                                               status=('status', lambda s: ", ".join(sorted(set(s), key=['RECALLED', 'QUARANTINE', 'ACTIVE'].index))))
+    out = flows.join(stock, how='outer').reset_index()
+    for col in ['received_qty', 'dispensed_qty', 'expired_qty', 'adjusted_qty', 'dispense_count', 'on_hand', 'quarantined_qty']:
+        out[col] = out[col].fillna(0).astype('int64') if col in out.columns else 0
+    for col in ['first_dispense', 'last_dispense']:
+        if col not in out.columns: out[col] = pd.NaT
+    out['status'] = out['status'].fillna('')
+    out['status_th'] = out['status'].map(lambda s: ", ".join(STATUS_TH.get(x, x) for x in s.split(", ") if x))
+    return out.sort_values(keys, kind='stable', ignore_index=True)
+
+# 🌟 คำสั่งบันทึกผ่าน submit_once (กันกดซ้ำ) import ตอนเรียกเพื่อให้ส่วนคำนวณข้างบนใช้ได้โดยไม่ต้องมี Streamlit
+def recall_lots(lots, medicine_id, reason, block, user_name, form=None):
+    from pharmacy.submit import call_rpc
+    return call_rpc("lot_recall", {"p_lots": list(lots), "p_medicine_id": medicine_id, "p_reason": reason, "p_block": bool(block), "p_user_name": user_name}, form)
+
+def release_recall(recall_id, user_name, form=None):
+    from pharmacy.submit import call_rpc
+    return call_rpc("lot_recall_release", {"p_recall_id": int(recall_id), "p_user_name": user_name}, form)
@@ -0,0 +1,111 @@
+import io
+import numpy as np
+import pandas as pd
+
+# --- รับเข้าแบบตาราง (ใบส่งของหลายร้อยบรรทัด วางจาก Excel ได้) ไม่พึ่ง Streamlit ---
+# ทุกช่องในตารางเป็นข้อความ วางข้อมูลจากใบส่งของได้ตรงๆ (เลขมีจุลภาค, วันที่ ว/ด/ป พ.ศ. หรือ ค.ศ.) แล้วแปลงที่นี่ทีเดียว
+# 🌟 ตรวจทุกบรรทัดพร้อมกันด้วย pandas (ไม่วนทีละแถว): ไม่พบยา, Lot ซ้ำในใบ/ซ้ำกับในคลังแต่วันหมดอายุไม่ตรง,
+#    วันหมดอายุไม่หลังวันผลิต, หมดอายุแล้ว, จำนวน/ราคาทุนไม่ถูกต้อง ผ่านหมดแล้วจึงบันทึกทั้งใบด้วย receive_lots ครั้งเดียว
+
+GRID_COLUMNS = ['medicine', 'lot_no', 'mfg_date', 'exp_date', 'qty', 'unit_cost']
+GRID_LABELS = {'medicine': 'รหัสยา / ชื่อยา', 'lot_no': 'เลข Lot', 'mfg_date': 'วันผลิต', 'exp_date': 'วันหมดอายุ', 'qty': 'จำนวนรับเข้า', 'unit_cost': 'ราคาทุน/หน่วย (บาท)'}
+# ชื่อหัวคอลัมน์ที่รับได้ในไฟล์ใบส่งของ (นอกจาก GRID_LABELS)
+IMPORT_HEADERS = {'รหัสยา': 'medicine', 'ชื่อยา': 'medicine', 'รายการ': 'medicine', 'medicine_id': 'medicine', 'generic_name': 'medicine',
+                  'lot': 'lot_no', 'เลข lot': 'lot_no', 'mfg': 'mfg_date', 'exp': 'exp_date', 'จำนวน': 'qty', 'ราคาทุน': 'unit_cost', 'ราคา/หน่วย': 'unit_cost',
+                  **{v.lower(): k for k, v in GRID_LABELS.items()}}
+PROBLEMS = {
+    'unknown': "ไม่พบยาในระบบ",
+    'ambiguous': "ชื่อยาซ้ำหลายรายการ (ใช้รหัสยาแทน)",
+    'no_exp': "ไม่มี/อ่านวันหมดอายุไม่ได้",
+    'bad_mfg': "อ่านวันผลิตไม่ได้",
+    'exp_before_mfg': "วันหมดอายุไม่หลังวันผลิต",
+    'expired': "หมดอายุแล้ว",
+    'bad_qty': "จำนวนต้องเป็นจำนวนเต็มมากกว่า 0",
+    'bad_cost': "ราคาทุนต้องเป็นตัวเลขไม่ติดลบ",
+    'dup_in_sheet': "Lot ซ้ำกับบรรทัดอื่นในใบนี้",
+    'dup_in_stock': "Lot นี้มีในคลังแล้วแต่วันหมดอายุไม่ตรง",
+}
+
+def empty_grid(rows=20):
+    return pd.DataFrame({c: pd.Series([None] * rows, dtype=object) for c in GRID_COLUMNS})
+
+# อ่านไฟล์ใบส่งของ (CSV/Excel) เป็นตารางเดียวกับที่กรอกบนหน้าเว็บ
+def parse_invoice_file(uploaded):
+    name = getattr(uploaded, 'name', '')
+    raw = pd.read_excel(uploaded, dtype=str) if name.lower().endswith(('.xlsx', '.xls')) else pd.read_csv(io.BytesIO(uploaded.getvalue()) if hasattr(uploaded, 'getvalue') else uploaded, dtype=str, encoding='utf-8-sig')
+    raw = raw.rename(columns=lambda c: IMPORT_HEADERS.get(str(c).strip().lower(), str(c).strip().lower()))
+    if not {'medicine', 'exp_date', 'qty'} <= set(raw.columns): raise ValueError("ไฟล์ต้องมีคอลัมน์ 'รหัสยา / ชื่อยา', 'วันหมดอายุ' และ 'จำนวนรับเข้า'")
+    return raw.reindex(columns=GRID_COLUMNS).astype(object)
+
+def _text(s):
+    return s.astype(object).where(s.notna(), '').astype(str).str.strip()
+
+# วันที่ในรูปแบบที่พบบ่อยในใบส่งของ: 2027-12-31, 31/12/2027, 31/12/2570 (พ.ศ.) -> Timestamp (NaT ถ้าอ่านไม่ได้)
+def parse_dates(s):
+    text = _text(s).str.replace(r'\b(2[4-6]\d\d)\b', lambda m: str(int(m.group(1)) - 543), regex=True)
+    iso = text.str.match(r'^\d{4}-\d{1,2}-\d{1,2}')
+    out = pd.to_datetime(text.where(iso), format='ISO8601', errors='coerce')
+    return out.fillna(pd.to_datetime(text.where(~iso & (text != '')), dayfirst=True, format='mixed', errors='coerce')).dt.normalize()
+
+def _numbers(s):
+    return pd.to_numeric(_text(s).str.replace(',', '', regex=False).replace('', np.nan), errors='coerce')
+
+# จับคู่ช่อง "รหัสยา / ชื่อยา" กับรายการยา: รหัสตรงตัว -> ชื่อที่แสดงในหน้าเว็บ "ชื่อ (หน่วย)" -> ชื่อสามัญ (ไม่สนตัวพิมพ์เล็ก/ใหญ่)
+def resolve_medicines(values, meds):
+    ids = meds['id'].astype(str)
+    keys = _text(values)
+    by_id = pd.Series(ids.values, index=ids.str.lower())
+    labels = (meds['generic_name'].astype(str) + " (" + meds['unit'].astype(str) + ")").str.strip().str.lower()
+    names = meds['generic_name'].astype(str).str.strip().str.lower()
+    lookups = [by_id[~by_id.index.duplicated()]]
+    for key in (labels, names):
+        unique = ~key.duplicated(keep=False)
+        lookups.append(pd.Series(ids.values[unique.values], index=key[unique].values))
+    low = keys.str.lower()
+    resolved = pd.Series(None, index=keys.index, dtype=object)
+    for lookup in lookups: resolved = resolved.fillna(low.map(lookup))
+    ambiguous = resolved.isna() & low.isin(set(names[names.duplicated(keep=False)]))
+    return resolved, ambiguous
+
+# grid: ตารางจากหน้าเว็บ, meds: รายการยา (id, generic_name, unit), stock_lots: ล็อตในคลังของยาในใบนี้ (medicine_id, lot_no, exp_date)
+# คืนตารางที่แปลงค่าแล้วพร้อมคอลัมน์ problems (ว่าง = ผ่าน) เฉพาะบรรทัดที่มีข้อมูล
+def validate_grid(grid, meds, stock_lots, today):
+    grid = grid.reindex(columns=GRID_COLUMNS)
+    filled = grid.apply(_text).ne('').any(axis=1)
+    grid = grid[filled]
+    if grid.empty: return pd.DataFrame(columns=['medicine_id', 'lot_no', 'mfg_date', 'exp_date', 'qty', 'unit_cost', 'problems'])
+    df = pd.DataFrame(index=grid.index)
+    df['medicine_id'], ambiguous = resolve_medicines(grid['medicine'], meds)
+    df['lot_no'] = _text(grid['lot_no']).replace('', '-')
+    df['mfg_date'], df['exp_date'] = parse_dates(grid['mfg_date']), parse_dates(grid['exp_date'])
+    qty, cost = _numbers(grid['qty']), _numbers(grid['unit_cost'])
+    df['qty'], df['unit_cost'] = qty, cost
+    # astype(str) ทุกส่วน: pandas 3 ไม่ให้บวกคอลัมน์ object (medicine_id) กับคอลัมน์ชนิด str
+    lot_key = df['medicine_id'].fillna('?').astype(str) + '\x1f' + df['lot_no'].astype(str).str.lower()
+    stock = stock_lots.assign(key=stock_lots['medicine_id'].astype(str) + '\x1f' + stock_lots['lot_no'].astype(str).str.strip().str.lower(),
+                              exp=pd.to_datetime(stock_lots['exp_date'], errors='coerce'))
+    # map ผ่าน dict (ไม่ใช่ Series datetime ว่าง ซึ่ง map แล้ว cast ไม่ได้เมื่อยาในใบยังไม่มีล็อตในคลังเลย)
+    stock = stock.drop_duplicates('key')
+    stock_exp = dict(zip(stock['key'], stock['exp']))
+    in_stock_exp = pd.to_datetime(lot_key.map(stock_exp), errors='coerce')
+    checks = {
+        'unknown': df['medicine_id'].isna() & ~ambiguous,
+        'ambiguous': ambiguous,
+        'no_exp': df['exp_date'].isna(),
+        'bad_mfg': df['mfg_date'].isna() & _text(grid['mfg_date']).ne(''),
+        'exp_before_mfg': df['mfg_date'].notna() & df['exp_date'].notna() & (df['exp_date'] <= df['mfg_date']),
+        'expired': df['exp_date'] < pd.Timestamp(today),
+        'bad_qty': qty.isna() | (qty <= 0) | (qty % 1 != 0),
+        'bad_cost': (cost.isna() & _text(grid['unit_cost']).ne('')) | (cost < 0),
+        'dup_in_sheet': df['medicine_id'].notna() & (df['lot_no'] != '-') & lot_key.duplicated(keep=False),
+        'dup_in_stock': df['lot_no'].ne('-') & in_stock_exp.notna() & df['exp_date'].notna() & (in_stock_exp != df['exp_date']),
+    }
+    flags = pd.DataFrame(checks).fillna(False).astype(bool)
+    df['problems'] = flags.dot(pd.Series([PROBLEMS[c] + ', ' for c in flags.columns], index=flags.columns)).str.rstrip(', ')
+    return df
+
+# บรรทัดที่ผ่านการตรวจ -> p_lines ของ receive_lots
+def receive_payload(df):
+    return [{"medicine_id": m, "lot_no": l, "mfg_date": mf.date().isoformat() if pd.notna(mf) else None, "exp_date": ex.date().isoformat(), "qty": int(q),
+             "unit_cost": float(c) if pd.notna(c) else None}
+            for m, l, mf, ex, q, c in zip(df['medicine_id'], df['lot_no'], df['mfg_date'], df['exp_date'], df['qty'], df['unit_cost'])]
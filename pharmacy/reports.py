@@ -0,0 +1,235 @@
+import datetime
+import pandas as pd
+from pharmacy.utils import THAI_MONTHS
+from pharmacy.dimensions import category_kind, CATEGORY_COLUMNS, DRUG, SUPPLY
+
+# รายงานสรุปผู้บริหารและรายงานตามรอบที่ส่งเข้า LINE (โหลดเฉพาะตอนกดส่งในหน้า Admin หรือเมื่องานใน auto_report.py ถึงเวลาเท่านั้น)
+# client = None ใช้การเชื่อมต่อของแอป (pharmacy.db) ส่วน auto_report.py ส่ง supabase client ของตัวเองเข้ามา (ไม่พึ่ง Streamlit)
+
+def _loader(client):
+    if client is None:
+        from pharmacy.db import fetch
+        return fetch
+    from pharmacy.fetch import fetch_frame
+    return lambda table, columns, filters=(): fetch_frame(client, table, columns, filters)
+
+# ชนิดยา/มิใช่ยาของแต่ละรายการ join ด้วย category_id กับตารางมิติ (migrations/018_medicine_dimensions.sql)
+def _with_kind(fetch, meds):
+    meds['kind'] = category_kind(meds, fetch("medicine_categories", CATEGORY_COLUMNS))
+    return meds
+
+# มูลค่าคลังรายยาของเดือน (migrations/011_lot_valuation.sql) คืน None ถ้าเดือนนั้นเก็บถาวรไปแล้ว
+def _month_valuation(client, month):
+    if client is None:
+        from pharmacy.db import get_month_valuation
+        return get_month_valuation(month.strftime('%Y-%m'))
+    from pharmacy.fetch import fetch_rpc_frame
+    from pharmacy.valuation import VALUATION_COLUMNS
+    try: return fetch_rpc_frame(client, "stock_month_valuation", {"p_month": str(month)}, VALUATION_COLUMNS, ["medicine_id"], schema="stock_valuation")
+    except Exception as e:
+        if 'HISTORY_ARCHIVED' in str(e): return None
+        raise
+
+# 🌟 มูลค่าคลังสิ้นเดือน / ต้นทุนเบิกจ่าย ตามราคาทุนของล็อตที่ตัดจริง แยกยา/มิใช่ยา และกลุ่มยาที่ต้นทุนเบิกจ่ายสูงสุด
+def _valuation_section(client, month, meds):
+    from pharmacy.valuation import with_medicines, group_valuation, totals, baht
+    text = "\n\n💰 มูลค่าคลัง (ราคาทุนรายล็อต):"
+    try: valuation = _month_valuation(client, month)
+    except Exception as e: return text + f"\n(คำนวณมูลค่าไม่ได้: {e})"
+    if valuation is None or valuation.empty: return text + "\n(ไม่มีข้อมูลมูลค่า)"
+    valued = with_medicines(valuation, meds)
+    total = totals(valued)
+    drugs = valued.loc[valued['kind'] == DRUG, 'closing_value'].sum()
+    supplies = valued.loc[valued['kind'] == SUPPLY, 'closing_value'].sum()
+    text += f"\n- มูลค่าคงเหลือสิ้นเดือน: {baht(total['closing_value'])}\n  (ยา {baht(drugs)} | มิใช่ยา {baht(supplies)})"
+    text += f"\n- มูลค่ารับเข้า: {baht(total['receive_value'])}\n- ต้นทุนเบิกจ่าย: {baht(total['dispense_cost'])}"
+    if total['expire_value']: text += f"\n- มูลค่าตัดหมดอายุ: {baht(total['expire_value'])}"
+    groups = group_valuation(valued, 'drug_group').sort_values('dispense_cost', ascending=False)
+    groups = groups[groups['dispense_cost'] > 0].head(3)
+    if not groups.empty:
+        text += "\nกลุ่มยาที่ต้นทุนเบิกจ่ายสูงสุด:"
+        for i, row in enumerate(groups.itertuples(), 1): text += f"\n{i}. {row.drug_group} ({baht(row.dispense_cost)})"
+    if total['uncosted_qty']: text += f"\n⚠️ ยอดคงเหลือ {int(total['uncosted_qty']):,} หน่วยยังไม่มีราคาทุน"
+    return text
+
+def generate_monthly_executive_report(client=None, today=None):
+    fetch = _loader(client)
+    today = today or datetime.date.today()
+    first_day_of_this_month = today.replace(day=1)
+    last_day_of_prev_month = first_day_of_this_month - datetime.timedelta(days=1)
+    first_day_of_prev_month = last_day_of_prev_month.replace(day=1)
+    
+    month_name = THAI_MONTHS.get(last_day_of_prev_month.strftime('%m'))
+    year_th = last_day_of_prev_month.year + 543
+    report_title = f"\n📊 สรุปคลังเวชภัณฑ์ประจำเดือน {month_name} {year_th}"
+
+    try:
+        meds = fetch("medicines", ["id", "generic_name", "unit", "category", "category_id", "drug_group", "min_stock"], [("eq", "is_active", True)])
+        inv_df = fetch("inventory", ["medicine_id", "lot_no", "exp_date", "qty"], [("eq", "status", "ACTIVE")])
+        trans_df = fetch("transactions", ["medicine_id", "action_type", "qty_change"], [("gte", "created_at", str(first_day_of_prev_month)), ("lt", "created_at", str(first_day_of_this_month))])
+    except Exception as e:
+        return f"❌ เกิดข้อผิดพลาดการดึงข้อมูลจากฐานข้อมูล: {e}"
+
+    if meds.empty:
+        msg_part1 = "\n\n❌ ไม่พบข้อมูล Master Data ในระบบ"
+        msg_part2 = "\n\n📥 รับเข้ามากที่สุด 5 อันดับ:\n(ไม่มีการเคลื่อนไหว)"
+        msg_part3 = "\n\n📤 เบิกจ่ายมากที่สุด 5 อันดับ:\n(ไม่มีการเคลื่อนไหว)"
+        msg_part4 = "\n\n⚠️ แจ้งเตือน: ต่ำกว่าจุดสั่งซื้อ\n(ไม่มีข้อมูล Master Data)"
+        msg_part5 = "\n\n⏰ แจ้งเตือน: ใกล้หมดอายุ (<90 วัน)\n(ไม่มีข้อมูลสต๊อก)"
+        msg_part6 = "\n\n🗑️ ตัดจำหน่ายยาหมดอายุ (คลังกักกัน):\n(ไม่มีรายการ)"
+        return report_title + msg_part1 + msg_part2 + msg_part3 + msg_part4 + msg_part5 + msg_part6
+
+    try: meds = _with_kind(fetch, meds)
+    except Exception as e: return f"❌ เกิดข้อผิดพลาดการดึงข้อมูลจากฐานข้อมูล: {e}"
+
+    drugs_in_stock = 0
+    supplies_in_stock = 0
+    if not inv_df.empty:
+        inv_agg_current = inv_df.groupby('medicine_id', observed=True)['qty'].sum().reset_index()
+        inv_active_current = inv_agg_current[inv_agg_current['qty'] > 0]
+        if not inv_active_current.empty:
+            active_meds = pd.merge(inv_active_current, meds, left_on='medicine_id', right_on='id', how='left')
+            drugs_in_stock = int((active_meds['kind'] == DRUG).sum())
+            supplies_in_stock = int((active_meds['kind'] == SUPPLY).sum())
+
+    msg_part1 = f"\n\n🏥 ข้อมูล ณ ปัจจุบัน (ที่มียอดคงเหลือ):\n- เวชภัณฑ์ยา: {drugs_in_stock} รายการ\n- เวชภัณฑ์มิใช่ยา: {supplies_in_stock} รายการ"
+
+    msg_part2 = "\n\n📥 รับเข้ามากที่สุด 5 อันดับ:"
+    msg_part3 = "\n\n📤 เบิกจ่ายมากที่สุด 5 อันดับ:"
+    msg_part6 = "\n\n🗑️ ตัดจำหน่ายยาหมดอายุ (คลังกักกัน):"
+    
+    if not trans_df.empty:
+        df_merged = pd.merge(trans_df, meds[['id', 'generic_name', 'unit']], left_on='medicine_id', right_on='id', how='left')
+        df_recv = df_merged[df_merged['action_type'] == 'RECEIVE'].groupby('generic_name')['qty_change'].sum().reset_index()
+        df_recv = df_recv.sort_values(by='qty_change', ascending=False).head(5)
+        if not df_recv.empty:
+            for idx, row in df_recv.iterrows():
+                unit_vals = meds[meds['generic_name'] == row['generic_name']]['unit'].values
+                unit = unit_vals[0] if len(unit_vals) > 0 else ''
+                msg_part2 += f"\n{idx+1}. {row['generic_name']} (+{int(row['qty_change'])} {unit})"
+        else: msg_part2 += "\n(ไม่มีการเคลื่อนไหว)"
+
+        # รวมยอดก่อนแล้วค่อยกลับเครื่องหมาย เพื่อให้รายการปรับปรุง (AMEND/VOID) หักล้างกับต้นฉบับได้ถูกต้อง
+        df_disp = df_merged[df_merged['action_type'] == 'DISPENSE'].groupby('generic_name')['qty_change'].sum().reset_index()
+        df_disp['qty_change'] = -df_disp['qty_change']
+        df_disp = df_disp.sort_values(by='qty_change', ascending=False).head(5)
+        if not df_disp.empty:
+            for idx, row in df_disp.iterrows():
+                unit_vals = meds[meds['generic_name'] == row['generic_name']]['unit'].values
+                unit = unit_vals[0] if len(unit_vals) > 0 else ''
+                msg_part3 += f"\n{idx+1}. {row['generic_name']} (-{int(row['qty_change'])} {unit})"
+        else: msg_part3 += "\n(ไม่มีการเคลื่อนไหว)"
+
+        df_exp = df_merged[df_merged['action_type'] == 'EXPIRE'].groupby(['generic_name', 'unit'])['qty_change'].sum().reset_index()
+        df_exp['qty_change'] = -df_exp['qty_change']
+        df_exp = df_exp[df_exp['qty_change'] > 0].sort_values(by='qty_change', ascending=False)
+        if not df_exp.empty:
+            msg_part6 += f" ({len(df_exp)} รายการ)"
+            for _, row in df_exp.head(10).iterrows():
+                msg_part6 += f"\n- {row['generic_name']} (-{int(row['qty_change'])} {row['unit']})"
+            if len(df_exp) > 10: msg_part6 += f"\n...และอื่นๆ อีก {len(df_exp)-10} รายการ"
+        else: msg_part6 += "\n(ไม่มีรายการ)"
+    else:
+        msg_part2 += "\n(ไม่มีการเคลื่อนไหว)"
+        msg_part3 += "\n(ไม่มีการเคลื่อนไหว)"
+        msg_part6 += "\n(ไม่มีรายการ)"
+
+    msg_part4 = "\n\n⚠️ แจ้งเตือน: ต่ำกว่าจุดสั่งซื้อ"
+    if not inv_df.empty:
+        inv_agg = inv_df.groupby('medicine_id', observed=True)['qty'].sum().reset_index()
+        df_stock = pd.merge(meds, inv_agg, left_on='id', right_on='medicine_id', how='left')
+        df_stock['qty'] = df_stock['qty'].fillna(0)
+    else:
+        df_stock = meds.copy()
+        df_stock['qty'] = 0
+        
+    df_stock['qty'] = pd.to_numeric(df_stock['qty'], errors='coerce').fillna(0)
+    df_stock['min_stock'] = pd.to_numeric(df_stock['min_stock'], errors='coerce').fillna(0)
+        
+    low_stock = df_stock[df_stock['qty'] <= df_stock['min_stock']]
+    low_total = len(low_stock)
+    low_drugs = int((low_stock['kind'] == DRUG).sum())
+    low_supplies = int((low_stock['kind'] == SUPPLY).sum())
+
+    msg_part4 += f"\nรวมทั้งหมด {low_total} รายการ แบ่งเป็น:"
+    msg_part4 += f"\n💊 เวชภัณฑ์ยา จำนวน {low_drugs} รายการ"
+    msg_part4 += f"\n📦 เวชภัณฑ์ที่มิใช่ยา จำนวน {low_supplies} รายการ"
+
+    msg_part5 = "\n\n⏰ แจ้งเตือน: ใกล้หมดอายุ (<90 วัน)"
+    if not inv_df.empty:
+        inv_active = inv_df[inv_df['qty'] > 0].copy()
+        if not inv_active.empty:
+            inv_active['exp_date'] = pd.to_datetime(inv_active['exp_date'])
+            near_exp_raw = inv_active[inv_active['exp_date'] <= pd.to_datetime(today) + pd.Timedelta(days=90)]
+            if not near_exp_raw.empty:
+                near_exp = pd.merge(near_exp_raw, meds[['id', 'generic_name']], left_on='medicine_id', right_on='id', how='left')
+                msg_part5 += f" ({len(near_exp)} ล็อต)"
+                count_exp = 0
+                for _, row in near_exp.iterrows():
+                    if count_exp >= 10: break
+                    exp_str = row['exp_date'].strftime('%d/%m/%Y')
+                    msg_part5 += f"\n- {row['generic_name']} (Lot: {row['lot_no']})\n  เหลือ {int(row['qty'])} | หมด: {exp_str}"
+                    count_exp += 1
+                if len(near_exp) > 10: msg_part5 += f"\n...และอื่นๆ อีก {len(near_exp)-10} ล็อต"
+            else: msg_part5 += "\n(ไม่มีรายการเสี่ยงหมดอายุ)"
+        else: msg_part5 += "\n(ไม่มีรายการเสี่ยงหมดอายุ)"
+    else: msg_part5 += "\n(ไม่มีข้อมูลสต๊อก)"
+
+    msg_part7 = _valuation_section(client, first_day_of_prev_month, meds)
+
+    final_message = report_title + msg_part1 + msg_part2 + msg_part3 + msg_part4 + msg_part5 + msg_part6 + msg_part7
+    return final_message
+
+# ยอดคงเหลือรวมต่อยา (เฉพาะล็อตที่ยังใช้งานได้) เทียบกับจุดสั่งซื้อ
+def _stock_levels(fetch):
+    meds = _with_kind(fetch, fetch("medicines", ["id", "generic_name", "unit", "category_id", "min_stock"], [("eq", "is_active", True)]))
+    inv = fetch("inventory", ["medicine_id", "qty"], [("eq", "status", "ACTIVE"), ("gt", "qty", 0)])
+    qty = inv.groupby('medicine_id', observed=True)['qty'].sum() if not inv.empty else pd.Series(dtype='int64')
+    meds['qty'] = meds['id'].map(qty).fillna(0).astype('int64')
+    meds['min_stock'] = pd.to_numeric(meds['min_stock'], errors='coerce').fillna(0)
+    meds['unit'] = meds['unit'].fillna('')
+    return meds
+
+def _listing(lines, limit, unit_word):
+    text = "".join(f"\n{line}" for line in lines[:limit])
+    if len(lines) > limit: text += f"\n...และอื่นๆ อีก {len(lines) - limit} {unit_word}"
+    return text
+
+# รายงานรายวัน: ยาที่หมดและต่ำกว่าจุดสั่งซื้อ เรียงตามสัดส่วนยอดคงเหลือต่อจุดสั่งซื้อ (น้อยสุดก่อน)
+def daily_low_stock_report(client=None, today=None, limit=20):
+    today = today or datetime.date.today()
+    try: meds = _stock_levels(_loader(client))
+    except Exception as e: return f"❌ เกิดข้อผิดพลาดการดึงข้อมูลจากฐานข้อมูล: {e}"
+    title = f"📉 ยาต่ำกว่าจุดสั่งซื้อ ประจำวันที่ {today:%d/%m}/{today.year + 543}"
+    if meds.empty: return title + "\n(ไม่มีข้อมูล Master Data)"
+    low = meds[meds['qty'] <= meds['min_stock']].assign(ratio=lambda d: d['qty'] / d['min_stock'].where(d['min_stock'] > 0))
+    if low.empty: return title + "\n✅ ไม่มีรายการต่ำกว่าจุดสั่งซื้อ"
+    out = low[low['qty'] <= 0].sort_values('generic_name')
+    short = low[low['qty'] > 0].sort_values(['ratio', 'generic_name'])
+    message = title + f"\nรวม {len(low)} รายการ (💊 ยา {int((low['kind'] == DRUG).sum())} | 📦 มิใช่ยา {int((low['kind'] == SUPPLY).sum())})"
+    if not out.empty:
+        message += f"\n\n⛔ หมดคลัง ({len(out)} รายการ):" + _listing([f"- {r.generic_name} (จุดสั่งซื้อ {int(r.min_stock)} {r.unit})" for r in out.itertuples()], limit, "รายการ")
+    if not short.empty:
+        message += f"\n\n⚠️ ใกล้หมด ({len(short)} รายการ):" + _listing([f"- {r.generic_name} (เหลือ {r.qty} / {int(r.min_stock)} {r.unit})" for r in short.itertuples()], limit, "รายการ")
+    return message
+
+# รายงานรายสัปดาห์: ล็อตที่จะหมดอายุภายใน days วัน แบ่งเป็นช่วงละ 30 วัน
+def weekly_expiry_report(client=None, today=None, days=90, limit=10):
+    fetch = _loader(client)
+    today = today or datetime.date.today()
+    title = f"⏰ ยาใกล้หมดอายุภายใน {days} วัน (ข้อมูลวันที่ {today:%d/%m}/{today.year + 543})"
+    try:
+        meds = fetch("medicines", ["id", "generic_name", "unit"])
+        lots = fetch("inventory", ["medicine_id", "lot_no", "exp_date", "qty"], [("eq", "status", "ACTIVE"), ("gt", "qty", 0), ("lte", "exp_date", str(today + datetime.timedelta(days=days)))])
+    except Exception as e: return f"❌ เกิดข้อผิดพลาดการดึงข้อมูลจากฐานข้อมูล: {e}"
+    if lots.empty: return title + "\n✅ ไม่มีล็อตที่ใกล้หมดอายุ"
+    names = meds.set_index(meds['id'].astype(str))
+    lots['generic_name'] = lots['medicine_id'].astype(str).map(names['generic_name'])
+    lots['unit'] = lots['medicine_id'].astype(str).map(names['unit']).fillna('')
+    lots['exp_date'] = pd.to_datetime(lots['exp_date']).dt.date
+    lots['band'] = [max((d - today).days - 1, 0) // 30 * 30 + 30 for d in lots['exp_date']]
+    message = title + f"\nรวม {len(lots)} ล็อต"
+    for band, group in lots.sort_values(['exp_date', 'generic_name']).groupby('band'):
+        message += f"\n\n{'🔴' if band <= 30 else '🟠' if band <= 60 else '🟡'} ภายใน {band} วัน ({len(group)} ล็อต):"
+        message += _listing([f"- {r.generic_name} (Lot: {r.lot_no}) เหลือ {r.qty} {r.unit} | หมด: {r.exp_date:%d/%m/%Y}" for r in group.itertuples()], limit, "ล็อต")
+    return message
@@ -0,0 +1,64 @@
+import streamlit as st
+import pandas as pd
+from pharmacy.gs1 import parse_gs1
+from pharmacy.db import get_gtin_index
+from pharmacy.submit import reset_form
+
+# --- โหมดสแกนบาร์โค้ดที่หน้ารับเข้า/เบิกจ่ายใช้ร่วมกัน ---
+# เครื่องสแกนแบบคีย์บอร์ดพิมพ์ข้อความแล้วกด Enter -> on_change อ่านบาร์โค้ด รวมเข้ารายการ แล้วล้างช่องให้สแกนชิ้นต่อไปได้ทันที
+# 🌟 การสแกนแต่ละครั้งเก็บใน session_state อย่างเดียว (ค้น GTIN จาก index ที่แคชไว้) ไม่ยิงฐานข้อมูล
+#    ทั้งใบถูกบันทึกครั้งเดียวผ่าน receive_lots / dispense_fefo ตอนกดยืนยัน
+# group_by: ฟิลด์ที่ใช้รวมการสแกนซ้ำเป็นบรรทัดเดียว เช่น รับเข้า = ยา+Lot+วันหมดอายุ, เบิกจ่าย = ยา
+
+LINE_FIELDS = ['medicine_id', 'lot_no', 'mfg_date', 'exp_date', 'qty', 'unit_cost', 'scans']
+
+def scanned_lines(key):
+    return st.session_state.setdefault(f"{key}_lines", {})
+
+# ล้างรายการที่สแกนพร้อม token ของฟอร์ม (ชื่อ key เดียวกับที่ส่งเป็น form ตอนบันทึก)
+def clear_scans(key):
+    reset_form(key)
+
+def add_scan(lines, parsed, medicine_id, pack_qty, group_by):
+    line = {"medicine_id": medicine_id, "lot_no": parsed['lot_no'] or "-", "mfg_date": parsed['mfg_date'], "exp_date": parsed['exp_date'], "qty": 0, "unit_cost": None, "scans": 0}
+    current = lines.setdefault(tuple(line[f] for f in group_by), line)
+    current['qty'] += pack_qty
+    current['scans'] += 1
+    return current
+
+def scan_box(key, group_by, names, label="📷 สแกนบาร์โค้ด (GS1 DataMatrix / GS1-128 / EAN)"):
+    def on_scan():
+        raw = st.session_state[f"{key}_input"]
+        st.session_state[f"{key}_input"] = ""
+        if not raw.strip(): return
+        try: parsed = parse_gs1(raw)
+        except ValueError as e:
+            st.session_state[f"{key}_msg"] = ("error", f"❌ {e}"); return
+        hit = get_gtin_index().get(parsed['gtin'])
+        if not hit:
+            st.session_state[f"{key}_msg"] = ("error", f"❌ ไม่พบ GTIN {parsed['gtin']} ในระบบ กรุณาลงทะเบียนบาร์โค้ดที่หน้า 'ข้อมูลยา (Master Data)'"); return
+        line = add_scan(scanned_lines(key), parsed, hit[0], hit[1], group_by)
+        st.session_state[f"{key}_version"] = st.session_state.get(f"{key}_version", 0) + 1
+        lot = f" Lot {line['lot_no']}" if 'lot_no' in group_by else ""
+        st.session_state[f"{key}_msg"] = ("success", f"✅ {names.get(hit[0], hit[0])}{lot} +{hit[1]} (รวม {line['qty']})")
+
+    st.text_input(label, key=f"{key}_input", on_change=on_scan, placeholder="คลิกที่ช่องนี้แล้วสแกนต่อเนื่องได้เลย")
+    msg = st.session_state.pop(f"{key}_msg", None)
+    if msg: getattr(st, msg[0])(msg[1])
+    return scanned_lines(key)
+
+# ตารางให้แก้ไขจำนวน/Lot/วันที่ หรือลบบรรทัด (แก้แล้วเก็บกลับเข้า session_state ทุก rerun เพื่อไม่ให้หายเมื่อสแกนชิ้นถัดไป)
+def scan_editor(key, group_by, names, columns, column_config):
+    df = pd.DataFrame(list(scanned_lines(key).values()), columns=LINE_FIELDS).astype({'unit_cost': 'float64'})
+    df.insert(0, 'generic_name', df['medicine_id'].map(names))
+    edited = st.data_editor(df, hide_index=True, use_container_width=True, num_rows="dynamic", column_order=['generic_name'] + columns,
+                            key=f"{key}_editor_{st.session_state.get(f'{key}_version', 0)}", disabled=['generic_name', 'medicine_id', 'scans'],
+                            column_config=dict({"generic_name": "รายการ", "scans": "จำนวนครั้งที่สแกน"}, **column_config))
+    edited = edited[edited['medicine_id'].notna()]
+    lines = {}
+    for row in edited[LINE_FIELDS].to_dict('records'):
+        k = tuple(row[f] for f in group_by)
+        if k in lines: lines[k]['qty'] += row['qty']
+        else: lines[k] = row
+    st.session_state[f"{key}_lines"] = lines
+    return edited
@@ -0,0 +1,31 @@
+import re
+from pharmacy.submit import call_rpc
+
+# --- เบิกจ่าย/รับเข้าจากหน้าเว็บ ผ่านฟังก์ชันฝั่งเซิร์ฟเวอร์ (ดู migrations/005_atomic_dispense_receive.sql) ---
+# ตรวจยอด ตัดสต๊อก และบันทึกประวัติใน transaction เดียว จึงไม่เกิดการเบิกเกินเมื่อหลายคนกดพร้อมกัน
+# form: ชื่อฟอร์มที่ส่ง (ใช้ token กันกดซ้ำ ดู pharmacy/submit.py)
+
+STOCK_ERRORS = {
+    'INSUFFICIENT_STOCK': "❌ ยอดคงเหลือไม่พอเบิก (อาจมีผู้ใช้อื่นเบิกไปก่อนหน้านี้) กรุณาตรวจสอบยอดล่าสุดแล้วลองใหม่",
+    'INVALID_QTY': "❌ จำนวนต้องมากกว่า 0",
+    'INVALID_COST': "❌ ราคาทุนต่อหน่วยต้องไม่ติดลบ",
+}
+
+# lines: รายการ {"medicine_id", "qty"} -> คืนรายการล็อตที่ถูกตัด
+def dispense_fefo(lines, user_name, note, form=None):
+    payload = [{"medicine_id": str(l['medicine_id']), "qty": int(l['qty'])} for l in lines]
+    return call_rpc("dispense_fefo", {"p_lines": payload, "p_user_name": user_name, "p_note": note}, form)
+
+# lines: รายการ {"medicine_id", "lot_no", "mfg_date", "exp_date", "qty", "unit_cost"} (unit_cost = ราคาทุนต่อหน่วย ไม่ระบุได้)
+def receive_lots(lines, user_name, note, form=None):
+    return call_rpc("receive_lots", {"p_lines": lines, "p_user_name": user_name, "p_note": note}, form)
+
+# คืน (medicine_id, ยอดที่มี, ยอดที่ขอ) จาก error INSUFFICIENT_STOCK เพื่อแจ้งชื่อยาที่ยอดไม่พอ
+def insufficient_stock(e):
+    m = re.search(r"INSUFFICIENT_STOCK:([^:]*):(\d+):(\d+)", str(e))
+    return (m.group(1), int(m.group(2)), int(m.group(3))) if m else None
+
+def stock_error_message(e):
+    for code, msg in STOCK_ERRORS.items():
+        if code in str(e): return msg
+    return None
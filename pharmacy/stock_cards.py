@@ -0,0 +1,198 @@
+import os
+import re
+import zipfile
+import datetime
+import multiprocessing
+from collections import deque
+from zoneinfo import ZoneInfo
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from pharmacy.frames import TZ, TRANSACTION_COLUMNS, apply_schema, add_display_columns
+from pharmacy.ledger import fold_ledger
+
+# --- บัญชีคุมเวชภัณฑ์คงคลัง (Stock Card) ของยาทุกรายการในครั้งเดียว สำหรับตรวจสอบประจำปี (ไม่พึ่ง Streamlit) ---
+# แทนการเลือกยาทีละรายการในหน้า Stock Card (~1,500 รายการ รายการละ 2 query + cumsum)
+# 🌟 อ่านสมุดบัญชีของช่วงวันที่ครั้งเดียว เป็นชุดละ BATCH_SIZE รายการยา (ใช้ดัชนี transactions (medicine_id, created_at, id))
+#    ยอดยกมาของทุกรายการได้จาก stock_as_of คำสั่งเดียว แล้วคำนวณยอดคงเหลือทั้งชุดด้วย groupby().cumsum()
+# จัดรูปแบบตาราง/ไฟล์ในพูลโปรเซส โดยมีงานค้างไม่เกิน workers * 2 ชุด หน่วยความจำจึงไม่โตตามจำนวนรายการยา
+# รูปแบบ: xlsx = สมุดงานเดียว ชีตละรายการยา + ชีตสรุป (ต้องมี openpyxl หรือ xlsxwriter ไม่มีก็เป็น zip)
+#         zip  = ไฟล์ CSV รายการละไฟล์ (Excel เปิดได้ สั่งพิมพ์ทีละไฟล์หรือรวมเป็น PDF ภายหลัง)
+# รายการแก้ไข/ยกเลิกในช่วงวันที่ยุบเข้ากับรายการต้นฉบับ (fold_ledger) ส่วนที่ชี้ไปยังรายการก่อนช่วงแสดงเป็นแถวของตัวเอง
+# ยอดคงเหลือสุดท้ายจึงตรงกับ stock_as_of ณ สิ้นวันสุดท้าย
+
+BATCH_SIZE = 50
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+FORMATS = ('xlsx', 'zip')
+ZIP_MIME = "application/zip"
+ARCHIVED_MESSAGE = "ช่วงวันที่เริ่มก่อนวันตัดยอดเก็บถาวร กรุณาเลือกวันเริ่มหลังปีงบประมาณที่เก็บถาวรแล้ว"
+CARD_COLUMNS = ['วัน-เวลา', 'ประเภท', 'เลข Lot', 'วันหมดอายุ', 'รับ', 'จ่าย', 'ยอดคงเหลือ', 'ผู้บันทึก', 'หมายเหตุ']
+SUMMARY_COLUMNS = {'medicine_id': 'รหัสยา', 'generic_name': 'รายการ', 'unit': 'หน่วย', 'opening': 'ยอดยกมา', 'received': 'รับ', 'issued': 'จ่าย',
+                   'closing': 'คงเหลือ', 'entries': 'จำนวนรายการ'}
+
+# ช่วงวันที่ตามเวลาไทย [เริ่มวันแรก, สิ้นวันสุดท้าย) เหมือน bkk_day_end ใน migrations/008
+def day_bounds(date_from, date_to):
+    tz = ZoneInfo(TZ)
+    return (datetime.datetime.combine(date_from, datetime.time(), tzinfo=tz),
+            datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time(), tzinfo=tz))
+
+def excel_available():
+    for module in ('openpyxl', 'xlsxwriter'):
+        try:
+            __import__(module)
+            return True
+        except ImportError: pass
+    return False
+
+# --- แหล่งข้อมูล: Postgres โดยตรง (stock_cards.py) หรือ PostgREST (หน้า Admin ผ่านคิวงาน) ---
+
+MOVEMENTS_SQL = f"""
+select {', '.join(f't.{c}::text as {c}' if c in ('id', 'ref_id') else f't.{c}' for c in TRANSACTION_COLUMNS)}
+from public.transactions t
+where t.medicine_id = any(%s) and t.created_at >= %s and t.created_at < %s
+order by t.medicine_id, t.created_at, t.id
+"""
+
+def _archived(e):
+    if 'HISTORY_ARCHIVED' in str(e): raise ValueError(ARCHIVED_MESSAGE) from e
+    raise e
+
+def pg_opening(conn, at):
+    try: rows = conn.execute("select medicine_id, sum(qty)::bigint as qty from public.stock_as_of(%s) group by medicine_id", (at,)).fetchall()
+    except Exception as e: _archived(e)
+    return {r['medicine_id']: int(r['qty']) for r in rows}
+
+def pg_movements(conn, ids, start, end):
+    return apply_schema(pd.DataFrame(conn.execute(MOVEMENTS_SQL, (list(ids), start, end)).fetchall(), columns=TRANSACTION_COLUMNS), "transactions")
+
+def pg_lots(conn):
+    return pd.DataFrame(conn.execute("select distinct on (medicine_id, lot_no) medicine_id, lot_no, exp_date::text as exp_date from public.inventory order by medicine_id, lot_no, id").fetchall(),
+                        columns=['medicine_id', 'lot_no', 'exp_date'])
+
+def rest_opening(client, at):
+    from pharmacy.fetch import fetch_rpc_frame
+    try: df = fetch_rpc_frame(client, "stock_as_of", {"p_at": at.isoformat()}, ["medicine_id", "lot_no", "qty"], ["medicine_id", "lot_no"])
+    except Exception as e: _archived(e)
+    if df.empty: return {}
+    return pd.to_numeric(df['qty']).groupby(df['medicine_id'].astype(str)).sum().astype(int).to_dict()
+
+def rest_movements(client, ids, start, end):
+    from pharmacy.fetch import fetch_frame
+    return fetch_frame(client, "transactions", TRANSACTION_COLUMNS,
+                       [("in_", "medicine_id", list(ids)), ("gte", "created_at", start.isoformat()), ("lt", "created_at", end.isoformat())], order="created_at")
+
+def rest_lots(client):
+    from pharmacy.fetch import fetch_frame
+    return fetch_frame(client, "inventory", ["medicine_id", "lot_no", "exp_date"]).drop_duplicates(['medicine_id', 'lot_no'])
+
+# --- คำนวณ (โปรเซสหลัก) ---
+
+# 🌟 ยอดคงเหลือทุกรายการยาของชุดในครั้งเดียว: ยอดยกมาของยา + cumsum ภายในยาเดียวกัน
+def running_balances(rows, opening):
+    if rows.empty: return rows.assign(amended=False, running_balance=pd.Series(dtype='int64'))
+    rows = rows.assign(medicine_id=rows['medicine_id'].astype(str), id=rows['id'].astype(str))
+    # รายการแก้ไข/ยกเลิกที่ชี้ไปยังรายการก่อนช่วงวันที่ (ไม่มีต้นฉบับในชุดนี้) เก็บไว้เป็นแถวของตัวเอง ไม่ให้ fold_ledger ตัดทิ้ง
+    orphan = rows['ref_id'].notna().to_numpy() & (pd.Index(rows['id']).get_indexer(rows['ref_id'].astype(object)) < 0)
+    folded = fold_ledger(rows[~orphan])
+    if 'amended' not in folded.columns: folded = folded.assign(amended=False)
+    rows = pd.concat([folded, rows[orphan].assign(amended=False)], ignore_index=True).sort_values(['medicine_id', 'created_at', 'id'], kind='stable', ignore_index=True)
+    rows['running_balance'] = rows['medicine_id'].map(opening).fillna(0).astype('int64') + rows.groupby('medicine_id', sort=False)['qty_change'].cumsum().astype('int64')
+    return rows
+
+def summarize(batch, rows, opening):
+    qty = rows['qty_change'].astype('int64') if not rows.empty else pd.Series(dtype='int64')
+    by_med = rows['medicine_id'] if not rows.empty else pd.Series(dtype=object)
+    out = batch[['id', 'generic_name', 'unit']].rename(columns={'id': 'medicine_id'}).copy()
+    out['opening'] = out['medicine_id'].map(opening).fillna(0).astype('int64')
+    out['received'] = out['medicine_id'].map(qty.clip(lower=0).groupby(by_med).sum()).fillna(0).astype('int64')
+    out['issued'] = out['medicine_id'].map((-qty.clip(upper=0)).groupby(by_med).sum()).fillna(0).astype('int64')
+    out['closing'] = out['opening'] + out['received'] - out['issued']
+    out['entries'] = out['medicine_id'].map(by_med.value_counts()).fillna(0).astype('int64')
+    return out
+
+# --- จัดรูปแบบ (รันในพูลโปรเซส: รับ/คืนเฉพาะ DataFrame และ bytes) ---
+
+def render_batch(batch, rows, opening, fmt, start_label, period_label):
+    # แถวยอดยกมาของทุกรายการในชุด + รายการรับ-จ่าย เป็นตารางเดียว แล้วค่อยตัดเป็นรายการยา
+    first = pd.DataFrame({'medicine_id': batch['id'].to_numpy(), 'created_at_str': start_label, 'action_type_th': 'ยอดยกมา',
+                          'running_balance': batch['id'].map(opening).fillna(0).astype('int64').to_numpy()})
+    if not rows.empty:
+        rows = add_display_columns(rows, '%d/%m/%Y %H:%M')
+        qty = rows['qty_change'].astype('int64')
+        rows['received'], rows['issued'] = qty.where(qty > 0).astype('Int64'), (-qty).where(qty < 0).astype('Int64')
+        first = pd.concat([first, rows], ignore_index=True)
+    cards = first.reindex(columns=['medicine_id', 'created_at_str', 'action_type_th', 'lot_no', 'exp_date', 'received', 'issued', 'running_balance', 'user_name', 'note']).astype(object)
+    cards = cards.iloc[pd.Series(pd.Categorical(cards['medicine_id'], categories=batch['id'])).argsort(kind='stable')]
+    cards.columns = ['medicine_id'] + CARD_COLUMNS
+    out = []
+    for med, (_, card) in zip(batch.itertuples(index=False), cards.groupby('medicine_id', sort=False)):
+        card = card[CARD_COLUMNS]
+        title = f"บัญชีคุมเวชภัณฑ์คงคลัง: {med.generic_name} ({med.unit}) รหัส {med.id} | {period_label}"
+        if fmt == 'xlsx': out.append((med.id, title, card))
+        else: out.append((f"{_safe_name(f'{med.id}_{med.generic_name}')}.csv", (title + "\n" + card.to_csv(index=False)).encode('utf-8-sig')))
+    return out
+
+def _safe_name(text):
+    return re.sub(r'[\\/:*?"<>|\[\]]', '-', str(text)).strip() or '-'
+
+def _sheet_name(med_id, used):
+    # ชื่อชีตยาวได้ 31 ตัวอักษรและห้ามซ้ำ (รหัสยาที่ถูกตัดจนซ้ำกันได้เลขต่อท้าย)
+    base = name = _safe_name(med_id)[:31]
+    n = 1
+    while name.lower() in used:
+        n += 1
+        name = f"{base[:31 - len(str(n)) - 1]}~{n}"
+    used.add(name.lower())
+    return name
+
+# --- ประกอบไฟล์ ---
+
+# meds: ยาที่ต้องพิมพ์ (id, generic_name, unit), load_opening(at) -> {medicine_id: qty}, load_movements(ids, start, end) -> DataFrame
+# lots: (medicine_id, lot_no, exp_date) สำหรับวันหมดอายุ, user_names: อีเมล -> ชื่อ
+# out: path หรือ file object ที่เขียนได้, progress(done, total) ถูกเรียกหลังเขียนเสร็จแต่ละชุด
+def generate(meds, load_opening, load_movements, lots, date_from, date_to, out, fmt='xlsx', user_names=None, workers=None, batch_size=BATCH_SIZE, progress=None):
+    if fmt not in FORMATS: raise ValueError(f"รูปแบบไฟล์ต้องเป็น {' / '.join(FORMATS)}")
+    if fmt == 'xlsx' and not excel_available(): fmt = 'zip'
+    start, end = day_bounds(date_from, date_to)
+    meds = meds[['id', 'generic_name', 'unit']].astype({'id': str}).sort_values('id', ignore_index=True)
+    lots = lots.astype({'medicine_id': str, 'lot_no': str}).drop_duplicates(['medicine_id', 'lot_no'])
+    opening = load_opening(start)
+    start_label, period_label = date_from.strftime('%d/%m/%Y'), f"{date_from:%d/%m/%Y} - {date_to:%d/%m/%Y}"
+    workers = max(1, workers or DEFAULT_WORKERS)
+    total, done, entries, summaries, used, pending = len(meds), 0, 0, [], set(), deque()
+
+    writer = pd.ExcelWriter(out) if fmt == 'xlsx' else zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+    def write(result):
+        for item in result:
+            if fmt == 'xlsx':
+                sheet = _sheet_name(item[0], used)
+                pd.DataFrame([[item[1]]]).to_excel(writer, sheet_name=sheet, index=False, header=False)
+                item[2].to_excel(writer, sheet_name=sheet, index=False, startrow=2)
+            else: writer.writestr(item[0], item[1])
+
+    with writer, ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for i in range(0, total, batch_size):
+            batch = meds.iloc[i:i + batch_size]
+            rows = running_balances(load_movements(batch['id'].tolist(), start, end), opening)
+            if not rows.empty:
+                rows = rows.merge(lots, on=['medicine_id', 'lot_no'], how='left', sort=False)
+                rows['exp_date'] = rows['exp_date'].fillna('-')
+                if user_names: rows['user_name'] = rows['user_name'].astype(object).map(lambda v: user_names.get(str(v).strip().lower(), v) if pd.notna(v) else v)
+            entries += len(rows)
+            summaries.append(summarize(batch, rows, opening))
+            pending.append((len(batch), pool.submit(render_batch, batch, rows, {m: opening.get(m, 0) for m in batch['id']}, fmt, start_label, period_label)))
+            # 🌟 อ่านชุดถัดไประหว่างที่พูลจัดรูปแบบชุดก่อนหน้า แต่ไม่ให้งานค้างเกิน workers * 2 ชุด
+            while len(pending) >= workers * 2 or (pending and i + batch_size >= total):
+                n, future = pending.popleft()
+                write(future.result())
+                done += n
+                if progress: progress(done, total)
+
+        summary = pd.concat(summaries, ignore_index=True) if summaries else summarize(meds, pd.DataFrame(), opening)
+        summary = summary[list(SUMMARY_COLUMNS)].rename(columns=SUMMARY_COLUMNS)
+        if fmt == 'xlsx': summary.to_excel(writer, sheet_name=_sheet_name('สรุปทุกรายการ', used), index=False)
+        else: writer.writestr('_สรุปทุกรายการ.csv', summary.to_csv(index=False).encode('utf-8-sig'))
+    if progress and total == 0: progress(0, 0)
+    return {"format": fmt, "medicines": total, "entries": entries, "closing_total": int(summary['คงเหลือ'].sum()) if total else 0}
+
+def file_name(date_from, date_to, fmt):
+    return f"บัญชีคุมเวชภัณฑ์_{date_from:%Y_%m_%d}-{date_to:%Y_%m_%d}.{fmt}"
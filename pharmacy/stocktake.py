@@ -0,0 +1,115 @@
+import io
+import numpy as np
+import pandas as pd
+from pharmacy.db import supabase, fetch
+from pharmacy.submit import call_rpc
+
+# --- ตรวจนับสต๊อกเป็นรอบ (ดู migrations/006_stock_take.sql) ---
+# เปิดรอบ = ฝั่งเซิร์ฟเวอร์บันทึกยอดทุกล็อต ณ เวลานั้น (snapshot) -> กรอกยอดนับในตารางหรือนำเข้าไฟล์ -> ยืนยันปรับยอดทั้งรอบครั้งเดียว
+# 🌟 ส่วนต่าง = ยอดนับ - ยอด snapshot แล้วบวกเข้ากับยอดปัจจุบัน การรับ/เบิกระหว่างนับจึงยังคงอยู่ครบ
+# การคำนวณส่วนต่างทำทั้งตารางด้วย pandas (ไม่วนทีละแถว) รองรับหลายพันล็อตต่อรอบ
+
+STOCK_COUNT_ERRORS = {
+    'STOCK_COUNT_ALREADY_OPEN': "❌ มีรอบตรวจนับที่เปิดค้างอยู่แล้ว กรุณาปิดหรือยกเลิกรอบเดิมก่อน",
+    'STOCK_COUNT_NOT_OPEN': "❌ รอบตรวจนับนี้ถูกปิดหรือยกเลิกไปแล้ว",
+    'STOCK_COUNT_NOT_FOUND': "❌ ไม่พบรอบตรวจนับนี้",
+    'NEGATIVE_STOCK': "❌ มีล็อตที่ยอดจะติดลบหลังปรับ (มีการเบิกระหว่างนับมากกว่ายอดที่นับได้) กรุณาตรวจสอบยอดนับอีกครั้ง",
+}
+
+LOT_STATUS_TH = {'QUARANTINE': "กักกันยาหมดอายุ", 'RECALLED': "ระงับ/เรียกคืน"}
+
+LINE_COLUMNS = ['id', 'inventory_id', 'medicine_id', 'lot_no', 'exp_date', 'snapshot_qty', 'counted_qty']
+
+# ชื่อหัวคอลัมน์ที่รับได้ในไฟล์นำเข้า (ไฟล์ที่ดาวน์โหลดจากหน้าตรวจนับใช้ชื่อภาษาไทย)
+IMPORT_HEADERS = {'รหัสบรรทัด': 'id', 'รหัสยา': 'medicine_id', 'เลข lot': 'lot_no', 'lot': 'lot_no', 'ยอดนับได้': 'counted_qty', 'ยอดนับ': 'counted_qty', 'counted': 'counted_qty'}
+
+def open_count(user_name, note=None, form=None):
+    return call_rpc("stock_count_open", {"p_user_name": user_name, "p_note": note}, form)
+
+# counts: DataFrame คอลัมน์ id, counted_qty (ส่งทุกบรรทัดในคำขอเดียว)
+def save_counts(count_id, counts, user_name):
+    payload = [{"id": int(i), "counted_qty": None if pd.isna(q) else int(q)} for i, q in zip(counts['id'], counts['counted_qty'])]
+    return supabase.rpc("stock_count_save", {"p_count_id": count_id, "p_counts": payload, "p_user_name": user_name}).execute().data
+
+def post_count(count_id, user_name, form=None):
+    return call_rpc("stock_count_post", {"p_count_id": count_id, "p_user_name": user_name}, form)
+
+def cancel_count(count_id, user_name):
+    supabase.rpc("stock_count_cancel", {"p_count_id": count_id, "p_user_name": user_name}).execute()
+
+def get_open_count():
+    res = supabase.table("stock_counts").select("*").eq("status", "OPEN").limit(1).execute()
+    return res.data[0] if res.data else None
+
+def load_lines(count_id):
+    return fetch("stock_count_lines", LINE_COLUMNS, [("eq", "count_id", count_id)])
+
+# ยอดรับ/เบิกของแต่ละยา+Lot ที่เกิดหลังเวลา snapshot
+def load_movements(snapshot_at):
+    return fetch("transactions", ["medicine_id", "lot_no", "qty_change"], [("gt", "created_at", snapshot_at)])
+
+def compute_variance(lines, movements):
+    df = lines.copy()
+    keys = ['medicine_id', 'lot_no']
+    for k in keys: df[k] = df[k].astype(str)
+    if movements.empty: df['movement'] = 0
+    else:
+        mv = movements.assign(**{k: movements[k].astype(str) for k in keys}).groupby(keys)['qty_change'].sum().rename('movement')
+        df = df.merge(mv, left_on=keys, right_index=True, how='left')
+        df['movement'] = df['movement'].fillna(0).astype('int64')
+    counted = df['counted_qty'].astype('float64')
+    df['expected_now'] = df['snapshot_qty'] + df['movement']
+    df['variance'] = (counted - df['snapshot_qty']).fillna(0).astype('int64')
+    df['new_qty'] = df['expected_now'] + df['variance']
+    df['result'] = np.select([counted.isna(), df['variance'] == 0, df['variance'] > 0], ['ยังไม่นับ', 'ตรง', 'เกิน'], 'ขาด')
+    return df
+
+def summarize(df):
+    counted = df['counted_qty'].notna()
+    return {"lines": len(df), "counted": int(counted.sum()), "matched": int((df['result'] == 'ตรง').sum()),
+            "over": int(df['variance'].clip(lower=0).sum()), "short": int(-df['variance'].clip(upper=0).sum()), "negative": int((df['new_qty'] < 0).sum())}
+
+def with_names(lines, med_names):
+    names = med_names[['id', 'generic_name', 'unit']].rename(columns={'id': 'medicine_id'}).astype({'medicine_id': str})
+    return lines.assign(medicine_id=lines['medicine_id'].astype(str)).merge(names, on='medicine_id', how='left')
+
+# แบบฟอร์มสำหรับนับบนกระดาษ/Excel แล้วนำเข้ากลับ (คอลัมน์รหัสบรรทัดใช้จับคู่ ไม่แสดงยอดตั้งต้นเพื่อให้นับตามจริง)
+def export_template(lines, med_names):
+    out = with_names(lines, med_names).sort_values(['generic_name', 'exp_date', 'lot_no'])
+    out = out[['id', 'medicine_id', 'generic_name', 'unit', 'lot_no', 'exp_date', 'counted_qty']]
+    out.columns = ['รหัสบรรทัด', 'รหัสยา', 'ชื่อยา', 'หน่วย', 'เลข Lot', 'วันหมดอายุ', 'ยอดนับได้']
+    return out.to_csv(index=False).encode('utf-8-sig')
+
+# อ่านไฟล์ยอดนับ (CSV หรือ Excel) -> DataFrame id, counted_qty ของบรรทัดในรอบนี้
+# จับคู่ด้วยรหัสบรรทัด ถ้าไม่มีจะจับคู่ด้วยรหัสยา + เลข Lot (คืนรายการที่จับคู่ไม่ได้แยกไว้)
+def parse_count_file(uploaded, lines):
+    name = getattr(uploaded, 'name', '')
+    raw = pd.read_excel(uploaded, dtype=str) if name.lower().endswith(('.xlsx', '.xls')) else pd.read_csv(io.BytesIO(uploaded.getvalue()) if hasattr(uploaded, 'getvalue') else uploaded, dtype=str, encoding='utf-8-sig')
+    raw = raw.rename(columns=lambda c: IMPORT_HEADERS.get(str(c).strip().lower(), str(c).strip().lower()))
+    if 'counted_qty' not in raw.columns: raise ValueError("ไม่พบคอลัมน์ 'ยอดนับได้' ในไฟล์")
+    raw['counted_qty'] = pd.to_numeric(raw['counted_qty'].str.replace(',', '').str.strip(), errors='coerce')
+    raw = raw[raw['counted_qty'].notna()]
+    if (raw['counted_qty'] < 0).any() or (raw['counted_qty'] % 1 != 0).any(): raise ValueError("ยอดนับต้องเป็นจำนวนเต็มที่ไม่ติดลบ")
+    target = lines[['id', 'medicine_id', 'lot_no']].astype(str)
+    if 'id' in raw.columns and raw['id'].notna().all():
+        matched = raw[['id', 'counted_qty']].assign(id=raw['id'].str.strip()).merge(target[['id']], on='id', how='left', indicator=True)
+    elif {'medicine_id', 'lot_no'} <= set(raw.columns):
+        keyed = raw[['medicine_id', 'lot_no', 'counted_qty']].apply(lambda s: s.str.strip() if s.dtype == object or pd.api.types.is_string_dtype(s) else s)
+        matched = keyed.merge(target, on=['medicine_id', 'lot_no'], how='left', indicator=True)
+    else: raise ValueError("ไฟล์ต้องมีคอลัมน์ 'รหัสบรรทัด' หรือ 'รหัสยา' + 'เลข Lot'")
+    unmatched = matched[matched['_merge'] == 'left_only'].drop(columns='_merge')
+    matched = matched[matched['_merge'] == 'both'].drop_duplicates('id', keep='last')
+    return pd.DataFrame({'id': matched['id'].astype('int64'), 'counted_qty': matched['counted_qty'].astype('int64')}), unmatched
+
+# บรรทัดที่ไม่ถูกปรับยอดเพราะล็อตถูกกักกัน/ระงับระหว่างนับ (result.skipped ของ stock_count_post ดู migrations/021) -> ข้อความเตือน หรือ None
+def skipped_message(result, med_names=None):
+    skipped = (result or {}).get('skipped') or []
+    if not skipped: return None
+    names = {} if med_names is None else dict(zip(med_names['id'].astype(str), med_names['generic_name']))
+    lots = ", ".join(f"{names.get(str(x['medicine_id']), x['medicine_id'])} Lot {x['lot_no']} ({LOT_STATUS_TH.get(x['status'], x['status'])}, ส่วนต่าง {x['variance']:+,})" for x in skipped)
+    return f"ไม่ได้ปรับยอด {len(skipped):,} ล็อตที่ไม่ได้ใช้งานแล้ว กรุณาตรวจสอบแยก: {lots}"
+
+def stock_count_error_message(e):
+    for code, msg in STOCK_COUNT_ERRORS.items():
+        if code in str(e): return msg
+    return None
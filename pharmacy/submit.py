@@ -0,0 +1,75 @@
+import time
+import uuid
+import collections
+import pandas as pd
+import streamlit as st
+from pharmacy.db import supabase, invalidate_cache
+from pharmacy.outbox import QUEUEABLE
+from pharmacy.offline import is_offline_error, queue_command
+
+# --- บันทึกฟอร์มได้ครั้งเดียวต่อการแสดงผล และข้อความยืนยันแบบไม่บล็อก (ดู migrations/012_form_submissions.sql) ---
+# ฟอร์มแต่ละชุดมี token ใน session_state ส่งไปพร้อมคำสั่งผ่าน submit_once
+# ดับเบิลคลิก/กดซ้ำก่อนหน้าจอรีเฟรช = ส่ง token เดิม เซิร์ฟเวอร์ปฏิเสธด้วย DUPLICATE_SUBMISSION จึงไม่รับเข้า/เบิกซ้ำ
+# ถ้าผิดพลาด (เช่น ยอดไม่พอ) แก้แล้วกดใหม่ด้วย token เดิมได้ เพราะฝั่งเซิร์ฟเวอร์ rollback การจองไปด้วย
+# 🌟 token ผูกกับการแสดงผลแต่ละรอบของฟอร์ม ({key}_version): บันทึกสำเร็จแล้ว reset_form เปลี่ยน version
+#    ฟอร์มและปุ่มตั้ง key ด้วย form_key() คลิกที่ค้างจากหน้าจอเดิม (ดับเบิลคลิก) จึงไม่ตรงกับปุ่มของรอบใหม่และไม่ส่งอะไรเลย
+# 🌟 แทน st.success + time.sleep ก่อน st.rerun(): flash() เก็บข้อความไว้ แล้ว show_flash() แสดงเป็น toast ในรอบถัดไปทันที
+
+DUPLICATE = 'DUPLICATE_SUBMISSION'
+DUPLICATE_MESSAGE = "รายการนี้ถูกบันทึกไปแล้ว (กดซ้ำ) ระบบไม่บันทึกซ้ำให้"
+MAX_LATENCIES = 200
+
+@st.cache_resource
+def _latencies():
+    return collections.defaultdict(lambda: collections.deque(maxlen=MAX_LATENCIES))
+
+def form_version(key):
+    return st.session_state.get(f"{key}_version", 0)
+
+def form_token(key):
+    return st.session_state.setdefault(f"{key}_token_{form_version(key)}", str(uuid.uuid4()))
+
+# key ของ st.form / ปุ่มบันทึกของฟอร์ม key ในการแสดงผลรอบนี้
+def form_key(key, name):
+    return f"{name}_{form_version(key)}"
+
+# เริ่มฟอร์มรอบใหม่: เปลี่ยน version (ได้ token และ key ของปุ่มชุดใหม่) และล้างรายการที่ค้างในฟอร์ม (เช่น รายการที่สแกน)
+def reset_form(key):
+    for suffix in (f"_token_{form_version(key)}", "_lines", "_msg"): st.session_state.pop(f"{key}{suffix}", None)
+    st.session_state[f"{key}_version"] = form_version(key) + 1
+
+# form = None เรียกฟังก์ชันตรงๆ (ใช้จากสคริปต์ที่ไม่มีฟอร์ม) ไม่งั้นส่งผ่าน submit_once ด้วย token ของฟอร์มนั้น
+# เน็ตหลุด: คำสั่งใน QUEUEABLE ถูกเก็บลงคิวในเครื่องด้วย token เดียวกันแล้วคืน None (effect = ผลต่อยอดรายล็อตที่คาดไว้ ดู pharmacy/outbox.py)
+def call_rpc(fn, params, form=None, effect=None):
+    t0 = time.perf_counter()
+    try:
+        if form is None: return supabase.rpc(fn, params).execute().data
+        result = supabase.rpc("submit_once", {"p_token": form_token(form), "p_action": fn, "p_params": params}).execute().data
+        reset_form(form)
+        return result
+    except Exception as e:
+        if form is not None and fn in QUEUEABLE and is_offline_error(e):
+            queue_command(fn, params, form_token(form), effect)
+            reset_form(form)
+            flash("ออฟไลน์: บันทึกไว้ในเครื่องแล้ว ระบบจะส่งเข้าฐานข้อมูลอัตโนมัติเมื่อเชื่อมต่อได้", icon="📴")
+            return None
+        # คำขอแรกบันทึกสำเร็จไปแล้วแต่หน้าจอถูกรอบใหม่แทรกก่อนแสดงผล -> แจ้งผู้ใช้แล้วเริ่มฟอร์มใหม่ แทนการแสดงเป็นข้อผิดพลาด
+        if form is not None and DUPLICATE in str(e):
+            reset_form(form)
+            invalidate_cache()
+            flash(DUPLICATE_MESSAGE, icon="ℹ️")
+            st.rerun()
+        raise
+    finally: _latencies()[fn].append((time.perf_counter() - t0) * 1000)
+
+def flash(message, icon="✅"):
+    st.session_state.setdefault("_flash", []).append((message, icon))
+
+# เรียกครั้งเดียวใน streamlit_app.py ก่อนแสดงหน้า
+def show_flash():
+    for message, icon in st.session_state.pop("_flash", []): st.toast(message, icon=icon, duration="long")
+
+# เวลาที่ใช้ต่อคำสั่งบันทึก (ไม่รวมการแสดงผล) ของทุก session บนเซิร์ฟเวอร์นี้ ล่าสุด MAX_LATENCIES ครั้งต่อคำสั่ง
+def latency_summary():
+    rows = [{"action": fn, "n": len(v), "p50_ms": pd.Series(v).quantile(0.5), "p95_ms": pd.Series(v).quantile(0.95), "max_ms": max(v)} for fn, v in list(_latencies().items()) if v]
+    return pd.DataFrame(rows, columns=["action", "n", "p50_ms", "p95_ms", "max_ms"])
@@ -0,0 +1,59 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+# --- แนวโน้มการใช้ยา จากยอดเคลื่อนไหวรายวัน (migrations/015_daily_movements.sql) ไม่พึ่ง Streamlit ---
+# 🌟 เลือกขนาดช่วงให้จำนวนจุดบนกราฟไม่เกิน MAX_POINTS (วัน -> สัปดาห์ -> เดือน -> ไตรมาส) ฐานข้อมูลรวมยอดมาให้แล้ว
+#    ดูย้อนหลังหลายปีก็รับข้อมูลแค่ร้อยกว่าแถว ไม่ต้องดึงรายการรับ-จ่ายดิบ
+# ช่วงที่ไม่มีความเคลื่อนไหวไม่มีแถวในฐานข้อมูล เติมเป็น 0 ที่นี่ (กราฟจะไม่ลากเส้นข้ามช่วงที่ไม่มีการใช้)
+
+SERIES_COLUMNS = ['bucket', 'receive_qty', 'dispense_qty', 'expire_qty', 'adjust_qty', 'net_qty']
+MEASURE_LABELS = {'dispense_qty': 'เบิกจ่าย', 'receive_qty': 'รับเข้า', 'expire_qty': 'ตัดหมดอายุ', 'adjust_qty': 'ปรับยอด', 'net_qty': 'เปลี่ยนแปลงสุทธิ'}
+BUCKET_LABELS = {'day': 'รายวัน', 'week': 'รายสัปดาห์', 'month': 'รายเดือน', 'quarter': 'รายไตรมาส'}
+BUCKET_FREQ = {'day': 'D', 'week': 'W-MON', 'month': 'MS', 'quarter': 'QS'}
+BUCKETS_PER_YEAR = {'day': 365.25, 'week': 52.18, 'month': 12, 'quarter': 4}
+MAX_POINTS = 120
+
+# วันแรกของช่วงที่ day อยู่ (สัปดาห์เริ่มวันจันทร์ เหมือน date_trunc ของ Postgres)
+def bucket_start(day, bucket):
+    if bucket == 'week': return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month': return day.replace(day=1)
+    if bucket == 'quarter': return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day
+
+def pick_bucket(start, end, max_points=MAX_POINTS):
+    for bucket in BUCKET_FREQ:
+        if len(pd.date_range(bucket_start(start, bucket), end, freq=BUCKET_FREQ[bucket])) <= max_points: return bucket
+    return 'quarter'
+
+# แถวจาก movement_series -> ตารางครบทุกช่วงตั้งแต่ start ถึง end (index = วันแรกของช่วง)
+def complete_series(rows, start, end, bucket):
+    index = pd.date_range(bucket_start(start, bucket), end, freq=BUCKET_FREQ[bucket], name='bucket')
+    if rows is None or rows.empty: return pd.DataFrame(0, index=index, columns=SERIES_COLUMNS[1:])
+    df = rows.assign(bucket=pd.to_datetime(rows['bucket'])).set_index('bucket')[SERIES_COLUMNS[1:]]
+    return df.reindex(index, fill_value=0).astype('int64')
+
+# ความชันของเส้นตรงที่ fit กับยอดแต่ละช่วง คิดเป็น % ต่อปีของค่าเฉลี่ย (None ถ้าข้อมูลไม่พอ)
+# ช่วงสุดท้ายที่ยังไม่ครบ (เช่นเดือนปัจจุบัน) ไม่นำมาคิด ไม่ให้ดูเหมือนยอดตก
+def trend_per_year(values, bucket, partial_last=True):
+    values = np.asarray(values[:-1] if partial_last else values, dtype='float64')
+    if len(values) < 3 or values.mean() == 0: return None
+    slope = np.polyfit(np.arange(len(values)), values, 1)[0]
+    return slope * BUCKETS_PER_YEAR[bucket] / values.mean() * 100
+
+# ซ้อนกราฟรายปี: แถว = เดือน 1-12, คอลัมน์ = ปี พ.ศ.
+def year_over_year(series, column='dispense_qty'):
+    monthly = series[column].resample('MS').sum()
+    return monthly.groupby([monthly.index.month, monthly.index.year + 543]).sum().unstack().rename_axis(index='เดือน', columns='ปี พ.ศ.')
+
+# ประวัติที่เก็บถาวร (คอลัมน์ตาม TRANSACTION_COLUMNS) -> แถวของ daily_movements นับแบบเดียวกับ trigger ใน 015
+def daily_movements(trans):
+    trans = trans[~trans['carry_forward'].astype(bool) & trans['medicine_id'].notna()]
+    if trans.empty: return pd.DataFrame(columns=['medicine_id', 'day'] + SERIES_COLUMNS[1:])
+    origin = trans['ref_id'].astype(str).map(trans['created_at'].set_axis(trans['id'].astype(str)))
+    day = origin.fillna(trans['created_at']).dt.tz_convert('Asia/Bangkok').dt.date
+    qty, action = trans['qty_change'].astype('int64'), trans['action_type'].astype(str)
+    df = pd.DataFrame({'medicine_id': trans['medicine_id'].astype(str), 'day': day,
+                       'receive_qty': qty.where(action == 'RECEIVE', 0), 'dispense_qty': -qty.where(action == 'DISPENSE', 0),
+                       'expire_qty': -qty.where(action == 'EXPIRE', 0), 'adjust_qty': qty.where(~action.isin(['RECEIVE', 'DISPENSE', 'EXPIRE']), 0), 'net_qty': qty})
+    return df.groupby(['medicine_id', 'day'], as_index=False)[SERIES_COLUMNS[1:]].sum()
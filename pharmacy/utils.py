@@ -0,0 +1,10 @@
+THAI_MONTHS = {'01': 'มกราคม', '02': 'กุมภาพันธ์', '03': 'มีนาคม', '04': 'เมษายน', '05': 'พฤษภาคม', '06': 'มิถุนายน', '07': 'กรกฎาคม', '08': 'สิงหาคม', '09': 'กันยายน', '10': 'ตุลาคม', '11': 'พฤศจิกายน', '12': 'ธันวาคม'}
+
+ACTION_TYPE_TH = {'RECEIVE': 'รับเข้า', 'DISPENSE': 'เบิกจ่าย', 'INITIAL': 'ยอดยกมา', 'EXPIRE': 'ตัดหมดอายุ', 'ADJUST': 'ปรับยอดตรวจนับ'}
+
+ENTRY_KIND_TH = {'AMEND': 'แก้ไข', 'VOID': 'ยกเลิก'}
+
+def format_thai_month(ym_str):
+    if not isinstance(ym_str, str) or '-' not in ym_str: return ym_str
+    y, m = ym_str.split('-')
+    return f"{THAI_MONTHS.get(m, m)} {int(y) + 543}"
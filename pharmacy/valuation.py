@@ -0,0 +1,30 @@
+import pandas as pd
+
+# --- มูลค่าคลังและต้นทุนการเบิกจ่ายตามราคาทุนรายล็อต (คำนวณรายยาฝั่งเซิร์ฟเวอร์ ดู migrations/011_lot_valuation.sql) ---
+# ฝั่งแอปแค่รวมผลรายยาเป็นรายหมวด/กลุ่มยาด้วย groupby ครั้งเดียว (ไม่พึ่ง Streamlit ใช้ได้ทั้งหน้าเว็บและรายงาน LINE)
+
+VALUATION_COLUMNS = ['medicine_id', 'opening_value', 'receive_value', 'dispense_cost', 'expire_value', 'adjust_value', 'other_value',
+                     'closing_value', 'closing_qty', 'uncosted_qty']
+VALUE_COLUMNS = VALUATION_COLUMNS[1:8]
+VALUE_LABELS = {'opening_value': 'มูลค่ายกมา', 'receive_value': 'มูลค่ารับเข้า', 'dispense_cost': 'ต้นทุนเบิกจ่าย', 'expire_value': 'มูลค่าตัดหมดอายุ',
+                'adjust_value': 'มูลค่าปรับยอดตรวจนับ', 'other_value': 'มูลค่าอื่นๆ', 'closing_value': 'มูลค่าคงเหลือ', 'uncosted_qty': 'ยอดที่ยังไม่มีราคาทุน'}
+GROUP_LABELS = {'category': 'หมวด', 'drug_group': 'กลุ่มยา'}
+UNSPECIFIED = 'ไม่ระบุ'
+
+# meds: DataFrame ที่มี id, generic_name, unit, category, drug_group (และ kind ถ้าแยกยา/มิใช่ยาไว้แล้ว ดู pharmacy/dimensions.py)
+def with_medicines(valuation, meds):
+    info = meds[['id', 'generic_name', 'unit', 'category', 'drug_group'] + (['kind'] if 'kind' in meds.columns else [])].rename(columns={'id': 'medicine_id'}).astype({'medicine_id': str})
+    return valuation.assign(medicine_id=valuation['medicine_id'].astype(str)).merge(info, on='medicine_id', how='left')
+
+# ชื่อหมวด/กลุ่มยาสำหรับ groupby (ค่าว่าง/'-' รวมเป็น 'ไม่ระบุ' แทนที่จะถูกตัดทิ้ง)
+def group_keys(df, by):
+    return df[by].astype(object).fillna('').astype(str).str.strip().replace({'': UNSPECIFIED, '-': UNSPECIFIED, 'nan': UNSPECIFIED, 'None': UNSPECIFIED}).rename(by)
+
+def group_valuation(df, by):
+    return df.groupby(group_keys(df, by))[VALUE_COLUMNS + ['uncosted_qty']].sum().sort_values('closing_value', ascending=False).reset_index()
+
+def totals(df):
+    return df[VALUE_COLUMNS + ['uncosted_qty']].sum() if not df.empty else pd.Series(0, index=VALUE_COLUMNS + ['uncosted_qty'])
+
+def baht(value):
+    return f"{value:,.2f} บาท"
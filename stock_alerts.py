@@ -0,0 +1,38 @@
+import os
+import sys
+from supabase import create_client
+from pharmacy.line import send_line_message
+from pharmacy.alerts import format_alert_message, ack_payload
+
+# --- งานส่งแจ้งเตือนคลังเข้า LINE (เรียก stock_alert_pending / stock_alert_ack ใน migrations/009) ---
+# การประเมินยาต่ำกว่าจุดสั่งซื้อ/ยาหมด/ล็อตใกล้หมดอายุเกิดในฐานข้อมูลทันทีที่มีการรับ-เบิก งานนี้แค่รวบรวมรายการที่ถึงเวลาแจ้ง
+# 🌟 ทุกรอบ (ทุก 15 นาที) ส่งเป็นข้อความเดียว และ ack หลังส่งสำเร็จเท่านั้น ถ้าส่งไม่ผ่านรอบถัดไปจะส่งซ้ำให้เอง
+# ใส่ --dry-run เพื่อพิมพ์ข้อความโดยไม่ส่งและไม่ ack
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+
+def run_alerts(dry_run=False):
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    pending = supabase.rpc("stock_alert_pending", {}).execute().data
+    message = format_alert_message(pending)
+    if not message:
+        print("ไม่มีรายการที่ต้องแจ้งเตือน")
+        return False
+    print(message)
+    if dry_run: return False
+
+    # ใช้ Token/ปลายทางที่ตั้งไว้ในหน้า Admin ก่อน ถ้าไม่มีจึงใช้ค่าจาก secrets
+    settings = supabase.table("settings").select("line_token, line_target_id").eq("id", 1).execute().data
+    settings = settings[0] if settings else {}
+    token = settings.get('line_token') or os.environ.get("LINE_BOT_TOKEN")
+    target = settings.get('line_target_id') or os.environ.get("LINE_TARGET_ID")
+    if not (token and target and send_line_message(token, target, message)):
+        sys.exit("❌ ส่ง LINE ไม่สำเร็จ (จะส่งซ้ำในรอบถัดไป)")
+    stock, expiry = ack_payload(pending)
+    supabase.rpc("stock_alert_ack", {"p_stock": stock, "p_expiry": expiry}).execute()
+    print(f"✅ ส่งแจ้งเตือนแล้ว: {len(stock)} รายการยา, {len(expiry)} ล็อตใกล้หมดอายุ")
+    return True
+
+if __name__ == "__main__":
+    run_alerts(dry_run="--dry-run" in sys.argv[1:])
@@ -0,0 +1,52 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import pandas as pd
+from pharmacy.pg import connect
+from pharmacy import stock_cards
+
+# --- พิมพ์บัญชีคุมเวชภัณฑ์คงคลัง (Stock Card) ของยาทุกรายการสำหรับตรวจสอบประจำปี (ดู pharmacy/stock_cards.py) ---
+# ตัวอย่าง: python stock_cards.py --fiscal-year 2568                       ปีงบประมาณ (1 ต.ค. - 30 ก.ย.) เป็น Excel ไฟล์เดียว
+#           python stock_cards.py --from 2025-01-01 --to 2025-06-30 --format zip --out cards.zip --workers 4
+# ต้องตั้งค่า DATABASE_URL และติดตั้ง pip install -r requirements-service.txt (Excel ต้องมี openpyxl ไม่มีจะได้ zip ของ CSV)
+
+def fiscal_year_range(fiscal_year):
+    # ปีงบประมาณ พ.ศ. N = 1 ต.ค. (N-544) ถึง 30 ก.ย. (N-543)
+    return datetime.date(fiscal_year - 544, 10, 1), datetime.date(fiscal_year - 543, 9, 30)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างบัญชีคุมเวชภัณฑ์คงคลังของยาที่เปิดใช้งานทุกรายการในช่วงวันที่")
+    parser.add_argument("--fiscal-year", type=int, help="ปีงบประมาณ พ.ศ. (แทน --from/--to)")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, help="วันแรก YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, help="วันสุดท้าย YYYY-MM-DD (ค่าเริ่มต้น วันนี้)")
+    parser.add_argument("--format", choices=stock_cards.FORMATS, default="xlsx")
+    parser.add_argument("--out", help="ไฟล์ผลลัพธ์ (ค่าเริ่มต้น ตั้งชื่อตามช่วงวันที่)")
+    parser.add_argument("--workers", type=int, default=stock_cards.DEFAULT_WORKERS, help="จำนวนโปรเซสที่จัดรูปแบบพร้อมกัน")
+    parser.add_argument("--batch", type=int, default=stock_cards.BATCH_SIZE, help="จำนวนรายการยาต่อชุดที่อ่านจากสมุดบัญชี")
+    parser.add_argument("--all", action="store_true", help="รวมยาที่ปิดใช้งานแล้ว")
+    args = parser.parse_args(argv)
+    if args.fiscal_year: date_from, date_to = fiscal_year_range(args.fiscal_year)
+    elif args.date_from: date_from, date_to = args.date_from, args.date_to or datetime.date.today()
+    else: parser.error("ต้องระบุ --fiscal-year หรือ --from")
+    if date_to < date_from: parser.error("วันสุดท้ายต้องไม่ก่อนวันแรก")
+    fmt = args.format if args.format == 'zip' or stock_cards.excel_available() else 'zip'
+    out = args.out or stock_cards.file_name(date_from, date_to, fmt)
+    if fmt != args.format:
+        out = os.path.splitext(out)[0] + '.zip'
+        print("⚠️ ไม่พบ openpyxl/xlsxwriter จึงสร้างเป็น zip ของไฟล์ CSV แทน", file=sys.stderr)
+
+    conn = connect()
+    meds = pd.DataFrame(conn.execute("select id, generic_name, unit from public.medicines" + ("" if args.all else " where is_active")).fetchall(), columns=['id', 'generic_name', 'unit'])
+    user_names = {str(r['email']).strip().lower(): str(r['full_name']).strip() for r in conn.execute("select email, full_name from public.profiles where nullif(trim(full_name), '') is not null and email is not null")}
+    progress = lambda done, total: print(f"\r📒 {done:,}/{total:,} รายการ", end="", file=sys.stderr, flush=True)
+    try:
+        result = stock_cards.generate(meds, lambda at: stock_cards.pg_opening(conn, at), lambda ids, start, end: stock_cards.pg_movements(conn, ids, start, end),
+                                      stock_cards.pg_lots(conn), date_from, date_to, out, fmt=fmt, user_names=user_names, workers=args.workers, batch_size=args.batch, progress=progress)
+    except ValueError as e: raise SystemExit(f"❌ {e}")
+    print(file=sys.stderr)
+    print(json.dumps({"file": out, **result}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
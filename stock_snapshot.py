@@ -0,0 +1,19 @@
+import os
+import sys
+import json
+from supabase import create_client
+
+# --- งานรายวัน: บันทึกยอดคงเหลือสิ้นเดือนรายยา+Lot (เรียกฟังก์ชัน stock_snapshot_run ใน migrations/008) ---
+# รันทุกวันได้ จะบันทึกเฉพาะสิ้นเดือนที่ปิดแล้วแต่ยังไม่มี snapshot ใส่ --backfill เพื่อย้อนสร้างตั้งแต่เดือนแรกในสมุดบัญชี
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+
+def run_snapshot(backfill=False):
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    result = supabase.rpc("stock_snapshot_run", {"p_backfill": backfill}).execute().data
+    print(f"📸 บันทึกยอดคงเหลือสิ้นเดือนเรียบร้อย: {json.dumps(result, ensure_ascii=False)}")
+    return result
+
+if __name__ == "__main__":
+    run_snapshot(backfill="--backfill" in sys.argv[1:])
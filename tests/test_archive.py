@@ -0,0 +1,34 @@
+import datetime
+
+import pandas as pd
+
+from pharmacy.archive import write_staging, publish_staging, load_archived
+
+# --- load_archived (pharmacy/archive.py): รหัสยาที่เปลี่ยนหลังเก็บถาวร (medicine_renames, migrations/024) ---
+
+def ts(day):
+    return datetime.datetime(2025, 3, day, 3, tzinfo=datetime.timezone.utc)
+
+def row(id, medicine_id, day):
+    return {"id": id, "medicine_id": medicine_id, "action_type": "RECEIVE", "qty_change": 10, "lot_no": "L1", "user_name": "u", "note": "",
+            "created_at": ts(day), "ref_id": None, "entry_kind": None, "carry_forward": False, "year": 2025, "month": 3}
+
+def archive(tmp_path):
+    uri = str(tmp_path / "archive")
+    # A -> B วันที่ 10, B -> C วันที่ 20, แล้วนำรหัส A กลับมาใช้กับยาตัวใหม่ (รายการวันที่ 25 ไม่ใช่ยา C)
+    write_staging([[row("1", "A", 1), row("2", "B", 15), row("3", "A", 25), row("4", "X", 2)]], uri, "t1")
+    publish_staging(uri, "t1")
+    renames = pd.DataFrame({"old_id": ["A", "B"], "new_id": ["B", "C"], "renamed_at": [pd.Timestamp(ts(10)), pd.Timestamp(ts(20))]})
+    return uri, renames
+
+def test_renames_follow_chain_by_time(tmp_path):
+    uri, renames = archive(tmp_path)
+    df = load_archived(uri, renames=renames).sort_values('id')
+    assert df['medicine_id'].astype(str).tolist() == ["C", "C", "A", "X"]
+
+def test_filter_by_current_id_reads_former_ids(tmp_path):
+    uri, renames = archive(tmp_path)
+    assert sorted(load_archived(uri, medicine_id="C", renames=renames)['id']) == ["1", "2"]
+    assert load_archived(uri, medicine_id="A", renames=renames)['id'].tolist() == ["3"]
+    # ไม่มีประวัติการเปลี่ยนรหัส อ่านตามรหัสในไฟล์เหมือนเดิม
+    assert sorted(load_archived(uri, medicine_id="A")['id']) == ["1", "3"]
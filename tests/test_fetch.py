@@ -0,0 +1,100 @@
+import csv
+import io
+import re
+
+import pandas as pd
+
+from pharmacy.fetch import fetch_frame, fetch_rpc_frame, read_csv_payload
+
+# --- fetch_frame / fetch_rpc_frame (pharmacy/fetch.py): แบ่งหน้าด้วยคีย์ และช่องว่างใน CSV ---
+# FakeClient ทำตัวแบบ PostgREST เฉพาะส่วนที่ fetch.py ใช้ (select, filter, or=(...), order, limit, csv) บนรายการ dict
+
+OPS = {"eq": lambda a, b: a == b, "gt": lambda a, b: a > b, "lt": lambda a, b: a < b}
+
+def _split(text):
+    parts, depth, quoted, cur = [], 0, False, ""
+    for i, ch in enumerate(text):
+        if ch == '"' and text[i - 1] != '\\': quoted = not quoted
+        if not quoted and ch == '(': depth += 1
+        if not quoted and ch == ')': depth -= 1
+        if ch == ',' and not depth and not quoted: parts.append(cur); cur = ""
+        else: cur += ch
+    return parts + [cur]
+
+def _cond(term):
+    if term.startswith("and("): return lambda r, subs=[_cond(t) for t in _split(term[4:-1])]: all(f(r) for f in subs)
+    col, op, value = re.fullmatch(r'(\w+)\.(\w+)\."(.*)"', term).groups()
+    value = value.replace('\\"', '"').replace('\\\\', '\\')
+    return lambda r: OPS[op](str(r[col]), value)
+
+class FakeQuery:
+    def __init__(self, client, rows):
+        self.client, self.rows, self.cols, self.conds, self.sort, self.n = client, rows, None, [], [], None
+    def select(self, cols): self.cols = cols.split(","); return self
+    def eq(self, col, v): self.conds.append(lambda r: r[col] == v); return self
+    def gt(self, col, v): self.conds.append(lambda r: str(r[col]) > str(v)); return self
+    def lt(self, col, v): self.conds.append(lambda r: str(r[col]) < str(v)); return self
+    def or_(self, text): subs = [_cond(t) for t in _split(text)]; self.conds.append(lambda r: any(f(r) for f in subs)); return self
+    def order(self, col, desc=False): self.sort.append((col, desc)); return self
+    def limit(self, n): self.n = n; return self
+    def csv(self): return self
+    def execute(self):
+        self.client.requests += 1
+        rows = [r for r in self.rows if all(f(r) for f in self.conds)]
+        for col, desc in reversed(self.sort): rows = sorted(rows, key=lambda r: str(r[col]), reverse=desc)
+        buf = io.StringIO()
+        w = csv.writer(buf, lineterminator='\n')
+        w.writerow(self.cols)
+        for r in rows[:self.n]: w.writerow(['' if r[c] is None else r[c] for c in self.cols])
+        self.data = buf.getvalue()
+        if self.client.on_page: self.client.on_page(self.client)
+        return self
+
+class FakeClient:
+    def __init__(self, rows, on_page=None): self.rows, self.on_page, self.requests = rows, on_page, 0
+    def table(self, name): return FakeQuery(self, self.rows)
+    def rpc(self, fn, params): return FakeQuery(self, self.rows)
+
+def trans_rows(n):
+    return [{"id": f"{i:05d}", "medicine_id": f"M{i % 7}", "action_type": "RECEIVE", "qty_change": i, "lot_no": f"L{i % 3}",
+             "note": None if i % 2 else "", "ref_id": None, "created_at": f"2026-01-{1 + i % 5:02d} 10:00:00+00"} for i in range(n)]
+
+def test_pages_by_key_without_gaps_or_duplicates():
+    client = FakeClient(trans_rows(25))
+    df = fetch_frame(client, "transactions", ["medicine_id", "qty_change"], page_size=10)
+    assert sorted(df['qty_change'].tolist()) == list(range(25))
+    # คอลัมน์ id ที่เพิ่มไว้ใช้แบ่งหน้าไม่ติดไปกับผลลัพธ์
+    assert list(df.columns) == ["medicine_id", "qty_change"]
+    assert client.requests == 3
+
+def test_pages_by_order_then_key():
+    client = FakeClient(trans_rows(23))
+    df = fetch_frame(client, "transactions", ["id", "qty_change", "created_at"], order="created_at", desc=True, page_size=4)
+    expected = sorted(trans_rows(23), key=lambda r: r["id"])
+    expected = sorted(expected, key=lambda r: r["created_at"], reverse=True)
+    assert df['id'].tolist() == [r["id"] for r in expected]
+
+def test_rows_inserted_before_cursor_do_not_shift_pages():
+    # ระหว่างดึงหน้าแรกกับหน้าถัดไปมีแถวใหม่ที่เรียงอยู่ก่อนหน้า offset จะได้แถวซ้ำ keyset ไม่ซ้ำ
+    rows = trans_rows(20)
+    def insert_front(client):
+        if client.requests == 1: rows.insert(0, {**rows[0], "id": "00000a", "qty_change": -1})
+    df = fetch_frame(FakeClient(rows, insert_front), "transactions", ["id", "qty_change"], order="created_at", page_size=5)
+    assert not df['id'].duplicated().any()
+    assert set(range(20)) <= set(df['qty_change'])
+
+def test_rpc_pages_by_composite_key_with_quotes():
+    rows = [{"medicine_id": f"M{i // 4}", "lot_no": f'L"{i % 4},(x)', "qty": i} for i in range(18)]
+    df = fetch_rpc_frame(FakeClient(rows), "stock_as_of", {}, ["medicine_id", "lot_no", "qty"], ["medicine_id", "lot_no"], page_size=5)
+    assert sorted(df['qty'].astype(int).tolist()) == list(range(18))
+
+def test_empty_string_kept_only_in_text_columns():
+    # note ว่างเป็นข้อความว่างเหมือนอ่านจาก JSON ส่วน ref_id (NULL) ต้องเป็น NaN ให้ fold_ledger แยกรายการแก้ไขได้
+    df = fetch_frame(FakeClient(trans_rows(4)), "transactions", ["id", "note", "ref_id"], page_size=10)
+    assert df['note'].tolist() == [''] * 4
+    assert df['ref_id'].isna().all()
+
+def test_read_csv_payload_keeps_codes_as_text():
+    df = read_csv_payload('medicine_id,lot_no,qty\n001,,5\n', ['medicine_id', 'lot_no', 'qty'])
+    assert df.iloc[0].tolist() == ['001', '', '5']
+    assert read_csv_payload('', ['a']).columns.tolist() == ['a']
@@ -0,0 +1,74 @@
+import datetime
+
+import pandas as pd
+
+from pharmacy.receive_grid import PROBLEMS, empty_grid, validate_grid, receive_payload
+
+# --- validate_grid (pharmacy/receive_grid.py): ตรวจใบส่งของโหมดตาราง ไม่ต้องใช้ฐานข้อมูล ---
+
+TODAY = datetime.date(2026, 10, 19)
+MEDS = pd.DataFrame({'id': ['M1', 'M2', 'M3', 'M4'], 'generic_name': ['Paracetamol', 'Amoxicillin', 'Cetirizine', 'Cetirizine'],
+                     'unit': ['tab', 'cap', 'tab', 'syrup']})
+NO_STOCK = pd.DataFrame(columns=['medicine_id', 'lot_no', 'exp_date'])
+
+def grid(*rows):
+    g = empty_grid(len(rows) + 2)
+    for i, row in enumerate(rows):
+        for col, value in row.items(): g.at[i, col] = value
+    return g
+
+def problems(df):
+    return df['problems'].tolist()
+
+def test_empty_grid_has_no_lines():
+    checked = validate_grid(empty_grid(), MEDS, NO_STOCK, TODAY)
+    assert checked.empty
+    assert {'medicine_id', 'lot_no', 'exp_date', 'qty', 'problems'} <= set(checked.columns)
+    assert receive_payload(checked) == []
+
+def test_new_items_without_stock_lots():
+    checked = validate_grid(grid({'medicine': 'M1', 'lot_no': 'A1', 'exp_date': '2027-12-31', 'qty': '1,200', 'unit_cost': '0.75'},
+                                 {'medicine': 'amoxicillin (cap)', 'lot_no': 'B1', 'exp_date': '31/12/2027', 'qty': '50'}), MEDS, NO_STOCK, TODAY)
+    assert problems(checked) == ['', '']
+    assert checked['medicine_id'].tolist() == ['M1', 'M2']
+    assert receive_payload(checked) == [
+        {"medicine_id": 'M1', "lot_no": 'A1', "mfg_date": None, "exp_date": '2027-12-31', "qty": 1200, "unit_cost": 0.75},
+        {"medicine_id": 'M2', "lot_no": 'B1', "mfg_date": None, "exp_date": '2027-12-31', "qty": 50, "unit_cost": None},
+    ]
+
+def test_empty_typed_stock_frame():
+    stock = pd.DataFrame({'medicine_id': pd.Series(dtype=str), 'lot_no': pd.Series(dtype=str), 'exp_date': pd.Series(dtype='datetime64[ns]')})
+    checked = validate_grid(grid({'medicine': 'M1', 'lot_no': 'A1', 'exp_date': '2027-12-31', 'qty': '10'}), MEDS, stock, TODAY)
+    assert problems(checked) == ['']
+
+def test_buddhist_era_dates():
+    checked = validate_grid(grid({'medicine': 'M1', 'lot_no': 'A1', 'mfg_date': '01/01/2569', 'exp_date': '31/12/2570', 'qty': '10'},
+                                 {'medicine': 'M1', 'lot_no': 'A2', 'mfg_date': '2569-01-01', 'exp_date': '2570-12-31', 'qty': '10'}), MEDS, NO_STOCK, TODAY)
+    assert problems(checked) == ['', '']
+    assert checked['mfg_date'].tolist() == [pd.Timestamp('2026-01-01')] * 2
+    assert checked['exp_date'].tolist() == [pd.Timestamp('2027-12-31')] * 2
+
+def test_duplicate_lot_in_sheet():
+    checked = validate_grid(grid({'medicine': 'M1', 'lot_no': 'A1', 'exp_date': '2027-12-31', 'qty': '10'},
+                                 {'medicine': 'M1', 'lot_no': 'a1', 'exp_date': '2027-12-31', 'qty': '5'},
+                                 {'medicine': 'M1', 'exp_date': '2027-12-31', 'qty': '5'},
+                                 {'medicine': 'M1', 'exp_date': '2027-12-31', 'qty': '5'}), MEDS, NO_STOCK, TODAY)
+    # บรรทัดที่ไม่มีเลข Lot ('-') ไม่นับเป็น Lot ซ้ำ
+    assert problems(checked) == [PROBLEMS['dup_in_sheet']] * 2 + ['', '']
+
+def test_lot_in_stock_with_other_expiry():
+    stock = pd.DataFrame({'medicine_id': ['M1', 'M1'], 'lot_no': [' a1 ', 'A2'], 'exp_date': ['2028-01-01', '2027-12-31']})
+    checked = validate_grid(grid({'medicine': 'M1', 'lot_no': 'A1', 'exp_date': '2027-12-31', 'qty': '10'},
+                                 {'medicine': 'M1', 'lot_no': 'A2', 'exp_date': '2027-12-31', 'qty': '10'}), MEDS, stock, TODAY)
+    assert problems(checked) == [PROBLEMS['dup_in_stock'], '']
+
+def test_line_problems():
+    checked = validate_grid(grid({'medicine': 'nope', 'exp_date': '2027-12-31', 'qty': '1'},
+                                 {'medicine': 'cetirizine', 'exp_date': '2027-12-31', 'qty': '1'},
+                                 {'medicine': 'M1', 'exp_date': '2026-10-18', 'qty': '1'},
+                                 {'medicine': 'M1', 'mfg_date': '2027-12-31', 'exp_date': '2027-01-01', 'qty': '1'},
+                                 {'medicine': 'M1', 'exp_date': 'soon', 'qty': '1.5', 'unit_cost': '-1'}), MEDS, NO_STOCK, TODAY)
+    assert problems(checked) == [
+        PROBLEMS['unknown'], PROBLEMS['ambiguous'], PROBLEMS['expired'], PROBLEMS['exp_before_mfg'],
+        ", ".join([PROBLEMS['no_exp'], PROBLEMS['bad_qty'], PROBLEMS['bad_cost']]),
+    ]
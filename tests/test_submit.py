@@ -0,0 +1,34 @@
+from streamlit.testing.v1 import AppTest
+
+# --- token ของฟอร์ม (pharmacy/submit.py): บันทึกสำเร็จแล้วปุ่มของหน้าจอเดิมต้องไม่ส่งซ้ำด้วย token ใหม่ ---
+
+def form_app():
+    import streamlit as st
+    from pharmacy.submit import form_token, form_key, reset_form
+    st.session_state.setdefault("sent", [])
+    form_token("f")
+    with st.form(form_key("f", "myform")):
+        st.text_input("note", key="note")
+        if st.form_submit_button("save", key=form_key("f", "save")):
+            # เหมือน call_rpc: ส่งด้วย token ของรอบนี้ สำเร็จแล้ว reset_form แล้ว st.rerun()
+            st.session_state.sent.append(form_token("f"))
+            reset_form("f")
+            st.rerun()
+
+def test_submit_rotates_button_key_and_token():
+    at = AppTest.from_function(form_app).run()
+    assert [b.key for b in at.button] == ["save_0"]
+    at.button(key="save_0").click().run()
+    assert len(at.session_state.sent) == 1
+    # หน้าจอรอบใหม่ไม่มีปุ่ม save_0 แล้ว คลิกที่ค้างจากหน้าจอเดิมจึงไม่ถึงปุ่มใด
+    assert [b.key for b in at.button] == ["save_1"]
+    at.run()
+    assert len(at.session_state.sent) == 1
+    at.button(key="save_1").click().run()
+    assert len(at.session_state.sent) == 2 and len(set(at.session_state.sent)) == 2
+
+def test_token_is_stable_within_one_render():
+    at = AppTest.from_function(form_app).run()
+    token = at.session_state["f_token_0"]
+    at.run()
+    assert at.session_state["f_token_0"] == token